@@ -0,0 +1,160 @@
+"""
+Measures how many concurrent requests one worker sustains when TMDb is slow,
+with the sync views and with the async views under ASGI.
+
+Starts a fake TMDb on localhost that answers every call after --latency
+seconds, then sends --requests requests to --path at each --concurrency
+level, with the TMDb cache off:
+
+- sync: the default views, run by a pool of --threads request threads, as
+  in a gunicorn gthread worker;
+- async: the async views behind asgi.application, with every request in
+  flight at once, as under uvicorn.
+
+Reports throughput and median latency per level.
+
+    python -m benchmarks.bench_async_views --latency 0.2 --concurrency 8 64 256
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MOVIE = {'id': 949, 'title': 'Heat', 'poster_path': '/949.jpg', 'overview': 'A heist.',
+         'release_date': '1995-12-15', 'vote_average': 7.9, 'runtime': 170, 'genres': [],
+         'credits': {'cast': []}, 'known_for': []}
+
+
+def serve_fake_tmdb(latency, port):
+    body = json.dumps({'results': [MOVIE] * 20, **MOVIE}).encode()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    class Server(ThreadingHTTPServer):
+        daemon_threads = True
+        request_queue_size = 1024
+
+    server = Server(('127.0.0.1', 0), Handler)
+    port.value = server.server_port
+    server.serve_forever()
+
+
+def fake_tmdb(latency):
+    """
+    Runs the fake TMDb in a process of its own, so it doesn't compete with
+    the measured worker for the GIL. Returns the process and its port.
+    """
+    port = multiprocessing.Value('i', 0)
+    process = multiprocessing.Process(target=serve_fake_tmdb, args=(latency, port), daemon=True)
+    process.start()
+    while not port.value:
+        time.sleep(0.01)
+    return process, port.value
+
+
+def run_sync(app, path, requests, threads):
+    def one(_):
+        client = app.test_client()
+        started = time.perf_counter()
+        status = client.get(path).status_code
+        return status, time.perf_counter() - started
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        return list(pool.map(one, range(requests)))
+
+
+def run_async(application, path, requests, concurrency):
+    import httpx
+
+    async def burst():
+        limit = asyncio.Semaphore(concurrency)
+        transport = httpx.ASGITransport(app=application)
+        async with httpx.AsyncClient(transport=transport, base_url='http://movievault',
+                                     timeout=None) as client:
+            async def one():
+                async with limit:
+                    started = time.perf_counter()
+                    response = await client.get(path)
+                    return response.status_code, time.perf_counter() - started
+            return await asyncio.gather(*[one() for _ in range(requests)])
+
+    return asyncio.run(burst())
+
+
+def summarize(mode, concurrency, results, elapsed):
+    latencies = [latency for _, latency in results]
+    return {
+        'mode': mode,
+        'concurrency': concurrency,
+        'requests_per_second': round(len(results) / elapsed, 1),
+        'p50_ms': round(statistics.median(latencies) * 1000, 1),
+        'errors': sum(1 for status, _ in results if status != 200),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--latency', type=float, default=0.2)
+    parser.add_argument('--path', default='/search?query=heat')
+    parser.add_argument('--requests', type=int, default=512)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[8, 64, 256])
+    args = parser.parse_args()
+
+    server, port = fake_tmdb(args.latency)
+    scratch = tempfile.mkdtemp()
+    os.environ.update({
+        'DATABASE_URL': f"sqlite:///{os.path.join(scratch, 'async.db')}",
+        'TMDB_BASE_URL': f'http://127.0.0.1:{port}/3',
+        'TMDB_CACHE': '0',
+        'TMDB_POOL_SIZE': '256',
+        'TMDB_ASYNC_MAX_CONNECTIONS': '256',
+        'TMDB_RATE_LIMIT': '0',
+        'SENTRY_DSN': '',
+    })
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+    from app import app, db
+    import asgi
+
+    with app.app_context():
+        db.create_all()
+
+    results = []
+    for concurrency in args.concurrency:
+        threads = min(concurrency, args.threads)
+        started = time.perf_counter()
+        outcome = run_sync(app, args.path, args.requests, threads)
+        results.append(summarize(f'sync ({threads} threads)', concurrency, outcome,
+                                 time.perf_counter() - started))
+
+        started = time.perf_counter()
+        outcome = run_async(asgi.application, args.path, args.requests, concurrency)
+        results.append(summarize('async (ASGI)', concurrency, outcome, time.perf_counter() - started))
+
+    print(json.dumps({'latency': args.latency, 'path': args.path, 'requests': args.requests,
+                      'results': results}, indent=2))
+    server.terminate()
+    os._exit(0)
+
+
+if __name__ == '__main__':
+    main()
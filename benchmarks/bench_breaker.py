@@ -0,0 +1,99 @@
+"""
+Measures how page latency holds up while TMDb hangs, with the circuit
+breakers off and on.
+
+Starts a fake TMDb on localhost that answers every call after --latency
+seconds (longer than the read timeout, so every call times out), then has
+--concurrency threads load --path for --duration seconds, each load for a
+different movie so no two share a TMDb call or a cache entry. Without
+breakers every load waits out the read timeout; with them the first loads
+do, and once TMDB_BREAKER_MIN_CALLS calls have been stuck for
+TMDB_BREAKER_SLOW_CALL seconds the rest are answered without TMDb.
+
+Reports the loads completed and their latency percentiles per mode.
+
+    python -m benchmarks.bench_breaker --latency 30 --concurrency 8 --duration 20
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.bench_async_views import fake_tmdb
+
+
+def measure(breaker, port, path, concurrency, duration, results):
+    scratch = tempfile.mkdtemp()
+    os.environ.update({
+        'DATABASE_URL': f"sqlite:///{os.path.join(scratch, 'breaker.db')}",
+        'TMDB_BASE_URL': f'http://127.0.0.1:{port}/3',
+        'TMDB_RATE_LIMIT': '0',
+        'TMDB_BREAKER': '1' if breaker else '0',
+        'SENTRY_DSN': '',
+    })
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+    from app import app, db, tmdb
+
+    with app.app_context():
+        db.create_all()
+
+    movie_ids = itertools.count(1)
+    latencies = []
+    deadline = time.perf_counter() + duration
+
+    def load():
+        client = app.test_client()
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            client.get(path.format(next(movie_ids)))
+            latencies.append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=load) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    results.put({
+        'breaker': breaker,
+        'loads': len(latencies),
+        'p50_ms': round(statistics.median(latencies) * 1000, 1),
+        'p95_ms': round(latencies[int(len(latencies) * 0.95)] * 1000, 1),
+        'max_ms': round(latencies[-1] * 1000, 1),
+        'breakers': tmdb.breakers.stats() if tmdb.breakers is not None else None,
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--latency', type=float, default=30)
+    parser.add_argument('--path', default='/movies/{}')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=20)
+    args = parser.parse_args()
+
+    server, port = fake_tmdb(args.latency)
+    results = multiprocessing.Queue()
+    report = []
+    for breaker in (False, True):
+        # A process per run, so each imports the app with its own settings
+        process = multiprocessing.Process(
+            target=measure, args=(breaker, port, args.path, args.concurrency, args.duration, results))
+        process.start()
+        report.append(results.get())
+        process.kill()
+
+    print(json.dumps({'latency': args.latency, 'path': args.path, 'concurrency': args.concurrency,
+                      'duration': args.duration, 'results': report}, indent=2))
+    server.terminate()
+
+
+if __name__ == '__main__':
+    main()
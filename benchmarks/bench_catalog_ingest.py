@@ -0,0 +1,72 @@
+"""
+Measures catalog bulk-ingest throughput and peak memory.
+
+Writes a synthetic TMDb daily-export dump with --rows lines, ingests it into a
+scratch SQLite database through the same code path as `flask catalog ingest`,
+and prints rows/second and the process's peak RSS. Peak RSS should stay flat
+as --rows grows; only --batch-size moves it.
+
+    python -m benchmarks.bench_catalog_ingest --rows 1000000
+"""
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+
+
+def write_dump(path, rows):
+    with open(path, 'w') as dump:
+        for movie_id in range(1, rows + 1):
+            dump.write(json.dumps({
+                'adult': False,
+                'id': movie_id,
+                'original_title': f'Synthetic Movie {movie_id}',
+                'popularity': (movie_id * 7919 % 10000) / 100,
+                'video': False,
+            }) + '\n')
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--batch-size', type=int, default=5000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='catalog-bench-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'catalog.db')}"
+    os.environ.setdefault('TMDB_CACHE', '0')
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+    from app import app, db
+    import catalog
+
+    dump = os.path.join(workdir, 'movie_ids.json')
+    write_dump(dump, args.rows)
+    baseline = peak_rss_mb()
+
+    with app.app_context():
+        db.create_all()
+        started = time.perf_counter()
+        total = catalog.ingest(catalog.read_records(dump), batch_size=args.batch_size)
+        elapsed = time.perf_counter() - started
+
+    print(json.dumps({
+        'rows': total,
+        'batch_size': args.batch_size,
+        'seconds': round(elapsed, 2),
+        'rows_per_second': round(total / elapsed),
+        'rss_before_mb': round(baseline, 1),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Measures /favorites page latency as a user's vault grows.
+
+Fills a scratch SQLite database with users holding --sizes favorites each,
+then times favorites.page() for the first and the last page in every sort
+order, next to the OFFSET query it replaces. Keyset pages seek straight to
+their position in the (user_id, ..., id) index, so their latency should stay
+flat from 10 to 100k favorites while OFFSET grows with the page's depth.
+
+    python -m benchmarks.bench_favorites --sizes 10 1000 100000
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+
+def timed(function, repeats):
+    latencies = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        function()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(latencies), 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000, 10000, 100000])
+    parser.add_argument('--page-size', type=int, default=24)
+    parser.add_argument('--repeats', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(scratch, 'favorites.db')}"
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+    from app import app
+    from models import db, User, Favorite
+    import favorites
+
+    generator = random.Random(args.seed)
+    results = []
+    with app.app_context():
+        db.create_all()
+        for size in args.sizes:
+            user = User(username=f'bench{size}', password='x', first_name='Bench', last_name='User')
+            db.session.add(user)
+            db.session.flush()
+            db.session.execute(db.insert(Favorite), [{
+                'user_id': user.id,
+                'movie_id': movie_id,
+                'movie_title': f'Movie {generator.randrange(size * 10):08d}',
+                'movie_poster': f'/{movie_id}.jpg',
+                'movie_release_date': f'{generator.randint(1920, 2026)}-06-01',
+                'movie_rating': round(generator.uniform(1, 10), 1),
+                'movie_runtime': 120,
+            } for movie_id in range(1, size + 1)])
+            db.session.commit()
+
+            row = {'favorites': size}
+            for sort, (columns, descending) in favorites.SORTS.items():
+                order = [column.desc() if descending else column for column in columns]
+                depth = max(size - args.page_size, 0)
+                last = (db.session.query(*columns).filter(Favorite.user_id == user.id)
+                        .order_by(*order).offset(max(depth - 1, 0)).first())
+                cursor = favorites.encode_cursor(list(last)) if depth else None
+                row[f'{sort}_first_ms'] = timed(
+                    lambda: favorites.page(user.id, sort, None, args.page_size), args.repeats)
+                row[f'{sort}_last_ms'] = timed(
+                    lambda: favorites.page(user.id, sort, cursor, args.page_size), args.repeats)
+                row[f'{sort}_offset_last_ms'] = timed(
+                    lambda: Favorite.query.filter(Favorite.user_id == user.id).order_by(*order)
+                    .offset(depth).limit(args.page_size + 1).all(), args.repeats)
+                db.session.rollback()
+            results.append(row)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
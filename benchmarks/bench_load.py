@@ -0,0 +1,301 @@
+"""
+Load-tests the app under gunicorn against a local TMDb stub and reports
+throughput and latency percentiles per route.
+
+Starts benchmarks.tmdb_stub with the given --latency, --jitter and
+--error-rate, creates a scratch SQLite database, and runs `gunicorn
+src.app:app` (with gunicorn.conf.py) on it with --workers processes of
+--threads threads. --users accounts are signed up and each adds
+--favorites movies through the app. Then --concurrency clients, each logged
+in as one of the users, request a weighted mix of:
+
+- dashboard: /
+- search: /search?query=<a title word or surname>
+- movie: /movies/<id>, mostly popular movies
+- favorites: /favorites
+- recommendations: /recommendations
+
+back to back for --warmup seconds, which are not counted, and then for
+--duration seconds. A response of 400 or above, or no response, counts as an
+error. The clients run in this process, so on a small machine they take CPU
+from the workers; compare runs made on the same machine.
+
+Prints, and with --output writes, a JSON report with each route's
+requests, status codes, errors, requests a second and p50/p95/p99 latency
+in milliseconds. With --baseline it also compares against an earlier
+report and exits with status 1 if any route's p95 or p99 grew, or its
+throughput fell, by more than --tolerance, or its error rate rose by more
+than a point.
+
+    python -m benchmarks.bench_load --duration 30 --output run.json
+    python -m benchmarks.bench_load --duration 30 --baseline run.json
+"""
+import argparse
+import collections
+import itertools
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+from benchmarks import tmdb_stub
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+ROUTES = ('dashboard', 'search', 'movie', 'favorites', 'recommendations')
+PASSWORD = 'load-test-password'
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def percentile(ordered, share):
+    """
+    Nearest-rank percentile of an ascending list.
+    """
+    return ordered[max(0, math.ceil(share * len(ordered)) - 1)]
+
+
+class Workload:
+    """
+    Picks the routes and paths the clients request, from the stub's
+    catalog.
+    """
+
+    def __init__(self, catalog, mix, seed):
+        self.routes = [route for route in ROUTES if mix.get(route, 0) > 0]
+        self.weights = [mix[route] for route in self.routes]
+        self.popular = [movie['id'] for movie in catalog.by_popularity[:200]]
+        self.all = list(catalog.movies)
+        self.queries = list(tmdb_stub.TITLE_WORDS) + list(tmdb_stub.LAST_NAMES)
+        self.seed = seed
+
+    def rng(self, client):
+        return random.Random(self.seed * 7919 + client)
+
+    def movie_id(self, rng):
+        # Most views go to popular movies, as on the real site
+        return rng.choice(self.popular if rng.random() < 0.8 else self.all)
+
+    def next(self, rng):
+        route = rng.choices(self.routes, self.weights)[0]
+        if route == 'dashboard':
+            return route, '/'
+        if route == 'search':
+            return route, f'/search?query={rng.choice(self.queries)}'
+        if route == 'movie':
+            return route, f'/movies/{self.movie_id(rng)}'
+        return route, f'/{route}'
+
+
+def start_app(args, env, scratch):
+    port = free_port()
+    log = open(os.path.join(scratch, 'gunicorn.log'), 'w')
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', 'src.app:app', '--bind', f'127.0.0.1:{port}',
+         '--workers', str(args.workers), '--threads', str(args.threads), '--worker-class', 'gthread',
+         '--timeout', '120'],
+        cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+    url = f'http://127.0.0.1:{port}'
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited; see {log.name}")
+        try:
+            if requests.get(url + '/login', timeout=5).status_code == 200:
+                return process, url
+        except requests.exceptions.ConnectionError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"gunicorn did not answer within 60s; see {log.name}")
+
+
+def sign_up(url, users, favorites, workload):
+    """
+    Creates the users and their favorites through the app, returning a
+    logged-in session per user.
+    """
+    sessions = []
+    for index in range(users):
+        session = requests.Session()
+        username = f'load{index}'
+        session.post(f'{url}/signup', data={'username': username, 'password': PASSWORD,
+                                           'first_name': 'Load', 'last_name': str(index)})
+        response = session.post(f'{url}/login', data={'username': username, 'password': PASSWORD})
+        response.raise_for_status()
+        rng = workload.rng(-1 - index)
+        for movie_id in {workload.movie_id(rng) for _ in range(favorites)}:
+            session.post(f'{url}/add_to_favorites/{movie_id}', allow_redirects=False)
+        sessions.append(session)
+    return sessions
+
+
+def run(url, sessions, workload, concurrency, seconds, first_client=0):
+    """
+    Keeps concurrency clients requesting the workload for seconds.
+
+    Returns:
+        (route, status, seconds) for every request that finished in time.
+    """
+    samples = []
+    deadline = time.perf_counter() + seconds
+
+    def client(index):
+        session = requests.Session()
+        session.cookies.update(sessions[index % len(sessions)].cookies)
+        rng = workload.rng(first_client + index)
+        while True:
+            route, path = workload.next(rng)
+            started = time.perf_counter()
+            try:
+                status = session.get(url + path, allow_redirects=False, timeout=60).status_code
+            except requests.exceptions.RequestException:
+                status = None
+            finished = time.perf_counter()
+            if finished > deadline:
+                return
+            samples.append((route, status, finished - started))
+
+    threads = [threading.Thread(target=client, args=(index,)) for index in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples
+
+
+def summarize(samples, seconds):
+    routes = {}
+    for route, group in itertools.groupby(sorted(samples, key=lambda sample: sample[0]),
+                                          key=lambda sample: sample[0]):
+        group = list(group)
+        latencies = sorted(latency * 1000 for _, _, latency in group)
+        errors = sum(1 for _, status, _ in group if status is None or status >= 400)
+        statuses = collections.Counter(str(status) for _, status, _ in group)
+        routes[route] = {
+            'requests': len(group),
+            'statuses': dict(sorted(statuses.items())),
+            'errors': errors,
+            'error_rate': round(errors / len(group), 4),
+            'requests_per_second': round(len(group) / seconds, 2),
+            'p50_ms': round(percentile(latencies, 0.50), 1),
+            'p95_ms': round(percentile(latencies, 0.95), 1),
+            'p99_ms': round(percentile(latencies, 0.99), 1),
+        }
+    return routes
+
+
+def compare(report, baseline, tolerance, min_delta_ms):
+    """
+    Lists how report's routes regressed against baseline's.
+    """
+    regressions = []
+    for route, current in report['routes'].items():
+        before = baseline.get('routes', {}).get(route)
+        if before is None:
+            continue
+        for metric in ('p95_ms', 'p99_ms'):
+            if (current[metric] > before[metric] * (1 + tolerance)
+                    and current[metric] - before[metric] > min_delta_ms):
+                regressions.append(f"{route} {metric} {before[metric]} -> {current[metric]}")
+        if current['requests_per_second'] < before['requests_per_second'] * (1 - tolerance):
+            regressions.append(f"{route} requests_per_second {before['requests_per_second']} -> "
+                               f"{current['requests_per_second']}")
+        if current['error_rate'] > before['error_rate'] + 0.01:
+            regressions.append(f"{route} error_rate {before['error_rate']} -> {current['error_rate']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--warmup', type=float, default=5)
+    parser.add_argument('--users', type=int, default=8)
+    parser.add_argument('--favorites', type=int, default=12)
+    parser.add_argument('--mix', default='dashboard=3,search=2,movie=4,favorites=1,recommendations=1',
+                        help='Relative weights of the routes, e.g. movie=1,search=1')
+    parser.add_argument('--latency', type=float, default=0.05, help="TMDb stub's base latency")
+    parser.add_argument('--jitter', type=float, default=0.02, help="Mean extra latency of the stub")
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of stub calls that fail')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--env', action='append', default=[], metavar='NAME=VALUE',
+                        help="Extra setting for the app's environment; may be repeated")
+    parser.add_argument('--output', help='Also write the report to this file')
+    parser.add_argument('--baseline', help='Report of an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    parser.add_argument('--min-delta-ms', type=float, default=5,
+                        help='Smallest latency increase counted as a regression')
+    args = parser.parse_args()
+
+    mix = {name: float(weight) for name, weight in
+           (item.split('=') for item in args.mix.split(',') if item)}
+    unknown = set(mix) - set(ROUTES)
+    if unknown:
+        parser.error(f"Unknown routes in --mix: {', '.join(sorted(unknown))}")
+
+    stub, tmdb_url = tmdb_stub.start(latency=args.latency, jitter=args.jitter,
+                                     error_rate=args.error_rate, seed=args.seed)
+    workload = Workload(tmdb_stub.Catalog(seed=args.seed), mix, args.seed)
+    scratch = tempfile.mkdtemp()
+    env = dict(os.environ, **{
+        'DATABASE_URL': f"sqlite:///{os.path.join(scratch, 'load.db')}",
+        'TMDB_BASE_URL': tmdb_url,
+        'POSTER_CACHE_DIR': os.path.join(scratch, 'posters'),
+        'SENTRY_DSN': '',
+    })
+    env.update(setting.split('=', 1) for setting in args.env)
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'init-db'],
+                   cwd=os.path.join(ROOT, 'src'), env=env, check=True, capture_output=True)
+
+    app, url = start_app(args, env, scratch)
+    try:
+        sessions = sign_up(url, args.users, args.favorites, workload)
+        run(url, sessions, workload, args.concurrency, args.warmup)
+        samples = run(url, sessions, workload, args.concurrency, args.duration,
+                      first_client=args.concurrency)
+    finally:
+        app.terminate()
+        app.wait(30)
+        stub.terminate()
+
+    latencies = sorted(latency * 1000 for _, _, latency in samples)
+    report = {
+        'settings': {name: getattr(args, name) for name in
+                     ('workers', 'threads', 'concurrency', 'duration', 'users', 'favorites',
+                      'latency', 'jitter', 'error_rate', 'seed', 'env')} | {'mix': mix},
+        'total': {
+            'requests': len(samples),
+            'requests_per_second': round(len(samples) / args.duration, 2),
+            'p50_ms': round(percentile(latencies, 0.50), 1) if latencies else None,
+            'p99_ms': round(percentile(latencies, 0.99), 1) if latencies else None,
+        },
+        'routes': summarize(samples, args.duration),
+    }
+    if args.baseline:
+        with open(args.baseline) as file:
+            report['regressions'] = compare(report, json.load(file), args.tolerance, args.min_delta_ms)
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    if report.get('regressions'):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
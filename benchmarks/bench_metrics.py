@@ -0,0 +1,90 @@
+"""
+Measures what the Server-Timing header and /metrics histograms cost a
+request.
+
+Starts a fake TMDb on localhost that answers every call after --latency
+seconds, and serves the app over HTTP on localhost from a thread of this
+process, with a scratch database and the TMDb cache on. Signs up a user
+with --favorites favorites and logs in. Each path in --paths is loaded
+once to warm the caches, then --requests times with the timing on and
+--requests times with it off, alternating load by load so both modes see
+the same machine noise. The defaults are fast pages answered from the
+caches, where the fixed cost of the timing is the largest share of the
+request.
+
+Reports the median milliseconds per load of each path per mode, and the
+overhead of the timing in microseconds and as a share of the time without
+it.
+
+    python -m benchmarks.bench_metrics --requests 500
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+from werkzeug.serving import make_server
+
+from benchmarks.bench_async_views import fake_tmdb
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--latency', type=float, default=0.01)
+    parser.add_argument('--paths', nargs='+',
+                        default=['/', '/movies/949', '/search?query=heat', '/favorites', '/recommendations'])
+    parser.add_argument('--favorites', type=int, default=12)
+    parser.add_argument('--requests', type=int, default=500)
+    args = parser.parse_args()
+
+    server, port = fake_tmdb(args.latency)
+    scratch = tempfile.mkdtemp()
+    os.environ.update({
+        'DATABASE_URL': f"sqlite:///{os.path.join(scratch, 'metrics.db')}",
+        'TMDB_BASE_URL': f'http://127.0.0.1:{port}/3',
+        'METRICS': '1',
+        'PASSWORD_HASH_WORKERS': '0',
+        'SENTRY_DSN': '',
+    })
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+    from app import app, db, metrics
+
+    with app.app_context():
+        db.create_all()
+    http = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=http.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{http.server_port}'
+    client = requests.Session()
+    account = {'username': 'bench', 'password': 'bench-password', 'first_name': 'Bench', 'last_name': 'User'}
+    client.post(f'{url}/signup', data=account)
+    client.post(f'{url}/login', data=account)
+    for movie_id in range(1, args.favorites + 1):
+        client.post(f'{url}/add_to_favorites/{movie_id}')
+
+    report = {}
+    for path in args.paths:
+        status = client.get(url + path).status_code
+        seconds = {True: [], False: []}
+        for index in range(2 * args.requests):
+            metrics.enabled = index % 2 == 1
+            started = time.perf_counter()
+            client.get(url + path)
+            seconds[metrics.enabled].append(time.perf_counter() - started)
+        metrics.enabled = True
+        off, on = (statistics.median(seconds[enabled]) * 1000 for enabled in (False, True))
+        report[path] = {'status': status, 'off_ms': round(off, 3), 'on_ms': round(on, 3),
+                        'overhead_us': round((on - off) * 1000, 1),
+                        'overhead_percent': round((on - off) / off * 100, 2)}
+    http.shutdown()
+    server.terminate()
+
+    print(json.dumps({'latency': args.latency, 'requests': args.requests, 'paths': report}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
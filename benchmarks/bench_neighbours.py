@@ -0,0 +1,69 @@
+"""
+Measures the item-item neighbour job's time and memory on a synthetic vault.
+
+Builds a binary users x movies matrix with --favorites favorites drawn with a
+long-tailed movie popularity, runs the chunked cosine top-N computation that
+`flask neighbours build` uses, and prints throughput and peak RSS. Peak RSS
+is governed by --chunk-size, not by movies squared.
+
+    python -m benchmarks.bench_neighbours --favorites 2000000
+"""
+import argparse
+import json
+import os
+import resource
+import sys
+import time
+
+import numpy as np
+from scipy import sparse
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--favorites', type=int, default=2_000_000)
+    parser.add_argument('--users', type=int, default=200_000)
+    parser.add_argument('--movies', type=int, default=100_000)
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    parser.add_argument('--top-n', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+    from neighbours import top_neighbours
+
+    generator = np.random.default_rng(args.seed)
+    users = generator.integers(0, args.users, args.favorites)
+    movies = (args.movies * generator.random(args.favorites) ** 3).astype(np.int64)
+    matrix = sparse.csr_matrix((np.ones(args.favorites, dtype=np.float32), (users, movies)),
+                               shape=(args.users, args.movies))
+    matrix.data[:] = 1
+    baseline = peak_rss_mb()
+
+    started = time.perf_counter()
+    movies_with_neighbours = pairs = 0
+    for _, found in top_neighbours(matrix, args.top_n, min_users=2, chunk_size=args.chunk_size):
+        movies_with_neighbours += 1
+        pairs += len(found)
+    elapsed = time.perf_counter() - started
+
+    print(json.dumps({
+        'favorites': int(matrix.nnz),
+        'users': args.users,
+        'movies': args.movies,
+        'chunk_size': args.chunk_size,
+        'movies_with_neighbours': movies_with_neighbours,
+        'neighbour_rows': pairs,
+        'seconds': round(elapsed, 2),
+        'rss_before_mb': round(baseline, 1),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
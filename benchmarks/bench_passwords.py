@@ -0,0 +1,112 @@
+"""
+Measures login throughput with passwords hashed inline and on the pool.
+
+Creates a user in a scratch SQLite database, then sends --logins POST /login
+requests from --threads concurrent clients, first with the hash checked on
+the request thread (workers=0, as before the hashing pool) and then on a pool
+of --workers processes. Alongside the burst, a probe thread keeps rendering
+GET /login and records its latency: that is the other traffic sharing the web
+worker. Login throughput is reported per core available to the process.
+
+    python -m benchmarks.bench_passwords --threads 8 --logins 200
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * fraction))], 3) if values else None
+
+
+def burst(app, threads, logins, password):
+    remaining = iter(range(logins))
+    lock = threading.Lock()
+    done = threading.Event()
+    failures = []
+    probes = []
+
+    def log_in():
+        client = app.test_client()
+        while True:
+            with lock:
+                if next(remaining, None) is None:
+                    return
+            response = client.post('/login', data={'username': 'bench', 'password': password})
+            if response.status_code != 302:
+                failures.append(response.status_code)
+
+    def probe():
+        client = app.test_client()
+        while not done.is_set():
+            started = time.perf_counter()
+            client.get('/login')
+            probes.append((time.perf_counter() - started) * 1000)
+            time.sleep(0.005)
+
+    prober = threading.Thread(target=probe)
+    prober.start()
+    workers = [threading.Thread(target=log_in) for _ in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+    done.set()
+    prober.join()
+    return elapsed, failures, probes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--method', default='scrypt:32768:8:1')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(scratch, 'passwords.db')}"
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+    from app import app
+    from models import db, User
+    import passwords
+
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+    results = []
+    with app.app_context():
+        db.create_all()
+        passwords.hasher.configure(method=args.method, workers=0)
+        db.session.add(User(username='bench', password=passwords.hasher.hash('benchpassword'),
+                            first_name='Bench', last_name='User'))
+        db.session.commit()
+
+    for mode, workers in (('inline', 0), ('pool', args.workers)):
+        passwords.hasher.configure(method=args.method, workers=workers,
+                                   concurrency=max(args.threads, 1), wait=60)
+        burst(app, 1, 2, 'benchpassword')  # start the pool and warm the routes
+        elapsed, failures, probes = burst(app, args.threads, args.logins, 'benchpassword')
+        results.append({
+            'mode': mode,
+            'workers': workers,
+            'logins_per_second': round(args.logins / elapsed, 2),
+            'logins_per_second_per_core': round(args.logins / elapsed / cores, 2),
+            'failures': len(failures),
+            'probe_p50_ms': round(statistics.median(probes), 3) if probes else None,
+            'probe_p99_ms': percentile(probes, 0.99),
+        })
+        passwords.hasher.reset()
+
+    print(json.dumps({'method': args.method, 'threads': args.threads, 'logins': args.logins,
+                      'cores': cores, 'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Measures what the poster proxy saves a dashboard visit and what serving a
+poster costs.
+
+Stands in for TMDb's image server with a generated w780 poster, then for
+--posters distinct posters:
+
+- bytes: the size of the w500 image every card used to load against the
+  variant a 150px card picks from its srcset at 1x and 2x pixel density;
+- miss: the latency of the first request for a variant, which fetches the
+  original (instantly here) and resizes it;
+- hit: the latency of a later request, served from the disk cache;
+- revalidate: the latency of a request with a matching If-None-Match.
+
+    python -m benchmarks.bench_posters --posters 120
+"""
+import argparse
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+
+def poster(seed):
+    """
+    Returns a w780 JPEG with enough detail to compress like a real poster.
+    """
+    from PIL import Image, ImageFilter
+
+    noise = Image.effect_noise((780, 1170), 64 + seed % 32).convert('RGB')
+    gradient = Image.linear_gradient('L').resize((780, 1170)).convert('RGB')
+    image = Image.blend(noise.filter(ImageFilter.GaussianBlur(2)), gradient, 0.5)
+    output = io.BytesIO()
+    image.save(output, 'JPEG', quality=90)
+    return output.getvalue()
+
+
+def timed(client, url, headers=None):
+    started = time.perf_counter()
+    response = client.get(url, headers=headers)
+    return response, (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--posters', type=int, default=120)
+    args = parser.parse_args()
+
+    os.environ.setdefault('SENTRY_DSN', '')
+    from app import app
+    import posters
+
+    posters.store.configure(directory=tempfile.mkdtemp())
+    originals = {f'p{index}.jpg': poster(index) for index in range(args.posters)}
+    client = app.test_client()
+    timings = {'miss_ms': [], 'hit_ms': [], 'revalidate_ms': []}
+    sizes = {'w500': 0, 'w154': 0, 'w342': 0}
+
+    with patch.object(posters.store, 'fetch_original', side_effect=originals.__getitem__):
+        for path in originals:
+            for size in sizes:
+                response, elapsed = timed(client, f'/poster/{size}/{path}')
+                sizes[size] += len(response.data)
+                if size == 'w154':
+                    timings['miss_ms'].append(elapsed)
+            response, elapsed = timed(client, f'/poster/w154/{path}')
+            timings['hit_ms'].append(elapsed)
+            etag, _ = response.get_etag()
+            response, elapsed = timed(client, f'/poster/w154/{path}', {'If-None-Match': f'"{etag}"'})
+            assert response.status_code == 304
+            timings['revalidate_ms'].append(elapsed)
+
+    print(json.dumps({
+        'posters': args.posters,
+        'dashboard_kib': {
+            'w500 (before)': round(sizes['w500'] / 1024),
+            'srcset at 1x (w154)': round(sizes['w154'] / 1024),
+            'srcset at 2x (w342)': round(sizes['w342'] / 1024),
+        },
+        'p50': {name: round(statistics.median(values), 2) for name, values in timings.items()},
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Measures per-request ranking latency of the content-based recommender.
+
+Builds a Ranker over --candidates synthetic catalog movies (TMDb's 19 genres,
+a long-tailed pool of cast members, release years since 1920) and times
+profile construction plus ranking for random users with --favorites
+favorites each. The target is under 20ms per request at 50k candidates.
+
+    python -m benchmarks.bench_recommender --candidates 50000
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+GENRES = (28, 12, 16, 35, 80, 99, 18, 10751, 14, 36, 27, 10402, 9648, 10749, 878, 10770, 53, 10752, 37)
+
+
+def synthetic_catalog(count, people, generator):
+    movie_ids = list(range(1, count + 1))
+    popularity = [generator.paretovariate(1.2) for _ in movie_ids]
+    release_dates = [f'{generator.randint(1920, 2026)}-06-01' for _ in movie_ids]
+    genre_links = [(movie_id, genre) for movie_id in movie_ids
+                   for genre in generator.sample(GENRES, generator.randint(1, 3))]
+    cast_links = [(movie_id, int(people * generator.random() ** 3)) for movie_id in movie_ids
+                  for _ in range(5)]
+    return movie_ids, popularity, release_dates, genre_links, cast_links
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--candidates', type=int, default=50000)
+    parser.add_argument('--people', type=int, default=100000)
+    parser.add_argument('--favorites', type=int, default=200)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+    from recommender import Ranker, decade
+
+    generator = random.Random(args.seed)
+    movie_ids, popularity, release_dates, genre_links, cast_links = synthetic_catalog(
+        args.candidates, args.people, generator)
+    started = time.perf_counter()
+    ranker = Ranker(movie_ids, popularity, release_dates, genre_links, cast_links)
+    build_seconds = time.perf_counter() - started
+
+    genres_of, cast_of = {}, {}
+    for movie_id, genre in genre_links:
+        genres_of.setdefault(movie_id, []).append(genre)
+    for movie_id, person in cast_links:
+        cast_of.setdefault(movie_id, []).append(person)
+
+    latencies = []
+    for _ in range(args.requests):
+        favorites = generator.sample(movie_ids, args.favorites)
+        genre_ids = [genre for movie_id in favorites for genre in genres_of[movie_id]]
+        person_ids = [person for movie_id in favorites for person in cast_of[movie_id][:3]]
+        decades = [decade(release_dates[movie_id - 1]) for movie_id in favorites]
+        started = time.perf_counter()
+        profile = ranker.profile(genre_ids, person_ids, decades)
+        ranker.rank(profile, exclude=set(favorites))
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+
+    print(json.dumps({
+        'candidates': len(ranker),
+        'features': ranker.width,
+        'nonzeros': int(ranker.features.nnz),
+        'build_seconds': round(build_seconds, 2),
+        'favorites_per_user': args.favorites,
+        'rank_ms': {
+            'p50': round(statistics.median(latencies), 2),
+            'p99': round(latencies[int(len(latencies) * 0.99)], 2),
+            'max': round(latencies[-1], 2),
+        },
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Measures how long a worker takes to import the app and serve its first
+request.
+
+Each run starts a fresh interpreter against a scratch SQLite database and
+times `import app` (with lifecycle.preload, in trees that have it), the
+per-worker startup that gunicorn's post_fork hook runs (lifecycle.post_fork)
+and the first and second GET /login. With preload_app, the import happens
+once in the master, so a worker's boot costs only the hook and the first
+request. --src points at another checkout's src directory to compare trees.
+
+    python -m benchmarks.bench_startup --runs 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+CHILD = r'''
+import json, os, sys, time
+sys.path.insert(0, os.environ['BENCH_SRC'])
+started = time.perf_counter()
+import app as module
+if hasattr(module, 'lifecycle') and hasattr(module.lifecycle, 'preload'):
+    module.lifecycle.preload(module.app)
+imported = time.perf_counter()
+if hasattr(module, 'lifecycle') and hasattr(module.lifecycle, 'post_fork'):
+    module.lifecycle.post_fork(module.app)
+booted = time.perf_counter()
+client = module.app.test_client()
+assert client.get('/login').status_code == 200
+first = time.perf_counter()
+client.get('/login')
+second = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'post_fork_ms': (booted - imported) * 1000,
+    'first_request_ms': (first - booted) * 1000,
+    'second_request_ms': (second - first) * 1000,
+}))
+os._exit(0)
+'''
+
+SETUP = r'''
+import os, sys
+sys.path.insert(0, os.environ['BENCH_SRC'])
+from app import app, db
+with app.app_context():
+    db.create_all()
+os._exit(0)
+'''
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--src', default=os.path.join(os.path.dirname(__file__), '..', 'src'))
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp()
+    env = dict(os.environ, BENCH_SRC=os.path.abspath(args.src),
+               DATABASE_URL=f"sqlite:///{os.path.join(scratch, 'startup.db')}")
+    subprocess.run([sys.executable, '-c', SETUP], env=env, check=True, capture_output=True)
+
+    runs = []
+    for _ in range(args.runs):
+        output = subprocess.run([sys.executable, '-c', CHILD], env=env, check=True,
+                                capture_output=True, text=True).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+
+    medians = {key: round(statistics.median(run[key] for run in runs), 1) for key in runs[0]}
+    medians['worker_boot_ms'] = round(medians['import_ms'] + medians['post_fork_ms']
+                                      + medians['first_request_ms'], 1)
+    medians['preloaded_worker_boot_ms'] = round(medians['post_fork_ms'] + medians['first_request_ms'], 1)
+    print(json.dumps({'src': os.path.abspath(args.src), 'runs': args.runs, 'median': medians}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Measures the title suggestion index's build time, memory and lookup latency.
+
+Builds a TitleIndex over --titles synthetic titles and prints the build time,
+the resident memory the index holds once built, the peak during the build, and
+lookup latency percentiles for random prefixes of one to eight characters.
+
+    python -m benchmarks.bench_suggest --titles 1000000
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import resource
+import statistics
+import sys
+import time
+
+WORDS = ('the', 'dark', 'knight', 'star', 'wars', 'love', 'night', 'house', 'last', 'man',
+         'city', 'blood', 'return', 'lost', 'king', 'ghost', 'dead', 'summer', 'war', 'girl',
+         'secret', 'little', 'story', 'black', 'life', 'time', 'world', 'death', 'moon', 'river',
+         'amélie', 'léon', 'mädchen', 'día', 'rêve', 'été', 'noël', 'señor')
+
+
+def synthetic_titles(count, seed):
+    generator = random.Random(seed)
+    for movie_id in range(1, count + 1):
+        words = generator.choices(WORDS, k=generator.randint(1, 4))
+        title = ' '.join(words).title() + f' {movie_id % 997}'
+        release_date = f'{generator.randint(1920, 2026)}-01-01'
+        yield movie_id, title, release_date, generator.paretovariate(1.5)
+
+
+def rss_mb():
+    with open('/proc/self/statm') as statm:
+        return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--titles', type=int, default=1_000_000)
+    parser.add_argument('--lookups', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+    from suggest import TitleIndex
+
+    gc.collect()
+    baseline = rss_mb()
+    started = time.perf_counter()
+    index = TitleIndex(synthetic_titles(args.titles, args.seed))
+    build_seconds = time.perf_counter() - started
+    gc.collect()
+    held = rss_mb() - baseline
+
+    generator = random.Random(args.seed + 1)
+    queries = [generator.choice(index.keys)[:generator.randint(1, 8)].decode(errors='ignore')
+               for _ in range(args.lookups)]
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        index.suggest(query)
+        latencies.append((time.perf_counter() - started) * 1e6)
+    latencies.sort()
+
+    print(json.dumps({
+        'titles': len(index),
+        'keys': len(index.keys),
+        'hot_prefixes': len(index.hot),
+        'build_seconds': round(build_seconds, 2),
+        'index_rss_mb': round(held, 1),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'lookup_us': {
+            'p50': round(statistics.median(latencies), 1),
+            'p99': round(latencies[int(len(latencies) * 0.99)], 1),
+            'max': round(latencies[-1], 1),
+        },
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
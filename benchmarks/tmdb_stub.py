@@ -0,0 +1,344 @@
+"""
+A local stand-in for the TMDb API, for benchmarks.
+
+Serves the endpoints the app calls (now_playing, popular, top_rated,
+discover, search/movie, search/person and movie details with credits) from
+a catalog of generated movies and people shaped like TMDb's payloads, so
+pages render as they do against the real API. Every answer is delayed by
+--latency seconds plus an exponentially distributed extra with mean
+--jitter, which gives the long tail real upstream latency has, and
+--error-rate of the calls get a 500 or 503 instead.
+
+The catalog is generated from --seed, so runs with the same settings see
+the same data. Run it on its own and point TMDB_BASE_URL at it:
+
+    python -m benchmarks.tmdb_stub --port 8765 --latency 0.05 --jitter 0.02
+    TMDB_BASE_URL=http://127.0.0.1:8765/3 flask --app app run
+
+or start it from another benchmark with start().
+"""
+import argparse
+import json
+import multiprocessing
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+GENRES = {
+    28: 'Action', 12: 'Adventure', 16: 'Animation', 35: 'Comedy', 80: 'Crime',
+    99: 'Documentary', 18: 'Drama', 10751: 'Family', 14: 'Fantasy', 36: 'History',
+    27: 'Horror', 10402: 'Music', 9648: 'Mystery', 10749: 'Romance', 878: 'Science Fiction',
+    53: 'Thriller', 10752: 'War', 37: 'Western',
+}
+
+TITLE_WORDS = (
+    'Last', 'Night', 'Shadow', 'River', 'Empire', 'Silent', 'Storm', 'Heart', 'City', 'Dark',
+    'Summer', 'Winter', 'Road', 'Secret', 'Lost', 'Iron', 'Glass', 'Fire', 'Star', 'Ghost',
+    'Midnight', 'Garden', 'King', 'Queen', 'Blood', 'Dream', 'Edge', 'Echo', 'Harbor', 'Wild',
+)
+FIRST_NAMES = (
+    'Anna', 'Ben', 'Clara', 'David', 'Elena', 'Frank', 'Grace', 'Hugo', 'Iris', 'Jack',
+    'Kate', 'Leo', 'Maya', 'Noah', 'Olive', 'Paul', 'Rosa', 'Sam', 'Tara', 'Victor',
+)
+LAST_NAMES = (
+    'Adams', 'Brooks', 'Carter', 'Diaz', 'Evans', 'Fischer', 'Garcia', 'Hughes', 'Ito', 'Jensen',
+    'Khan', 'Lopez', 'Moreau', 'Nolan', 'Okafor', 'Park', 'Quinn', 'Rossi', 'Silva', 'Turner',
+)
+OVERVIEW_WORDS = (
+    'a', 'the', 'young', 'detective', 'family', 'must', 'find', 'their', 'way', 'home', 'after',
+    'mysterious', 'war', 'town', 'secret', 'love', 'betrayal', 'journey', 'across', 'world',
+    'one', 'last', 'chance', 'to', 'save', 'everything', 'they', 'know', 'when', 'past',
+)
+
+PAGE_SIZE = 20
+_MOVIE = re.compile(r'^/3/movie/(\d+)$')
+
+
+def _path(rng):
+    return '/' + ''.join(rng.choice('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789')
+                         for _ in range(27)) + '.jpg'
+
+
+class Catalog:
+    """
+    The generated movies and people the stub serves.
+
+    Args:
+        movies (int): Number of movies.
+        people (int): Number of people, each cast in some of the movies.
+        seed (int): Seed of the generator.
+    """
+
+    def __init__(self, movies=2000, people=500, seed=1):
+        rng = random.Random(seed)
+        self.people = [{
+            'id': 10000 + index,
+            'name': f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+            'profile_path': _path(rng),
+            'known_for_department': 'Acting',
+            'popularity': round(rng.uniform(1, 80), 3),
+            'gender': rng.choice((1, 2)),
+        } for index in range(people)]
+        self.movies = {}
+        for index in range(movies):
+            movie_id = 100 + index
+            title = ' '.join(rng.sample(TITLE_WORDS, rng.randint(1, 3)))
+            if rng.random() < 0.4:
+                title = 'The ' + title
+            self.movies[movie_id] = {
+                'adult': False,
+                'backdrop_path': _path(rng),
+                'genre_ids': rng.sample(sorted(GENRES), rng.randint(1, 3)),
+                'id': movie_id,
+                'original_language': rng.choice(('en', 'en', 'en', 'fr', 'ja', 'ko', 'es')),
+                'original_title': title,
+                'overview': ' '.join(rng.choice(OVERVIEW_WORDS)
+                                     for _ in range(rng.randint(30, 70))).capitalize() + '.',
+                'popularity': round(rng.expovariate(1 / 40), 3),
+                'poster_path': _path(rng),
+                'release_date': f'{rng.randint(1960, 2025)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}',
+                'title': title,
+                'video': False,
+                'vote_average': round(rng.uniform(3, 9), 1),
+                'vote_count': rng.randint(10, 30000),
+            }
+        self.cast = {movie_id: rng.sample(range(people), min(people, rng.randint(8, 25)))
+                     for movie_id in self.movies}
+        self.filmography = {}
+        for movie_id, cast in self.cast.items():
+            for person in cast:
+                self.filmography.setdefault(person, []).append(movie_id)
+        self.by_popularity = sorted(self.movies.values(), key=lambda movie: -movie['popularity'])
+        self.by_rating = sorted(self.movies.values(), key=lambda movie: -movie['vote_average'])
+        self.by_date = sorted(self.movies.values(), key=lambda movie: movie['release_date'], reverse=True)
+        self.details_seed = seed
+
+    def page(self, movies, page=1):
+        page = max(1, page)
+        results = movies[(page - 1) * PAGE_SIZE:page * PAGE_SIZE]
+        return {'page': page, 'results': results,
+                'total_pages': max(1, -(-len(movies) // PAGE_SIZE)), 'total_results': len(movies)}
+
+    def details(self, movie_id, credits=False):
+        movie = self.movies.get(movie_id)
+        if movie is None:
+            return None
+        rng = random.Random(self.details_seed * 1000003 + movie_id)
+        details = {key: value for key, value in movie.items() if key != 'genre_ids'}
+        details.update({
+            'belongs_to_collection': None,
+            'budget': rng.randint(1, 200) * 1000000,
+            'genres': [{'id': genre, 'name': GENRES[genre]} for genre in movie['genre_ids']],
+            'homepage': '',
+            'imdb_id': f'tt{rng.randint(1000000, 9999999)}',
+            'production_companies': [{'id': rng.randint(1, 5000), 'logo_path': _path(rng),
+                                      'name': f'{rng.choice(LAST_NAMES)} Pictures',
+                                      'origin_country': 'US'} for _ in range(rng.randint(1, 4))],
+            'revenue': rng.randint(0, 900) * 1000000,
+            'runtime': rng.randint(80, 180),
+            'spoken_languages': [{'english_name': 'English', 'iso_639_1': 'en', 'name': 'English'}],
+            'status': 'Released',
+            'tagline': ' '.join(rng.choice(OVERVIEW_WORDS) for _ in range(6)).capitalize() + '.',
+        })
+        if credits:
+            cast = []
+            for order, person in enumerate(self.cast[movie_id]):
+                cast.append(dict(self.people[person], cast_id=order, order=order,
+                                 character=f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+                                 credit_id=f'{movie_id:08x}{person:08x}'))
+            crew = [dict(self.people[rng.randrange(len(self.people))], department=department,
+                         job=job, credit_id=f'{movie_id:08x}c{index}')
+                    for index, (department, job) in enumerate((('Directing', 'Director'),
+                                                               ('Writing', 'Screenplay'),
+                                                               ('Production', 'Producer'),
+                                                               ('Sound', 'Original Music Composer')))]
+            details['credits'] = {'cast': cast, 'crew': crew}
+        return details
+
+    def discover(self, query):
+        movies = self.by_popularity
+        if query.get('with_genres'):
+            genres = {int(genre) for genre in re.split('[,|]', query['with_genres']) if genre.isdigit()}
+            movies = [movie for movie in movies if genres & set(movie['genre_ids'])]
+        if query.get('with_cast'):
+            person = int(query['with_cast']) - 10000
+            ids = set(self.filmography.get(person, ()))
+            movies = [movie for movie in movies if movie['id'] in ids]
+        return self.page(movies, int(query.get('page', 1)))
+
+    def search_movies(self, query):
+        words = query.get('query', '').lower().split()
+        movies = [movie for movie in self.by_popularity
+                  if words and all(word in movie['title'].lower() for word in words)]
+        return self.page(movies, int(query.get('page', 1)))
+
+    def search_people(self, query):
+        words = query.get('query', '').lower().split()
+        people = [person for person in self.people
+                  if words and all(word in person['name'].lower() for word in words)]
+        results = []
+        for person in people[:PAGE_SIZE]:
+            known_for = sorted((self.movies[movie_id] for movie_id in
+                                self.filmography.get(person['id'] - 10000, ())),
+                               key=lambda movie: -movie['popularity'])[:3]
+            results.append(dict(person, known_for=[dict(movie, media_type='movie') for movie in known_for]))
+        return {'page': 1, 'results': results, 'total_pages': 1, 'total_results': len(people)}
+
+    def answer(self, path, query):
+        """
+        Returns the (status, payload) TMDb would give for a GET.
+        """
+        if path == '/3/movie/now_playing':
+            return 200, self.page(self.by_date, int(query.get('page', 1)))
+        if path == '/3/movie/popular':
+            return 200, self.page(self.by_popularity, int(query.get('page', 1)))
+        if path == '/3/movie/top_rated':
+            return 200, self.page(self.by_rating, int(query.get('page', 1)))
+        if path == '/3/discover/movie':
+            return 200, self.discover(query)
+        if path == '/3/search/movie':
+            return 200, self.search_movies(query)
+        if path == '/3/search/person':
+            return 200, self.search_people(query)
+        match = _MOVIE.match(path)
+        if match:
+            details = self.details(int(match.group(1)),
+                                   credits='credits' in query.get('append_to_response', ''))
+            if details is not None:
+                return 200, details
+        return 404, {'success': False, 'status_code': 34,
+                     'status_message': 'The resource you requested could not be found.'}
+
+
+class StubTMDb:
+    """
+    The stub's HTTP server, with its latency and error settings and counters
+    of the calls it answered.
+
+    Args:
+        catalog (Catalog): The data served.
+        latency (float): Seconds every answer is delayed by.
+        jitter (float): Mean of an exponentially distributed extra delay.
+        error_rate (float): Share of calls answered with a 500 or 503.
+        host (str): Address to listen on.
+        port (int): Port to listen on; 0 picks a free one.
+        seed (int): Seed for the delays and errors.
+    """
+
+    def __init__(self, catalog, latency=0.05, jitter=0.02, error_rate=0.0, host='127.0.0.1', port=0,
+                 seed=1):
+        self.catalog = catalog
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.calls = 0
+        self.errors = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+                delay, failure = stub.draw()
+                time.sleep(delay)
+                status, payload = failure or stub.catalog.answer(url.path, query)
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json;charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                try:
+                    self.wfile.write(body)
+                except OSError:
+                    pass
+
+            def log_message(self, *args):
+                pass
+
+        class Server(ThreadingHTTPServer):
+            daemon_threads = True
+            request_queue_size = 1024
+
+        self.server = Server((host, port), Handler)
+        self.port = self.server.server_port
+        self.url = f'http://{host}:{self.port}/3'
+
+    def draw(self):
+        """
+        Picks a call's delay and, for a failing call, its (status, payload).
+        """
+        with self._lock:
+            self.calls += 1
+            delay = self.latency + (self._rng.expovariate(1 / self.jitter) if self.jitter > 0 else 0)
+            if self._rng.random() >= self.error_rate:
+                return delay, None
+            self.errors += 1
+            status = self._rng.choice((500, 503))
+        return delay, (status, {'success': False, 'status_code': 11 if status == 500 else 9,
+                                'status_message': 'Service unavailable, try again later.'})
+
+    def serve_forever(self):
+        self.server.serve_forever()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def _serve(settings, port):
+    stub = StubTMDb(Catalog(settings['movies'], settings['people'], settings['seed']),
+                    latency=settings['latency'], jitter=settings['jitter'],
+                    error_rate=settings['error_rate'], port=settings['port'], seed=settings['seed'])
+    port.value = stub.port
+    stub.serve_forever()
+
+
+def start(latency=0.05, jitter=0.02, error_rate=0.0, movies=2000, people=500, seed=1, port=0):
+    """
+    Runs the stub in a process of its own, so it doesn't compete with the
+    caller for the GIL.
+
+    Returns:
+        The process and the stub's API root, for TMDB_BASE_URL.
+    """
+    settings = {'latency': latency, 'jitter': jitter, 'error_rate': error_rate, 'movies': movies,
+                'people': people, 'seed': seed, 'port': port}
+    bound = multiprocessing.Value('i', 0)
+    process = multiprocessing.Process(target=_serve, args=(settings, bound), daemon=True)
+    process.start()
+    while not bound.value:
+        if not process.is_alive():
+            raise RuntimeError('The TMDb stub failed to start')
+        time.sleep(0.01)
+    return process, f'http://127.0.0.1:{bound.value}/3'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--jitter', type=float, default=0.02)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--movies', type=int, default=2000)
+    parser.add_argument('--people', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    stub = StubTMDb(Catalog(args.movies, args.people, args.seed), latency=args.latency,
+                    jitter=args.jitter, error_rate=args.error_rate, port=args.port, seed=args.seed)
+    print(f'TMDb stub at {stub.url}', flush=True)
+    try:
+        stub.serve_forever()
+    except KeyboardInterrupt:
+        stub.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""
+Gunicorn settings for the Procfile's `gunicorn src.app:app`; gunicorn reads
+this file from the working directory.
+
+The app is imported once in the master and forked into each worker, so
+workers share its modules and compiled templates. Each worker then drops
+the database connections and pools it inherited and starts its own
+reporting.
+
+Workers record their metrics in files under PROMETHEUS_MULTIPROC_DIR, which
+/metrics adds up. prometheus_client reads the setting when it is imported,
+so it is set here, before the app is loaded: to a new directory unless one
+is given, which is emptied so counts start from zero.
+"""
+import glob
+import os
+import sys
+import tempfile
+
+preload_app = os.getenv('GUNICORN_PRELOAD', '1') != '0'
+
+if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+    for path in glob.glob(os.path.join(os.environ['PROMETHEUS_MULTIPROC_DIR'], '*.db')):
+        os.remove(path)
+else:
+    os.environ['PROMETHEUS_MULTIPROC_DIR'] = tempfile.mkdtemp(prefix='movievault-metrics-')
+
+
+def _lifecycle(app):
+    # The lifecycle module the app's own module imported, as lifecycle or
+    # src.lifecycle depending on how it was loaded.
+    return sys.modules[app.import_name].lifecycle
+
+
+def when_ready(server):
+    if server.cfg.preload_app:
+        app = server.app.wsgi()
+        _lifecycle(app).preload(app)
+
+
+def post_fork(server, worker):
+    app = server.app.wsgi()
+    _lifecycle(app).post_fork(app)
@@ -1,71 +1,248 @@
+import asyncio
 import os
+import httpx
 import requests
-from flask import Flask, render_template, redirect, url_for, request, flash
-from sqlalchemy.exc import OperationalError
+import click
+from datetime import timedelta
+from flask import Flask, current_app, render_template, redirect, url_for, request, flash, jsonify, \
+    abort, send_file
+from flask.cli import with_appcontext
+from sqlalchemy.exc import OperationalError, IntegrityError, SQLAlchemyError
 from flask_login import LoginManager, login_user, login_required, \
     logout_user, current_user
 from flask_migrate import Migrate
-from werkzeug.security import generate_password_hash, check_password_hash
-import sentry_sdk
-from sentry_sdk.integrations.flask import FlaskIntegration
-from sentry_sdk.integrations.sqlalchemy import SqlalchemyIntegration
-from collections import Counter
+from functools import partial
 try:
-    from models import db, User, Favorite
+    from models import db, User, Favorite, TitleLookup
+    from tmdb import client as tmdb
+    from executor import gather, gather_async
+    from tmdb_async import client as atmdb
+    import catalog
+    import suggest
+    import favorites
+    import recommender
+    import neighbours
+    import recommendation_store
+    import vault
+    import user_cache
+    import passwords
+    import posters
+    import ratelimit
+    import lifecycle
+    import metrics
 except ModuleNotFoundError:
-    from src.models import db, User, Favorite
+    from src.models import db, User, Favorite, TitleLookup
+    from src.tmdb import client as tmdb
+    from src.executor import gather, gather_async
+    from src.tmdb_async import client as atmdb
+    from src import catalog
+    from src import suggest
+    from src import favorites
+    from src import recommender
+    from src import neighbours
+    from src import recommendation_store
+    from src import vault
+    from src import user_cache
+    from src import passwords
+    from src import posters
+    from src import ratelimit
+    from src import lifecycle
+    from src import metrics
+
+SENTRY_DSN = "https://a6dac84ec65d0d4edc43a70edf1674c4@o4508120998936576.ingest.us.sentry.io/4508121009815552"
+
+migrate = Migrate()
 
-app = Flask(__name__)
+login_manager = LoginManager()
+login_manager.login_view = 'login'
 
-sentry_sdk.init(
-    dsn="https://a6dac84ec65d0d4edc43a70edf1674c4@o4508120998936576.ingest.us.sentry.io/4508121009815552",
-    integrations=[FlaskIntegration(), SqlalchemyIntegration()],
-    traces_sample_rate=1.0,
-    profiles_sample_rate=1.0
-)
+ROUTES = []
+# Async views that replace the sync view of the same endpoint when
+# ASYNC_VIEWS is on; filled in where they are defined.
+ASYNC_VIEWS = {}
 
 
-app.config['SECRET_KEY'] = 'bgfbrbg843thu34iingubdf'
-TMDB_API_KEY = '056f3d31df0856f08c488274990e7921'
+class MovieVault(Flask):
+    def async_to_sync(self, func):
+        """
+        Runs an async view to completion on a private event loop in the
+        request's own thread, so it keeps the request's context and database
+        session. The TMDb calls it awaits run on the async client's shared
+        loop (see tmdb_async).
+        """
+        def run(*args, **kwargs):
+            return asyncio.run(func(*args, **kwargs))
+        return run
 
-app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///users.db')
-if app.config['SQLALCHEMY_DATABASE_URI'] and app.config['SQLALCHEMY_DATABASE_URI'].startswith("postgres://"):
-    app.config['SQLALCHEMY_DATABASE_URI'] = app.config['SQLALCHEMY_DATABASE_URI'].replace("postgres://", "postgresql://", 1)
 
-db.init_app(app)
-migrate = Migrate(app, db)
+def route(rule, **options):
+    """
+    Records a view for create_app() to register, in place of @app.route, so
+    views are declared once for every app the factory builds.
+    """
+    def record(view):
+        ROUTES.append((rule, view, options))
+        return view
+    return record
 
-login_manager = LoginManager()
-login_manager.init_app(app)
-login_manager.login_view = 'login'
 
-with app.app_context():
-    try:
-        db.create_all()
-    except OperationalError:
-        print("Tables already exist. Skipping creation.")
+def async_view(endpoint):
+    """
+    Records an async view to serve endpoint in place of its sync view when
+    ASYNC_VIEWS is on.
+    """
+    def record(view):
+        ASYNC_VIEWS[endpoint] = view
+        return view
+    return record
+
+
+def create_app(config=None):
+    """
+    Builds the Flask app: reads settings from the environment, binds the
+    extensions and registers the views and commands.
+
+    Nothing here touches the database or starts a thread, so building the
+    app is cheap enough to do at import and before a fork. Sentry starts
+    per process in lifecycle.ensure_started, and tables are created by
+    `flask init-db` and changed by `flask db upgrade`, never on boot.
+
+    Args:
+        config (dict): Settings applied over the environment's.
+    """
+    app = MovieVault(__name__)
+
+    app.config['SECRET_KEY'] = 'bgfbrbg843thu34iingubdf'
+    app.config['SENTRY_DSN'] = os.getenv('SENTRY_DSN', SENTRY_DSN)
+    app.config['SENTRY_TRACES_SAMPLE_RATE'] = float(os.getenv('SENTRY_TRACES_SAMPLE_RATE', 1.0))
+    app.config['SENTRY_PROFILES_SAMPLE_RATE'] = float(os.getenv('SENTRY_PROFILES_SAMPLE_RATE', 1.0))
+    app.config['ASYNC_VIEWS'] = os.getenv('ASYNC_VIEWS', '0') == '1'
+    app.config['DASHBOARD_ROW_TIMEOUT'] = float(os.getenv('DASHBOARD_ROW_TIMEOUT', 5))
+    app.config['CATALOG_MIN_ROWS'] = int(os.getenv('CATALOG_MIN_ROWS', 1000))
+    app.config['SUGGEST_REBUILD_INTERVAL'] = int(os.getenv('SUGGEST_REBUILD_INTERVAL', 3600))
+    app.config['RECOMMENDER_CANDIDATES'] = int(os.getenv('RECOMMENDER_CANDIDATES', 50000))
+    app.config['RECOMMENDER_REBUILD_INTERVAL'] = int(os.getenv('RECOMMENDER_REBUILD_INTERVAL', 3600))
+    app.config['RECOMMENDATIONS_MAX_AGE'] = int(os.getenv('RECOMMENDATIONS_MAX_AGE', 86400))
+    app.config['FAVORITES_PAGE_SIZE'] = int(os.getenv('FAVORITES_PAGE_SIZE', favorites.PAGE_SIZE))
+    app.config['FAVORITES_BATCH_LIMIT'] = int(os.getenv('FAVORITES_BATCH_LIMIT', favorites.BATCH_LIMIT))
+    app.config['VAULT_CACHE_TTL'] = int(os.getenv('VAULT_CACHE_TTL', vault.DEFAULT_TTL))
+    app.config['USER_CACHE_TTL'] = int(os.getenv('USER_CACHE_TTL', user_cache.DEFAULT_TTL))
+    app.config['PASSWORD_HASH_METHOD'] = os.getenv('PASSWORD_HASH_METHOD', passwords.DEFAULT_METHOD)
+    app.config['PASSWORD_HASH_WORKERS'] = int(os.getenv('PASSWORD_HASH_WORKERS', passwords.DEFAULT_WORKERS))
+    app.config['PASSWORD_HASH_CONCURRENCY'] = int(os.getenv('PASSWORD_HASH_CONCURRENCY',
+                                                            passwords.DEFAULT_CONCURRENCY))
+    app.config['PASSWORD_HASH_WAIT'] = float(os.getenv('PASSWORD_HASH_WAIT', passwords.DEFAULT_WAIT))
+    app.config['POSTER_PROXY'] = os.getenv('POSTER_PROXY', '1') == '1'
+    app.config['POSTER_CACHE_DIR'] = os.getenv('POSTER_CACHE_DIR', os.path.join(app.instance_path, 'posters'))
+    app.config['POSTER_CACHE_MAX_BYTES'] = int(os.getenv('POSTER_CACHE_MAX_BYTES', posters.DEFAULT_MAX_BYTES))
+    app.config['METRICS'] = os.getenv('METRICS', '1') == '1'
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///users.db')
+    if app.config['SQLALCHEMY_DATABASE_URI'] and app.config['SQLALCHEMY_DATABASE_URI'].startswith("postgres://"):
+        app.config['SQLALCHEMY_DATABASE_URI'] = app.config['SQLALCHEMY_DATABASE_URI'].replace("postgres://", "postgresql://", 1)
+    app.config.update(config or {})
+
+    vault.cache.ttl = app.config['VAULT_CACHE_TTL']
+    user_cache.cache.ttl = app.config['USER_CACHE_TTL']
+    passwords.hasher.configure(method=app.config['PASSWORD_HASH_METHOD'],
+                               workers=app.config['PASSWORD_HASH_WORKERS'],
+                               concurrency=app.config['PASSWORD_HASH_CONCURRENCY'],
+                               wait=app.config['PASSWORD_HASH_WAIT'])
+    posters.store.configure(directory=app.config['POSTER_CACHE_DIR'],
+                            max_bytes=app.config['POSTER_CACHE_MAX_BYTES'])
+
+    db.init_app(app)
+    migrate.init_app(app, db)
+    login_manager.init_app(app)
+    metrics.init_app(app)
+
+    for rule, view, options in ROUTES:
+        endpoint = view.__name__
+        if app.config['ASYNC_VIEWS']:
+            view = ASYNC_VIEWS.get(endpoint, view)
+        app.add_url_rule(rule, endpoint, view_func=view, **options)
+    app.before_request(start_worker)
+    app.before_request(refresh_suggestion_index)
+    app.context_processor(inject_vault_state)
+    app.add_template_global(poster_attrs)
+
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(refresh_recommendations_command)
+    app.cli.add_command(catalog.catalog_cli)
+    app.cli.add_command(favorites.favorites_cli)
+    app.cli.add_command(neighbours.neighbours_cli)
+    return app
+
+
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    """Create any missing tables."""
+    db.create_all()
+    click.echo("Created missing tables")
+
+
+def start_worker():
+    """
+    Runs this process's one-time startup on its first request, for servers
+    that don't call lifecycle.post_fork themselves.
+    """
+    lifecycle.ensure_started(current_app)
+
+
+def refresh_suggestion_index():
+    """
+    Builds this worker's title suggestion index in the background on its
+    first request, and rebuilds it once it is older than
+    SUGGEST_REBUILD_INTERVAL.
+    """
+    suggest.index.ensure_fresh()
+
+
+def inject_vault_state():
+    """
+    Exposes in_vault(movie_id) to templates so any movie card can show
+    whether the current user has favorited it, from the user's cached
+    favorite IDs rather than a query per card.
+    """
+    return {'in_vault': vault.in_vault}
+
+
+def poster_attrs(poster_path, width):
+    """
+    Renders an <img>'s src, srcset and sizes for a poster displayed width
+    CSS pixels wide, from the poster proxy unless POSTER_PROXY is off.
+    """
+    return posters.poster_attrs(poster_path, width, proxy=current_app.config['POSTER_PROXY'])
 
 
 @login_manager.user_loader
 def load_user(user_id):
     """
-    Callback function for Flask-Login to load a user by their ID.
+    Callback function for Flask-Login to load a user by their session token.
+
+    Users are served from a short-lived per-worker cache, so most requests
+    from a logged-in user cost no database round trip.
 
     Args:
-        user_id: The ID of the user to load.
+        user_id: The session token from User.get_id(), "<id>:<version>".
 
     Returns:
-        The User object associated with the given ID.
+        The User object associated with the token, or None if the user is
+        gone or changed their profile in another session.
     """
-    return User.query.get(int(user_id))
+    return user_cache.load(user_id)
+
 
+PASSWORDS_BUSY = 'We are handling a lot of sign-ins right now. Please try again in a moment.'
 
-@app.route('/login', methods=['GET', 'POST'])
+
+@route('/login', methods=['GET', 'POST'])
 def login():
     """
     Handles the login process by checking the given username and password against
     the database of registered users. If the credentials are valid, the user is
-    logged in and redirected to the dashboard. Otherwise, an error message is
+    logged in and redirected to the dashboard, and a password hash made with
+    an outdated method or cost is replaced. Otherwise, an error message is
     flashed to the user.
 
     GET: Displays the login form.
@@ -78,19 +255,29 @@ def login():
 
         user = User.query.filter_by(username=username).first()
 
-        if not user:
-            flash('Invalid username or password')
-
-        elif check_password_hash(user.password, password):
+        try:
+            valid = user is not None and passwords.hasher.verify(user.password, password)
+        except passwords.PasswordHasherBusy:
+            flash(PASSWORDS_BUSY)
+            return render_template('login.html', hide_login=True), 503
+
+        if valid:
+            if passwords.hasher.needs_rehash(user.password):
+                try:
+                    user.password = passwords.hasher.hash(password)
+                    db.session.commit()
+                except (passwords.PasswordHasherBusy, SQLAlchemyError):
+                    # Keep the old hash, e.g. while the password column is
+                    # too narrow for the new one; the next login tries again
+                    db.session.rollback()
             login_user(user)
             return redirect(url_for('dashboard'))
 
-        else:
-            flash('Invalid username or password')
+        flash('Invalid username or password')
 
     return render_template('login.html', hide_login=True)
 
-@app.route('/signup', methods=['GET', 'POST'])
+@route('/signup', methods=['GET', 'POST'])
 def signup():
     """
     Handles the signup process by validating the given username and password
@@ -112,7 +299,11 @@ def signup():
             flash('Username already exists. Please choose a different one.')
             return redirect(url_for('signup'))
 
-        hashed_password = generate_password_hash(password, method='pbkdf2:sha256')
+        try:
+            hashed_password = passwords.hasher.hash(password)
+        except passwords.PasswordHasherBusy:
+            flash(PASSWORDS_BUSY)
+            return render_template('signup.html', hide_login=True), 503
 
         new_user = User(username=username, password=hashed_password,
                         first_name=first_name, last_name=last_name)
@@ -125,7 +316,7 @@ def signup():
     return render_template('signup.html', hide_login=True)
 
 
-@app.route('/logout', methods=['GET', 'POST'])
+@route('/logout', methods=['GET', 'POST'])
 @login_required
 def logout():
     """
@@ -139,7 +330,7 @@ def logout():
     return redirect(url_for('dashboard'))
 
 
-@app.route('/edit_profile', methods=['GET', 'POST'])
+@route('/edit_profile', methods=['GET', 'POST'])
 @login_required
 def edit_profile():
     """
@@ -150,17 +341,28 @@ def edit_profile():
     POST: Updates the current user's information from the form and redirects to the dashboard.
     """
     if request.method == 'POST':
+        # current_user may be a cached, detached copy, so edit the stored row
+        user = db.session.get(User, current_user.id)
         # Get updated information from the form
-        current_user.first_name = request.form.get('first_name')
-        current_user.last_name = request.form.get('last_name')
+        user.first_name = request.form.get('first_name')
+        user.last_name = request.form.get('last_name')
         new_password = request.form.get('password')
 
         if new_password:
-            hashed_password = generate_password_hash(new_password, method='pbkdf2:sha256')
-            current_user.password = hashed_password
+            try:
+                user.password = passwords.hasher.hash(new_password)
+            except passwords.PasswordHasherBusy:
+                db.session.rollback()
+                flash(PASSWORDS_BUSY, 'danger')
+                return render_template('edit_profile.html'), 503
+        user.session_version = (user.session_version or 0) + 1
 
         try:
             db.session.commit()
+            user_cache.cache.invalidate(user.id)
+            # Reissue this browser's session token for the new version; the
+            # user's other sessions are signed out.
+            login_user(user)
             flash('Profile updated successfully!', 'success')
             return redirect(url_for('dashboard'))
         except OperationalError:
@@ -182,8 +384,7 @@ def fetch_popular_movies_tmdb():
         overview: A short summary of the movie's plot.
         rating: The average rating of the movie from 0 to 10.
     """
-    url = f"https://api.themoviedb.org/3/movie/popular?api_key={TMDB_API_KEY}&language=en-US&page=1"
-    response = requests.get(url)
+    response = tmdb.get('/movie/popular', {'language': 'en-US', 'page': 1})
     movies = []
     if response.status_code == 200:
         data = response.json()
@@ -199,74 +400,125 @@ def fetch_popular_movies_tmdb():
     return movies
 
 
-@app.route('/')
+@route('/')
 def dashboard():
     """
     Displays the dashboard page.
 
     The dashboard page contains a list of the newest movies, a list of the top rated movies, and a list of movies for each of the following genres: Action, Comedy, Horror, and Romance.
 
+    The rows are fetched concurrently on the shared thread pool. A row that
+    fails or does not arrive within DASHBOARD_ROW_TIMEOUT seconds is rendered
+    as an empty section.
+
     Returns a rendered template of the dashboard page.
     """
-    new_movies = fetch_new_movies()
-    top_rated_movies = fetch_top_rated_movies()
-    action_movies = fetch_movies_by_genre('Action')
-    comedy_movies = fetch_movies_by_genre('Comedy')
-    horror_movies = fetch_movies_by_genre('Horror')
-    romance_movies = fetch_movies_by_genre('Romance')
+    rows = gather({
+        'new_movies': fetch_new_movies,
+        'top_rated_movies': fetch_top_rated_movies,
+        'action_movies': partial(fetch_movies_by_genre, 'Action'),
+        'comedy_movies': partial(fetch_movies_by_genre, 'Comedy'),
+        'horror_movies': partial(fetch_movies_by_genre, 'Horror'),
+        'romance_movies': partial(fetch_movies_by_genre, 'Romance'),
+    }, timeout=current_app.config['DASHBOARD_ROW_TIMEOUT'])
+
+    return render_template('dashboard.html', **rows)
+
+
+def normalize_title(title):
+    """
+    Returns the lookup key for a movie title: lower-cased with runs of
+    whitespace collapsed.
+    """
+    return ' '.join(title.lower().split())
+
+
+def resolve_movie_id(title):
+    """
+    Resolves a movie title to its TMDb ID.
+
+    Resolutions are stored in the TitleLookup table, so each distinct title
+    costs at most one /search/movie call over the lifetime of the database.
+
+    Args:
+        title (str): The movie title from a legacy /movie/<title> URL.
+
+    Returns:
+        The TMDb movie ID, or None if TMDb has no match or cannot be reached.
+    """
+    key = normalize_title(title)[:255]
+    try:
+        lookup = TitleLookup.query.filter_by(title=key).first()
+    except OperationalError:
+        # The table is missing until the migrations have run; resolve
+        # through TMDb meanwhile
+        db.session.rollback()
+        lookup = None
+    if lookup:
+        return lookup.movie_id
+
+    try:
+        response = tmdb.get('/search/movie', {'query': title})
+    except requests.exceptions.RequestException:
+        return None
+    if response.status_code != 200:
+        return None
+    results = response.json().get('results') or []
+    if not results:
+        return None
 
-    return render_template(
-        'dashboard.html',
-        new_movies=new_movies,
-        top_rated_movies=top_rated_movies,
-        action_movies=action_movies,
-        comedy_movies=comedy_movies,
-        horror_movies=horror_movies,
-        romance_movies=romance_movies
-    )
+    movie_id = results[0]['id']
+    try:
+        db.session.add(TitleLookup(title=key, movie_id=movie_id))
+        db.session.commit()
+    except (IntegrityError, OperationalError):
+        db.session.rollback()
+    return movie_id
 
 
-def fetch_movie_details(title):
+@route('/movie/<title>')
+def movie_details_by_title(title):
     """
-    Fetches detailed movie information from the TMDb API for the given movie title.
-    Returns a dictionary containing the detailed movie information, if found. Otherwise, returns an empty dictionary.
+    Redirects a legacy title-based movie URL to the ID-based details page.
+    Every /movie/ path is a title, including numeric ones such as
+    /movie/1917. If the title cannot be resolved, the user is redirected to
+    the dashboard with a message flashed.
     """
-    search_url = f"https://api.themoviedb.org/3/search/movie?api_key={TMDB_API_KEY}&query={title}"
-    search_response = requests.get(search_url)
-    search_data = search_response.json()
+    movie_id = resolve_movie_id(title)
 
-    if search_data['results']:
-        movie_id = search_data['results'][0]['id']
-        details_url = f"https://api.themoviedb.org/3/movie/{movie_id}?api_key={TMDB_API_KEY}&append_to_response=credits"
-        movie_response = requests.get(details_url)
-        movie_details = movie_response.json()
+    if movie_id is None:
+        flash("Movie not found")
+        return redirect(url_for('dashboard'))
 
-        return movie_details
-    return {}
+    return redirect(url_for('movie_details', movie_id=movie_id), code=301)
 
 
-@app.route('/movie/<title>')
-def movie_details(title):
+@route('/movies/<int:movie_id>')
+def movie_details(movie_id):
     """
-    Displays detailed information about the given movie title, including its
+    Displays detailed information about the given movie, including its
     title, release date, poster, genres, vote average, runtime, and overview.
     If the movie is not found, the user is redirected to the dashboard with a
     message flashed.
     Additionally, if the user is authenticated, the page will display whether
     the movie is already in their favorites or not.
     """
-    movie = fetch_movie_details(title)
+    movie = fetch_movie_by_id(movie_id)
 
     if not movie:
         flash("Movie not found")
         return redirect(url_for('dashboard'))
 
+    return render_movie(movie)
+
+
+def render_movie(movie):
+    """
+    Renders the details page for a movie's TMDb details.
+    """
     cast = movie.get('credits', {}).get('cast', [])[:10]
 
-    is_favorite = False
-    if current_user.is_authenticated:
-        favorite = Favorite.query.filter_by(user_id=current_user.id, movie_id=movie['id']).first()
-        is_favorite = True if favorite else False
+    is_favorite = vault.in_vault(movie['id'])
 
     movie_details = {
         'id': movie.get('id', 'N/A'),
@@ -282,7 +534,7 @@ def movie_details(title):
     return render_template('movie.html', movie=movie_details, cast=cast, is_favorite=is_favorite)
 
 
-@app.route('/search', methods=['GET'])
+@route('/search', methods=['GET'])
 def search_movies():
     """
     Displays a list of movies and actors that match the given search query.
@@ -296,7 +548,18 @@ def search_movies():
     return render_template('search_results.html', search_results=search_results, query=query)
 
 
-@app.route('/add_to_favorites/<int:movie_id>', methods=['POST'])
+@route('/search/suggest', methods=['GET'])
+def search_suggest():
+    """
+    Returns title completions for the search box as JSON, most popular first,
+    from this worker's in-memory title index.
+    """
+    query = request.args.get('q', '')
+    limit = request.args.get('limit', suggest.DEFAULT_LIMIT, type=int)
+    return jsonify({'query': query, 'results': suggest.suggest(query, limit)})
+
+
+@route('/add_to_favorites/<int:movie_id>', methods=['POST'])
 @login_required
 def add_to_favorites(movie_id):
     # Fetch movie details by movie_id
@@ -309,27 +572,32 @@ def add_to_favorites(movie_id):
     Returns:
         Redirects to the movie's details page.
     """
+    if Favorite.query.filter_by(user_id=current_user.id, movie_id=movie_id).first():
+        flash("This movie is already in your favorites.", "info")
+        return redirect(url_for('movie_details', movie_id=movie_id))
+
     movie = fetch_movie_by_id(movie_id)
 
     if movie:
-        favorite = Favorite(
-            user_id=current_user.id,
-            movie_id=movie['id'],
-            movie_title=movie['title'],
-            movie_poster=movie['poster_path'],
-            movie_release_date=movie['release_date'],
-            movie_rating=movie['vote_average'],
-            movie_runtime=movie['runtime']
-        )
+        favorite = Favorite(**favorites.favorite_row(current_user.id, movie))
+        favorites.capture_details(favorite, movie)
 
         db.session.add(favorite)
-        db.session.commit()
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Lost a race with a concurrent add of the same movie.
+            db.session.rollback()
+            flash("This movie is already in your favorites.", "info")
+            return redirect(url_for('movie_details', movie_id=movie_id))
+        vault.changed(current_user.id, added=[favorite.movie_id])
+        recommendation_store.schedule(current_user.id, refresh_recommendations)
         flash(f"{movie['title']} has been added to your favorites!", "success")
 
-    return redirect(url_for('movie_details', title=movie['title']))
+    return redirect(url_for('movie_details', movie_id=movie_id))
 
 
-@app.route('/remove_from_favorites/<int:movie_id>', methods=['POST'])
+@route('/remove_from_favorites/<int:movie_id>', methods=['POST'])
 @login_required
 def remove_from_favorites(movie_id):
     # Find the favorite entry
@@ -347,42 +615,285 @@ def remove_from_favorites(movie_id):
     if favorite:
         db.session.delete(favorite)
         db.session.commit()
+        vault.changed(current_user.id, removed=[movie_id])
+        recommendation_store.schedule(current_user.id, refresh_recommendations)
         flash("Movie has been removed from your favorites.", "success")
 
-    return redirect(url_for('movie_details', title=fetch_movie_by_id(movie_id)['title']))
+    return redirect(url_for('movie_details', movie_id=movie_id))
+
+
+def batch_movie_ids(payload, key):
+    """
+    Returns the distinct movie IDs listed under key in a batch request body,
+    in request order, or raises ValueError if they are not a list of
+    positive integers.
+    """
+    movie_ids = payload.get(key, [])
+    if not isinstance(movie_ids, list) or not all(
+            type(movie_id) is int and movie_id > 0 for movie_id in movie_ids):
+        raise ValueError(f"'{key}' must be a list of movie IDs")
+    return list(dict.fromkeys(movie_ids))
+
+
+@route('/api/favorites/batch', methods=['POST'])
+def favorites_batch():
+    """
+    Adds and removes many favorites in one request, for importers and bulk
+    edits.
+
+    The JSON body holds 'add' and/or 'remove' lists of movie IDs, at most
+    FAVORITES_BATCH_LIMIT in total. Details for new favorites are resolved
+    in one concurrent pass and every change is written in a single
+    transaction.
 
+    Returns:
+        JSON with one {'movie_id', 'action', 'status'} result per movie, in
+        request order; status is 'added', 'exists' or 'not_found' for adds
+        and 'removed' or 'not_favorited' for removals. Errors are JSON with
+        an 'error' message and a 400, 401 or 503 status.
+    """
+    if not current_user.is_authenticated:
+        return jsonify({'error': 'Authentication required'}), 401
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({'error': 'Expected a JSON object'}), 400
+    try:
+        to_add = batch_movie_ids(payload, 'add')
+        to_remove = batch_movie_ids(payload, 'remove')
+    except ValueError as error:
+        return jsonify({'error': str(error)}), 400
+    if set(to_add) & set(to_remove):
+        return jsonify({'error': 'A movie cannot be both added and removed'}), 400
+    limit = current_app.config['FAVORITES_BATCH_LIMIT']
+    if len(to_add) + len(to_remove) > limit:
+        return jsonify({'error': f'At most {limit} movies per batch'}), 400
 
-@app.route('/favorites')
+    try:
+        added = favorites.add_many(current_user.id, to_add) if to_add else {}
+        removed = favorites.remove_many(current_user.id, to_remove) if to_remove else {}
+        db.session.commit()
+    except OperationalError:
+        db.session.rollback()
+        return jsonify({'error': 'Favorites are temporarily unavailable'}), 503
+
+    if 'added' in added.values() or 'removed' in removed.values():
+        vault.changed(current_user.id,
+                      added=[movie_id for movie_id, status in added.items() if status == 'added'],
+                      removed=[movie_id for movie_id, status in removed.items() if status == 'removed'])
+        recommendation_store.schedule(current_user.id, refresh_recommendations)
+    results = ([{'movie_id': movie_id, 'action': 'add', 'status': status}
+                for movie_id, status in added.items()] +
+               [{'movie_id': movie_id, 'action': 'remove', 'status': status}
+                for movie_id, status in removed.items()])
+    return jsonify({'results': results})
+
+
+@route('/favorites')
 @login_required
 def view_favorites():
     """
     Displays the user's favorite movies.
 
+    Favorites are paginated by keyset: ?sort= picks one of favorites.SORTS and
+    ?after= is the cursor of the page to continue from.
+
     Returns:
-        A rendered template of the user's favorite movies.
+        A rendered template of one page of the user's favorite movies.
     """
-    favorites = Favorite.query.filter_by(user_id=current_user.id).all()
-    return render_template('favorites.html', favorites=favorites)
+    sort = request.args.get('sort', favorites.DEFAULT_SORT)
+    if sort not in favorites.SORTS:
+        sort = favorites.DEFAULT_SORT
+    user_favorites, cursor = favorites.page(current_user.id, sort, request.args.get('after'),
+                                            current_app.config['FAVORITES_PAGE_SIZE'])
+    return render_template('favorites.html', favorites=user_favorites, sort=sort,
+                           next_cursor=cursor, paged='after' in request.args)
 
 
-@app.route('/recommendations')
+@route('/cache/stats')
+@login_required
+def cache_stats():
+    """
+    Returns this worker's TMDb cache hit and miss counters as JSON, broken down
+    by endpoint, for tuning the per-endpoint TTLs, how many TMDb calls were
+    led or joined by concurrent identical calls, the rate limit scheduler's
+    queue depths and waits per lane, and each endpoint's circuit breaker.
+    Only for logged-in users, as it exposes internal cache state.
+    """
+    scheduler = tmdb.scheduler.stats() if tmdb.scheduler is not None else None
+    breakers = tmdb.breakers.stats() if tmdb.breakers is not None else None
+    if tmdb.cache is None:
+        return jsonify({'enabled': False, 'flights': tmdb.flights.stats(), 'scheduler': scheduler,
+                        'breakers': breakers})
+    return jsonify(dict(tmdb.cache.stats(), enabled=True, flights=tmdb.flights.stats(),
+                        scheduler=scheduler, breakers=breakers))
+
+
+@route('/metrics')
+def metrics_view():
+    """
+    Returns the request, TMDb, database and template timing histograms in
+    the Prometheus text format, for all of this server's workers (see
+    metrics). 404 when METRICS is off.
+    """
+    if not current_app.config['METRICS']:
+        abort(404)
+    body, content_type = metrics.exposition()
+    return current_app.response_class(body, content_type=content_type)
+
+
+@route('/poster/<size>/<path>')
+def poster(size, path):
+    """
+    Serves a TMDb poster at one of the posters.SIZES widths from the local
+    disk cache, fetching and resizing it on the first request.
+
+    Responses carry a strong ETag and may be cached by browsers for a year:
+    TMDb never changes the image behind a path.
+
+    Args:
+        size (str): The width, e.g. 'w185'.
+        path (str): The TMDb poster file name, e.g. 'kqjL17yufvn9OVLyXYpvtyrFfak.jpg'.
+    """
+    if size not in posters.SIZES or not posters.is_poster_path(path):
+        abort(404)
+    # The file can be evicted between lookup and open; look it up again then
+    for _ in range(2):
+        try:
+            filename = posters.store.variant(size, path)
+            file = open(filename, 'rb')
+            break
+        except FileNotFoundError:
+            continue
+        except posters.PosterNotFound:
+            abort(404)
+        except posters.PosterOriginError as error:
+            current_app.logger.warning("Poster origin failed: %s", error)
+            abort(502)
+    else:
+        abort(503)
+    response = send_file(file, mimetype=posters.mimetype_for(path), conditional=True,
+                         etag=posters.store.etag(filename), max_age=posters.MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+@route('/recommendations')
 @login_required
 def recommendations():
     """
     Displays recommended movies based on the user's favorite genres or actors.
 
+    The lists are read from the user's materialized recommendations, which
+    are recomputed in the background whenever their favorites change. Lists
+    older than RECOMMENDATIONS_MAX_AGE are served and refreshed in the
+    background; a user with no lists yet has them computed on the spot.
+
     Returns:
         A rendered template with recommended movies.
     """
-    genre_recommendations, actor_recommendations = fetch_recommendations()
+    lists = recommendation_store.load(current_user.id)
+    if lists is None:
+        lists = refresh_recommendations(current_user.id)
+    elif lists['computed_at'] < recommendation_store.utcnow() - timedelta(
+            seconds=current_app.config['RECOMMENDATIONS_MAX_AGE']):
+        recommendation_store.schedule(current_user.id, refresh_recommendations)
+
+    return render_recommendations(lists)
+
+
+def render_recommendations(lists):
+    """
+    Renders the recommendations page for a user's stored lists.
+    """
     return render_template('recommendations.html',
-                           genre_recommendations=genre_recommendations, 
-                           actor_recommendations=actor_recommendations)
+                           top_picks=lists['top_picks'],
+                           genre_recommendations=lists['genre'],
+                           actor_recommendations=lists['actor'],
+                           anchor_title=lists['anchor_title'],
+                           also_vaulted=lists['also_vaulted'])
+
+
+@click.command('refresh-recommendations')
+@click.option('--max-age', default=None, type=int,
+              help='Recompute lists older than this many seconds. '
+                   'Defaults to RECOMMENDATIONS_MAX_AGE.')
+@with_appcontext
+def refresh_recommendations_command(max_age):
+    """Recompute stale materialized recommendation lists."""
+    max_age = current_app.config['RECOMMENDATIONS_MAX_AGE'] if max_age is None else max_age
+    refreshed = failed = 0
+    for user_id in list(recommendation_store.stale_users(max_age)):
+        try:
+            with ratelimit.lane(ratelimit.BULK):
+                refresh_recommendations(user_id)
+            refreshed += 1
+        except requests.exceptions.RequestException as error:
+            db.session.rollback()
+            failed += 1
+            click.echo(f"User {user_id}: {error!r}", err=True)
+    click.echo(f"Refreshed recommendations for {refreshed} users, {failed} failed")
+
+
+def compute_recommendations(user_id):
+    """
+    Computes a user's recommendation lists from scratch.
+
+    Once the local catalog is populated, a single ranked list of top picks
+    replaces the per-genre and per-actor TMDb lists. Movies that other users
+    favorited alongside the user's latest favorite are listed too.
+
+    Returns:
+        A dict with the 'top_picks', 'genre', 'actor' and 'also_vaulted'
+        lists and 'anchor_title', the latest favorite's title.
+    """
+    top_picks = recommender.recommend(user_id) or []
+    if top_picks:
+        genre_recommendations, actor_recommendations = [], []
+    else:
+        genre_recommendations, actor_recommendations = fetch_recommendations(user_id)
+    return recommendation_lists(user_id, top_picks, genre_recommendations, actor_recommendations)
+
+
+def recommendation_lists(user_id, top_picks, genre_recommendations, actor_recommendations):
+    """
+    Completes a user's recommendation lists with the movies other users
+    favorited alongside their latest favorite.
+    """
+    user_favorites = (db.session.query(Favorite.movie_id, Favorite.movie_title)
+                      .filter(Favorite.user_id == user_id)
+                      .order_by(Favorite.id.desc()).all())
+    latest_favorite = user_favorites[0] if user_favorites else None
+    also_vaulted = []
+    if latest_favorite:
+        also_vaulted = neighbours.also_vaulted(
+            latest_favorite.movie_id, exclude={favorite.movie_id for favorite in user_favorites})
+
+    return {
+        'top_picks': top_picks,
+        'genre': genre_recommendations,
+        'actor': actor_recommendations,
+        'also_vaulted': also_vaulted,
+        'anchor_title': latest_favorite.movie_title if latest_favorite else None,
+    }
+
+
+def refresh_recommendations(user_id):
+    """
+    Recomputes and stores a user's materialized recommendation lists.
+
+    Returns:
+        The new lists.
+    """
+    lists = compute_recommendations(user_id)
+    recommendation_store.store(user_id, lists)
+    return lists
 
 
 def fetch_new_movies():
     """
-    Fetches a list of currently playing movies from the TMDb API.
+    Fetches a list of currently playing movies, from the local catalog when it
+    is populated and from the TMDb API otherwise.
 
     Returns a list of dictionaries with the following keys:
         id: The ID of the movie.
@@ -392,20 +903,31 @@ def fetch_new_movies():
         overview: A short summary of the movie's plot.
         rating: The average rating of the movie from 0 to 10.
     """
-    url = f"https://api.themoviedb.org/3/movie/now_playing?api_key={TMDB_API_KEY}&language=en-US&page=1"
-    response = requests.get(url)
+    local = catalog.now_playing()
+    if local:
+        return local
+
+    response = tmdb.get('/movie/now_playing', {'language': 'en-US', 'page': 1})
     return response.json().get('results', [])
 
 
 def fetch_movie_by_id(movie_id):
     """
-    Fetches movie details from TMDb API based on the movie ID.
+    Fetches movie details based on the movie ID.
+
+    Detailed movies in the local catalog are served without a network call;
+    otherwise the details are fetched from the TMDb API and written through
+    to the catalog.
     """
-    url = f"https://api.themoviedb.org/3/movie/{movie_id}?api_key={TMDB_API_KEY}&append_to_response=credits"
+    local = catalog.get_movie(movie_id)
+    if local:
+        return local
+
     try:
-        response = requests.get(url)
+        response = tmdb.get(f'/movie/{movie_id}', {'append_to_response': 'credits'})
         if response.status_code == 200:
             movie_details = response.json()
+            catalog.store_movie(movie_details)
             return movie_details
         else:
             return None
@@ -415,7 +937,8 @@ def fetch_movie_by_id(movie_id):
 
 def fetch_top_rated_movies():
     """
-    Fetches a list of top-rated movies from the TMDb API.
+    Fetches a list of top-rated movies, from the local catalog when it is
+    populated and from the TMDb API otherwise.
 
     Returns a list of dictionaries with the following keys:
         id: The ID of the movie.
@@ -425,32 +948,11 @@ def fetch_top_rated_movies():
         overview: A short summary of the movie's plot.
         rating: The average rating of the movie from 0 to 10.
     """
-    url = f"https://api.themoviedb.org/3/movie/top_rated?api_key={TMDB_API_KEY}&language=en-US&page=1"
-    response = requests.get(url)
-    return response.json().get('results', [])
-
-
-def fetch_movies_by_genre(genre_name):
-    """
-    Fetches a list of movies by genre from the TMDb API.
-
-    The supported genres are: Action, Comedy, Horror, Romance.
-
-    Args:
-        genre_name (str): The name of the genre to fetch movies for.
+    local = catalog.top_rated()
+    if local:
+        return local
 
-    Returns:
-        A list of dictionaries containing the movie details, if found. Otherwise, returns an empty list.
-    """
-    genre_map = {
-        'Action': 28,
-        'Comedy': 35,
-        'Horror': 27,
-        'Romance': 10749
-    }
-    genre_id = genre_map.get(genre_name)
-    url = f"https://api.themoviedb.org/3/discover/movie?api_key={TMDB_API_KEY}&with_genres={genre_id}&language=en-US&page=1"
-    response = requests.get(url)
+    response = tmdb.get('/movie/top_rated', {'language': 'en-US', 'page': 1})
     return response.json().get('results', [])
 
 
@@ -462,20 +964,25 @@ def fetch_movies_by_search(query):
     If the search query is a movie title, it will return a list of movies with a matching title.
     If the search query is an actor name, it will return a list of movies featuring that actor.
 
+    The local catalog's full-text index is queried first; TMDb is only asked
+    when the catalog has no match.
+
     Args:
         query (str): The search query to pass to the TMDb API.
 
     Returns:
         A list of dictionaries containing the movie details, if found. Otherwise, returns an empty list.
     """
-    movie_url = f"https://api.themoviedb.org/3/search/movie?api_key={TMDB_API_KEY}&query={query}"
-    movie_response = requests.get(movie_url)
+    local = catalog.search(query)
+    if local:
+        return local
+
+    movie_response = tmdb.get('/search/movie', {'query': query})
     movie_results = movie_response.json().get('results', [])
 
     movie_results = [movie for movie in movie_results if movie.get('poster_path')]
 
-    actor_url = f"https://api.themoviedb.org/3/search/person?api_key={TMDB_API_KEY}&query={query}"
-    actor_response = requests.get(actor_url)
+    actor_response = tmdb.get('/search/person', {'query': query})
     actor_results = actor_response.json().get('results', [])
 
     actor_movie_results = []
@@ -489,71 +996,59 @@ def fetch_movies_by_search(query):
     return combined_results
 
 
-def get_user_favorites():
+def get_user_favorites(user_id):
     """
-    Collects the genres and actors from the user's favorite movies.
+    Finds the genre and actor that appear most often across a user's
+    favorite movies.
 
-    This function fetches the movie details for each favorite movie, and then
-    collects the genres and top 3 actors for each movie. The results are returned
-    as two lists: genres and actors.
-
-    Args:
-        None
+    Both come from a single GROUP BY over the genres and top 3 actors recorded
+    when each favorite was added, so no movie details are fetched.
 
     Returns:
-        A tuple of two lists: genres and actors. If the user has no favorite movies,
-        the function returns (None, None).
+        A tuple of the most common genre name and actor name. Either is None
+        if the user's favorites have no genres or cast recorded.
     """
-    favorite_movies = Favorite.query.filter_by(user_id=current_user.id).all()
+    return favorites.most_common_genre(user_id), favorites.most_common_actor(user_id)
 
-    if not favorite_movies:
-        return None, None
 
-    genres = []
-    actors = []
-
-    for favorite in favorite_movies:
-        movie_details = fetch_movie_by_id(favorite.movie_id)
-
-        if 'genres' in movie_details:
-            genres.extend([genre['name'] for genre in movie_details['genres']])
-
-        if 'credits' in movie_details:
-            actors.extend([actor['name'] for actor in movie_details['credits']['cast'][:3]])
-
-    return genres, actors
-
-
-
-def fetch_recommendations():
+def fetch_recommendations(user_id):
     """
-    Fetches movie recommendations based on the user's favorite movies.
+    Fetches movie recommendations based on a user's favorite movies.
 
-    This function fetches the user's favorite movies, extracts the genres and actors
-    from those movies, and then fetches more movies from the TMDb API based on the
-    most common genre and actor.
+    This function looks up the most common genre and actor among the user's
+    favorite movies, and then fetches more movies from the TMDb API based on them.
 
     Returns a tuple of two lists: the first list contains movies recommended based
     on the user's favorite genres, and the second list contains movies recommended
     based on the user's favorite actors.
 
-    If the user has no favorite movies, the function returns two empty lists.
+    Movies the user has already favorited are left out. If the user has no
+    favorite movies, the function returns two empty lists.
     """
-    genres, actors = get_user_favorites()
+    common_genre, common_actor = get_user_favorites(user_id)
 
     genre_recommendations = []
     actor_recommendations = []
 
-    if genres:
-        common_genre = Counter(genres).most_common(1)[0][0]
+    if common_genre:
         genre_recommendations.extend(fetch_movies_by_genre(common_genre))
 
-    if actors:
-        common_actor = Counter(actors).most_common(1)[0][0]
+    if common_actor:
         actor_recommendations.extend(fetch_movies_by_actor(common_actor))
 
-    unique_genre_recommendations = {movie['id']: movie for movie in genre_recommendations}.values()
-    unique_actor_recommendations = {movie['id']: movie for movie in actor_recommendations}.values()
+    return without_favorites(user_id, genre_recommendations, actor_recommendations)
+
+
+def without_favorites(user_id, genre_recommendations, actor_recommendations):
+    """
+    Drops the user's favorites and duplicates from both recommendation lists.
+    """
+    favorite_ids = {row[0] for row in db.session.query(Favorite.movie_id)
+                    .filter(Favorite.user_id == user_id)}
+    unique_genre_recommendations = {movie['id']: movie for movie in genre_recommendations
+                                    if movie['id'] not in favorite_ids}.values()
+    unique_actor_recommendations = {movie['id']: movie for movie in actor_recommendations
+                                    if movie['id'] not in favorite_ids}.values()
 
     return list(unique_genre_recommendations), list(unique_actor_recommendations)
 
@@ -571,24 +1066,35 @@ def fetch_movies_by_actor(actor_name):
     Returns:
         A list of movie dictionaries if found, otherwise an empty list.
     """
-    url = f"https://api.themoviedb.org/3/search/person?api_key={TMDB_API_KEY}&query={actor_name}"
-    response = requests.get(url)
-    actor_data = response.json()
+    response = tmdb.get('/search/person', {'query': actor_name})
+    actors = response.json().get('results')
 
-    if actor_data['results']:
-        actor_id = actor_data['results'][0]['id']
-        url = f"https://api.themoviedb.org/3/discover/movie?api_key={TMDB_API_KEY}&with_cast={actor_id}"
-        response = requests.get(url)
+    if actors:
+        actor_id = actors[0]['id']
+        response = tmdb.get('/discover/movie', {'with_cast': actor_id})
         return response.json().get('results', [])
 
     return []
 
+GENRE_IDS = {
+    'Action': 28,
+    'Comedy': 35,
+    'Horror': 27,
+    'Romance': 10749,
+    'Science Fiction': 878,
+    'Thriller': 53,
+    'Drama': 18,
+    'Adventure': 12
+}
+
+
 def fetch_movies_by_genre(genre_name):
     """
     Fetches movies from TMDb API based on genre name.
 
     This function takes a genre name as input, maps it to its corresponding ID
-    in the TMDb API, and then fetches movies from the API based on the genre ID.
+    in the TMDb API, and then fetches movies based on the genre ID, from the
+    local catalog when it is populated and from the API otherwise.
 
     Args:
         genre_name (str): The name of the genre to search for.
@@ -596,24 +1102,205 @@ def fetch_movies_by_genre(genre_name):
     Returns:
         A list of movie dictionaries if found, otherwise an empty list.
     """
-    genre_map = {
-        'Action': 28,
-        'Comedy': 35,
-        'Horror': 27,
-        'Romance': 10749,
-        'Science Fiction': 878,
-        'Thriller': 53,
-        'Drama': 18,
-        'Adventure': 12
-    }
-    genre_id = genre_map.get(genre_name)
+    genre_id = GENRE_IDS.get(genre_name)
     if genre_id:
-        url = f"https://api.themoviedb.org/3/discover/movie?api_key={TMDB_API_KEY}&with_genres={genre_id}&language=en-US&page=1"
-        response = requests.get(url)
+        local = catalog.by_genre(genre_id)
+        if local:
+            return local
+
+        response = tmdb.get('/discover/movie', {'with_genres': genre_id, 'language': 'en-US', 'page': 1})
         return response.json().get('results', [])
     else:
         return []
 
 
+# Async views, served in place of the sync views above when ASYNC_VIEWS is on
+# (always, under asgi.py). Each gathers its TMDb calls concurrently on the
+# shared async client instead of blocking the request thread on each in turn
+# or borrowing threads from the shared pool. Reads of the local catalog stay
+# synchronous: they are short and use the request's database session.
+
+async def fetch_new_movies_async():
+    """
+    The async version of fetch_new_movies.
+    """
+    local = catalog.now_playing()
+    if local:
+        return local
+
+    response = await atmdb.get('/movie/now_playing', {'language': 'en-US', 'page': 1})
+    return response.json().get('results', [])
+
+
+async def fetch_top_rated_movies_async():
+    """
+    The async version of fetch_top_rated_movies.
+    """
+    local = catalog.top_rated()
+    if local:
+        return local
+
+    response = await atmdb.get('/movie/top_rated', {'language': 'en-US', 'page': 1})
+    return response.json().get('results', [])
+
+
+async def fetch_movies_by_genre_async(genre_name):
+    """
+    The async version of fetch_movies_by_genre.
+    """
+    genre_id = GENRE_IDS.get(genre_name)
+    if not genre_id:
+        return []
+    local = catalog.by_genre(genre_id)
+    if local:
+        return local
+
+    response = await atmdb.get('/discover/movie', {'with_genres': genre_id, 'language': 'en-US', 'page': 1})
+    return response.json().get('results', [])
+
+
+async def fetch_movie_by_id_async(movie_id):
+    """
+    The async version of fetch_movie_by_id.
+    """
+    local = catalog.get_movie(movie_id)
+    if local:
+        return local
+
+    try:
+        response = await atmdb.get(f'/movie/{movie_id}', {'append_to_response': 'credits'})
+    except httpx.HTTPError:
+        return None
+    if response.status_code != 200:
+        return None
+    movie_details = response.json()
+    catalog.store_movie(movie_details)
+    return movie_details
+
+
+async def fetch_movies_by_search_async(query):
+    """
+    The async version of fetch_movies_by_search: the title and actor
+    searches run concurrently.
+    """
+    local = catalog.search(query)
+    if local:
+        return local
+
+    movie_response, actor_response = await asyncio.gather(
+        atmdb.get('/search/movie', {'query': query}),
+        atmdb.get('/search/person', {'query': query}))
+
+    movie_results = [movie for movie in movie_response.json().get('results', [])
+                     if movie.get('poster_path')]
+    actor_movie_results = [movie for actor in actor_response.json().get('results', [])
+                           for movie in actor.get('known_for', [])
+                           if movie.get('title') and movie.get('id') and movie.get('poster_path')]
+    return movie_results + actor_movie_results
+
+
+async def fetch_movies_by_actor_async(actor_name):
+    """
+    The async version of fetch_movies_by_actor.
+    """
+    response = await atmdb.get('/search/person', {'query': actor_name})
+    results = response.json().get('results')
+    if not results:
+        return []
+
+    response = await atmdb.get('/discover/movie', {'with_cast': results[0]['id']})
+    return response.json().get('results', [])
+
+
+async def fetch_recommendations_async(user_id):
+    """
+    The async version of fetch_recommendations: the genre and actor lists
+    are fetched concurrently.
+    """
+    common_genre, common_actor = get_user_favorites(user_id)
+
+    async def nothing():
+        return []
+
+    genre_recommendations, actor_recommendations = await asyncio.gather(
+        fetch_movies_by_genre_async(common_genre) if common_genre else nothing(),
+        fetch_movies_by_actor_async(common_actor) if common_actor else nothing())
+    return without_favorites(user_id, genre_recommendations, actor_recommendations)
+
+
+async def refresh_recommendations_async(user_id):
+    """
+    The async version of refresh_recommendations.
+    """
+    top_picks = recommender.recommend(user_id) or []
+    if top_picks:
+        genre_recommendations, actor_recommendations = [], []
+    else:
+        genre_recommendations, actor_recommendations = await fetch_recommendations_async(user_id)
+    lists = recommendation_lists(user_id, top_picks, genre_recommendations, actor_recommendations)
+    recommendation_store.store(user_id, lists)
+    return lists
+
+
+@async_view('dashboard')
+async def dashboard_async():
+    """
+    The async version of dashboard: all rows are fetched concurrently on the
+    running loop.
+    """
+    rows = await gather_async({
+        'new_movies': fetch_new_movies_async,
+        'top_rated_movies': fetch_top_rated_movies_async,
+        'action_movies': partial(fetch_movies_by_genre_async, 'Action'),
+        'comedy_movies': partial(fetch_movies_by_genre_async, 'Comedy'),
+        'horror_movies': partial(fetch_movies_by_genre_async, 'Horror'),
+        'romance_movies': partial(fetch_movies_by_genre_async, 'Romance'),
+    }, timeout=current_app.config['DASHBOARD_ROW_TIMEOUT'])
+
+    return render_template('dashboard.html', **rows)
+
+
+@async_view('movie_details')
+async def movie_details_async(movie_id):
+    """
+    The async version of movie_details.
+    """
+    movie = await fetch_movie_by_id_async(movie_id)
+    if not movie:
+        flash("Movie not found")
+        return redirect(url_for('dashboard'))
+    return render_movie(movie)
+
+
+@async_view('search_movies')
+async def search_movies_async():
+    """
+    The async version of search_movies.
+    """
+    query = request.args.get('query')
+    search_results = await fetch_movies_by_search_async(query) if query else []
+    return render_template('search_results.html', search_results=search_results, query=query)
+
+
+@async_view('recommendations')
+@login_required
+async def recommendations_async():
+    """
+    The async version of recommendations.
+    """
+    lists = recommendation_store.load(current_user.id)
+    if lists is None:
+        lists = await refresh_recommendations_async(current_user.id)
+    elif lists['computed_at'] < recommendation_store.utcnow() - timedelta(
+            seconds=current_app.config['RECOMMENDATIONS_MAX_AGE']):
+        recommendation_store.schedule(current_user.id, refresh_recommendations)
+    return render_recommendations(lists)
+
+
+app = create_app()
+
+
 if __name__ == "__main__":
+    with app.app_context():
+        db.create_all()
     app.run(debug=True)
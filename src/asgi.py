@@ -0,0 +1,39 @@
+"""
+ASGI entry point serving the async views, for high-concurrency deployments:
+
+    uvicorn src.asgi:application --workers 4
+
+Each request runs the Flask app in a thread of its own, so one slow TMDb
+round trip never holds up another request, and the TMDb calls of every
+request in the process share the async client's event loop and
+connection pool.
+"""
+from asgiref.sync import ThreadSensitiveContext
+from asgiref.wsgi import WsgiToAsgi
+
+try:
+    from app import create_app
+    import lifecycle
+except ModuleNotFoundError:
+    from src.app import create_app
+    from src import lifecycle
+
+app = create_app({'ASYNC_VIEWS': True})
+wsgi = WsgiToAsgi(app)
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                lifecycle.preload(app)
+                lifecycle.ensure_started(app)
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    # WsgiToAsgi runs every request in one shared thread unless each has its
+    # own thread-sensitive context.
+    async with ThreadSensitiveContext():
+        await wsgi(scope, receive, send)
@@ -0,0 +1,246 @@
+import os
+import threading
+import time
+from collections import deque
+
+import requests
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+DEFAULT_WINDOW = 20
+DEFAULT_MIN_CALLS = 5
+DEFAULT_FAILURE_RATIO = 0.5
+DEFAULT_SLOW_CALL = 2.0
+DEFAULT_OPEN_SECONDS = 30
+DEFAULT_PROBES = 1
+
+
+class CircuitOpen(requests.exceptions.ConnectionError):
+    """
+    Raised instead of calling an endpoint whose circuit is open. A
+    ConnectionError, so code that copes with TMDb being unreachable copes
+    with this too.
+    """
+
+
+class CircuitBreaker:
+    """
+    Stops calling a failing TMDb endpoint for a while, so pages stop
+    waiting on it.
+
+    The breaker keeps the outcomes of the last `window` calls. A call is bad
+    if it raised, returned a 5xx, or took longer than slow_call seconds;
+    a call still in flight after slow_call seconds counts as bad already, so
+    a TMDb that hangs trips the breaker without waiting for read timeouts.
+    Once at least min_calls are counted and the bad share reaches
+    failure_ratio, the circuit opens: calls are refused at once for
+    open_seconds. Then it half-opens and lets `probes` calls through; if
+    they all succeed it closes with a clean window, and if one fails it
+    opens again.
+
+    Callers take a ticket with start() before each call to TMDb and hand it
+    back to record() with the outcome.
+
+    Args:
+        name (str): The endpoint, for stats.
+        window (int): Calls the bad share is computed over.
+        min_calls (int): Calls needed before the circuit may open.
+        failure_ratio (float): Bad share at which the circuit opens.
+        slow_call (float): Seconds after which a call counts as bad.
+        open_seconds (float): Seconds the circuit stays open before probing.
+        probes (int): Successful probes needed to close the circuit.
+    """
+
+    def __init__(self, name, window=DEFAULT_WINDOW, min_calls=DEFAULT_MIN_CALLS,
+                 failure_ratio=DEFAULT_FAILURE_RATIO, slow_call=DEFAULT_SLOW_CALL,
+                 open_seconds=DEFAULT_OPEN_SECONDS, probes=DEFAULT_PROBES):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_ratio = failure_ratio
+        self.slow_call = slow_call
+        self.open_seconds = open_seconds
+        self.probes = probes
+        self.state = CLOSED
+        self.opened_at = None
+        self.counters = {'opened': 0, 'rejected': 0, 'fallbacks': 0}
+        self._outcomes = deque(maxlen=window)
+        self._in_flight = []
+        self._probing = 0
+        self._probe_successes = 0
+        self._lock = threading.Lock()
+
+    def allow(self, now=None):
+        """
+        Tells whether a call may go ahead, taking a probe slot if the
+        circuit is half-open. A caller that gets True must start() and
+        record() the call, or cancel() it.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._update(now)
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and self._probing < self.probes - self._probe_successes:
+                self._probing += 1
+                return True
+            self.counters['rejected'] += 1
+            return False
+
+    def rejecting(self, now=None):
+        """
+        Tells, without taking a probe slot, whether the circuit is open and
+        not yet due for a probe, counting the call as rejected if so.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._update(now)
+            if self.state == OPEN:
+                self.counters['rejected'] += 1
+                return True
+            return False
+
+    def cancel(self):
+        """
+        Gives back the probe slot of an allowed call that never reached TMDb.
+        """
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probing = max(0, self._probing - 1)
+
+    def start(self, now=None):
+        """
+        Notes that a call to TMDb is starting and returns its ticket.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._in_flight.append(now)
+        return now
+
+    def record(self, ok, started, now=None):
+        """
+        Records the outcome of a call.
+
+        Args:
+            ok (bool): False if the call raised or returned a 5xx.
+            started (float): The call's ticket from start().
+        """
+        now = time.monotonic() if now is None else now
+        bad = not ok or now - started > self.slow_call
+        with self._lock:
+            try:
+                self._in_flight.remove(started)
+            except ValueError:
+                pass
+            if self.state == HALF_OPEN:
+                self._probing = max(0, self._probing - 1)
+                if bad:
+                    self._open(now)
+                else:
+                    self._probe_successes += 1
+                    if self._probe_successes >= self.probes:
+                        self.state = CLOSED
+                        self._outcomes.clear()
+                return
+            if self.state == OPEN:
+                return
+            self._outcomes.append(bad)
+            self._update(now)
+
+    def count_fallback(self):
+        with self._lock:
+            self.counters['fallbacks'] += 1
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            return dict(self.counters, state=self.state, recent_calls=len(self._outcomes),
+                        recent_bad=sum(self._outcomes), stalled=self._stalled(now))
+
+    def _stalled(self, now):
+        return sum(1 for started in self._in_flight if now - started > self.slow_call)
+
+    def _update(self, now):
+        """
+        Opens a closed circuit whose bad share has reached failure_ratio,
+        and half-opens an open one that has waited open_seconds.
+        """
+        if self.state == CLOSED:
+            stalled = self._stalled(now)
+            calls = len(self._outcomes) + stalled
+            if calls >= self.min_calls and sum(self._outcomes) + stalled >= self.failure_ratio * calls:
+                self._open(now)
+        elif self.state == OPEN and now - self.opened_at >= self.open_seconds:
+            self.state = HALF_OPEN
+            self._probing = 0
+            self._probe_successes = 0
+
+    def _open(self, now):
+        self.state = OPEN
+        self.opened_at = now
+        self.counters['opened'] += 1
+        self._outcomes.clear()
+        # Calls in flight now are reported but no longer counted
+        self._in_flight.clear()
+
+
+class Breakers:
+    """
+    One CircuitBreaker per TMDb endpoint ('movie', 'discover', ...), created
+    on first use with the same settings, so a failing search does not cut
+    off movie details.
+
+    Breakers are per process and start closed again after a fork.
+
+    Args:
+        settings: CircuitBreaker arguments shared by every endpoint.
+    """
+
+    def __init__(self, **settings):
+        self.settings = settings
+        self._breakers = {}
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """
+        Builds breakers from the TMDB_BREAKER_* environment variables, or
+        returns None if TMDB_BREAKER is 0.
+        """
+        if os.getenv('TMDB_BREAKER', '1') == '0':
+            return None
+        return cls(
+            window=int(os.getenv('TMDB_BREAKER_WINDOW', DEFAULT_WINDOW)),
+            min_calls=int(os.getenv('TMDB_BREAKER_MIN_CALLS', DEFAULT_MIN_CALLS)),
+            failure_ratio=float(os.getenv('TMDB_BREAKER_FAILURE_RATIO', DEFAULT_FAILURE_RATIO)),
+            slow_call=float(os.getenv('TMDB_BREAKER_SLOW_CALL', DEFAULT_SLOW_CALL)),
+            open_seconds=float(os.getenv('TMDB_BREAKER_OPEN_SECONDS', DEFAULT_OPEN_SECONDS)),
+            probes=int(os.getenv('TMDB_BREAKER_PROBES', DEFAULT_PROBES)),
+        )
+
+    def get(self, endpoint):
+        if self._pid != os.getpid():
+            self._lock = threading.Lock()
+            self._breakers = {}
+            self._pid = os.getpid()
+        breaker = self._breakers.get(endpoint)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.get(endpoint)
+                if breaker is None:
+                    breaker = self._breakers[endpoint] = CircuitBreaker(endpoint, **self.settings)
+        return breaker
+
+    def clear(self):
+        """
+        Forgets every breaker, closing all circuits.
+        """
+        with self._lock:
+            self._breakers = {}
+
+    def stats(self):
+        with self._lock:
+            breakers = dict(self._breakers)
+        return {name: breaker.stats() for name, breaker in breakers.items()}
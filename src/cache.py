@@ -0,0 +1,396 @@
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTLS = {
+    'now_playing': 300,
+    'popular': 300,
+    'search_movie': 600,
+    'search_person': 600,
+    'top_rated': 3600,
+    'discover': 3600,
+    'movie': 86400,
+}
+DEFAULT_TTL = 300
+
+# Endpoints served stale-while-revalidate: once an entry is older than its TTL
+# it is still returned, and refreshed in the background, until it reaches the
+# hard TTL below.
+DEFAULT_HARD_TTLS = {
+    'now_playing': 3600,
+    'top_rated': 86400,
+    'discover': 86400,
+}
+
+# Longest a worker holds the Redis lock for filling a missing key, and so
+# the longest other workers wait for it before fetching the key themselves.
+DEFAULT_FILL_TIMEOUT = 5
+FILL_POLL_INTERVAL = 0.05
+
+# How long the local tier keeps an entry past its hard TTL as the last known
+# good payload, served only while TMDb's circuit is open (see breaker.py).
+DEFAULT_LAST_GOOD = 86400
+
+
+class LRUCache:
+    """
+    Bounded, thread-safe in-process cache with least-recently-used eviction.
+
+    Values are stored as encoded JSON strings and the cache is bounded by the
+    total size of those strings, so a handful of large payloads cannot push the
+    worker's memory past max_bytes.
+
+    Args:
+        max_bytes (int): Upper bound on the summed size of stored values.
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, now=None):
+        """
+        Returns (stored_at, encoded) for a live entry, or None if the key is
+        missing or expired.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, stored_at, encoded = entry
+            if expires_at <= now:
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return stored_at, encoded
+
+    def set(self, key, encoded, ttl, stored_at=None):
+        """
+        Stores an encoded value for ttl seconds, evicting the least recently
+        used entries until the cache fits within max_bytes.
+        """
+        size = len(encoded)
+        if size > self.max_bytes:
+            return
+        stored_at = time.time() if stored_at is None else stored_at
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (stored_at + ttl, stored_at, encoded)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def _remove(self, key):
+        _, _, encoded = self._entries.pop(key)
+        self.bytes -= len(encoded)
+
+
+class TMDbCache:
+    """
+    Two-tier cache for TMDb payloads.
+
+    The first tier is a per-worker LRUCache. The second, optional tier is a
+    Redis instance shared by every worker; hits there are copied back into the
+    local tier. Each entry's TTL is chosen by the endpoint it came from, and
+    hit/miss counters are kept per endpoint so the TTLs can be tuned.
+
+    Endpoints with a hard TTL keep their entries past the (soft) TTL so they
+    can be served stale while a background refresh runs; lookup() reports the
+    entry's age so the caller can decide when to refresh.
+
+    With Redis, a miss is filled by one worker at a time: the worker that
+    takes the key's fill lock fetches it, and the others wait up to
+    fill_timeout seconds for the entry to appear in Redis.
+
+    The local tier keeps entries for last_good seconds past their hard TTL.
+    lookup() treats those as misses; last_good() returns them, so a page can
+    still show something while TMDb is failing.
+
+    Redis errors are logged and treated as misses so an unavailable Redis
+    never fails a page.
+
+    Args:
+        local (LRUCache): The in-process tier.
+        redis_client: A redis.Redis compatible client, or None.
+        ttls (dict): Maps endpoint names to TTLs in seconds.
+        hard_ttls (dict): Maps endpoint names to the maximum age at which a
+            stale entry may still be served.
+        prefix (str): Prefix for Redis keys.
+        fill_timeout (float): Seconds a fill lock is held for; 0 lets every
+            worker fill misses on its own.
+        last_good (float): Seconds the local tier keeps an entry past its
+            hard TTL for last_good().
+    """
+
+    def __init__(self, local=None, redis_client=None, ttls=None, hard_ttls=None, prefix='tmdb:',
+                 fill_timeout=DEFAULT_FILL_TIMEOUT, last_good=DEFAULT_LAST_GOOD):
+        self.local = local if local is not None else LRUCache()
+        self.redis = redis_client
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.hard_ttls = dict(DEFAULT_HARD_TTLS if hard_ttls is None else hard_ttls)
+        self.prefix = prefix
+        self.fill_timeout = fill_timeout
+        self.last_good_ttl = last_good
+        self._counters = defaultdict(lambda: {'local_hits': 0, 'redis_hits': 0,
+                                              'stale_hits': 0, 'misses': 0})
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """
+        Builds a cache configured from environment variables.
+
+        TMDB_CACHE_MAX_BYTES bounds the local tier, REDIS_URL enables the shared
+        tier, TMDB_CACHE_TTL_<ENDPOINT> and TMDB_CACHE_HARD_TTL_<ENDPOINT>
+        override an endpoint's TTLs, TMDB_CACHE_FILL_TIMEOUT sets the fill
+        lock's timeout and TMDB_CACHE_LAST_GOOD how long entries are kept
+        past their hard TTL.
+        """
+        ttls = dict(DEFAULT_TTLS)
+        for endpoint in ttls:
+            override = os.getenv(f'TMDB_CACHE_TTL_{endpoint.upper()}')
+            if override:
+                ttls[endpoint] = int(override)
+        hard_ttls = dict(DEFAULT_HARD_TTLS)
+        for endpoint in hard_ttls:
+            override = os.getenv(f'TMDB_CACHE_HARD_TTL_{endpoint.upper()}')
+            if override:
+                hard_ttls[endpoint] = int(override)
+
+        redis_client = None
+        redis_url = os.getenv('REDIS_URL')
+        if redis_url:
+            import redis
+            redis_client = redis.Redis.from_url(redis_url, socket_timeout=0.25,
+                                                socket_connect_timeout=0.25)
+
+        local = LRUCache(max_bytes=int(os.getenv('TMDB_CACHE_MAX_BYTES', 32 * 1024 * 1024)))
+        return cls(local=local, redis_client=redis_client, ttls=ttls, hard_ttls=hard_ttls,
+                   fill_timeout=float(os.getenv('TMDB_CACHE_FILL_TIMEOUT', DEFAULT_FILL_TIMEOUT)),
+                   last_good=float(os.getenv('TMDB_CACHE_LAST_GOOD', DEFAULT_LAST_GOOD)))
+
+    def ttl_for(self, endpoint):
+        return self.ttls.get(endpoint, DEFAULT_TTL)
+
+    def hard_ttl_for(self, endpoint):
+        return max(self.hard_ttls.get(endpoint, 0), self.ttl_for(endpoint))
+
+    def local_ttl_for(self, endpoint):
+        return self.hard_ttl_for(endpoint) + self.last_good_ttl
+
+    def lookup(self, endpoint, key):
+        """
+        Looks a key up in the local tier, then in Redis.
+
+        Returns:
+            A (payload, age) tuple, or None on a miss. The age may exceed the
+            endpoint's TTL for stale-while-revalidate endpoints.
+        """
+        entry = self.lookup_local(endpoint, key)
+        if entry is not None:
+            return entry
+
+        now = time.time()
+        entry = self._from_redis(endpoint, key, now)
+        if entry is not None:
+            self._count(endpoint, 'redis_hits', entry[1])
+            return entry
+
+        self._count(endpoint, 'misses')
+        return None
+
+    def lookup_local(self, endpoint, key):
+        """
+        Looks a key up in the local tier only, so it never waits on the
+        network and is safe to call on an event loop. A miss here is not
+        counted; follow it with lookup().
+
+        Returns:
+            A (payload, age) tuple, or None on a miss.
+        """
+        now = time.time()
+        hit = self.local.get(key, now=now)
+        if hit is not None and now - hit[0] < self.hard_ttl_for(endpoint):
+            stored_at, encoded = hit
+            self._count(endpoint, 'local_hits', now - stored_at)
+            return json.loads(encoded), now - stored_at
+        return None
+
+    def _from_redis(self, endpoint, key, now):
+        """
+        Looks a key up in Redis, copying a hit into the local tier.
+        """
+        if self.redis is None:
+            return None
+        try:
+            raw = self.redis.get(self.prefix + key)
+        except Exception as error:
+            logger.warning("Redis get failed: %r", error)
+            return None
+        if raw is None:
+            return None
+        envelope = json.loads(raw)
+        if envelope['t'] + self.hard_ttl_for(endpoint) <= now:
+            return None
+        self.local.set(key, json.dumps(envelope['v']), self.local_ttl_for(endpoint),
+                       stored_at=envelope['t'])
+        return envelope['v'], now - envelope['t']
+
+    def last_good(self, endpoint, key):
+        """
+        Returns the newest payload held for a key, however old, for when
+        TMDb cannot be asked. Not counted as a hit or a miss.
+
+        Returns:
+            A (payload, age) tuple, or None if neither tier has the key.
+        """
+        now = time.time()
+        hit = self.local.get(key, now=now)
+        if hit is not None:
+            stored_at, encoded = hit
+            return json.loads(encoded), now - stored_at
+        return self._from_redis(endpoint, key, now)
+
+    def get(self, endpoint, key):
+        """
+        Returns the payload for a key if it is still within its TTL, else None.
+        """
+        entry = self.lookup(endpoint, key)
+        if entry is None or entry[1] >= self.ttl_for(endpoint):
+            return None
+        return entry[0]
+
+    def set(self, endpoint, key, payload, stored_at=None):
+        """
+        Stores a payload in both tiers, kept until the endpoint's hard TTL
+        (and for last_good seconds more in the local tier).
+        """
+        ttl = self.hard_ttl_for(endpoint)
+        stored_at = time.time() if stored_at is None else stored_at
+        self.local.set(key, json.dumps(payload), self.local_ttl_for(endpoint), stored_at=stored_at)
+        if self.redis is not None:
+            try:
+                expires_in = max(1, int(stored_at + ttl - time.time()))
+                self.redis.set(self.prefix + key, json.dumps({'t': stored_at, 'v': payload}),
+                               ex=expires_in)
+            except Exception as error:
+                logger.warning("Redis set failed: %r", error)
+
+    def acquire_refresh(self, key, timeout=30):
+        """
+        Claims the right to refresh a key across workers with a short Redis
+        lock. Without Redis, or if Redis is unreachable, the claim always
+        succeeds and only the caller's in-process guard applies.
+        """
+        return self._acquire('refresh:', key, timeout)
+
+    def release_refresh(self, key):
+        self._release('refresh:', key)
+
+    def acquire_fill(self, key):
+        """
+        Claims the right to fetch a missing key across workers for
+        fill_timeout seconds. Like acquire_refresh, the claim always succeeds
+        without Redis, and also when fill_timeout is 0.
+        """
+        if self.fill_timeout <= 0:
+            return True
+        return self._acquire('fill:', key, max(1, math.ceil(self.fill_timeout)))
+
+    def release_fill(self, key):
+        if self.fill_timeout > 0:
+            self._release('fill:', key)
+
+    def wait_for_fill(self, endpoint, key):
+        """
+        Waits up to fill_timeout seconds for another worker to store a key.
+
+        Returns:
+            The payload, or None if it did not arrive in time.
+        """
+        deadline = time.time() + self.fill_timeout
+        while time.time() < deadline:
+            time.sleep(FILL_POLL_INTERVAL)
+            entry = self._from_redis(endpoint, key, time.time())
+            if entry is not None:
+                self._count(endpoint, 'redis_hits', entry[1])
+                return entry[0]
+        return None
+
+    def _acquire(self, kind, key, timeout):
+        if self.redis is None:
+            return True
+        try:
+            return bool(self.redis.set(self.prefix + kind + key, b'1', nx=True, ex=timeout))
+        except Exception as error:
+            logger.warning("Redis lock failed: %r", error)
+            return True
+
+    def _release(self, kind, key):
+        if self.redis is None:
+            return
+        try:
+            self.redis.delete(self.prefix + kind + key)
+        except Exception as error:
+            logger.warning("Redis unlock failed: %r", error)
+
+    def clear(self):
+        """
+        Empties the local tier and resets the counters. Redis is left alone.
+        """
+        self.local.clear()
+        with self._lock:
+            self._counters.clear()
+
+    def stats(self):
+        """
+        Returns the hit and miss counters, per endpoint and in total.
+        """
+        with self._lock:
+            endpoints = {name: dict(counts) for name, counts in self._counters.items()}
+        total = {'local_hits': 0, 'redis_hits': 0, 'stale_hits': 0, 'misses': 0}
+        for counts in endpoints.values():
+            for name, value in counts.items():
+                total[name] += value
+        lookups = total['local_hits'] + total['redis_hits'] + total['misses']
+        total['hit_ratio'] = round((lookups - total['misses']) / lookups, 4) if lookups else 0.0
+        return {
+            'total': total,
+            'endpoints': endpoints,
+            'local': {'entries': len(self.local), 'bytes': self.local.bytes,
+                      'max_bytes': self.local.max_bytes, 'evictions': self.local.evictions},
+            'redis': self.redis is not None,
+        }
+
+    def _count(self, endpoint, name, age=None):
+        with self._lock:
+            counters = self._counters[endpoint]
+            counters[name] += 1
+            if age is not None and age >= self.ttl_for(endpoint):
+                counters['stale_hits'] += 1
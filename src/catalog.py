@@ -0,0 +1,447 @@
+import gzip
+import json
+import logging
+import time
+from datetime import date, datetime, timedelta, timezone
+
+import click
+from flask import current_app, has_app_context
+from flask.cli import AppGroup
+from sqlalchemy import case, func
+from sqlalchemy.exc import IntegrityError, OperationalError, ProgrammingError
+from sqlalchemy.orm import selectinload
+
+try:
+    from models import db, dialect_insert, CatalogIngest, Movie, Genre, MovieGenre, MovieCast
+    import search_index
+except ModuleNotFoundError:
+    from src.models import db, dialect_insert, CatalogIngest, Movie, Genre, MovieGenre, MovieCast
+    from src import search_index
+
+logger = logging.getLogger(__name__)
+
+TMDB_GENRES = {
+    28: 'Action',
+    12: 'Adventure',
+    16: 'Animation',
+    35: 'Comedy',
+    80: 'Crime',
+    99: 'Documentary',
+    18: 'Drama',
+    10751: 'Family',
+    14: 'Fantasy',
+    36: 'History',
+    27: 'Horror',
+    10402: 'Music',
+    9648: 'Mystery',
+    10749: 'Romance',
+    878: 'Science Fiction',
+    10770: 'TV Movie',
+    53: 'Thriller',
+    10752: 'War',
+    37: 'Western',
+}
+
+CAST_LIMIT = 20
+ROW_LIMIT = 20
+
+MOVIE_COLUMNS = ('title', 'original_title', 'release_date', 'poster_path', 'overview',
+                 'vote_average', 'vote_count', 'popularity', 'runtime', 'adult')
+
+catalog_cli = AppGroup('catalog', help='Manage the local movie catalog.')
+
+_size_cache = {'count': None, 'expires_at': 0.0}
+
+
+def movie_row(record):
+    """
+    Maps a TMDb movie record (a daily-export line, a list result or a full
+    details payload) to a row for the Movie table.
+    """
+    release_date = record.get('release_date') or None
+    return {
+        'id': int(record['id']),
+        'title': (record.get('title') or record.get('original_title') or '')[:255],
+        'original_title': record.get('original_title'),
+        'release_date': release_date[:10] if release_date else None,
+        'poster_path': record.get('poster_path'),
+        'overview': record.get('overview'),
+        'vote_average': record.get('vote_average'),
+        'vote_count': record.get('vote_count'),
+        'popularity': record.get('popularity'),
+        'runtime': record.get('runtime'),
+        'adult': bool(record.get('adult', False)),
+        'detailed': 'runtime' in record,
+    }
+
+
+def genre_ids(record):
+    if 'genres' in record:
+        return [genre['id'] for genre in record['genres']]
+    return record.get('genre_ids')
+
+
+def cast_members(record):
+    credits = record.get('credits') or {}
+    if 'cast' in credits:
+        return credits['cast'][:CAST_LIMIT]
+    if 'cast' in record:
+        return record['cast'][:CAST_LIMIT]
+    return None
+
+
+def write_batch(records):
+    """
+    Upserts a batch of movie records with one executemany statement per table.
+
+    Columns missing from a record (as in the daily export) keep their stored
+    values, so re-ingesting a thin dump never erases fetched details. Genre and
+    cast links are replaced only for records that carry them, and the batch is
+    re-indexed for full-text search. A movie repeated in the batch, as when
+    TMDb's pages shift during an ingest, is written once from its last
+    record, since PostgreSQL's ON CONFLICT can't update a row twice in one
+    statement.
+    """
+    records = list({int(record['id']): record for record in records}.values())
+    if not records:
+        return
+
+    rows = [movie_row(record) for record in records]
+    insert = dialect_insert(Movie)
+    update = {column: func.coalesce(insert.excluded[column], getattr(Movie, column))
+              for column in MOVIE_COLUMNS}
+    update['detailed'] = case((insert.excluded.detailed == True, True),  # noqa: E712
+                              else_=Movie.detailed)
+    db.session.execute(insert.on_conflict_do_update(index_elements=['id'], set_=update), rows)
+
+    genres = {}
+    genre_links = {}
+    cast_links = {}
+    for record in records:
+        movie_id = int(record['id'])
+        for genre in record.get('genres') or []:
+            genres[genre['id']] = genre['name']
+        ids = genre_ids(record)
+        if ids is not None:
+            genre_links[movie_id] = ids
+        cast = cast_members(record)
+        if cast is not None:
+            cast_links[movie_id] = cast
+
+    if genres:
+        db.session.execute(dialect_insert(Genre).on_conflict_do_nothing(),
+                           [{'id': genre_id, 'name': name} for genre_id, name in genres.items()])
+
+    if genre_links:
+        db.session.execute(db.delete(MovieGenre).where(MovieGenre.movie_id.in_(genre_links)))
+        known = TMDB_GENRES.keys() | genres.keys()
+        rows = [{'movie_id': movie_id, 'genre_id': genre_id}
+                for movie_id, ids in genre_links.items() for genre_id in set(ids) if genre_id in known]
+        if rows:
+            db.session.execute(dialect_insert(MovieGenre).on_conflict_do_nothing(), rows)
+
+    if cast_links:
+        db.session.execute(db.delete(MovieCast).where(MovieCast.movie_id.in_(cast_links)))
+        rows = [{
+            'movie_id': movie_id,
+            'cast_order': position,
+            'person_id': member.get('id'),
+            'name': (member.get('name') or '')[:255],
+            'character': (member.get('character') or '')[:255],
+        } for movie_id, cast in cast_links.items() for position, member in enumerate(cast)]
+        if rows:
+            db.session.execute(dialect_insert(MovieCast), rows)
+
+    search_index.index_movies({int(record['id']) for record in records})
+
+
+def seed_genres():
+    """
+    Inserts TMDb's movie genres so ingested genre_ids always resolve to names.
+    """
+    db.session.execute(dialect_insert(Genre).on_conflict_do_nothing(),
+                       [{'id': genre_id, 'name': name} for genre_id, name in TMDB_GENRES.items()])
+
+
+def read_records(path):
+    """
+    Yields one decoded record per non-empty line of a JSON-lines file.
+    Files ending in .gz, as published by TMDb's daily export, are read
+    through gzip.
+    """
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as lines:
+        for line in lines:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def ingest(records, batch_size=5000):
+    """
+    Streams records into the catalog in batches, committing after each.
+
+    Only one batch is held in memory at a time, so memory use is bounded by
+    batch_size regardless of the size of the dump. Once every batch is in, a
+    CatalogIngest row records the catalog's size, which is what
+    ingested_size() gates local reads on.
+
+    Returns:
+        The number of records written.
+    """
+    seed_genres()
+    db.session.commit()
+
+    total = 0
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            write_batch(batch)
+            db.session.commit()
+            total += len(batch)
+            batch = []
+    if batch:
+        write_batch(batch)
+        db.session.commit()
+        total += len(batch)
+
+    db.session.add(CatalogIngest(finished_at=datetime.now(timezone.utc).replace(tzinfo=None),
+                                 movies=db.session.query(func.count(Movie.id)).scalar()))
+    db.session.commit()
+    _size_cache['expires_at'] = 0.0
+    return total
+
+
+@catalog_cli.command('reindex')
+@click.option('--batch-size', default=5000, show_default=True)
+def reindex_command(batch_size):
+    """Create the full-text search index if needed and rebuild it."""
+    search_index.ensure_index()
+    total = 0
+    last_id = 0
+    while True:
+        ids = [row[0] for row in db.session.query(Movie.id).filter(Movie.id > last_id)
+               .order_by(Movie.id).limit(batch_size)]
+        if not ids:
+            break
+        search_index.index_movies(ids)
+        db.session.commit()
+        total += len(ids)
+        last_id = ids[-1]
+    click.echo(f"Indexed {total} movies")
+
+
+@catalog_cli.command('ingest')
+@click.argument('path')
+@click.option('--batch-size', default=5000, show_default=True,
+              help='Records written per executemany batch and transaction.')
+def ingest_command(path, batch_size):
+    """Bulk-load a TMDb JSON-lines export into the movie catalog."""
+    db.create_all()
+    search_index.ensure_index()
+    db.session.commit()
+    started = time.perf_counter()
+    total = ingest(read_records(path), batch_size=batch_size)
+    click.echo(f"Ingested {total} movies in {time.perf_counter() - started:.1f}s")
+
+
+def store_movie(details):
+    """
+    Writes a TMDb details payload through to the catalog. Failures are logged
+    and ignored since the catalog is only an accelerator.
+    """
+    store_movies([details])
+
+
+def store_movies(payloads):
+    """
+    Writes TMDb details payloads through to the catalog in one transaction.
+    Failures are logged and ignored since the catalog is only an accelerator,
+    including the IntegrityError PostgreSQL raises when another worker writes
+    the same movie's cast at the same time.
+    """
+    payloads = [details for details in payloads if details and 'id' in details]
+    if not has_app_context() or not payloads:
+        return
+    try:
+        write_batch(payloads)
+        db.session.commit()
+    except (IntegrityError, OperationalError) as error:
+        db.session.rollback()
+        logger.warning("Could not store movies %s in the catalog: %r",
+                       [details['id'] for details in payloads], error)
+
+
+def movie_payload(movie):
+    """
+    Renders a detailed catalog row in the shape of TMDb's
+    /movie/{id}?append_to_response=credits response.
+    """
+    return {
+        'id': movie.id,
+        'title': movie.title,
+        'original_title': movie.original_title,
+        'release_date': movie.release_date or '',
+        'poster_path': movie.poster_path,
+        'overview': movie.overview or '',
+        'vote_average': movie.vote_average,
+        'vote_count': movie.vote_count,
+        'popularity': movie.popularity,
+        'runtime': movie.runtime,
+        'genres': [{'id': genre.id, 'name': genre.name} for genre in movie.genres],
+        'credits': {'cast': [{'id': member.person_id, 'name': member.name,
+                              'character': member.character} for member in movie.cast]},
+    }
+
+
+def list_payload(movie):
+    """
+    Renders a catalog row in the shape of a TMDb list result.
+    """
+    return {
+        'id': movie.id,
+        'title': movie.title,
+        'original_title': movie.original_title,
+        'release_date': movie.release_date or '',
+        'poster_path': movie.poster_path,
+        'overview': movie.overview or '',
+        'vote_average': movie.vote_average,
+        'vote_count': movie.vote_count,
+        'popularity': movie.popularity,
+    }
+
+
+def get_movie(movie_id):
+    """
+    Returns the catalog's details payload for a movie, or None if the movie is
+    missing, only known from a thin export, or the catalog is unavailable.
+    """
+    if not has_app_context():
+        return None
+    try:
+        movie = db.session.get(Movie, movie_id)
+        if movie is None or not movie.detailed:
+            return None
+        return movie_payload(movie)
+    except OperationalError as error:
+        db.session.rollback()
+        logger.warning("Catalog lookup failed: %r", error)
+        return None
+
+
+def get_movies(movie_ids):
+    """
+    Returns the catalog's details payloads by movie ID for the detailed movies
+    among movie_ids, loading their genres and cast with one query each rather
+    than per movie.
+    """
+    movie_ids = list(movie_ids)
+    if not has_app_context() or not movie_ids:
+        return {}
+    try:
+        movies = (Movie.query.options(selectinload(Movie.genres), selectinload(Movie.cast))
+                  .filter(Movie.id.in_(movie_ids), Movie.detailed.is_(True)).all())
+        return {movie.id: movie_payload(movie) for movie in movies}
+    except OperationalError as error:
+        db.session.rollback()
+        logger.warning("Catalog lookup failed: %r", error)
+        return {}
+
+
+def ingested_size():
+    """
+    Returns the number of movies in the catalog when its last bulk ingest
+    finished, or 0 if none has, cached per worker for a minute. Movies
+    written through on TMDb misses don't count: a catalog holding only those
+    would answer dashboard rows and searches with whatever users happened to
+    open.
+    """
+    now = time.time()
+    if _size_cache['count'] is None or _size_cache['expires_at'] <= now:
+        try:
+            latest = CatalogIngest.query.order_by(CatalogIngest.id.desc()).first()
+        except (OperationalError, ProgrammingError) as error:
+            # The catalog_ingest table is missing until its migration runs
+            db.session.rollback()
+            logger.warning("Catalog ingest lookup failed: %r", error)
+            latest = None
+        _size_cache['count'] = latest.movies if latest is not None else 0
+        _size_cache['expires_at'] = now + 60
+    return _size_cache['count']
+
+
+def _rows(build_query, limit=ROW_LIMIT):
+    """
+    Runs a dashboard row query, built by build_query(), against the catalog
+    once an ingest has loaded at least CATALOG_MIN_ROWS movies. Returns None
+    when the catalog should not be used.
+    """
+    if not has_app_context():
+        return None
+    try:
+        if ingested_size() < current_app.config.get('CATALOG_MIN_ROWS', 1000):
+            return None
+        movies = build_query().filter(Movie.poster_path.isnot(None)).limit(limit).all()
+        return [list_payload(movie) for movie in movies]
+    except OperationalError as error:
+        db.session.rollback()
+        logger.warning("Catalog row query failed: %r", error)
+        return None
+
+
+def now_playing(today=None):
+    """
+    Returns the most popular catalog movies released in the last six weeks.
+    """
+    today = today or date.today()
+    window_start = (today - timedelta(weeks=6)).isoformat()
+    return _rows(lambda: Movie.query
+                 .filter(Movie.release_date.between(window_start, today.isoformat()))
+                 .order_by(Movie.popularity.desc()))
+
+
+def top_rated(min_votes=300):
+    """
+    Returns the highest rated catalog movies with at least min_votes votes.
+    """
+    return _rows(lambda: Movie.query
+                 .filter(Movie.vote_count >= min_votes)
+                 .order_by(Movie.vote_average.desc(), Movie.popularity.desc()))
+
+
+def by_genre(genre_id):
+    """
+    Returns the most popular catalog movies in a genre.
+    """
+    return _rows(lambda: Movie.query
+                 .join(MovieGenre, MovieGenre.movie_id == Movie.id)
+                 .filter(MovieGenre.genre_id == genre_id)
+                 .order_by(Movie.popularity.desc()))
+
+
+def search(query, limit=40):
+    """
+    Searches the catalog's full-text index over titles, original titles and
+    cast names.
+
+    Returns:
+        Matching movies with posters, best match first, in the shape of TMDb
+        list results; or None when the catalog is too small to be trusted or
+        unavailable, so the caller falls back to TMDb.
+    """
+    if not has_app_context():
+        return None
+    try:
+        if ingested_size() < current_app.config.get('CATALOG_MIN_ROWS', 1000):
+            return None
+        ids = search_index.match_ids(query, limit=limit)
+        if not ids:
+            return []
+        movies = {movie.id: movie for movie in
+                  Movie.query.filter(Movie.id.in_(ids), Movie.poster_path.isnot(None))}
+        return [list_payload(movies[movie_id]) for movie_id in ids if movie_id in movies]
+    except OperationalError as error:
+        db.session.rollback()
+        logger.warning("Catalog search failed: %r", error)
+        return None
@@ -0,0 +1,175 @@
+import asyncio
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from flask import current_app, has_app_context
+
+try:
+    import metrics
+    import ratelimit
+except ModuleNotFoundError:
+    from src import metrics
+    from src import ratelimit
+
+logger = logging.getLogger(__name__)
+
+MAX_WORKERS = int(os.getenv('FANOUT_WORKERS', 16))
+BACKGROUND_WORKERS = int(os.getenv('BACKGROUND_WORKERS', 4))
+
+_executor = None
+_background = None
+_pid = None
+_lock = threading.Lock()
+
+
+def _pools():
+    """
+    Returns the shared pool and the background pool for the current process,
+    creating them on first use and re-creating them after a fork so that
+    gunicorn workers never inherit threads from the master process.
+    """
+    global _executor, _background, _pid
+    pid = os.getpid()
+    if _executor is None or _pid != pid:
+        with _lock:
+            if _executor is None or _pid != pid:
+                _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS,
+                                               thread_name_prefix='movievault')
+                _background = ThreadPoolExecutor(max_workers=BACKGROUND_WORKERS,
+                                                 thread_name_prefix='movievault-background')
+                _pid = pid
+    return _executor, _background
+
+
+def get_executor():
+    """
+    Returns the shared, bounded thread pool for the current process.
+    """
+    return _pools()[0]
+
+
+def get_background_executor():
+    """
+    Returns the small pool for work nobody is waiting on, kept apart from the
+    shared pool so a burst of it can't hold up the fetches pages wait for.
+    """
+    return _pools()[1]
+
+
+def reset_executor():
+    """
+    Shuts down both pools so the next call to get_executor starts new ones.
+    """
+    global _executor, _background, _pid
+    with _lock:
+        if _executor is not None and _pid == os.getpid():
+            # cancel_futures needs Python 3.9+, which CI and runtime.txt run
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _background.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+        _background = None
+        _pid = None
+
+
+def submit(fn, *args, **kwargs):
+    """
+    Runs fn on the shared pool, inside the current app context if there is
+    one and in the caller's TMDb rate limit lane, timed as part of the
+    caller's request (see metrics).
+
+    Returns:
+        The concurrent.futures.Future for the call.
+    """
+    return get_executor().submit(_bind(fn, args, kwargs, metrics.current()))
+
+
+def submit_background(fn, *args, **kwargs):
+    """
+    Runs fn on the background pool, like submit but untimed, since the
+    request that scheduled it won't wait for it.
+
+    Returns:
+        The concurrent.futures.Future for the call.
+    """
+    return get_background_executor().submit(_bind(fn, args, kwargs, None))
+
+
+def _bind(fn, args, kwargs, timings):
+    app = current_app._get_current_object() if has_app_context() else None
+    name = ratelimit.current_lane()
+
+    def run():
+        with ratelimit.lane(name), metrics.recording(timings):
+            if app is None:
+                return fn(*args, **kwargs)
+            with app.app_context():
+                return fn(*args, **kwargs)
+
+    return run
+
+
+def gather(tasks, timeout=None, default=list):
+    """
+    Runs independent calls concurrently and collects their results by name.
+
+    A call that raises, or has not finished when the timeout expires, is
+    logged and replaced by default() so one failing section never takes down
+    the whole page.
+
+    Args:
+        tasks (dict): Maps a result name to a zero-argument callable.
+        timeout (float): Seconds to wait for all calls, or None to wait forever.
+        default (callable): Factory for the value used when a call fails.
+
+    Returns:
+        A dict with the same keys as tasks.
+    """
+    futures = {name: submit(fn) for name, fn in tasks.items()}
+    wait(futures.values(), timeout=timeout)
+
+    results = {}
+    for name, future in futures.items():
+        if not future.done():
+            future.cancel()
+            logger.warning("Timed out waiting for %s", name)
+            results[name] = default()
+        elif future.exception() is not None:
+            logger.warning("Fetching %s failed: %r", name, future.exception())
+            results[name] = default()
+        else:
+            results[name] = future.result()
+    return results
+
+
+async def gather_async(tasks, timeout=None, default=list):
+    """
+    The asyncio version of gather: awaits independent coroutines
+    concurrently on the running loop and collects their results by name,
+    with the same timeout and failure handling.
+
+    Args:
+        tasks (dict): Maps a result name to a zero-argument coroutine function.
+        timeout (float): Seconds to wait for all calls, or None to wait forever.
+        default (callable): Factory for the value used when a call fails.
+
+    Returns:
+        A dict with the same keys as tasks.
+    """
+    running = {name: asyncio.ensure_future(fn()) for name, fn in tasks.items()}
+    if running:
+        await asyncio.wait(running.values(), timeout=timeout)
+
+    results = {}
+    for name, task in running.items():
+        if not task.done():
+            task.cancel()
+            logger.warning("Timed out waiting for %s", name)
+            results[name] = default()
+        elif task.exception() is not None:
+            logger.warning("Fetching %s failed: %r", name, task.exception())
+            results[name] = default()
+        else:
+            results[name] = task.result()
+    return results
@@ -0,0 +1,279 @@
+import base64
+import binascii
+import json
+import logging
+from functools import partial
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import func, tuple_
+
+try:
+    from models import db, dialect_insert, Favorite, FavoriteGenre, FavoriteCast
+    from tmdb import client as tmdb
+    from executor import gather
+    import catalog
+    import ratelimit
+except ModuleNotFoundError:
+    from src.models import db, dialect_insert, Favorite, FavoriteGenre, FavoriteCast
+    from src.tmdb import client as tmdb
+    from src.executor import gather
+    from src import catalog
+    from src import ratelimit
+
+logger = logging.getLogger(__name__)
+
+# Top-billed actors recorded per favorite.
+CAST_LIMIT = 3
+BACKFILL_TIMEOUT = 60
+# Most movies one /api/favorites/batch request may add or remove, and how
+# long it waits for TMDb details.
+BATCH_LIMIT = 100
+BATCH_TIMEOUT = 10
+PAGE_SIZE = 24
+
+# /favorites sort orders: (keyset columns, descending). Each matches one of
+# Favorite's (user_id, ..., id) indexes.
+SORTS = {
+    'added': ((Favorite.id,), True),
+    'title': ((Favorite.movie_title, Favorite.id), False),
+    'rating': ((Favorite.movie_rating, Favorite.id), True),
+    'release': ((Favorite.movie_release_date, Favorite.id), True),
+}
+DEFAULT_SORT = 'added'
+
+favorites_cli = AppGroup('favorites', help='Maintain users\' favorite movies.')
+
+
+def favorite_row(user_id, details):
+    """
+    Returns the Favorite column values for a movie's TMDb details payload.
+    Fields TMDb leaves empty are stored as blanks, which the templates show
+    as N/A.
+    """
+    return {
+        'user_id': user_id,
+        'movie_id': details['id'],
+        'movie_title': details['title'][:255],
+        'movie_poster': details.get('poster_path') or '',
+        'movie_release_date': details.get('release_date') or '',
+        'movie_rating': details.get('vote_average') or 0.0,
+        'movie_runtime': details.get('runtime') or 0,
+    }
+
+
+def detail_rows(user_id, details):
+    """
+    Returns the FavoriteGenre and FavoriteCast column values, less
+    favorite_id, recorded for a movie's TMDb details payload.
+    """
+    genres = []
+    seen = set()
+    for genre in details.get('genres') or []:
+        if genre['id'] not in seen:
+            seen.add(genre['id'])
+            genres.append({'user_id': user_id, 'genre_id': genre['id'], 'name': genre['name'][:100]})
+    cast = (details.get('credits') or {}).get('cast') or []
+    cast = [{'user_id': user_id, 'cast_order': position, 'person_id': member.get('id'),
+             'name': (member.get('name') or '')[:255]}
+            for position, member in enumerate(cast[:CAST_LIMIT])]
+    return genres, cast
+
+
+def capture_details(favorite, details):
+    """
+    Copies a movie's genres and top-billed cast from its TMDb details payload
+    onto a favorite, replacing anything recorded before.
+    """
+    genres, cast = detail_rows(favorite.user_id, details)
+    favorite.genres = [FavoriteGenre(**row) for row in genres]
+    favorite.cast = [FavoriteCast(**row) for row in cast]
+
+
+def _most_common(model, user_id):
+    """
+    Returns the name that appears on most of the user's favorites, ties going
+    to the one first favorited, or None if there is none.
+    """
+    row = (db.session.query(model.name)
+           .filter(model.user_id == user_id)
+           .group_by(model.name)
+           .order_by(func.count().desc(), func.min(model.favorite_id))
+           .first())
+    return row[0] if row else None
+
+
+def most_common_genre(user_id):
+    return _most_common(FavoriteGenre, user_id)
+
+
+def most_common_actor(user_id):
+    return _most_common(FavoriteCast, user_id)
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, columns):
+    """
+    Returns the keyset values encoded in a page cursor for the sort columns,
+    or None if the cursor is missing or malformed, including values of the
+    wrong type for their column, which the database would reject.
+    """
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if not isinstance(values, list) or len(values) != len(columns):
+        return None
+    for value, column in zip(values, columns):
+        python_type = column.type.python_type
+        allowed = (int, float) if python_type is float else python_type
+        if isinstance(value, bool) or not isinstance(value, allowed):
+            return None
+    return values
+
+
+def page(user_id, sort=DEFAULT_SORT, after=None, limit=PAGE_SIZE):
+    """
+    Returns one page of a user's favorites by keyset (seek) pagination: the
+    page starts right after the row the cursor points at, so every page costs
+    the same however deep it is, and rows added or removed meanwhile never
+    shift or repeat the following pages.
+
+    Args:
+        sort (str): A key of SORTS; unknown values use DEFAULT_SORT.
+        after (str): The cursor returned with the previous page.
+
+    Returns:
+        (favorites, cursor), where cursor fetches the next page or is None on
+        the last page.
+    """
+    columns, descending = SORTS.get(sort, SORTS[DEFAULT_SORT])
+    query = Favorite.query.filter(Favorite.user_id == user_id)
+    values = decode_cursor(after, columns)
+    if values is not None:
+        key, bound = tuple_(*columns), tuple_(*values)
+        query = query.filter(key < bound if descending else key > bound)
+    query = query.order_by(*(column.desc() if descending else column for column in columns))
+    favorites = query.limit(limit + 1).all()
+    if len(favorites) <= limit:
+        return favorites, None
+    favorites = favorites[:limit]
+    return favorites, encode_cursor([getattr(favorites[-1], column.key) for column in columns])
+
+
+def fetch_details(movie_id):
+    """
+    Fetches a movie's details payload from TMDb, or None on an error status.
+    Runs on the shared pool, so it never touches the database.
+    """
+    response = tmdb.get(f'/movie/{movie_id}', {'append_to_response': 'credits'})
+    return response.json() if response.status_code == 200 else None
+
+
+def load_details(movie_ids, timeout=BACKFILL_TIMEOUT):
+    """
+    Returns details payloads by movie ID, from the catalog where possible and
+    otherwise fetched from TMDb concurrently (through the response cache) and
+    written through to the catalog in one batch. Movies that could not be
+    loaded within timeout seconds are left out.
+    """
+    details = catalog.get_movies(movie_ids)
+    remote = [movie_id for movie_id in movie_ids if movie_id not in details]
+    fetched = gather({movie_id: partial(fetch_details, movie_id) for movie_id in remote},
+                     timeout=timeout, default=lambda: None)
+    fetched = {movie_id: payload for movie_id, payload in fetched.items() if payload}
+    catalog.store_movies(fetched.values())
+    details.update(fetched)
+    return details
+
+
+def add_many(user_id, movie_ids, timeout=BATCH_TIMEOUT):
+    """
+    Adds movies to a user's favorites with bulk inserts, without committing.
+
+    Details for movies not yet favorited are resolved in one pass: the
+    catalog first, then concurrent TMDb fetches through the response cache.
+    Favorites are inserted with ON CONFLICT DO NOTHING on (user_id, movie_id),
+    so a concurrent add of the same movie is reported rather than failing
+    the batch.
+
+    Returns:
+        A dict mapping each movie ID to 'added', 'exists' or 'not_found'.
+    """
+    existing = {row[0] for row in db.session.query(Favorite.movie_id)
+                .filter(Favorite.user_id == user_id, Favorite.movie_id.in_(movie_ids))}
+    wanted = [movie_id for movie_id in movie_ids if movie_id not in existing]
+    details = load_details(wanted, timeout) if wanted else {}
+    rows = [favorite_row(user_id, details[movie_id]) for movie_id in wanted if movie_id in details]
+
+    added = {}
+    if rows:
+        insert = (dialect_insert(Favorite)
+                  .on_conflict_do_nothing(index_elements=['user_id', 'movie_id'])
+                  .returning(Favorite.id, Favorite.movie_id))
+        added = {movie_id: favorite_id
+                 for favorite_id, movie_id in db.session.execute(insert, rows)}
+    genre_rows, cast_rows = [], []
+    for movie_id, favorite_id in added.items():
+        genres, cast = detail_rows(user_id, details[movie_id])
+        genre_rows.extend(dict(row, favorite_id=favorite_id) for row in genres)
+        cast_rows.extend(dict(row, favorite_id=favorite_id) for row in cast)
+    if genre_rows:
+        db.session.execute(db.insert(FavoriteGenre), genre_rows)
+    if cast_rows:
+        db.session.execute(db.insert(FavoriteCast), cast_rows)
+
+    return {movie_id: 'added' if movie_id in added
+            else 'not_found' if movie_id not in existing and movie_id not in details
+            else 'exists'
+            for movie_id in movie_ids}
+
+
+def remove_many(user_id, movie_ids):
+    """
+    Removes movies from a user's favorites, with their recorded genres and
+    cast, using one DELETE per table and without committing.
+
+    Returns:
+        A dict mapping each movie ID to 'removed' or 'not_favorited'.
+    """
+    found = dict(db.session.query(Favorite.movie_id, Favorite.id)
+                 .filter(Favorite.user_id == user_id, Favorite.movie_id.in_(movie_ids)).all())
+    if found:
+        favorite_ids = list(found.values())
+        for model in (FavoriteGenre, FavoriteCast):
+            db.session.execute(db.delete(model).where(model.favorite_id.in_(favorite_ids)))
+        db.session.execute(db.delete(Favorite).where(Favorite.id.in_(favorite_ids)))
+    return {movie_id: 'removed' if movie_id in found else 'not_favorited'
+            for movie_id in movie_ids}
+
+
+@favorites_cli.command('backfill')
+@click.option('--batch-size', default=200, show_default=True)
+def backfill_command(batch_size):
+    """Record genres and cast for favorites saved before they were captured."""
+    db.create_all()
+    updated = skipped = 0
+    last_id = 0
+    while True:
+        batch = (Favorite.query
+                 .filter(Favorite.id > last_id, ~Favorite.genres.any(), ~Favorite.cast.any())
+                 .order_by(Favorite.id).limit(batch_size).all())
+        if not batch:
+            break
+        last_id = batch[-1].id
+        with ratelimit.lane(ratelimit.BULK):
+            details = load_details({favorite.movie_id for favorite in batch})
+        for favorite in batch:
+            if favorite.movie_id in details:
+                capture_details(favorite, details[favorite.movie_id])
+                updated += 1
+            else:
+                skipped += 1
+        db.session.commit()
+    click.echo(f"Backfilled {updated} favorites, skipped {skipped}")
@@ -0,0 +1,104 @@
+import logging
+import os
+import threading
+import time
+
+try:
+    from models import db
+    import executor
+    import passwords
+except ModuleNotFoundError:
+    from src.models import db
+    from src import executor
+    from src import passwords
+
+logger = logging.getLogger(__name__)
+
+_started_pid = None
+_lock = threading.Lock()
+
+
+def sentry_enabled(app):
+    return bool(app.config.get('SENTRY_DSN')) and not app.config.get('TESTING')
+
+
+def init_sentry(app):
+    """
+    Starts error and performance reporting to SENTRY_DSN, if one is set and
+    the app is not under test. sentry_sdk is only imported here, so
+    processes that never serve traffic don't pay for it.
+    """
+    if not sentry_enabled(app):
+        return
+    import sentry_sdk
+    from sentry_sdk.integrations.flask import FlaskIntegration
+    from sentry_sdk.integrations.sqlalchemy import SqlalchemyIntegration
+
+    sentry_sdk.init(
+        dsn=app.config['SENTRY_DSN'],
+        integrations=[FlaskIntegration(), SqlalchemyIntegration()],
+        traces_sample_rate=app.config['SENTRY_TRACES_SAMPLE_RATE'],
+        profiles_sample_rate=app.config['SENTRY_PROFILES_SAMPLE_RATE'],
+    )
+
+
+def ensure_started(app):
+    """
+    Runs the once-per-process startup for the process serving app: Sentry,
+    whose reporting thread would not survive a fork, starts here rather
+    than at import. Later calls in the same process return at once.
+    """
+    global _started_pid
+    pid = os.getpid()
+    if _started_pid == pid:
+        return
+    with _lock:
+        if _started_pid != pid:
+            init_sentry(app)
+            _started_pid = pid
+
+
+def warm_templates(app):
+    """
+    Compiles every template into the Jinja cache. Run before forking so
+    workers share the compiled templates, or in each worker before its
+    first request.
+
+    Returns:
+        The number of templates compiled.
+    """
+    started = time.perf_counter()
+    names = app.jinja_env.list_templates()
+    for name in names:
+        app.jinja_env.get_template(name)
+    logger.info("Compiled %d templates in %.3fs", len(names), time.perf_counter() - started)
+    return len(names)
+
+
+def preload(app):
+    """
+    Does the per-process work that is safe to share across a fork, once in
+    the parent: imports sentry_sdk, which starts no threads until init, and
+    compiles the templates.
+    """
+    if sentry_enabled(app):
+        import sentry_sdk.integrations.flask  # noqa: F401
+        import sentry_sdk.integrations.sqlalchemy  # noqa: F401
+    warm_templates(app)
+
+
+def post_fork(app):
+    """
+    Prepares a freshly forked worker: drops the database connections and
+    thread and process pools inherited from the parent, which belong to it,
+    so this process opens its own on first use, then starts the worker and
+    compiles any templates the parent did not preload.
+    """
+    with app.app_context():
+        for engine in db.engines.values():
+            # close=False leaves the parent's sockets open for the parent
+            engine.dispose(close=False)
+    executor.reset_executor()
+    passwords.hasher.reset()
+    ensure_started(app)
+    warm_templates(app)
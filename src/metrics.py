@@ -0,0 +1,221 @@
+"""
+Per-request timing: how long each request spent waiting on TMDb, in
+database queries and rendering templates.
+
+Every response carries the breakdown in a Server-Timing header, which
+browsers show in their network panel:
+
+    Server-Timing: tmdb;dur=182.4;desc="3 calls", db;dur=4.1;desc="6 queries",
+                   render;dur=9.8;desc="1 template", total;dur=201.7
+
+and the same timings feed Prometheus histograms served by /metrics. Under
+gunicorn each worker writes its histograms to files in
+PROMETHEUS_MULTIPROC_DIR (gunicorn.conf.py sets one up) and /metrics adds
+up every worker's, so a scrape sees the whole server whichever worker
+answers it. Without that setting each process reports its own.
+"""
+import contextlib
+import contextvars
+import os
+import threading
+import time
+
+from flask import request
+from flask.signals import before_render_template, template_rendered
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Histogram, \
+    generate_latest, multiprocess
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENTS = ('SELECT', 'INSERT', 'UPDATE', 'DELETE')
+# The order parts appear in the Server-Timing header, and what they count
+PARTS = {'tmdb': ('call', 'calls'), 'db': ('query', 'queries'), 'render': ('template', 'templates')}
+
+REQUEST_SECONDS = Histogram('movievault_request_seconds', 'Time to answer a request, by view',
+                            ['view', 'method'], buckets=BUCKETS)
+TMDB_SECONDS = Histogram('movievault_tmdb_call_seconds',
+                         'Time a caller waited on a TMDb call the cache could not answer, by endpoint',
+                         ['endpoint'], buckets=BUCKETS)
+DB_SECONDS = Histogram('movievault_db_query_seconds', 'Time spent in a database query, by statement',
+                       ['statement'], buckets=BUCKETS)
+RENDER_SECONDS = Histogram('movievault_template_render_seconds', 'Time to render a template, by name',
+                           ['template'], buckets=BUCKETS)
+HISTOGRAMS = {'tmdb': TMDB_SECONDS, 'db': DB_SECONDS, 'render': RENDER_SECONDS}
+
+enabled = False
+_hooked = False
+# Histogram children by (histogram, label), as labels() takes a lock
+_children = {}
+_timings = contextvars.ContextVar('request_timings', default=None)
+_rendering = threading.local()
+
+
+class Timings:
+    """
+    The time one request has spent in each part so far. Calls made for it
+    on other threads add to the same Timings, so parts that ran
+    concurrently may add up to more than the request took.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.parts = {part: [] for part in PARTS}
+
+    def add(self, part, seconds):
+        self.parts[part].append(seconds)
+
+    def header(self, total):
+        """
+        Returns the Server-Timing header value for a request that took total
+        seconds.
+        """
+        entries = []
+        for part, nouns in PARTS.items():
+            seconds = self.parts[part]
+            if seconds:
+                entries.append(f'{part};dur={sum(seconds) * 1000:.1f};'
+                               f'desc="{len(seconds)} {nouns[len(seconds) != 1]}"')
+        entries.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(entries)
+
+
+def current():
+    """
+    Returns the Timings of the request being served here, or None.
+    """
+    return _timings.get()
+
+
+@contextlib.contextmanager
+def recording(timings):
+    """
+    Adds the timings of the calls made inside the block to timings, e.g. on
+    a pool thread working for a request.
+    """
+    token = _timings.set(timings)
+    try:
+        yield
+    finally:
+        _timings.reset(token)
+
+
+def observe(part, label, seconds):
+    """
+    Records seconds spent in one of the PARTS, in its histogram and in the
+    current request's timings.
+    """
+    if not enabled:
+        return
+    child(HISTOGRAMS[part], label).observe(seconds)
+    timings = _timings.get()
+    if timings is not None:
+        timings.add(part, seconds)
+
+
+@contextlib.contextmanager
+def timed(part, label):
+    """
+    Records the time the block takes with observe().
+    """
+    if not enabled:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(part, label, time.perf_counter() - started)
+
+
+def child(histogram, *labels):
+    key = (histogram, labels)
+    found = _children.get(key)
+    if found is None:
+        found = _children[key] = histogram.labels(*labels)
+    return found
+
+
+def statement_kind(statement):
+    kind = statement.lstrip()[:6].upper()
+    return kind.lower() if kind in STATEMENTS else 'other'
+
+
+# The start time goes on the statement's execution context rather than the
+# connection, so a query that fails, and never reaches _after_query, leaves
+# nothing behind.
+def _before_query(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context.metrics_started = time.perf_counter()
+
+
+def _after_query(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, 'metrics_started', None)
+    if started is not None:
+        observe('db', statement_kind(statement), time.perf_counter() - started)
+
+
+def _before_render(sender, template, context, **extra):
+    if not hasattr(_rendering, 'started'):
+        _rendering.started = []
+    _rendering.started.append(time.perf_counter())
+
+
+def _after_render(sender, template, context, **extra):
+    started = getattr(_rendering, 'started', None)
+    if started:
+        observe('render', template.name or 'string', time.perf_counter() - started.pop())
+
+
+def start_request():
+    if enabled:
+        _timings.set(Timings())
+
+
+def finish_request(response):
+    timings = _timings.get()
+    if timings is None:
+        return response
+    total = time.perf_counter() - timings.started
+    child(REQUEST_SECONDS, request.endpoint or 'none', request.method).observe(total)
+    response.headers['Server-Timing'] = timings.header(total)
+    return response
+
+
+def end_request(exc=None):
+    _timings.set(None)
+
+
+def init_app(app):
+    """
+    Times app's requests when its METRICS setting is on. The database and
+    template hooks are process-wide and installed once.
+    """
+    global enabled, _hooked
+    enabled = app.config['METRICS']
+    if not enabled:
+        return
+    # First, so the other before_request functions are timed too
+    app.before_request_funcs.setdefault(None, []).insert(0, start_request)
+    app.after_request(finish_request)
+    app.teardown_request(end_request)
+    if not _hooked:
+        event.listen(Engine, 'before_cursor_execute', _before_query)
+        event.listen(Engine, 'after_cursor_execute', _after_query)
+        before_render_template.connect(_before_render)
+        template_rendered.connect(_after_render)
+        _hooked = True
+
+
+def exposition():
+    """
+    Returns the histograms in the Prometheus text format, added up over all
+    of PROMETHEUS_MULTIPROC_DIR's processes if it is set, and their content
+    type.
+    """
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
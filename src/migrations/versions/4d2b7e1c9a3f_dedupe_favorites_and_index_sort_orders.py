@@ -0,0 +1,60 @@
+"""Dedupe favorites and index their lookups and sort orders
+
+Revision ID: 4d2b7e1c9a3f
+Revises: 
+Create Date: 2026-10-17 09:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4d2b7e1c9a3f'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+# `flask init-db` creates missing tables with db.create_all() (the Procfile's
+# release step runs it before `flask db upgrade`), so this revision only
+# changes what create_all() leaves alone on an existing table: the duplicate
+# rows and the indexes.
+INDEXES = (
+    ('ix_favorite_user_movie', ['user_id', 'movie_id'], True),
+    ('ix_favorite_user_added', ['user_id', 'id'], False),
+    ('ix_favorite_user_title', ['user_id', 'movie_title', 'id'], False),
+    ('ix_favorite_user_rating', ['user_id', 'movie_rating', 'id'], False),
+    ('ix_favorite_user_release', ['user_id', 'movie_release_date', 'id'], False),
+)
+CHILD_TABLES = ('favorite_genre', 'favorite_cast')
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+    if 'favorite' not in tables:
+        return
+
+    # Keep each user's earliest favorite of a movie and drop the repeats,
+    # along with the genres and cast recorded for them.
+    favorite = sa.table('favorite', sa.column('id'), sa.column('user_id'), sa.column('movie_id'))
+    keep = (sa.select(sa.func.min(favorite.c.id))
+            .group_by(favorite.c.user_id, favorite.c.movie_id)
+            .scalar_subquery())
+    for name in CHILD_TABLES:
+        if name in tables:
+            child = sa.table(name, sa.column('favorite_id'))
+            op.execute(child.delete().where(child.c.favorite_id.not_in(keep)))
+    op.execute(favorite.delete().where(favorite.c.id.not_in(keep)))
+
+    existing = {index['name'] for index in inspector.get_indexes('favorite')}
+    for name, columns, unique in INDEXES:
+        if name not in existing:
+            op.create_index(name, 'favorite', columns, unique=unique)
+
+
+def downgrade():
+    existing = {index['name'] for index in sa.inspect(op.get_bind()).get_indexes('favorite')}
+    for name, _, _ in reversed(INDEXES):
+        if name in existing:
+            op.drop_index(name, table_name='favorite')
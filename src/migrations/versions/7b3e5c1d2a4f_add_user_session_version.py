@@ -0,0 +1,30 @@
+"""Add user.session_version for cached session lookups
+
+Revision ID: 7b3e5c1d2a4f
+Revises: 4d2b7e1c9a3f
+Create Date: 2026-10-17 14:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7b3e5c1d2a4f'
+down_revision = '4d2b7e1c9a3f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if 'user' not in inspector.get_table_names():
+        return
+    if 'session_version' not in {column['name'] for column in inspector.get_columns('user')}:
+        op.add_column('user', sa.Column('session_version', sa.Integer(), nullable=False,
+                                        server_default='0'))
+
+
+def downgrade():
+    with op.batch_alter_table('user') as batch_op:
+        batch_op.drop_column('session_version')
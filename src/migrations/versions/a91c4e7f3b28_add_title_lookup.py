@@ -0,0 +1,33 @@
+"""Add title_lookup for resolving legacy /movie/<title> URLs
+
+Revision ID: a91c4e7f3b28
+Revises: 7b3e5c1d2a4f
+Create Date: 2026-10-17 18:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a91c4e7f3b28'
+down_revision = '7b3e5c1d2a4f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if 'title_lookup' in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        'title_lookup',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('title', sa.String(length=255), nullable=False),
+        sa.Column('movie_id', sa.Integer(), nullable=False),
+    )
+    op.create_index('ix_title_lookup_title', 'title_lookup', ['title'], unique=True)
+
+
+def downgrade():
+    op.drop_index('ix_title_lookup_title', table_name='title_lookup')
+    op.drop_table('title_lookup')
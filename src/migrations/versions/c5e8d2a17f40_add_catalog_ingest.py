@@ -0,0 +1,31 @@
+"""Add catalog_ingest to record finished bulk ingests
+
+Revision ID: c5e8d2a17f40
+Revises: a91c4e7f3b28
+Create Date: 2026-10-17 19:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5e8d2a17f40'
+down_revision = 'a91c4e7f3b28'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if 'catalog_ingest' in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        'catalog_ingest',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=False),
+        sa.Column('movies', sa.Integer(), nullable=False),
+    )
+
+
+def downgrade():
+    op.drop_table('catalog_ingest')
@@ -0,0 +1,37 @@
+"""Widen user.password to fit scrypt hashes
+
+Revision ID: e2f7a9c4b815
+Revises: c5e8d2a17f40
+Create Date: 2026-10-17 21:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2f7a9c4b815'
+down_revision = 'c5e8d2a17f40'
+branch_labels = None
+depends_on = None
+
+# werkzeug's scrypt:32768:8:1 hashes are 162 characters, pbkdf2 ones 102
+PASSWORD_LENGTH = 255
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if 'user' not in inspector.get_table_names():
+        return
+    column = next(column for column in inspector.get_columns('user') if column['name'] == 'password')
+    if (getattr(column['type'], 'length', None) or PASSWORD_LENGTH) >= PASSWORD_LENGTH:
+        return
+    with op.batch_alter_table('user') as batch_op:
+        batch_op.alter_column('password', existing_type=column['type'],
+                              type_=sa.String(length=PASSWORD_LENGTH), existing_nullable=False)
+
+
+def downgrade():
+    with op.batch_alter_table('user') as batch_op:
+        batch_op.alter_column('password', existing_type=sa.String(length=PASSWORD_LENGTH),
+                              type_=sa.String(length=150), existing_nullable=False)
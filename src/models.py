@@ -1,17 +1,40 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
+from sqlalchemy import insert
 
 db = SQLAlchemy()
 
 
+def dialect_insert(model):
+    """
+    Returns an INSERT construct for the model using the bound database's
+    dialect, so callers can use on_conflict_do_nothing/do_update on both
+    SQLite and PostgreSQL.
+    """
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+        return pg_insert(model)
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+        return sqlite_insert(model)
+    return insert(model)
+
+
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(150), unique=True, nullable=False)
-    password = db.Column(db.String(150), nullable=False)
+    password = db.Column(db.String(255), nullable=False)
     first_name = db.Column(db.String(150))
     last_name = db.Column(db.String(150))
+    # Bumped on every profile change; part of the session token, so sessions
+    # issued before the change stop matching.
+    session_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     favorites = db.relationship('Favorite', backref='user', lazy=True)
 
+    def get_id(self):
+        return f'{self.id}:{self.session_version or 0}'
+
 
 class Favorite(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -22,3 +45,114 @@ class Favorite(db.Model):
     movie_release_date = db.Column(db.String(255), nullable=False)
     movie_rating = db.Column(db.Float, nullable=False)
     movie_runtime = db.Column(db.Integer, nullable=False)
+    genres = db.relationship('FavoriteGenre', backref='favorite', lazy=True,
+                             cascade='all, delete-orphan')
+    cast = db.relationship('FavoriteCast', backref='favorite', lazy=True,
+                           cascade='all, delete-orphan', order_by='FavoriteCast.cast_order')
+    # A movie is favorited at most once per user. The other indexes serve the
+    # /favorites sort orders, each ending in id as the keyset tie-breaker, so
+    # every page is a bounded index range scan.
+    __table_args__ = (
+        db.Index('ix_favorite_user_movie', 'user_id', 'movie_id', unique=True),
+        db.Index('ix_favorite_user_added', 'user_id', 'id'),
+        db.Index('ix_favorite_user_title', 'user_id', 'movie_title', 'id'),
+        db.Index('ix_favorite_user_rating', 'user_id', 'movie_rating', 'id'),
+        db.Index('ix_favorite_user_release', 'user_id', 'movie_release_date', 'id'),
+    )
+
+
+class FavoriteGenre(db.Model):
+    favorite_id = db.Column(db.Integer, db.ForeignKey('favorite.id', ondelete='CASCADE'),
+                            primary_key=True)
+    genre_id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    name = db.Column(db.String(100), nullable=False)
+    __table_args__ = (db.Index('ix_favorite_genre_user_name', 'user_id', 'name'),)
+
+
+class FavoriteCast(db.Model):
+    favorite_id = db.Column(db.Integer, db.ForeignKey('favorite.id', ondelete='CASCADE'),
+                            primary_key=True)
+    cast_order = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    person_id = db.Column(db.Integer)
+    name = db.Column(db.String(255), nullable=False)
+    __table_args__ = (db.Index('ix_favorite_cast_user_name', 'user_id', 'name'),)
+
+
+class MovieNeighbour(db.Model):
+    movie_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    rank = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    neighbour_id = db.Column(db.Integer, nullable=False)
+    score = db.Column(db.Float, nullable=False)
+    users = db.Column(db.Integer, nullable=False)
+    title = db.Column(db.String(255), nullable=False)
+    poster_path = db.Column(db.String(255))
+    release_date = db.Column(db.String(255))
+    vote_average = db.Column(db.Float)
+
+
+class RecommendationList(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True, autoincrement=False)
+    computed_at = db.Column(db.DateTime, nullable=False, index=True)
+    anchor_title = db.Column(db.String(255))
+
+
+class RecommendedMovie(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey('recommendation_list.user_id', ondelete='CASCADE'),
+                        primary_key=True)
+    section = db.Column(db.String(20), primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    movie_id = db.Column(db.Integer, nullable=False)
+    title = db.Column(db.String(255), nullable=False)
+    poster_path = db.Column(db.String(255))
+    release_date = db.Column(db.String(255))
+    vote_average = db.Column(db.Float)
+
+
+class TitleLookup(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    title = db.Column(db.String(255), unique=True, nullable=False, index=True)
+    movie_id = db.Column(db.Integer, nullable=False)
+
+
+class Movie(db.Model):
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    title = db.Column(db.String(255), nullable=False)
+    original_title = db.Column(db.String(255))
+    release_date = db.Column(db.String(10), index=True)
+    poster_path = db.Column(db.String(255))
+    overview = db.Column(db.Text)
+    vote_average = db.Column(db.Float)
+    vote_count = db.Column(db.Integer)
+    popularity = db.Column(db.Float, index=True)
+    runtime = db.Column(db.Integer)
+    adult = db.Column(db.Boolean, nullable=False, default=False)
+    detailed = db.Column(db.Boolean, nullable=False, default=False)
+    genres = db.relationship('Genre', secondary='movie_genre', lazy=True)
+    cast = db.relationship('MovieCast', backref='movie', lazy=True,
+                           order_by='MovieCast.cast_order')
+
+
+class CatalogIngest(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    finished_at = db.Column(db.DateTime, nullable=False)
+    movies = db.Column(db.Integer, nullable=False)
+
+
+class Genre(db.Model):
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    name = db.Column(db.String(100), nullable=False)
+
+
+class MovieGenre(db.Model):
+    movie_id = db.Column(db.Integer, db.ForeignKey('movie.id'), primary_key=True)
+    genre_id = db.Column(db.Integer, db.ForeignKey('genre.id'), primary_key=True, index=True)
+
+
+class MovieCast(db.Model):
+    movie_id = db.Column(db.Integer, db.ForeignKey('movie.id'), primary_key=True)
+    cast_order = db.Column(db.Integer, primary_key=True)
+    person_id = db.Column(db.Integer, index=True)
+    name = db.Column(db.String(255), nullable=False, index=True)
+    character = db.Column(db.String(255))
@@ -0,0 +1,159 @@
+import logging
+import time
+from array import array
+
+import click
+import numpy as np
+from flask.cli import AppGroup
+from scipy import sparse
+from sqlalchemy import func
+from sqlalchemy.exc import OperationalError
+
+try:
+    from models import db, dialect_insert, Favorite, MovieNeighbour
+except ModuleNotFoundError:
+    from src.models import db, dialect_insert, Favorite, MovieNeighbour
+
+logger = logging.getLogger(__name__)
+
+TOP_N = 20
+MIN_USERS = 2
+READ_CHUNK = 50000
+MOVIE_CHUNK = 1000
+
+neighbours_cli = AppGroup('neighbours', help='Build "also vaulted" movie neighbours.')
+
+
+def favorite_matrix(chunk_size=READ_CHUNK):
+    """
+    Streams Favorite(user_id, movie_id) in keyset-paginated chunks into a
+    binary users x movies CSR matrix. Duplicate favorites count once.
+
+    Returns:
+        (matrix, movie_ids), where movie_ids maps column numbers to movie IDs.
+    """
+    users, movies = {}, {}
+    rows, columns = array('q'), array('q')
+    last_id = 0
+    while True:
+        chunk = (db.session.query(Favorite.id, Favorite.user_id, Favorite.movie_id)
+                 .filter(Favorite.id > last_id).order_by(Favorite.id).limit(chunk_size).all())
+        if not chunk:
+            break
+        for _, user_id, movie_id in chunk:
+            rows.append(users.setdefault(user_id, len(users)))
+            columns.append(movies.setdefault(movie_id, len(movies)))
+        last_id = chunk[-1][0]
+
+    matrix = sparse.csr_matrix((np.ones(len(rows), dtype=np.float32),
+                                (np.frombuffer(rows, dtype=np.int64),
+                                 np.frombuffer(columns, dtype=np.int64))),
+                               shape=(len(users), len(movies)))
+    matrix.data[:] = 1
+    movie_ids = np.empty(len(movies), dtype=np.int64)
+    for movie_id, column in movies.items():
+        movie_ids[column] = movie_id
+    return matrix, movie_ids
+
+
+def top_neighbours(matrix, top_n=TOP_N, min_users=MIN_USERS, chunk_size=MOVIE_CHUNK):
+    """
+    Computes each movie's top_n most similar movies by cosine similarity of
+    their user columns, ignoring pairs favorited together by fewer than
+    min_users users.
+
+    Co-occurrence counts are computed a chunk of movies at a time as a sparse
+    product of the chunk's rows of the transposed matrix with the matrix, so
+    memory is bounded by the chunk's co-occurrences rather than movies
+    squared, and nothing is densified.
+
+    Yields:
+        (column, [(neighbour_column, score, users), ...]) best first, for each
+        movie with at least one neighbour.
+    """
+    by_movie = matrix.T.tocsr()
+    counts = np.asarray(by_movie.sum(axis=1)).ravel()
+    for start in range(0, by_movie.shape[0], chunk_size):
+        co_counts = (by_movie[start:start + chunk_size] @ matrix).tocsr()
+        for offset in range(co_counts.shape[0]):
+            column = start + offset
+            lo, hi = co_counts.indptr[offset], co_counts.indptr[offset + 1]
+            others = co_counts.indices[lo:hi]
+            together = co_counts.data[lo:hi]
+            keep = (others != column) & (together >= min_users)
+            if not keep.any():
+                continue
+            others, together = others[keep], together[keep]
+            scores = together / np.sqrt(counts[column] * counts[others])
+            if len(scores) > top_n:
+                best = np.argpartition(-scores, top_n - 1)[:top_n]
+            else:
+                best = np.arange(len(scores))
+            best = best[np.lexsort((others[best], -scores[best]))]
+            yield column, [(int(others[i]), float(scores[i]), int(together[i])) for i in best]
+
+
+def movie_details():
+    """
+    Returns display details for every favorited movie, from its most recent
+    Favorite row.
+    """
+    latest = db.session.query(func.max(Favorite.id)).group_by(Favorite.movie_id)
+    rows = (db.session.query(Favorite.movie_id, Favorite.movie_title, Favorite.movie_poster,
+                             Favorite.movie_release_date, Favorite.movie_rating)
+            .filter(Favorite.id.in_(latest)))
+    return {row[0]: row[1:] for row in rows}
+
+
+@neighbours_cli.command('build')
+@click.option('--top-n', default=TOP_N, show_default=True, help='Neighbours kept per movie.')
+@click.option('--min-users', default=MIN_USERS, show_default=True,
+              help='Users who must have favorited both movies.')
+@click.option('--chunk-size', default=MOVIE_CHUNK, show_default=True,
+              help='Movies multiplied per sparse product.')
+def build_command(top_n, min_users, chunk_size):
+    """Rebuild the movie neighbour table from every user's favorites."""
+    db.create_all()
+    started = time.perf_counter()
+    matrix, movie_ids = favorite_matrix()
+    details = movie_details()
+
+    db.session.execute(db.delete(MovieNeighbour))
+    insert = dialect_insert(MovieNeighbour)
+    batch = []
+    movies = 0
+    for column, neighbours in top_neighbours(matrix, top_n, min_users, chunk_size):
+        movies += 1
+        for rank, (other, score, users) in enumerate(neighbours):
+            neighbour_id = int(movie_ids[other])
+            title, poster_path, release_date, vote_average = details[neighbour_id]
+            batch.append({'movie_id': int(movie_ids[column]), 'rank': rank,
+                          'neighbour_id': neighbour_id, 'score': score, 'users': users,
+                          'title': title, 'poster_path': poster_path,
+                          'release_date': release_date, 'vote_average': vote_average})
+        if len(batch) >= READ_CHUNK:
+            db.session.execute(insert, batch)
+            batch = []
+    if batch:
+        db.session.execute(insert, batch)
+    db.session.commit()
+    click.echo(f"Stored neighbours for {movies} of {len(movie_ids)} movies from "
+               f"{matrix.shape[0]} users in {time.perf_counter() - started:.1f}s")
+
+
+def also_vaulted(movie_id, exclude=(), limit=TOP_N):
+    """
+    Returns the movies most often favorited by users who favorited movie_id,
+    in the shape of TMDb list results, leaving out excluded IDs. Reads the
+    neighbour table's primary key range for movie_id only.
+    """
+    try:
+        rows = (MovieNeighbour.query.filter_by(movie_id=movie_id)
+                .order_by(MovieNeighbour.rank).all())
+    except OperationalError as error:
+        db.session.rollback()
+        logger.warning("Neighbour lookup failed: %r", error)
+        return []
+    return [{'id': row.neighbour_id, 'title': row.title, 'poster_path': row.poster_path,
+             'release_date': row.release_date or '', 'vote_average': row.vote_average}
+            for row in rows if row.neighbour_id not in exclude][:limit]
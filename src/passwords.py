@@ -0,0 +1,149 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, generate_password_hash, check_password_hash
+
+logger = logging.getLogger(__name__)
+
+# werkzeug method string: 'scrypt:N:r:p' or 'pbkdf2:<hash>:<iterations>'.
+DEFAULT_METHOD = 'scrypt:32768:8:1'
+DEFAULT_WORKERS = 2
+DEFAULT_CONCURRENCY = 8
+DEFAULT_WAIT = 5
+
+
+class PasswordHasherBusy(Exception):
+    """
+    Raised when no hashing slot frees up within the hasher's wait.
+    """
+
+
+def canonical_method(method):
+    """
+    Returns the method string werkzeug records in a hash made with method,
+    with the defaults it fills in spelled out, e.g. 'pbkdf2' becomes
+    'pbkdf2:sha256:600000'.
+    """
+    name, *args = method.split(':')
+    if name == 'scrypt' and not args:
+        args = ['32768', '8', '1']
+    elif name == 'pbkdf2':
+        args = args or ['sha256']
+        if len(args) == 1:
+            args.append(str(DEFAULT_PBKDF2_ITERATIONS))
+    elif name != 'scrypt':
+        raise ValueError(f"Unsupported password hash method {method!r}")
+    return ':'.join([name, *args])
+
+
+class PasswordHasher:
+    """
+    Hashes and checks passwords on a small process pool, so the CPU a login
+    burst costs is spent there instead of in the web worker, and bounds how
+    many hashes each worker runs or queues at once.
+
+    The pool is created on first use and re-created after a fork, like the
+    shared thread pool in executor.py.
+
+    Args:
+        method (str): werkzeug method (algorithm and cost) for new hashes.
+        workers (int): Pool processes; 0 hashes on the request thread.
+        concurrency (int): Most hashes running or queued at once; callers
+            beyond it wait for a slot.
+        wait (float): Seconds to wait for a slot before raising
+            PasswordHasherBusy.
+    """
+
+    def __init__(self, method=DEFAULT_METHOD, workers=DEFAULT_WORKERS,
+                 concurrency=DEFAULT_CONCURRENCY, wait=DEFAULT_WAIT):
+        self._lock = threading.Lock()
+        self._pool = None
+        self._slots = None
+        self._pid = None
+        self.configure(method, workers, concurrency, wait)
+
+    def configure(self, method=None, workers=None, concurrency=None, wait=None):
+        """
+        Changes any of the settings; a running pool is shut down so the next
+        hash starts one with the new size.
+        """
+        if method is not None:
+            canonical_method(method)
+            self.method = method
+        if workers is not None:
+            self.workers = workers
+        if concurrency is not None:
+            self.concurrency = concurrency
+        if wait is not None:
+            self.wait = wait
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            if self._pool is not None and self._pid == os.getpid():
+                # cancel_futures needs Python 3.9+, which CI and runtime.txt run
+                self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+            self._slots = None
+            self._pid = None
+
+    def _state(self):
+        pid = os.getpid()
+        if self._slots is None or self._pid != pid:
+            with self._lock:
+                if self._slots is None or self._pid != pid:
+                    self._pool = None
+                    if self.workers > 0:
+                        # A forkserver child starts from a clean process, not
+                        # a copy of this one with its threads and connections.
+                        start = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() \
+                            else 'spawn'
+                        self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                         mp_context=multiprocessing.get_context(start))
+                    self._slots = threading.BoundedSemaphore(self.concurrency)
+                    self._pid = pid
+        return self._pool, self._slots
+
+    def _run(self, fn, *args):
+        pool, slots = self._state()
+        if not slots.acquire(timeout=self.wait):
+            raise PasswordHasherBusy()
+        try:
+            if pool is None:
+                return fn(*args)
+            try:
+                return pool.submit(fn, *args).result()
+            except BrokenProcessPool:
+                logger.warning("Password hashing pool broke; restarting it")
+                self.reset()
+                return fn(*args)
+        finally:
+            slots.release()
+
+    def hash(self, password):
+        """
+        Returns a new salted hash of password made with the configured method.
+        """
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, stored_hash, password):
+        """
+        Returns whether password matches stored_hash, whichever method made it.
+        """
+        if not stored_hash or password is None:
+            return False
+        return self._run(check_password_hash, stored_hash, password)
+
+    def needs_rehash(self, stored_hash):
+        """
+        Returns whether stored_hash was made with a method or cost other than
+        the configured one.
+        """
+        return stored_hash.partition('$')[0] != canonical_method(self.method)
+
+
+hasher = PasswordHasher()
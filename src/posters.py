@@ -0,0 +1,369 @@
+import hashlib
+import io
+import logging
+import os
+import re
+import threading
+import time
+
+import requests
+from markupsafe import Markup, escape
+
+logger = logging.getLogger(__name__)
+
+ORIGIN = os.getenv('POSTER_ORIGIN', 'https://image.tmdb.org/t/p')
+# The TMDb size fetched from the origin and kept as each poster's original;
+# every smaller variant is resized from it.
+SOURCE_SIZE = 'w780'
+# Variant widths, named like TMDb's own sizes so a /poster/ URL reads the
+# same as the image.tmdb.org URL it replaces.
+WIDTHS = (92, 154, 185, 342, 500, 780)
+SIZES = frozenset(f'w{width}' for width in WIDTHS)
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+MAX_AGE = 365 * 86400
+JPEG_QUALITY = 85
+
+MIMETYPES = {'jpg': 'image/jpeg', 'jpeg': 'image/jpeg', 'png': 'image/png', 'webp': 'image/webp'}
+_POSTER_PATH = re.compile(r'^[A-Za-z0-9_-]+\.(jpg|jpeg|png|webp)$')
+
+# An entry is re-stamped as recently used at most this often, so a popular
+# poster doesn't cost a metadata write per request.
+TOUCH_INTERVAL = 60
+# Eviction deletes down to this share of max_bytes, so it runs once per
+# batch of writes instead of once per write.
+LOW_WATER = 0.9
+
+
+class PosterNotFound(Exception):
+    """
+    Raised for a poster the origin doesn't have.
+    """
+
+
+class PosterOriginError(Exception):
+    """
+    Raised when the origin can't be reached or answers with an error.
+    """
+
+
+def is_poster_path(path):
+    """
+    Tells whether path looks like a TMDb image file name such as
+    'kqjL17yufvn9OVLyXYpvtyrFfak.jpg', which is all the proxy serves.
+    """
+    return bool(path) and _POSTER_PATH.match(path) is not None
+
+
+def mimetype_for(path):
+    return MIMETYPES[path.rsplit('.', 1)[1].lower()]
+
+
+class DiskCache:
+    """
+    Size-bounded cache of files on local disk, shared by every worker on the
+    host.
+
+    Entries live under two levels of shard directories taken from the hash of
+    their key, so no directory grows past a few thousand files. Writes go to
+    a temporary file that is renamed into place, so a reader never sees a
+    partial file. Each entry's mtime records when it was last used; once the
+    cache outgrows max_bytes, the least recently used entries are deleted.
+
+    Workers share the directory but not their bookkeeping: each worker counts
+    the bytes it writes, and when its estimate passes max_bytes it rescans
+    the directory for the true total before evicting anything.
+
+    Args:
+        directory (str): Where entries are stored; created on first write.
+        max_bytes (int): Upper bound on the summed size of stored files.
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self._estimate = None
+        self._lock = threading.Lock()
+
+    def path_for(self, key):
+        digest = hashlib.sha1(key.encode()).hexdigest()
+        extension = key.rsplit('.', 1)[1]
+        return os.path.join(self.directory, digest[:2], digest[2:4], f'{digest}.{extension}')
+
+    def get(self, key):
+        """
+        Returns the file path of a stored entry, marking it recently used, or
+        None if the key is missing.
+        """
+        path = self.path_for(key)
+        try:
+            used_at = os.stat(path).st_mtime
+            if time.time() - used_at > TOUCH_INTERVAL:
+                os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def set(self, key, data):
+        """
+        Stores data for key and returns its file path, evicting the least
+        recently used entries if the cache has outgrown max_bytes.
+        """
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temporary, 'wb') as file:
+            file.write(data)
+        os.replace(temporary, path)
+
+        with self._lock:
+            if self._estimate is None:
+                self._estimate = self.size()
+            else:
+                self._estimate += len(data)
+            if self._estimate > self.max_bytes:
+                self._estimate = self.evict()
+        return path
+
+    def entries(self):
+        """
+        Yields (mtime, size, path) for every stored file.
+        """
+        if not os.path.isdir(self.directory):
+            return
+        for outer in os.scandir(self.directory):
+            if not outer.is_dir():
+                continue
+            for inner in os.scandir(outer.path):
+                if not inner.is_dir():
+                    continue
+                for entry in os.scandir(inner.path):
+                    if entry.name.endswith('.tmp'):
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    yield stat.st_mtime, stat.st_size, entry.path
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        """
+        Deletes the least recently used entries until the cache is within
+        LOW_WATER of max_bytes.
+
+        Returns:
+            The bytes left in the cache.
+        """
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * LOW_WATER
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            self.evictions += 1
+        return total
+
+
+def resize(data, width, path):
+    """
+    Scales an image down to width pixels wide, keeping its aspect ratio, and
+    re-encodes it in its own format. Pillow is imported here, so only
+    processes that resize pay for it.
+    """
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as image:
+        height = max(1, round(image.height * width / image.width))
+        resized = image.resize((width, height), Image.LANCZOS)
+        output = io.BytesIO()
+        extension = path.rsplit('.', 1)[1].lower()
+        if extension in ('jpg', 'jpeg'):
+            resized.convert('RGB').save(output, 'JPEG', quality=JPEG_QUALITY, optimize=True,
+                                        progressive=True)
+        elif extension == 'webp':
+            resized.save(output, 'WEBP', quality=JPEG_QUALITY)
+        else:
+            resized.save(output, 'PNG', optimize=True)
+        return output.getvalue()
+
+
+class PosterStore:
+    """
+    Serves TMDb posters from the local disk cache at the sizes the pages
+    display them.
+
+    The first request for a poster fetches its SOURCE_SIZE rendition from
+    the origin once and keeps it as the original; each smaller size is
+    resized from that original on first request and kept alongside it.
+    Concurrent first requests for the same file within a worker wait for one
+    fetch or resize rather than each doing their own.
+
+    Files are served with a strong ETag of their content, which is computed
+    once per file per worker.
+
+    Args:
+        directory (str): The disk cache directory.
+        max_bytes (int): Size bound of the disk cache.
+        origin (str): Image root the posters are fetched from.
+        timeout (float): Seconds to wait on the origin.
+    """
+
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES, origin=ORIGIN, timeout=10.0):
+        self.cache = DiskCache(directory, max_bytes)
+        self.origin = origin.rstrip('/')
+        self.timeout = timeout
+        self._etags = {}
+        self._session = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._key_locks = [threading.Lock() for _ in range(64)]
+
+    def configure(self, directory=None, max_bytes=None, origin=None):
+        if directory is not None:
+            self.cache.directory = directory
+        if max_bytes is not None:
+            self.cache.max_bytes = max_bytes
+        if origin is not None:
+            self.origin = origin.rstrip('/')
+        self._etags.clear()
+
+    @property
+    def session(self):
+        pid = os.getpid()
+        if self._session is None or self._pid != pid:
+            with self._lock:
+                if self._session is None or self._pid != pid:
+                    self._session = requests.Session()
+                    self._pid = pid
+        return self._session
+
+    def fetch_original(self, path):
+        """
+        Downloads a poster's SOURCE_SIZE rendition from the origin.
+
+        Raises:
+            PosterNotFound: The origin has no such poster.
+            PosterOriginError: The origin failed or could not be reached.
+        """
+        url = f'{self.origin}/{SOURCE_SIZE}/{path}'
+        try:
+            response = self.session.get(url, timeout=self.timeout)
+        except requests.RequestException as error:
+            raise PosterOriginError(f'{url}: {error!r}') from error
+        if response.status_code == 404:
+            raise PosterNotFound(url)
+        if response.status_code != 200:
+            raise PosterOriginError(f'{url}: HTTP {response.status_code}')
+        return response.content
+
+    def original(self, path):
+        """
+        Returns the file path of a poster's original, fetching it on a miss.
+        """
+        key = f'{SOURCE_SIZE}/{path}'
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        with self._key_lock(key):
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+            return self.cache.set(key, self.fetch_original(path))
+
+    def variant(self, size, path):
+        """
+        Returns the file path of a poster at size ('w92' to 'w780'),
+        fetching and resizing as needed.
+
+        Raises:
+            PosterNotFound: The origin has no such poster.
+            PosterOriginError: The origin failed or could not be reached.
+        """
+        if size == SOURCE_SIZE:
+            return self.original(path)
+        key = f'{size}/{path}'
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        source = self.original(path)
+        with self._key_lock(key):
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+            with open(source, 'rb') as file:
+                data = file.read()
+            width = int(size[1:])
+            try:
+                data = resize(data, width, path)
+            except (OSError, ValueError) as error:
+                # Serve the original rather than fail the page
+                logger.warning("Could not resize %s to %s: %r", path, size, error)
+                return source
+            return self.cache.set(key, data)
+
+    def etag(self, filename):
+        """
+        Returns the strong ETag for a cached file: a hash of its content.
+        """
+        etag = self._etags.get(filename)
+        if etag is None:
+            with open(filename, 'rb') as file:
+                etag = hashlib.blake2b(file.read(), digest_size=16).hexdigest()
+            if len(self._etags) > 100000:
+                self._etags.clear()
+            self._etags[filename] = etag
+        return etag
+
+    def _key_lock(self, key):
+        return self._key_locks[hash(key) % len(self._key_locks)]
+
+
+store = PosterStore()
+
+
+def source_width(width):
+    """
+    Returns the smallest variant width that covers width CSS pixels.
+    """
+    for candidate in WIDTHS:
+        if candidate >= width:
+            return candidate
+    return WIDTHS[-1]
+
+
+def poster_attrs(poster_path, width, proxy=True):
+    """
+    Renders the src, srcset and sizes attributes of an <img> for a poster
+    shown width CSS pixels wide, so browsers download the smallest variant
+    that is sharp at their pixel density rather than the full w500 image.
+
+    Args:
+        poster_path (str): TMDb poster path, e.g. '/kqjL17yufvn9OVLyXYpvtyrFfak.jpg'.
+        width (int): Displayed width in CSS pixels.
+        proxy (bool): Point at the /poster/ proxy rather than image.tmdb.org.
+
+    Returns:
+        The attributes as Markup; empty if there is no poster.
+    """
+    if not poster_path:
+        return Markup('')
+    path = poster_path.lstrip('/')
+    if proxy:
+        from flask import url_for
+
+        def url(w):
+            return url_for('poster', size=f'w{w}', path=path)
+    else:
+        def url(w):
+            return f'{store.origin}/w{w}/{path}'
+
+    srcset = ', '.join(f'{escape(url(w))} {w}w' for w in WIDTHS)
+    return Markup(f'src="{escape(url(source_width(width)))}" srcset="{srcset}" sizes="{width}px"')
@@ -0,0 +1,255 @@
+import asyncio
+import contextlib
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+
+# Priority lanes, highest first
+INTERACTIVE = 'interactive'
+PREFETCH = 'prefetch'
+BULK = 'bulk'
+LANES = (INTERACTIVE, PREFETCH, BULK)
+
+DEFAULT_RATE = 40
+DEFAULT_BURST = 20
+DEFAULT_WAIT = 5
+
+_lane = contextvars.ContextVar('tmdb_lane', default=INTERACTIVE)
+
+
+def current_lane():
+    """
+    Returns the lane TMDb calls made here are scheduled in: INTERACTIVE
+    unless an enclosing lane() block says otherwise.
+    """
+    return _lane.get()
+
+
+@contextlib.contextmanager
+def lane(name):
+    """
+    Schedules the TMDb calls made inside the block in the named lane, e.g.
+    `with lane(BULK):` around a batch job.
+    """
+    if name not in LANES:
+        raise ValueError(f"Unknown lane {name!r}")
+    token = _lane.set(name)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+
+class _Ticket:
+    __slots__ = ('lane', 'queued_at')
+
+    def __init__(self, lane):
+        self.lane = lane
+        self.queued_at = time.monotonic()
+
+
+class Scheduler:
+    """
+    Token bucket that paces every TMDb call a worker makes, handing tokens
+    out by priority lane.
+
+    The bucket holds up to burst tokens and refills at rate tokens a second.
+    Callers queue in their lane and a token goes to the longest-waiting
+    caller of the highest lane with anyone waiting, so page fetches
+    (INTERACTIVE) go ahead of background refreshes (PREFETCH), which go
+    ahead of batch jobs (BULK). While TMDb has asked us to back off with a
+    429 and Retry-After, no tokens are handed out at all.
+
+    Queue depth, grants, timeouts and time spent waiting are counted per
+    lane (see stats()).
+
+    Queues and locks are re-created after a fork: callers waiting in the
+    parent do not exist in the child.
+
+    Args:
+        rate (float): Tokens added a second; this worker's share of the
+            TMDb quota.
+        burst (int): Most tokens the bucket holds.
+        wait (float): Seconds an INTERACTIVE or PREFETCH caller waits for a
+            token before giving up; BULK callers wait as long as it takes.
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST, wait=DEFAULT_WAIT):
+        self.rate = rate
+        self.burst = burst
+        self.wait = wait
+        self._pid = None
+        self._reset()
+
+    @classmethod
+    def from_env(cls):
+        """
+        Builds a scheduler from TMDB_RATE_LIMIT, TMDB_RATE_BURST and
+        TMDB_RATE_WAIT, or returns None if TMDB_RATE_LIMIT is 0.
+        """
+        rate = float(os.getenv('TMDB_RATE_LIMIT', DEFAULT_RATE))
+        if rate <= 0:
+            return None
+        return cls(rate=rate, burst=int(os.getenv('TMDB_RATE_BURST', DEFAULT_BURST)),
+                   wait=float(os.getenv('TMDB_RATE_WAIT', DEFAULT_WAIT)))
+
+    def _reset(self):
+        self._condition = threading.Condition()
+        self._queues = {name: deque() for name in LANES}
+        self._tokens = float(self.burst)
+        self._refilled_at = time.monotonic()
+        self._paused_until = 0.0
+        self._counters = {name: {'granted': 0, 'timeouts': 0, 'wait_seconds': 0.0, 'max_wait_seconds': 0.0}
+                          for name in LANES}
+        self._pid = os.getpid()
+
+    def _check_pid(self):
+        if self._pid != os.getpid():
+            self._reset()
+
+    def timeout_for(self, name):
+        return None if name == BULK else self.wait
+
+    def acquire(self, name=None, timeout=None):
+        """
+        Blocks until a token is handed to this caller.
+
+        Args:
+            name (str): The lane, by default current_lane().
+            timeout (float): Seconds to wait; by default the lane's wait.
+
+        Returns:
+            True once a token is taken, False if the timeout expired first.
+        """
+        name = name or current_lane()
+        timeout = self.timeout_for(name) if timeout is None else timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+        self._check_pid()
+        with self._condition:
+            ticket = self._enqueue(name)
+            while True:
+                delay = self._try_take(ticket)
+                if delay == 0:
+                    return True
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._abandon(ticket)
+                        return False
+                    delay = min(delay, remaining)
+                self._condition.wait(delay)
+
+    async def acquire_async(self, name=None, timeout=None):
+        """
+        The asyncio version of acquire: waits for a token without blocking
+        the event loop. Waiting callers of both kinds share the same queues.
+        """
+        name = name or current_lane()
+        timeout = self.timeout_for(name) if timeout is None else timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+        self._check_pid()
+        with self._condition:
+            ticket = self._enqueue(name)
+        granted = False
+        try:
+            while True:
+                with self._condition:
+                    delay = self._try_take(ticket)
+                if delay == 0:
+                    granted = True
+                    return True
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    delay = min(delay, remaining)
+                await asyncio.sleep(delay)
+        finally:
+            if not granted:
+                with self._condition:
+                    self._abandon(ticket)
+
+    def pause(self, seconds):
+        """
+        Hands out no tokens for the next seconds, e.g. for a 429's
+        Retry-After, and empties the bucket so calls resume at the steady
+        rate rather than in a burst.
+        """
+        self._check_pid()
+        with self._condition:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+            self._refilled_at = self._paused_until
+
+    def stats(self):
+        """
+        Returns the queue depth and wait counters of each lane, and the
+        bucket's state.
+        """
+        self._check_pid()
+        with self._condition:
+            self._refill(time.monotonic())
+            lanes = {}
+            for name in LANES:
+                counters = self._counters[name]
+                lanes[name] = dict(counters, queued=len(self._queues[name]),
+                                   wait_seconds=round(counters['wait_seconds'], 4),
+                                   max_wait_seconds=round(counters['max_wait_seconds'], 4))
+            return {
+                'rate': self.rate,
+                'burst': self.burst,
+                'tokens': round(self._tokens, 2),
+                'paused_for': round(max(0.0, self._paused_until - time.monotonic()), 2),
+                'lanes': lanes,
+            }
+
+    def _enqueue(self, name):
+        ticket = _Ticket(name)
+        self._queues[name].append(ticket)
+        return ticket
+
+    def _abandon(self, ticket):
+        queue = self._queues[ticket.lane]
+        if ticket in queue:
+            queue.remove(ticket)
+            self._counters[ticket.lane]['timeouts'] += 1
+            # The next caller in line may be able to go now
+            self._condition.notify_all()
+
+    def _refill(self, now):
+        if now > self._refilled_at:
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+            self._refilled_at = now
+
+    def _try_take(self, ticket):
+        """
+        Takes a token for ticket if it is first in line and one is
+        available. Returns 0 if it did, else how long to wait before trying
+        again.
+        """
+        now = time.monotonic()
+        if now < self._paused_until:
+            return self._paused_until - now
+        self._refill(now)
+        for name in LANES:
+            queue = self._queues[name]
+            if queue:
+                first = queue[0]
+                break
+        if first is not ticket:
+            # Woken by the grant that moves the line along, or retries then
+            return 1 / self.rate
+        if self._tokens < 1:
+            return (1 - self._tokens) / self.rate
+        self._tokens -= 1
+        self._queues[ticket.lane].popleft()
+        waited = now - ticket.queued_at
+        counters = self._counters[ticket.lane]
+        counters['granted'] += 1
+        counters['wait_seconds'] += waited
+        counters['max_wait_seconds'] = max(counters['max_wait_seconds'], waited)
+        # Let the next in line check for a token
+        self._condition.notify_all()
+        return 0
@@ -0,0 +1,153 @@
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+
+try:
+    from models import db, dialect_insert, RecommendationList, RecommendedMovie
+    import executor
+    import ratelimit
+except ModuleNotFoundError:
+    from src.models import db, dialect_insert, RecommendationList, RecommendedMovie
+    from src import executor
+    from src import ratelimit
+
+logger = logging.getLogger(__name__)
+
+SECTIONS = ('top_picks', 'genre', 'actor', 'also_vaulted')
+
+_lock = threading.Condition()
+_running = set()
+_dirty = set()
+
+
+def utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def store(user_id, lists):
+    """
+    Replaces a user's materialized recommendation lists in one transaction.
+
+    Args:
+        lists (dict): Maps each name in SECTIONS to a list of movies in the
+            shape of TMDb list results, plus 'anchor_title', the title the
+            'also_vaulted' section is based on.
+    """
+    db.session.execute(db.delete(RecommendedMovie).where(RecommendedMovie.user_id == user_id))
+    insert = dialect_insert(RecommendationList)
+    row = {'user_id': user_id, 'computed_at': utcnow(),
+           'anchor_title': lists.get('anchor_title')}
+    db.session.execute(insert.on_conflict_do_update(
+        index_elements=['user_id'],
+        set_={'computed_at': insert.excluded.computed_at, 'anchor_title': insert.excluded.anchor_title}),
+        [row])
+    movies = [{
+        'user_id': user_id,
+        'section': section,
+        'rank': rank,
+        'movie_id': movie['id'],
+        'title': (movie.get('title') or '')[:255],
+        'poster_path': movie.get('poster_path'),
+        'release_date': movie.get('release_date') or '',
+        'vote_average': movie.get('vote_average'),
+    } for section in SECTIONS for rank, movie in enumerate(lists.get(section) or [])]
+    if movies:
+        db.session.execute(dialect_insert(RecommendedMovie), movies)
+    db.session.commit()
+
+
+def load(user_id):
+    """
+    Reads a user's materialized lists with one query over the primary key.
+
+    Returns:
+        A dict shaped like store()'s argument, plus 'computed_at'; or None if
+        the user's lists have never been computed.
+    """
+    rows = (db.session.query(RecommendationList.computed_at, RecommendationList.anchor_title,
+                             RecommendedMovie)
+            .outerjoin(RecommendedMovie, RecommendedMovie.user_id == RecommendationList.user_id)
+            .filter(RecommendationList.user_id == user_id)
+            .order_by(RecommendedMovie.section, RecommendedMovie.rank)
+            .all())
+    if not rows:
+        return None
+    lists = {section: [] for section in SECTIONS}
+    lists['computed_at'], lists['anchor_title'] = rows[0][0], rows[0][1]
+    for _, _, movie in rows:
+        if movie is not None:
+            lists[movie.section].append({
+                'id': movie.movie_id,
+                'title': movie.title,
+                'poster_path': movie.poster_path,
+                'release_date': movie.release_date or '',
+                'vote_average': movie.vote_average,
+            })
+    return lists
+
+
+def stale_users(max_age, batch_size=500):
+    """
+    Yields the IDs of users whose lists were computed more than max_age
+    seconds ago, in keyset-paginated batches.
+    """
+    cutoff = utcnow() - timedelta(seconds=max_age)
+    last_id = 0
+    while True:
+        batch = [row[0] for row in db.session.query(RecommendationList.user_id)
+                 .filter(RecommendationList.computed_at < cutoff, RecommendationList.user_id > last_id)
+                 .order_by(RecommendationList.user_id).limit(batch_size)]
+        if not batch:
+            return
+        yield from batch
+        last_id = batch[-1]
+
+
+def schedule(user_id, refresh):
+    """
+    Recomputes one user's lists in the background by calling refresh(user_id)
+    on the background pool, so recomputes never take the shared pool's
+    threads from page fetches.
+
+    Requests for a user whose refresh is already running are folded into a
+    single follow-up run, so a burst of vault changes costs at most two
+    recomputations and the last one always sees the final vault.
+    """
+    with _lock:
+        if user_id in _running:
+            _dirty.add(user_id)
+            return
+        _running.add(user_id)
+    try:
+        executor.submit_background(_run, user_id, refresh)
+    except RuntimeError:
+        with _lock:
+            _running.discard(user_id)
+            _lock.notify_all()
+
+
+def _run(user_id, refresh):
+    while True:
+        try:
+            with ratelimit.lane(ratelimit.PREFETCH):
+                refresh(user_id)
+        except Exception as error:
+            db.session.rollback()
+            logger.warning("Refreshing recommendations for user %s failed: %r", user_id, error)
+        with _lock:
+            if user_id not in _dirty:
+                _running.discard(user_id)
+                _lock.notify_all()
+                return
+            _dirty.discard(user_id)
+
+
+def wait(timeout=None):
+    """
+    Blocks until no refresh is running or the timeout expires.
+
+    Returns:
+        True if every refresh finished.
+    """
+    with _lock:
+        return _lock.wait_for(lambda: not _running, timeout=timeout)
@@ -0,0 +1,236 @@
+import logging
+import math
+
+import numpy as np
+from flask import current_app, has_app_context
+from scipy import sparse
+from sqlalchemy.exc import OperationalError
+
+try:
+    from models import db, Movie, MovieGenre, MovieCast, Favorite, FavoriteGenre, FavoriteCast
+    from snapshot import Snapshot
+    import catalog
+except ModuleNotFoundError:
+    from src.models import db, Movie, MovieGenre, MovieCast, Favorite, FavoriteGenre, FavoriteCast
+    from src.snapshot import Snapshot
+    from src import catalog
+
+logger = logging.getLogger(__name__)
+
+# Relative weight of each feature block in a user's profile.
+GENRE_WEIGHT = 1.0
+CAST_WEIGHT = 1.5
+ERA_WEIGHT = 0.5
+# Scales each candidate's log-popularity, normalized to [0, 1], as a tie-breaker.
+POPULARITY_WEIGHT = 0.05
+
+# Billed cast positions used as features for each candidate.
+CAST_FEATURES = 5
+DEFAULT_LIMIT = 20
+# Share of the results that may come from any one primary genre.
+MAX_GENRE_SHARE = 0.4
+
+
+def decade(release_date):
+    year = (release_date or '')[:4]
+    return int(year) // 10 * 10 if year.isdigit() else None
+
+
+class Ranker:
+    """
+    Content-based ranker over a fixed set of candidate movies.
+
+    Each candidate is a sparse row of genre, cast and era (release decade)
+    features, each block scaled to unit length so a long cast list does not
+    outweigh a short one. A user's favorites are folded into a profile vector
+    over the same features, and every candidate is scored with a single
+    sparse matrix-vector product.
+
+    Args:
+        movie_ids: Candidate movie IDs.
+        popularity: Candidate popularity, aligned with movie_ids.
+        release_dates: Candidate release dates, aligned with movie_ids.
+        genre_links: Iterable of (movie_id, genre_id).
+        cast_links: Iterable of (movie_id, person_id).
+    """
+
+    def __init__(self, movie_ids, popularity, release_dates, genre_links, cast_links):
+        self.movie_ids = np.asarray(movie_ids, dtype=np.int64)
+        self.row_of = {int(movie_id): row for row, movie_id in enumerate(self.movie_ids)}
+        count = len(self.movie_ids)
+
+        self.genre_columns = {}
+        self.person_columns = {}
+        self.decade_columns = {}
+        self.primary_genre = np.full(count, -1, dtype=np.int64)
+        rows, columns, blocks = [], [], []
+
+        for movie_id, genre_id in genre_links:
+            row = self.row_of.get(movie_id)
+            if row is None:
+                continue
+            column = self.genre_columns.setdefault(genre_id, len(self.genre_columns))
+            if self.primary_genre[row] < 0:
+                self.primary_genre[row] = genre_id
+            rows.append(row)
+            columns.append(column)
+            blocks.append(0)
+        for movie_id, person_id in cast_links:
+            row = self.row_of.get(movie_id)
+            if row is None:
+                continue
+            rows.append(row)
+            columns.append(self.person_columns.setdefault(person_id, len(self.person_columns)))
+            blocks.append(1)
+        for row, release_date in enumerate(release_dates):
+            era = decade(release_date)
+            if era is not None:
+                rows.append(row)
+                columns.append(self.decade_columns.setdefault(era, len(self.decade_columns)))
+                blocks.append(2)
+
+        offsets = np.array([0, len(self.genre_columns),
+                            len(self.genre_columns) + len(self.person_columns)], dtype=np.int64)
+        self.width = int(offsets[2]) + len(self.decade_columns)
+        rows = np.asarray(rows, dtype=np.int64)
+        blocks = np.asarray(blocks, dtype=np.int64)
+        columns = np.asarray(columns, dtype=np.int64) + offsets[blocks]
+
+        # Scale each (row, block) to unit length: 1 / sqrt(features in block).
+        per_block = np.bincount(rows * 3 + blocks, minlength=count * 3)
+        values = 1.0 / np.sqrt(per_block[rows * 3 + blocks])
+        self.features = sparse.csr_matrix((values.astype(np.float32), (rows, columns)),
+                                          shape=(count, self.width))
+        self.offsets = offsets
+
+        popularity = np.log1p(np.nan_to_num(np.asarray(popularity, dtype=np.float64)).clip(min=0))
+        peak = popularity.max() if count else 0.0
+        self.prior = (POPULARITY_WEIGHT * popularity / peak if peak > 0
+                      else np.zeros(count)).astype(np.float32)
+
+    def __len__(self):
+        return len(self.movie_ids)
+
+    def profile(self, genre_ids, person_ids, decades):
+        """
+        Builds a profile vector from the features of a user's favorites, one
+        list entry per occurrence. Each block is normalized to unit length and
+        weighted; features no candidate has are ignored.
+
+        Returns:
+            A dense float32 vector, or None if no feature is known.
+        """
+        vector = np.zeros(self.width, dtype=np.float32)
+        blocks = ((genre_ids, self.genre_columns, 0, GENRE_WEIGHT),
+                  (person_ids, self.person_columns, 1, CAST_WEIGHT),
+                  (decades, self.decade_columns, 2, ERA_WEIGHT))
+        for values, columns, block, weight in blocks:
+            known = [columns[value] for value in values if value in columns]
+            if not known:
+                continue
+            counts = np.bincount(known, minlength=len(columns)).astype(np.float32)
+            start = self.offsets[block]
+            vector[start:start + len(columns)] = weight * counts / np.linalg.norm(counts)
+        return vector if vector.any() else None
+
+    def rank(self, profile, exclude=(), limit=DEFAULT_LIMIT, max_genre_share=MAX_GENRE_SHARE):
+        """
+        Scores every candidate against a profile and returns the IDs of the
+        best limit movies, skipping excluded IDs.
+
+        Diversity: at most max_genre_share of the results may share a primary
+        genre. When that leaves the list short, the best skipped movies fill
+        it.
+        """
+        if profile is None or not len(self):
+            return []
+        scores = self.features @ profile
+        matched = scores > 0
+        scores = np.where(matched, scores + self.prior, -np.inf)
+        for movie_id in exclude:
+            row = self.row_of.get(movie_id)
+            if row is not None:
+                scores[row] = -np.inf
+
+        available = int(np.count_nonzero(np.isfinite(scores)))
+        pool = min(available, limit * 10)
+        if pool == 0:
+            return []
+        best = np.argpartition(-scores, pool - 1)[:pool]
+        best = best[np.argsort(-scores[best], kind='stable')]
+
+        cap = max(1, math.ceil(limit * max_genre_share))
+        per_genre = {}
+        picked, skipped = [], []
+        for row in best:
+            genre = int(self.primary_genre[row])
+            if genre >= 0 and per_genre.get(genre, 0) >= cap:
+                skipped.append(row)
+                continue
+            per_genre[genre] = per_genre.get(genre, 0) + 1
+            picked.append(row)
+            if len(picked) == limit:
+                break
+        picked.extend(skipped[:limit - len(picked)])
+        return [int(self.movie_ids[row]) for row in picked]
+
+
+def build_ranker():
+    """
+    Builds a Ranker over the most popular catalog movies that have posters,
+    up to RECOMMENDER_CANDIDATES of them.
+    """
+    limit = current_app.config.get('RECOMMENDER_CANDIDATES', 50000)
+    candidates = (db.session.query(Movie.id, Movie.popularity, Movie.release_date)
+                  .filter(Movie.poster_path.isnot(None))
+                  .order_by(Movie.popularity.desc()).limit(limit).subquery())
+    movies = db.session.query(candidates.c.id, candidates.c.popularity,
+                              candidates.c.release_date).all()
+    genre_links = (db.session.query(MovieGenre.movie_id, MovieGenre.genre_id)
+                   .join(candidates, candidates.c.id == MovieGenre.movie_id).all())
+    cast_links = (db.session.query(MovieCast.movie_id, MovieCast.person_id)
+                  .join(candidates, candidates.c.id == MovieCast.movie_id)
+                  .filter(MovieCast.cast_order < CAST_FEATURES, MovieCast.person_id.isnot(None))
+                  .order_by(MovieCast.movie_id, MovieCast.cast_order).all())
+    return Ranker([movie.id for movie in movies], [movie.popularity or 0.0 for movie in movies],
+                  [movie.release_date for movie in movies], genre_links, cast_links)
+
+
+model = Snapshot('recommendation model', build_ranker, 'RECOMMENDER_REBUILD_INTERVAL')
+
+
+def recommend(user_id, limit=DEFAULT_LIMIT):
+    """
+    Ranks catalog movies for a user from the genres, cast and release decades
+    of their favorites, excluding the favorites themselves.
+
+    Returns:
+        Up to limit movies in the shape of TMDb list results, best first; or
+        None when the model is not built yet or the catalog is too small, so
+        the caller falls back to TMDb.
+    """
+    if not has_app_context():
+        return None
+    model.ensure_fresh()
+    ranker = model.value
+    if ranker is None or not len(ranker):
+        return None
+    try:
+        if catalog.ingested_size() < current_app.config.get('CATALOG_MIN_ROWS', 1000):
+            return None
+        favorites = (db.session.query(Favorite.movie_id, Favorite.movie_release_date)
+                     .filter(Favorite.user_id == user_id).all())
+        genre_ids = [row[0] for row in db.session.query(FavoriteGenre.genre_id)
+                     .filter(FavoriteGenre.user_id == user_id)]
+        person_ids = [row[0] for row in db.session.query(FavoriteCast.person_id)
+                      .filter(FavoriteCast.user_id == user_id, FavoriteCast.person_id.isnot(None))]
+        profile = ranker.profile(genre_ids, person_ids,
+                                 [decade(favorite.movie_release_date) for favorite in favorites])
+        ids = ranker.rank(profile, exclude={favorite.movie_id for favorite in favorites},
+                          limit=limit)
+        movies = {movie.id: movie for movie in Movie.query.filter(Movie.id.in_(ids))} if ids else {}
+        return [catalog.list_payload(movies[movie_id]) for movie_id in ids if movie_id in movies]
+    except OperationalError as error:
+        db.session.rollback()
+        logger.warning("Ranking recommendations failed: %r", error)
+        return None
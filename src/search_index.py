@@ -0,0 +1,127 @@
+import re
+
+from sqlalchemy import DDL, bindparam, event, text
+
+try:
+    from models import db, Movie
+except ModuleNotFoundError:
+    from src.models import db, Movie
+
+TERM = re.compile(r'\w+', re.UNICODE)
+MAX_TERMS = 8
+
+# Column weights for ranking: a title hit outranks an original-title hit,
+# which outranks a cast-name hit.
+TITLE_WEIGHT = 10.0
+ORIGINAL_TITLE_WEIGHT = 5.0
+CAST_WEIGHT = 2.0
+
+SQLITE_CREATE = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS movie_search USING fts5("
+    "title, original_title, cast_names, tokenize = 'unicode61 remove_diacritics 2')",
+)
+POSTGRES_CREATE = (
+    "CREATE TABLE IF NOT EXISTS movie_search ("
+    "movie_id INTEGER PRIMARY KEY REFERENCES movie (id) ON DELETE CASCADE, "
+    "document TSVECTOR NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS ix_movie_search_document ON movie_search USING GIN (document)",
+)
+DROP = "DROP TABLE IF EXISTS movie_search"
+
+SQLITE_INDEX = text(
+    "INSERT INTO movie_search (rowid, title, original_title, cast_names) "
+    "SELECT m.id, m.title, coalesce(m.original_title, ''), "
+    "coalesce((SELECT group_concat(c.name, ' ') FROM movie_cast c WHERE c.movie_id = m.id), '') "
+    "FROM movie m WHERE m.id IN :ids"
+).bindparams(bindparam('ids', expanding=True))
+SQLITE_DELETE = text(
+    "DELETE FROM movie_search WHERE rowid IN :ids"
+).bindparams(bindparam('ids', expanding=True))
+SQLITE_MATCH = text(
+    "SELECT rowid FROM movie_search WHERE movie_search MATCH :query "
+    f"ORDER BY bm25(movie_search, {TITLE_WEIGHT}, {ORIGINAL_TITLE_WEIGHT}, {CAST_WEIGHT}) "
+    "LIMIT :limit"
+)
+
+POSTGRES_INDEX = text(
+    "INSERT INTO movie_search (movie_id, document) "
+    "SELECT m.id, "
+    "setweight(to_tsvector('simple', coalesce(m.title, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(m.original_title, '')), 'B') || "
+    "setweight(to_tsvector('simple', coalesce((SELECT string_agg(c.name, ' ') "
+    "FROM movie_cast c WHERE c.movie_id = m.id), '')), 'C') "
+    "FROM movie m WHERE m.id IN :ids "
+    "ON CONFLICT (movie_id) DO UPDATE SET document = excluded.document"
+).bindparams(bindparam('ids', expanding=True))
+POSTGRES_MATCH = text(
+    "SELECT s.movie_id FROM movie_search s, to_tsquery('simple', :query) q "
+    "WHERE s.document @@ q "
+    f"ORDER BY ts_rank_cd('{{0.0, {CAST_WEIGHT / 10}, {ORIGINAL_TITLE_WEIGHT / 10}, {TITLE_WEIGHT / 10}}}', "
+    "s.document, q) DESC "
+    "LIMIT :limit"
+)
+
+for statement in SQLITE_CREATE:
+    event.listen(Movie.__table__, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+for statement in POSTGRES_CREATE:
+    event.listen(Movie.__table__, 'after_create', DDL(statement).execute_if(dialect='postgresql'))
+event.listen(Movie.__table__, 'before_drop', DDL(DROP).execute_if(dialect=('sqlite', 'postgresql')))
+
+
+def dialect():
+    return db.session.get_bind().dialect.name
+
+
+def ensure_index():
+    """
+    Creates the search index for databases whose movie table predates it.
+    """
+    statements = {'sqlite': SQLITE_CREATE, 'postgresql': POSTGRES_CREATE}.get(dialect(), ())
+    for statement in statements:
+        db.session.execute(text(statement))
+
+
+def index_movies(movie_ids):
+    """
+    Re-indexes the given catalog movies from their current title, original
+    title and cast rows. Runs in the caller's transaction.
+    """
+    movie_ids = list(movie_ids)
+    if not movie_ids:
+        return
+    name = dialect()
+    if name == 'sqlite':
+        db.session.execute(SQLITE_DELETE, {'ids': movie_ids})
+        db.session.execute(SQLITE_INDEX, {'ids': movie_ids})
+    elif name == 'postgresql':
+        db.session.execute(POSTGRES_INDEX, {'ids': movie_ids})
+
+
+def terms(query):
+    """
+    Splits a free-text query into at most MAX_TERMS lower-cased word tokens.
+    Only word characters survive, so the result is safe to splice into an
+    FTS5 or tsquery expression.
+    """
+    return TERM.findall(query.lower())[:MAX_TERMS]
+
+
+def match_ids(query, limit=40):
+    """
+    Returns catalog movie IDs matching every term of the query as a prefix,
+    best match first: BM25 on SQLite, weighted ts_rank_cd on PostgreSQL.
+    Other databases have no index and always return an empty list.
+    """
+    words = terms(query)
+    if not words:
+        return []
+    name = dialect()
+    if name == 'sqlite':
+        expression = ' '.join(f'"{word}"*' for word in words)
+        rows = db.session.execute(SQLITE_MATCH, {'query': expression, 'limit': limit})
+    elif name == 'postgresql':
+        expression = ' & '.join(f'{word}:*' for word in words)
+        rows = db.session.execute(POSTGRES_MATCH, {'query': expression, 'limit': limit})
+    else:
+        return []
+    return [row[0] for row in rows]
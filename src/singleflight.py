@@ -0,0 +1,86 @@
+import os
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key within a process.
+
+    The first caller for a key (the leader) runs the function; callers that
+    arrive while it runs wait for it and get its result, or its exception
+    raised again. Once the call finishes the key is forgotten, so the next
+    caller runs the function afresh: this deduplicates work in flight and
+    caches nothing.
+
+    Results are shared between the callers of one flight, so they must be
+    treated as read-only.
+
+    Flights in progress at a fork belong to threads the child does not have,
+    so the child starts with none.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.followers = 0
+
+    def do(self, key, function):
+        """
+        Runs function() unless a call for key is already in flight, in
+        which case waits for that call and returns its outcome.
+        """
+        with self._lock:
+            if self._pid != os.getpid():
+                self._calls = {}
+                self._pid = os.getpid()
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                call.followers += 1
+                self.followers += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = function()
+            return call.result
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+            call.done.set()
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+    def waiting(self, key):
+        """
+        Returns how many callers are waiting on the call in flight for key.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            return call.followers if call is not None else 0
+
+    def stats(self):
+        with self._lock:
+            return {'leaders': self.leaders, 'followers': self.followers, 'in_flight': len(self._calls)}
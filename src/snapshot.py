@@ -0,0 +1,94 @@
+import logging
+import threading
+import time
+
+from flask import current_app, has_app_context
+from sqlalchemy.exc import SQLAlchemyError
+
+try:
+    from models import db
+    import executor
+except ModuleNotFoundError:
+    from src.models import db
+    from src import executor
+
+logger = logging.getLogger(__name__)
+
+RETRY_AFTER_FAILURE = 60
+
+
+class Snapshot:
+    """
+    A per-worker, read-only structure built from the database and replaced
+    wholesale when it gets old.
+
+    Readers use .value and never wait: a rebuild runs on the background pool,
+    outside any request's timings, and the new value is swapped in with a
+    single reference assignment once complete, so readers see either the old
+    value or the new one, never a partial build. At most one rebuild runs at a time, and a
+    failed build is retried after RETRY_AFTER_FAILURE seconds.
+
+    Args:
+        name (str): Used in log messages.
+        build (callable): Returns a new value; runs inside an app context.
+        interval_setting (str): App config key holding the rebuild interval
+            in seconds.
+        initial: The value served until the first build completes.
+    """
+
+    def __init__(self, name, build, interval_setting, initial=None, default_interval=3600):
+        self.name = name
+        self.build = build
+        self.interval_setting = interval_setting
+        self.default_interval = default_interval
+        self.value = initial
+        self.built_at = None
+        self.failed_at = None
+        self.building = threading.Lock()
+
+    def interval(self):
+        if has_app_context():
+            return current_app.config.get(self.interval_setting, self.default_interval)
+        return self.default_interval
+
+    def rebuild(self):
+        """
+        Builds a new value and swaps it in. Returns it, or None if the
+        database could not be read, e.g. a table is missing until its
+        migration runs.
+        """
+        started = time.perf_counter()
+        try:
+            value = self.build()
+        except SQLAlchemyError as error:
+            db.session.rollback()
+            self.failed_at = time.time()
+            logger.warning("Could not build the %s: %r", self.name, error)
+            return None
+        self.value = value
+        self.built_at = time.time()
+        logger.info("Built the %s in %.2fs", self.name, time.perf_counter() - started)
+        return value
+
+    def _rebuild_once(self):
+        try:
+            self.rebuild()
+        finally:
+            db.session.remove()
+            self.building.release()
+
+    def ensure_fresh(self):
+        """
+        Starts a background rebuild when there is no value yet or it is older
+        than the configured interval. The caller never waits for it.
+        """
+        now = time.time()
+        if self.built_at is not None and now - self.built_at < self.interval():
+            return
+        if self.failed_at is not None and now - self.failed_at < RETRY_AFTER_FAILURE:
+            return
+        if self.building.acquire(blocking=False):
+            try:
+                executor.submit_background(self._rebuild_once)
+            except RuntimeError:
+                self.building.release()
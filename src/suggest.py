@@ -0,0 +1,183 @@
+import heapq
+import re
+import unicodedata
+from array import array
+from bisect import bisect_left
+
+try:
+    from models import db, Movie
+    from snapshot import Snapshot
+except ModuleNotFoundError:
+    from src.models import db, Movie
+    from src.snapshot import Snapshot
+
+NON_ALNUM = re.compile(r'[\W_]+', re.UNICODE)
+ARTICLES = (b'the ', b'a ', b'an ')
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 20
+# Prefixes matching more than this many titles have their top MAX_LIMIT
+# completions precomputed; smaller ranges are cheap to rank per keystroke.
+HOT_RANGE = 1024
+# Sorts after any UTF-8 encoded key.
+MAX_BYTE = b'\xff'
+BUILD_BATCH_SIZE = 50000
+
+
+def normalize(text):
+    """
+    Folds a title or query for prefix matching: diacritics removed, case
+    folded and every run of punctuation or whitespace collapsed to one space.
+    """
+    text = text or ''
+    if not text.isascii():
+        decomposed = unicodedata.normalize('NFKD', text)
+        text = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return NON_ALNUM.sub(' ', text.casefold()).strip()
+
+
+class PackedStrings:
+    """
+    Read-only sequence of byte strings stored back to back in one bytes
+    object, with an array of offsets. Costs a few bytes per string instead
+    of a Python object per string.
+    """
+
+    def __init__(self, strings):
+        self.offsets = array('Q', [0])
+        parts = []
+        end = 0
+        for string in strings:
+            parts.append(string)
+            end += len(string)
+            self.offsets.append(end)
+        self.blob = b''.join(parts)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, position):
+        return self.blob[self.offsets[position]:self.offsets[position + 1]]
+
+
+class TitleIndex:
+    """
+    Immutable prefix index over movie titles, ranked by popularity.
+
+    Normalized titles are kept sorted, UTF-8 encoded, so the titles starting
+    with a prefix form a contiguous range found with two bisections (UTF-8
+    byte order is code point order). Titles with a leading article are also
+    indexed without it, so "dark kn" finds "The Dark Knight". Keys, titles and
+    movie data are packed into flat buffers rather than per-title objects to
+    keep a million titles compact.
+
+    Args:
+        entries: Iterable of (movie_id, title, release_date, popularity).
+    """
+
+    def __init__(self, entries=()):
+        self.ids = array('q')
+        self.years = array('H')
+        self.popularity = array('d')
+        titles = []
+        keyed = []
+        for movie_id, title, release_date, popularity in entries:
+            key = normalize(title).encode()
+            if not key:
+                continue
+            row = len(titles)
+            self.ids.append(movie_id)
+            titles.append(title.encode())
+            year = (release_date or '')[:4]
+            self.years.append(int(year) if year.isdigit() else 0)
+            self.popularity.append(popularity or 0.0)
+            keyed.append((key, row))
+            for article in ARTICLES:
+                if key.startswith(article) and len(key) > len(article):
+                    keyed.append((key[len(article):], row))
+                    break
+        self.titles = PackedStrings(titles)
+        del titles
+        keyed.sort()
+        self.keys = PackedStrings(key for key, _ in keyed)
+        self.rows = array('q', (row for _, row in keyed))
+        del keyed
+        self.hot = {}
+        self._precompute_hot(0, len(self.keys), 0, self.hot)
+
+    def __len__(self):
+        return len(self.titles)
+
+    def _top(self, lo, hi, limit):
+        """
+        Returns the rows in keys[lo:hi] with the highest popularity, each
+        movie at most once.
+        """
+        rows = set(self.rows[lo:hi]) if hi - lo > 1 else self.rows[lo:hi]
+        return heapq.nlargest(limit, rows, key=self.popularity.__getitem__)
+
+    def _precompute_hot(self, lo, hi, depth, hot):
+        """
+        Returns the top rows of keys[lo:hi], which share their first depth
+        characters, recording them in hot when the range is too large to rank
+        per lookup. Larger ranges are merged from their children's results, so
+        each key is ranked once however deep its hot prefixes go.
+        """
+        if hi - lo <= HOT_RANGE:
+            return self._top(lo, hi, MAX_LIMIT)
+        keys = self.keys
+        candidates = []
+        start = lo
+        while start < hi and len(keys[start]) == depth:
+            candidates.append(self.rows[start])
+            start += 1
+        while start < hi:
+            end = bisect_left(keys, keys[start][:depth + 1] + MAX_BYTE, start, hi)
+            candidates.extend(self._precompute_hot(start, end, depth + 1, hot))
+            start = end
+        top = heapq.nlargest(MAX_LIMIT, set(candidates), key=self.popularity.__getitem__)
+        prefix = keys[lo][:depth]
+        if prefix and not prefix.endswith(b' '):
+            hot[prefix] = tuple(top)
+        return top
+
+    def range(self, prefix):
+        lo = bisect_left(self.keys, prefix)
+        return lo, bisect_left(self.keys, prefix + MAX_BYTE, lo)
+
+    def suggest(self, query, limit=DEFAULT_LIMIT):
+        """
+        Returns up to limit completions of query, most popular first, as
+        dicts with the movie's id, title and release year.
+        """
+        prefix = normalize(query).encode()
+        if not prefix or limit <= 0:
+            return []
+        rows = self.hot.get(prefix) if limit <= MAX_LIMIT else None
+        if rows is None:
+            rows = self._top(*self.range(prefix), limit)
+        return [{'id': self.ids[row], 'title': self.titles[row].decode(), 'year': self.years[row] or None}
+                for row in rows[:limit]]
+
+
+def catalog_entries(batch_size=BUILD_BATCH_SIZE):
+    """
+    Yields (movie_id, title, release_date, popularity) for every catalog movie,
+    reading in keyset-paginated batches so the ORM never holds the whole table.
+    """
+    last_id = 0
+    while True:
+        batch = (db.session.query(Movie.id, Movie.title, Movie.release_date, Movie.popularity)
+                 .filter(Movie.id > last_id).order_by(Movie.id).limit(batch_size).all())
+        if not batch:
+            return
+        yield from batch
+        last_id = batch[-1][0]
+
+
+index = Snapshot('title suggestion index', lambda: TitleIndex(catalog_entries()),
+                 'SUGGEST_REBUILD_INTERVAL', initial=TitleIndex())
+
+
+def suggest(query, limit=DEFAULT_LIMIT):
+    return index.value.suggest(query, min(limit, MAX_LIMIT))
@@ -0,0 +1,463 @@
+import logging
+import os
+import random
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlencode
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    from breaker import Breakers, CircuitOpen, CLOSED
+    from cache import TMDbCache
+    from executor import submit_background
+    from metrics import timed
+    from singleflight import SingleFlight
+    from ratelimit import Scheduler, PREFETCH, current_lane, lane
+except ModuleNotFoundError:
+    from src.breaker import Breakers, CircuitOpen, CLOSED
+    from src.cache import TMDbCache
+    from src.executor import submit_background
+    from src.metrics import timed
+    from src.singleflight import SingleFlight
+    from src.ratelimit import Scheduler, PREFETCH, current_lane, lane
+
+logger = logging.getLogger(__name__)
+
+TMDB_BASE_URL = os.getenv('TMDB_BASE_URL', 'https://api.themoviedb.org/3')
+TMDB_API_KEY = os.getenv('TMDB_API_KEY', '056f3d31df0856f08c488274990e7921')
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# Statuses a circuit breaker counts as failed calls; a 429 is TMDb pacing us
+FAILURE_STATUSES = RETRY_STATUSES - {429}
+
+# Longest a retry waits on a Retry-After before the response is returned instead
+DEFAULT_MAX_RETRY_DELAY = 5.0
+
+_MOVIE_ID_PATH = re.compile(r'^/movie/\d+$')
+
+
+def endpoint_for(path):
+    """
+    Maps an API path to the endpoint name used for cache TTLs and metrics,
+    e.g. '/movie/550' -> 'movie' and '/search/person' -> 'search_person'.
+    """
+    path = '/' + path.strip('/')
+    if _MOVIE_ID_PATH.match(path):
+        return 'movie'
+    if path.startswith('/movie/'):
+        return path[len('/movie/'):]
+    if path == '/discover/movie':
+        return 'discover'
+    return path.strip('/').replace('/', '_')
+
+
+def cache_key(path, params=None):
+    """
+    Returns a normalized key for a request: the path plus its sorted query
+    parameters, without the API key.
+    """
+    path = '/' + path.strip('/')
+    if not params:
+        return path
+    query = sorted((key, str(value)) for key, value in params.items() if value is not None)
+    return f"{path}?{urlencode(query)}"
+
+
+class PayloadResponse:
+    """
+    Minimal stand-in for requests.Response wrapping an already decoded
+    payload, returned for cache hits so callers can treat both the same way.
+    """
+
+    def __init__(self, payload, status_code=200, from_cache=True):
+        self._payload = payload
+        self.status_code = status_code
+        self.from_cache = from_cache
+        self.headers = {}
+
+    def json(self):
+        return self._payload
+
+
+class TMDbClient:
+    """
+    Pooled, keep-alive client for The Movie Database API.
+
+    Every TMDb call in the app goes through a single instance of this class so
+    that connections are reused across requests instead of paying a TLS
+    handshake per call. The underlying requests.Session is created lazily and
+    re-created after a fork, so each gunicorn worker owns its own pool.
+
+    Args:
+        api_key (str): The TMDb API key sent with every request.
+        base_url (str): The API root, without a trailing slash.
+        pool_size (int): Maximum number of keep-alive connections per host.
+        connect_timeout (float): Seconds to wait for a connection.
+        read_timeout (float): Seconds to wait for the response body.
+        max_retries (int): Number of retries on 429 and 5xx responses.
+        backoff (float): Base delay in seconds for the jittered backoff.
+        max_retry_delay (float): Longest wait before a retry; a response asking
+            for a longer one is returned rather than retried.
+        cache (TMDbCache): Cache for successful responses, or None to disable.
+        scheduler (Scheduler): Paces requests to the rate limit, or None to
+            send them unpaced.
+        breakers (Breakers): Circuit breakers per endpoint, or None to always
+            call TMDb.
+    """
+
+    def __init__(self, api_key=TMDB_API_KEY, base_url=TMDB_BASE_URL, pool_size=10,
+                 connect_timeout=3.05, read_timeout=10.0, max_retries=2, backoff=0.25,
+                 max_retry_delay=DEFAULT_MAX_RETRY_DELAY, cache=None, scheduler=None, breakers=None):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip('/')
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_retry_delay = max_retry_delay
+        self.cache = cache
+        self.scheduler = scheduler
+        self.breakers = breakers
+        self._session = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._refresh_lock = threading.Lock()
+        self.flights = SingleFlight()
+
+    @classmethod
+    def from_env(cls):
+        """
+        Builds a client configured from TMDB_* environment variables.
+        """
+        return cls(
+            pool_size=int(os.getenv('TMDB_POOL_SIZE', 10)),
+            connect_timeout=float(os.getenv('TMDB_CONNECT_TIMEOUT', 3.05)),
+            read_timeout=float(os.getenv('TMDB_READ_TIMEOUT', 10)),
+            max_retries=int(os.getenv('TMDB_MAX_RETRIES', 2)),
+            backoff=float(os.getenv('TMDB_RETRY_BACKOFF', 0.25)),
+            max_retry_delay=float(os.getenv('TMDB_RETRY_MAX_DELAY', DEFAULT_MAX_RETRY_DELAY)),
+            cache=TMDbCache.from_env() if os.getenv('TMDB_CACHE', '1') != '0' else None,
+            scheduler=Scheduler.from_env(),
+            breakers=Breakers.from_env(),
+        )
+
+    @property
+    def session(self):
+        """
+        Returns the pooled session for the current process, creating it on first
+        use and again after a fork so workers never share sockets.
+        """
+        pid = os.getpid()
+        if self._session is None or self._pid != pid:
+            with self._lock:
+                if self._session is None or self._pid != pid:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    self._session = session
+                    self._pid = pid
+        return self._session
+
+    def close(self):
+        """
+        Closes the pooled connections held by this process.
+        """
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+            self._session = None
+            self._pid = None
+
+    def url(self, path):
+        """
+        Builds the absolute URL for an API path such as '/movie/popular'.
+        """
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def params(self, params=None):
+        """
+        Returns the query parameters for a request with the API key added.
+        """
+        merged = {'api_key': self.api_key}
+        if params:
+            merged.update({key: value for key, value in params.items() if value is not None})
+        return merged
+
+    def get(self, path, params=None):
+        """
+        Performs a cached GET against the TMDb API.
+
+        Successful responses are stored in the client's cache with the TTL of
+        their endpoint; later calls with the same path and parameters are
+        answered from the cache without touching the network.
+
+        For stale-while-revalidate endpoints an entry past its TTL but within
+        its hard TTL is returned immediately and a background refresh is
+        started, so only the first request after the hard TTL waits on TMDb.
+
+        Concurrent calls with the same path and parameters in the same lane
+        share one request to TMDb (see SingleFlight), so their result must be
+        treated as read-only. With a Redis cache tier, a miss is also fetched by one
+        worker at a time while the others wait for it to land in Redis.
+
+        While the endpoint's circuit is open (see breaker.py) TMDb is not
+        called: a miss is answered with the last known good payload, or an
+        empty PayloadResponse with status 503 if there is none. A 429 asking
+        for a longer wait than retry_limit() is answered with the last known
+        good payload too, if there is one.
+
+        The time a miss waits, whether on its own request or one it joined,
+        is recorded per endpoint in metrics.
+
+        Args:
+            path (str): The API path, e.g. '/search/movie'.
+            params (dict): Extra query parameters.
+
+        Returns:
+            A requests.Response, or a PayloadResponse with the same status_code
+            and json() interface.
+        """
+        key = cache_key(path, params)
+        endpoint = endpoint_for(path)
+        # Calls join flights in their own lane only, so a page never waits
+        # behind a batch job's token
+        flight = (current_lane(), key)
+        if self.cache is not None:
+            entry = self.cache.lookup(endpoint, key)
+            if entry is not None:
+                payload, age = entry
+                if age >= self.cache.ttl_for(endpoint):
+                    self.refresh(endpoint, key, path, params)
+                return PayloadResponse(payload)
+
+        breaker = self.breaker_for(endpoint)
+        if breaker is not None and breaker.rejecting():
+            return self.fallback(endpoint, key)
+        try:
+            with timed('tmdb', endpoint):
+                if self.cache is None:
+                    response = self.flights.do(flight, lambda: self.fetch(path, params))
+                else:
+                    response = self.flights.do(flight, lambda: self.fill(endpoint, key, path, params))
+        except CircuitOpen:
+            return self.fallback(endpoint, key)
+        return self.unless_rate_limited(endpoint, key, response)
+
+    def breaker_for(self, endpoint):
+        return self.breakers.get(endpoint) if self.breakers is not None else None
+
+    def fallback(self, endpoint, key):
+        """
+        Answers a call TMDb was not asked because the endpoint's circuit is
+        open: with the last known good payload if the cache has one, else
+        with an empty 503 that callers treat like any failed call.
+        """
+        breaker = self.breaker_for(endpoint)
+        if breaker is not None:
+            breaker.count_fallback()
+        entry = self.cache.last_good(endpoint, key) if self.cache is not None else None
+        if entry is not None:
+            return PayloadResponse(entry[0])
+        return PayloadResponse({}, status_code=503, from_cache=False)
+
+    def unless_rate_limited(self, endpoint, key, response):
+        """
+        Returns response, unless it is a 429 that was not retried and the
+        cache has a last known good payload to serve instead.
+        """
+        if response.status_code == 429 and self.cache is not None:
+            entry = self.cache.last_good(endpoint, key)
+            if entry is not None:
+                return PayloadResponse(entry[0])
+        return response
+
+    def fill(self, endpoint, key, path, params=None):
+        """
+        Fetches a missing entry and stores it in the cache. When another
+        worker holds the key's fill lock, waits for its result instead, and
+        fetches anyway if that does not arrive within the lock's timeout.
+        """
+        if not self.cache.acquire_fill(key):
+            payload = self.cache.wait_for_fill(endpoint, key)
+            if payload is not None:
+                return PayloadResponse(payload)
+            return self._fill(endpoint, key, path, params)
+        try:
+            return self._fill(endpoint, key, path, params)
+        finally:
+            self.cache.release_fill(key)
+
+    def _fill(self, endpoint, key, path, params):
+        response = self.fetch(path, params)
+        if response.status_code == 200:
+            payload = response.json()
+            self.cache.set(endpoint, key, payload)
+            return PayloadResponse(payload, from_cache=False)
+        return response
+
+    def refresh(self, endpoint, key, path, params=None):
+        """
+        Re-fetches a cached entry on the background pool, untimed, as the
+        request that found it stale does not wait for it.
+
+        At most one refresh per key runs in this worker at a time, and the
+        cache's Redis lock extends that guarantee across workers.
+
+        Returns:
+            The Future of the refresh, or None if one is already running.
+        """
+        with self._refresh_lock:
+            if key in self._refreshing:
+                return None
+            self._refreshing.add(key)
+
+        def run():
+            try:
+                if not self.cache.acquire_refresh(key):
+                    return
+                try:
+                    with lane(PREFETCH):
+                        response = self.fetch(path, params)
+                    if response.status_code == 200:
+                        self.cache.set(endpoint, key, response.json())
+                finally:
+                    self.cache.release_refresh(key)
+            except Exception as error:
+                logger.warning("Background refresh of %s failed: %r", key, error)
+            finally:
+                with self._refresh_lock:
+                    self._refreshing.discard(key)
+
+        try:
+            return submit_background(run)
+        except RuntimeError:
+            with self._refresh_lock:
+                self._refreshing.discard(key)
+            return None
+
+    def fetch(self, path, params=None):
+        """
+        Performs an uncached GET against the TMDb API.
+
+        Responses with a 429 or 5xx status are retried up to max_retries times.
+        The delay honours a Retry-After header when TMDb sends one and otherwise
+        uses exponential backoff with full jitter. A response whose delay is
+        longer than retry_limit() is returned at once rather than slept on.
+        Connection errors and timeouts are raised to the caller.
+
+        With a scheduler, every attempt first waits for a token in the
+        caller's lane (see ratelimit.lane), and a 429 pauses the scheduler
+        for its Retry-After, up to retry_limit(), so the worker's other calls
+        back off too.
+
+        With breakers, each attempt's outcome and duration is recorded on the
+        endpoint's breaker, and retries stop once its circuit leaves the
+        closed state.
+
+        Args:
+            path (str): The API path, e.g. '/search/movie'.
+            params (dict): Extra query parameters.
+
+        Returns:
+            The requests.Response of the last attempt.
+
+        Raises:
+            requests.exceptions.Timeout: No token was free within the lane's
+                wait.
+            breaker.CircuitOpen: The endpoint's circuit is open.
+        """
+        url = self.url(path)
+        query = self.params(params)
+        breaker = self.breaker_for(endpoint_for(path))
+        if breaker is not None and not breaker.allow():
+            raise CircuitOpen(f"TMDb circuit for {endpoint_for(path)} is open")
+        attempt = 0
+        while True:
+            try:
+                self.wait_for_token()
+            except requests.exceptions.Timeout:
+                if breaker is not None:
+                    breaker.cancel()
+                raise
+            response = self._attempt(breaker, url, query)
+            if response.status_code not in RETRY_STATUSES:
+                return response
+            delay = self.retry_delay(response, attempt)
+            limit = self.retry_limit(current_lane())
+            if response.status_code == 429 and self.scheduler is not None:
+                self.scheduler.pause(min(delay, limit))
+            if (attempt >= self.max_retries or delay > limit
+                    or (breaker is not None and breaker.state != CLOSED)):
+                return response
+            time.sleep(delay)
+            attempt += 1
+
+    def _attempt(self, breaker, url, query):
+        if breaker is None:
+            return self.session.get(url, params=query, timeout=self.timeout)
+        started = breaker.start()
+        try:
+            response = self.session.get(url, params=query, timeout=self.timeout)
+        except Exception:
+            breaker.record(False, started)
+            raise
+        breaker.record(response.status_code not in FAILURE_STATUSES, started)
+        return response
+
+    def wait_for_token(self):
+        """
+        Waits for the scheduler to let a request in the current lane through.
+        """
+        if self.scheduler is not None and not self.scheduler.acquire(current_lane()):
+            raise requests.exceptions.Timeout(
+                f"No TMDb rate limit token for the {current_lane()} lane within "
+                f"{self.scheduler.timeout_for(current_lane())}s")
+
+    def retry_delay(self, response, attempt):
+        """
+        Returns how long to wait before retrying the given response: its
+        Retry-After, in seconds or as an HTTP date, or else a jittered backoff.
+        """
+        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+        if retry_after is not None:
+            return retry_after
+        return random.uniform(0, self.backoff * (2 ** attempt))
+
+    def retry_limit(self, name):
+        """
+        Returns the longest a call in the named lane may wait for a retry:
+        max_retry_delay, or the lane's rate limit wait if that is shorter.
+        """
+        wait = self.scheduler.timeout_for(name) if self.scheduler is not None else None
+        return self.max_retry_delay if wait is None else min(wait, self.max_retry_delay)
+
+
+def parse_retry_after(value):
+    """
+    Returns the seconds a Retry-After header value asks for, whether given
+    as a number of seconds or an HTTP date, or None if it is missing or
+    malformed.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+client = TMDbClient.from_env()
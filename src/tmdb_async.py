@@ -0,0 +1,211 @@
+import asyncio
+import logging
+import os
+import threading
+
+import httpx
+
+try:
+    from tmdb import client as tmdb, endpoint_for, cache_key, PayloadResponse, RETRY_STATUSES, \
+        FAILURE_STATUSES
+    from breaker import CircuitOpen, CLOSED
+    from metrics import timed
+    from ratelimit import current_lane
+except ModuleNotFoundError:
+    from src.tmdb import client as tmdb, endpoint_for, cache_key, PayloadResponse, RETRY_STATUSES, \
+        FAILURE_STATUSES
+    from src.breaker import CircuitOpen, CLOSED
+    from src.metrics import timed
+    from src.ratelimit import current_lane
+
+logger = logging.getLogger(__name__)
+
+MAX_CONNECTIONS = int(os.getenv('TMDB_ASYNC_MAX_CONNECTIONS', 100))
+
+
+class AsyncTMDbClient:
+    """
+    asyncio counterpart of TMDbClient for the async views.
+
+    Every request in the process shares one httpx.AsyncClient, driven by an
+    event loop on a dedicated thread, so hundreds of TMDb calls can be in
+    flight at once over a single connection pool. A coroutine on any other
+    event loop awaits a call with `await client.get(...)`: the call is handed
+    to the shared loop and its result handed back. The loop and connection
+    pool are created on first use and again after a fork.
+
+    Settings, the response cache, circuit breakers and background refreshes
+    are shared with the TMDbClient it wraps. Like TMDbClient.get, concurrent
+    identical requests share one call to TMDb.
+
+    Args:
+        sync_client (TMDbClient): Supplies the API key, base URL, timeouts,
+            retry policy and cache.
+        max_connections (int): Most connections open to TMDb at once.
+        transport (httpx.AsyncBaseTransport): Replaces the network, for tests.
+    """
+
+    def __init__(self, sync_client, max_connections=MAX_CONNECTIONS, transport=None):
+        self.sync = sync_client
+        self.max_connections = max_connections
+        self.transport = transport
+        self._loop = None
+        self._http = None
+        self._pid = None
+        self._lock = threading.Lock()
+        # Calls in flight on the shared loop by cache key; only touched on
+        # that loop's thread
+        self._in_flight = {}
+
+    def loop(self):
+        """
+        Returns the shared event loop for the current process, starting its
+        thread on first use.
+        """
+        pid = os.getpid()
+        if self._loop is None or self._pid != pid:
+            with self._lock:
+                if self._loop is None or self._pid != pid:
+                    loop = asyncio.new_event_loop()
+                    threading.Thread(target=loop.run_forever, name='movievault-tmdb-async',
+                                     daemon=True).start()
+                    connect_timeout, read_timeout = self.sync.timeout
+                    self._http = httpx.AsyncClient(
+                        timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+                        limits=httpx.Limits(max_connections=self.max_connections,
+                                            max_keepalive_connections=self.max_connections),
+                        transport=self.transport)
+                    self._in_flight = {}
+                    self._loop = loop
+                    self._pid = pid
+        return self._loop
+
+    def close(self):
+        """
+        Closes this process's connections and stops its loop.
+        """
+        with self._lock:
+            loop, http = self._loop, self._http
+            if loop is not None and self._pid == os.getpid():
+                asyncio.run_coroutine_threadsafe(http.aclose(), loop).result(5)
+                loop.call_soon_threadsafe(loop.stop)
+            self._loop = None
+            self._http = None
+            self._pid = None
+
+    async def call(self, coroutine):
+        """
+        Runs a coroutine on the shared loop and waits for it from the
+        caller's loop.
+        """
+        future = asyncio.run_coroutine_threadsafe(coroutine, self.loop())
+        return await asyncio.wrap_future(future)
+
+    async def get(self, path, params=None):
+        """
+        Performs a cached GET against the TMDb API; the async version of
+        TMDbClient.get, reading and filling the same cache. Only the local
+        tier is read on the loop: cache work that may wait on Redis runs on
+        a thread.
+
+        Returns:
+            An httpx.Response, or a PayloadResponse with the same status_code
+            and json() interface.
+        """
+        cache = self.sync.cache
+        endpoint = endpoint_for(path)
+        key = cache_key(path, params)
+        if cache is not None:
+            entry = cache.lookup_local(endpoint, key)
+            if entry is None:
+                entry = await asyncio.to_thread(cache.lookup, endpoint, key)
+            if entry is not None:
+                payload, age = entry
+                if age >= cache.ttl_for(endpoint):
+                    self.sync.refresh(endpoint, key, path, params)
+                return PayloadResponse(payload)
+
+        breaker = self.sync.breaker_for(endpoint)
+        if breaker is not None and breaker.rejecting():
+            return await asyncio.to_thread(self.sync.fallback, endpoint, key)
+        try:
+            with timed('tmdb', endpoint):
+                response = await self.fetch(path, params)
+        except CircuitOpen:
+            return await asyncio.to_thread(self.sync.fallback, endpoint, key)
+        if cache is None:
+            return response
+        if response.status_code == 200:
+            payload = response.json()
+            await asyncio.to_thread(cache.set, endpoint, key, payload)
+            return PayloadResponse(payload, from_cache=False)
+        return await asyncio.to_thread(self.sync.unless_rate_limited, endpoint, key, response)
+
+    async def fetch(self, path, params=None):
+        """
+        Performs an uncached GET against the TMDb API, retrying 429 and 5xx
+        responses like TMDbClient.fetch. Connection errors and timeouts are
+        raised as httpx.HTTPError.
+
+        Callers that ask for the same path and parameters in the same lane
+        while a request for them is in flight wait for that request rather than sending
+        their own, and share its response.
+
+        Requests are paced by the sync client's scheduler in the caller's
+        lane; a caller that gets no token within the lane's wait gets an
+        httpx.PoolTimeout. Outcomes are recorded on the sync client's
+        breakers, and breaker.CircuitOpen is raised while the endpoint's
+        circuit is open.
+        """
+        return await self.call(self._shared(cache_key(path, params), self.sync.url(path),
+                                            self.sync.params(params), current_lane(),
+                                            self.sync.breaker_for(endpoint_for(path))))
+
+    async def _shared(self, key, url, query, lane, breaker=None):
+        flight = (lane, key)
+        task = self._in_flight.get(flight)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(url, query, lane, breaker))
+            self._in_flight[flight] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(flight, None))
+        # A caller that gives up must not cancel the request for the others
+        return await asyncio.shield(task)
+
+    async def _fetch(self, url, query, lane, breaker=None):
+        scheduler = self.sync.scheduler
+        if breaker is not None and not breaker.allow():
+            raise CircuitOpen(f"TMDb circuit for {breaker.name} is open")
+        attempt = 0
+        while True:
+            if scheduler is not None and not await scheduler.acquire_async(lane):
+                if breaker is not None:
+                    breaker.cancel()
+                raise httpx.PoolTimeout(f"No TMDb rate limit token for the {lane} lane within "
+                                        f"{scheduler.timeout_for(lane)}s")
+            response = await self._attempt(breaker, url, query)
+            if response.status_code not in RETRY_STATUSES:
+                return response
+            delay = self.sync.retry_delay(response, attempt)
+            limit = self.sync.retry_limit(lane)
+            if response.status_code == 429 and scheduler is not None:
+                scheduler.pause(min(delay, limit))
+            if (attempt >= self.sync.max_retries or delay > limit
+                    or (breaker is not None and breaker.state != CLOSED)):
+                return response
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _attempt(self, breaker, url, query):
+        if breaker is None:
+            return await self._http.get(url, params=query)
+        started = breaker.start()
+        try:
+            response = await self._http.get(url, params=query)
+        except Exception:
+            breaker.record(False, started)
+            raise
+        breaker.record(response.status_code not in FAILURE_STATUSES, started)
+        return response
+
+
+client = AsyncTMDbClient(tmdb)
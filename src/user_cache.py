@@ -0,0 +1,114 @@
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    from models import db, User
+except ModuleNotFoundError:
+    from src.models import db, User
+
+DEFAULT_TTL = 60
+MAX_USERS = 10000
+
+
+class UserCache:
+    """
+    Per-worker LRU of detached User rows keyed by (user_id, session_version),
+    each served for ttl seconds.
+
+    Because the session version is part of the key, and a profile change
+    bumps it and hands the editing browser a new session token, no worker
+    serves a user from before the change to that browser.
+
+    Revoking the user's other sessions is only immediate on the worker that
+    made the change, which calls invalidate(). Other workers keep accepting
+    an old token they have cached until its entry expires, so a session is
+    revoked everywhere at most ttl seconds after the change.
+
+    Args:
+        max_users (int): Most users kept before the least recently used is
+            evicted.
+        ttl (int): Seconds an entry is served for.
+    """
+
+    def __init__(self, max_users=MAX_USERS, ttl=DEFAULT_TTL):
+        self.max_users = max_users
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, user = entry
+            if expires_at <= now:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return user
+
+    def set(self, key, user, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            self._entries[key] = (now + self.ttl, user)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        """
+        Drops a user's entries from this worker's cache only; see the class
+        docstring for the other workers.
+        """
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == user_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+cache = UserCache()
+
+
+def parse_token(token):
+    """
+    Splits a session token from User.get_id() into (user_id, session_version).
+    Tokens issued before versions existed hold the bare ID and count as
+    version 0. Returns None for anything else.
+    """
+    user_id, _, version = str(token).partition(':')
+    try:
+        return int(user_id), int(version or 0)
+    except ValueError:
+        return None
+
+
+def load(token):
+    """
+    Returns the user a session token belongs to, from this worker's cache or
+    else the database, or None if the user no longer exists or the token's
+    version is out of date (the profile changed since it was issued).
+
+    Cached users are detached from any database session: request code may
+    read their columns but must load the row again to change it.
+    """
+    key = parse_token(token)
+    if key is None:
+        return None
+    user = cache.get(key)
+    if user is not None:
+        return user
+    user = db.session.get(User, key[0])
+    if user is None or user.session_version != key[1]:
+        return None
+    db.session.expunge(user)
+    cache.set(key, user)
+    return user
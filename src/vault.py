@@ -0,0 +1,164 @@
+import secrets
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+
+from flask import g, has_request_context, session
+from flask_login import current_user
+
+try:
+    from models import db, Favorite
+except ModuleNotFoundError:
+    from src.models import db, Favorite
+
+MAX_USERS = 10000
+DEFAULT_TTL = 300
+# Session key holding the version of the user's favorites that this browser
+# last changed or saw.
+SESSION_KEY = 'vault_version'
+
+
+class FavoriteIds:
+    """
+    Immutable set of a user's favorite movie IDs, kept sorted in an
+    array('q'): 8 bytes per ID and a bisection per membership test.
+    """
+
+    __slots__ = ('ids',)
+
+    def __init__(self, movie_ids=()):
+        self.ids = array('q', sorted(set(movie_ids)))
+
+    def __contains__(self, movie_id):
+        position = bisect_left(self.ids, movie_id)
+        return position < len(self.ids) and self.ids[position] == movie_id
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def changed(self, added=(), removed=()):
+        """
+        Returns a copy with added IDs inserted and removed IDs dropped.
+        """
+        removed = set(removed)
+        return FavoriteIds([movie_id for movie_id in self.ids if movie_id not in removed]
+                           + [movie_id for movie_id in added if movie_id not in removed])
+
+
+class FavoriteIdCache:
+    """
+    Per-worker LRU of FavoriteIds by user, bounded by user count.
+
+    Each entry records the version it was loaded or last changed under. A
+    lookup with a different version misses, so a user's own changes made on
+    another worker (which hand their browser a new version) are never served
+    stale; changes from another session show up within ttl seconds.
+
+    Args:
+        max_users (int): Most users kept before the least recently used is
+            evicted.
+        ttl (int): Seconds an entry is served for.
+    """
+
+    def __init__(self, max_users=MAX_USERS, ttl=DEFAULT_TTL):
+        self.max_users = max_users
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, user_id, version, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            loaded_at, entry_version, ids = entry
+            if entry_version != version or loaded_at + self.ttl <= now:
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return ids
+
+    def set(self, user_id, version, ids, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            self._entries[user_id] = (now, version, ids)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+
+    def update(self, user_id, version, added=(), removed=()):
+        """
+        Applies a change to a cached entry in place, under its new version.
+        Users not cached are left to load on their next lookup.
+        """
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                loaded_at, _, ids = entry
+                self._entries[user_id] = (loaded_at, version, ids.changed(added, removed))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+cache = FavoriteIdCache()
+
+
+def load(user_id):
+    """
+    Reads a user's favorite movie IDs with one query over the
+    (user_id, movie_id) index.
+    """
+    return FavoriteIds(row[0] for row in
+                       db.session.query(Favorite.movie_id).filter(Favorite.user_id == user_id))
+
+
+def favorite_ids(user_id):
+    """
+    Returns a user's FavoriteIds, from this request, then the worker cache,
+    then the database.
+    """
+    memo = g.setdefault('favorite_ids', {})
+    if user_id in memo:
+        return memo[user_id]
+    version = session.get(SESSION_KEY)
+    ids = cache.get(user_id, version)
+    if ids is None:
+        ids = load(user_id)
+        cache.set(user_id, version, ids)
+    memo[user_id] = ids
+    return ids
+
+
+def changed(user_id, added=(), removed=()):
+    """
+    Records that a user's favorites changed: the browser gets a new version,
+    so no worker serves it the old set, and this worker's entry is updated in
+    place. Call after the change is committed.
+    """
+    version = secrets.token_hex(8)
+    if has_request_context():
+        session[SESSION_KEY] = version
+        g.pop('favorite_ids', None)
+    cache.update(user_id, version, added, removed)
+
+
+def in_vault(movie_id):
+    """
+    Template helper: whether the current user has favorited movie_id. The
+    user's IDs are loaded at most once per request, and only if a template
+    asks.
+    """
+    if not current_user.is_authenticated:
+        return False
+    return movie_id in favorite_ids(current_user.id)
@@ -0,0 +1,17 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from app import tmdb
+
+
+def reset_tmdb():
+    """
+    Empties the app's TMDb cache and closes its circuit breakers, so a test
+    sees neither responses nor failures left by an earlier one.
+    """
+    if tmdb.cache is not None:
+        tmdb.cache.clear()
+    if tmdb.breakers is not None:
+        tmdb.breakers.clear()
@@ -0,0 +1,95 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import tempfile
+import unittest
+from unittest.mock import patch
+from sqlalchemy import inspect
+from app import app, create_app, db
+import lifecycle
+
+
+class TestCreateApp(unittest.TestCase):
+    def setUp(self):
+        self.scratch = tempfile.mkdtemp()
+        self.path = os.path.join(self.scratch, 'factory.db')
+        self.app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{self.path}', 'TESTING': True})
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            for engine in db.engines.values():
+                engine.dispose()
+
+    def test_building_the_app_creates_no_tables(self):
+        with self.app.app_context():
+            self.assertEqual(inspect(db.engine).get_table_names(), [])
+
+    def test_registers_the_same_views_as_the_default_app(self):
+        self.assertEqual({rule.endpoint for rule in self.app.url_map.iter_rules()},
+                         {rule.endpoint for rule in app.url_map.iter_rules()})
+        response = self.app.test_client().get('/login')
+        self.assertEqual(response.status_code, 200)
+
+    def test_config_overrides_the_environment(self):
+        custom = create_app({'FAVORITES_PAGE_SIZE': 5, 'TESTING': True})
+        self.assertEqual(custom.config['FAVORITES_PAGE_SIZE'], 5)
+        self.assertNotEqual(app.config['FAVORITES_PAGE_SIZE'], 5)
+
+    def test_init_db_creates_the_tables(self):
+        result = self.app.test_cli_runner().invoke(args=['init-db'])
+
+        self.assertIn('Created missing tables', result.output)
+        with self.app.app_context():
+            self.assertIn('user', inspect(db.engine).get_table_names())
+
+
+class TestLifecycle(unittest.TestCase):
+    def setUp(self):
+        lifecycle._started_pid = None
+
+    def tearDown(self):
+        lifecycle._started_pid = None
+
+    def test_warm_templates_compiles_every_template(self):
+        warmed = create_app({'TESTING': True})
+
+        count = lifecycle.warm_templates(warmed)
+
+        self.assertEqual(count, len(warmed.jinja_env.list_templates()))
+        self.assertEqual(len(warmed.jinja_env.cache), count)
+
+    @patch('lifecycle.init_sentry')
+    def test_ensure_started_runs_once_per_process(self, mock_init):
+        lifecycle.ensure_started(app)
+        lifecycle.ensure_started(app)
+
+        mock_init.assert_called_once_with(app)
+
+    @patch('sentry_sdk.init')
+    def test_sentry_stays_off_under_test(self, mock_init):
+        lifecycle.init_sentry(create_app({'TESTING': True}))
+        lifecycle.init_sentry(create_app({'SENTRY_DSN': ''}))
+
+        mock_init.assert_not_called()
+
+    @patch('lifecycle.warm_templates')
+    @patch('lifecycle.init_sentry')
+    @patch('lifecycle.passwords.hasher.reset')
+    @patch('lifecycle.executor.reset_executor')
+    @patch('sqlalchemy.engine.Engine.dispose')
+    def test_post_fork_drops_inherited_connections_and_pools(self, mock_dispose, mock_executor,
+                                                              mock_hasher, mock_sentry, mock_warm):
+        lifecycle.post_fork(app)
+
+        mock_dispose.assert_called_with(close=False)
+        mock_executor.assert_called_once_with()
+        mock_hasher.assert_called_once_with()
+        mock_sentry.assert_called_once_with(app)
+        mock_warm.assert_called_once_with(app)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,200 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import asyncio
+import time
+import unittest
+from unittest.mock import patch
+import httpx
+from app import app, db, tmdb, User, Favorite
+from helpers import reset_tmdb
+from models import FavoriteGenre, FavoriteCast
+from werkzeug.security import generate_password_hash
+from executor import gather_async
+import tmdb_async
+import asgi
+import recommendation_store
+
+LATENCY = 0.25
+
+
+def movie(movie_id, title='Heat'):
+    return {'id': movie_id, 'title': title, 'poster_path': f'/{movie_id}.jpg', 'overview': 'A heist.',
+            'release_date': '1995-12-15', 'vote_average': 7.9, 'runtime': 170, 'genres': [],
+            'credits': {'cast': []}, 'known_for': []}
+
+
+class FakeTMDb:
+    """
+    Answers TMDb requests after LATENCY seconds and counts them.
+    """
+
+    def __init__(self, statuses=()):
+        self.requests = []
+        self.statuses = list(statuses)
+
+    async def __call__(self, request):
+        self.requests.append(request.url.path)
+        await asyncio.sleep(LATENCY)
+        if self.statuses:
+            return httpx.Response(self.statuses.pop(0), json={})
+        path = request.url.path.removeprefix('/3')
+        if path.startswith('/movie/') and path[len('/movie/'):].isdigit():
+            movie_id = int(path[len('/movie/'):])
+            if movie_id == 404:
+                return httpx.Response(404, json={})
+            return httpx.Response(200, json=movie(movie_id))
+        return httpx.Response(200, json={'results': [movie(949)]})
+
+
+class AsyncTestCase(unittest.TestCase):
+    def setUp(self):
+        self.fake = FakeTMDb()
+        self.use(self.fake)
+        reset_tmdb()
+        with app.app_context():
+            db.create_all()
+
+    def tearDown(self):
+        tmdb_async.client.close()
+        tmdb_async.client.transport = None
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def use(self, fake):
+        tmdb_async.client.close()
+        tmdb_async.client.transport = httpx.MockTransport(fake)
+
+
+class TestAsyncTMDbClient(AsyncTestCase):
+    def test_get_caches_in_the_shared_cache(self):
+        async def fetch_twice():
+            first = await tmdb_async.client.get('/movie/949')
+            second = await tmdb_async.client.get('/movie/949')
+            return first.json(), second.json()
+
+        first, second = asyncio.run(fetch_twice())
+
+        self.assertEqual(first['title'], 'Heat')
+        self.assertEqual(second, first)
+        self.assertEqual(len(self.fake.requests), 1 if tmdb.cache is not None else 2)
+
+    @patch.object(tmdb.__class__, 'retry_delay', return_value=0)
+    def test_retries_server_errors(self, mock_delay):
+        fake = FakeTMDb(statuses=[503])
+        self.use(fake)
+
+        response = asyncio.run(tmdb_async.client.fetch('/movie/949'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(fake.requests), 2)
+
+    def test_calls_from_many_loops_share_one_client(self):
+        async def search(query):
+            return await tmdb_async.client.fetch('/search/movie', {'query': query})
+
+        started = time.perf_counter()
+        asyncio.run(search('a'))
+        asyncio.run(search('b'))
+
+        self.assertEqual(len(self.fake.requests), 2)
+        self.assertLess(time.perf_counter() - started, 5)
+
+
+class TestGatherAsync(unittest.TestCase):
+    def test_failed_and_late_calls_get_the_default(self):
+        async def fast():
+            return ['fast']
+
+        async def slow():
+            await asyncio.sleep(5)
+
+        async def broken():
+            raise ValueError('boom')
+
+        results = asyncio.run(gather_async({'fast': fast, 'slow': slow, 'broken': broken}, timeout=0.1))
+
+        self.assertEqual(results, {'fast': ['fast'], 'slow': [], 'broken': []})
+
+
+class TestAsyncViews(AsyncTestCase):
+    def setUp(self):
+        super().setUp()
+        asgi.app.config['TESTING'] = True
+        self.client = asgi.app.test_client()
+
+    def test_async_views_keep_the_sync_endpoint_names(self):
+        self.assertEqual(set(asgi.app.view_functions), set(app.view_functions))
+        self.assertTrue(asyncio.iscoroutinefunction(asgi.app.view_functions['search_movies']))
+        self.assertFalse(asyncio.iscoroutinefunction(app.view_functions['search_movies']))
+
+    def test_search_runs_both_lookups_concurrently(self):
+        started = time.perf_counter()
+        response = self.client.get('/search?query=heat')
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Heat', response.data)
+        self.assertEqual(sorted(self.fake.requests), ['/3/search/movie', '/3/search/person'])
+        self.assertLess(elapsed, 2 * LATENCY)
+
+    def test_dashboard_fetches_all_rows(self):
+        response = self.client.get('/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.fake.requests), 6)
+
+    def test_missing_movie_redirects_to_the_dashboard(self):
+        response = self.client.get('/movies/404')
+
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response.location.endswith('/'))
+
+    def test_recommendations_are_computed_and_stored(self):
+        with app.app_context():
+            user = User(username='async', password=generate_password_hash('testpassword'),
+                        first_name='Test', last_name='User')
+            db.session.add(user)
+            db.session.flush()
+            favorite = Favorite(user_id=user.id, movie_id=550, movie_title='Fight Club',
+                                movie_poster='/550.jpg', movie_release_date='1999-10-15',
+                                movie_rating=8.4, movie_runtime=139)
+            db.session.add(favorite)
+            db.session.flush()
+            db.session.add(FavoriteGenre(favorite_id=favorite.id, genre_id=28, user_id=user.id, name='Action'))
+            db.session.add(FavoriteCast(favorite_id=favorite.id, cast_order=0, user_id=user.id,
+                                        person_id=287, name='Brad Pitt'))
+            db.session.commit()
+            user_id = user.id
+        self.client.post('/login', data=dict(username='async', password='testpassword'))
+
+        response = self.client.get('/recommendations')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Heat', response.data)
+        self.assertEqual(sorted(self.fake.requests),
+                         ['/3/discover/movie', '/3/discover/movie', '/3/search/person'])
+        with app.app_context():
+            self.assertEqual(len(recommendation_store.load(user_id)['genre']), 1)
+
+    def test_asgi_serves_concurrent_requests_in_parallel(self):
+        async def burst(count):
+            transport = httpx.ASGITransport(app=asgi.application)
+            async with httpx.AsyncClient(transport=transport, base_url='http://movievault') as client:
+                return await asyncio.gather(*[client.get(f'/movies/{movie_id}')
+                                              for movie_id in range(1000, 1000 + count)])
+
+        started = time.perf_counter()
+        responses = asyncio.run(burst(40))
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual({response.status_code for response in responses}, {200})
+        # One at a time, 40 requests would take 40 * LATENCY = 10 seconds
+        self.assertLess(elapsed, 10 * LATENCY)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,312 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import asyncio
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+from breaker import Breakers, CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+from cache import LRUCache, TMDbCache
+from tmdb import TMDbClient, cache_key
+from tmdb_async import AsyncTMDbClient
+from app import app, tmdb
+
+
+def call(breaker, ok, seconds=0.1, at=100):
+    breaker.record(ok, breaker.start(now=at), now=at + seconds)
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_opens_once_enough_calls_fail(self):
+        breaker = CircuitBreaker('movie', min_calls=4, failure_ratio=0.5)
+        for ok in (True, False, True):
+            call(breaker, ok)
+        self.assertEqual(breaker.state, CLOSED)
+
+        call(breaker, False)
+
+        self.assertEqual(breaker.state, OPEN)
+        self.assertFalse(breaker.allow(now=101))
+        self.assertEqual(breaker.stats()['rejected'], 1)
+
+    def test_slow_calls_count_as_failures(self):
+        breaker = CircuitBreaker('movie', min_calls=2, slow_call=1.0)
+        call(breaker, True, seconds=0.1)
+        call(breaker, True, seconds=1.5)
+        self.assertEqual(breaker.state, OPEN)
+
+    def test_stalled_calls_open_the_circuit_before_they_finish(self):
+        breaker = CircuitBreaker('movie', min_calls=3, slow_call=1.0)
+        tickets = [breaker.start(now=100) for _ in range(3)]
+        self.assertTrue(breaker.allow(now=100.5))
+
+        self.assertFalse(breaker.allow(now=101.5))
+        self.assertEqual(breaker.state, OPEN)
+        # Their outcomes no longer count once they do finish
+        for ticket in tickets:
+            breaker.record(False, ticket, now=110)
+        self.assertEqual(breaker.stats()['opened'], 1)
+
+    def test_probes_after_open_seconds(self):
+        breaker = CircuitBreaker('movie', min_calls=1, open_seconds=30, probes=1)
+        call(breaker, False, at=100)
+        self.assertTrue(breaker.rejecting(now=110))
+
+        self.assertTrue(breaker.allow(now=131))
+        self.assertEqual(breaker.state, HALF_OPEN)
+        # Only one probe at a time
+        self.assertFalse(breaker.allow(now=131))
+        self.assertFalse(breaker.rejecting(now=131))
+
+        call(breaker, True, at=131)
+        self.assertEqual(breaker.state, CLOSED)
+        self.assertTrue(breaker.allow(now=132))
+
+    def test_failed_probe_opens_the_circuit_again(self):
+        breaker = CircuitBreaker('movie', min_calls=1, open_seconds=30)
+        call(breaker, False, at=100)
+        self.assertTrue(breaker.allow(now=131))
+
+        call(breaker, False, at=131)
+
+        self.assertEqual(breaker.state, OPEN)
+        self.assertFalse(breaker.allow(now=150))
+        self.assertEqual(breaker.stats()['opened'], 2)
+
+    def test_cancelled_probe_frees_its_slot(self):
+        breaker = CircuitBreaker('movie', min_calls=1, open_seconds=0)
+        call(breaker, False)
+        self.assertTrue(breaker.allow())
+        breaker.cancel()
+        self.assertTrue(breaker.allow())
+
+    def test_one_breaker_per_endpoint(self):
+        breakers = Breakers(min_calls=1)
+        call(breakers.get('search_movie'), False)
+
+        self.assertEqual(breakers.get('search_movie').state, OPEN)
+        self.assertEqual(breakers.get('movie').state, CLOSED)
+        self.assertEqual(set(breakers.stats()), {'search_movie', 'movie'})
+
+    def test_circuits_close_after_a_fork(self):
+        breakers = Breakers(min_calls=1)
+        call(breakers.get('movie'), False)
+        with patch('breaker.os.getpid', return_value=-1):
+            self.assertEqual(breakers.get('movie').state, CLOSED)
+
+
+class FaultyTMDb:
+    """
+    A local stand-in for TMDb whose answers can be made slow or failing:
+    mode is 'ok', 'slow' (delay seconds, then a 200) or 'error' (a 500).
+    """
+
+    def __init__(self, delay=1.0):
+        self.mode = 'ok'
+        self.delay = delay
+        self.requests = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                stub.requests += 1
+                mode = stub.mode
+                if mode == 'slow':
+                    time.sleep(stub.delay)
+                body = json.dumps({'id': 1, 'results': [{
+                    'id': 1, 'title': 'Live', 'poster_path': '/p.jpg',
+                    'release_date': '2024-01-01', 'vote_average': 7.0,
+                }]} if mode != 'error' else {'status_code': 11}).encode()
+                self.send_response(500 if mode == 'error' else 200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                try:
+                    self.wfile.write(body)
+                except OSError:
+                    pass
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.server.server_port}/3'
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class TestAgainstFaultyTMDb(unittest.TestCase):
+    def setUp(self):
+        self.stub = FaultyTMDb(delay=0.5)
+        self.client = TMDbClient(
+            api_key='key', base_url=self.stub.url, read_timeout=0.25, max_retries=2, backoff=0.01,
+            cache=TMDbCache(local=LRUCache()),
+            breakers=Breakers(min_calls=3, slow_call=0.2, open_seconds=0.3))
+
+    def tearDown(self):
+        self.client.close()
+        self.stub.close()
+
+    def open_circuit(self, path):
+        for page in range(10):
+            try:
+                self.client.get(path, {'page': page})
+            except Exception:
+                pass
+            if self.client.breaker_for('movie').state == OPEN:
+                return
+        self.fail('The circuit never opened')
+
+    def timed_get(self, path, params=None):
+        started = time.perf_counter()
+        response = self.client.get(path, params)
+        return response, time.perf_counter() - started
+
+    def test_errors_open_the_circuit(self):
+        self.stub.mode = 'error'
+        self.open_circuit('/movie/550')
+        requests = self.stub.requests
+
+        response, elapsed = self.timed_get('/movie/550', {'page': 99})
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json(), {})
+        self.assertLess(elapsed, 0.05)
+        self.assertEqual(self.stub.requests, requests)
+        self.assertEqual(self.client.breakers.stats()['movie']['fallbacks'], 1)
+
+    def test_timeouts_open_the_circuit(self):
+        self.stub.mode = 'slow'
+        self.open_circuit('/movie/550')
+
+        response, elapsed = self.timed_get('/movie/550', {'page': 99})
+
+        self.assertEqual(response.status_code, 503)
+        self.assertLess(elapsed, 0.05)
+
+    def test_last_known_good_payload_is_served_while_open(self):
+        self.client.cache.set('movie', cache_key('/movie/550'), {'id': 550},
+                              stored_at=time.time() - 1.5 * 86400)
+        self.stub.mode = 'error'
+        # Past its hard TTL the entry is not served while TMDb can be asked
+        self.assertEqual(self.client.get('/movie/550').status_code, 500)
+        self.open_circuit('/movie/550')
+
+        response, elapsed = self.timed_get('/movie/550')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'id': 550})
+        self.assertLess(elapsed, 0.05)
+
+    def test_recovers_through_a_probe(self):
+        self.stub.mode = 'error'
+        self.open_circuit('/movie/550')
+        self.stub.mode = 'ok'
+        time.sleep(0.35)
+
+        response = self.client.get('/movie/550')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['id'], 1)
+        self.assertEqual(self.client.breaker_for('movie').state, CLOSED)
+
+    def test_other_endpoints_keep_calling_tmdb(self):
+        self.stub.mode = 'error'
+        self.open_circuit('/movie/550')
+        self.stub.mode = 'ok'
+
+        response = self.client.get('/search/movie', {'query': 'Alien'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['title'], 'Live')
+
+    def test_async_client_fails_fast_while_open(self):
+        self.stub.mode = 'error'
+        self.open_circuit('/movie/550')
+        async_client = AsyncTMDbClient(self.client)
+
+        async def timed_get():
+            started = time.perf_counter()
+            response = await async_client.get('/movie/550', {'page': 99})
+            return response, time.perf_counter() - started
+
+        try:
+            response, elapsed = asyncio.run(timed_get())
+        finally:
+            async_client.close()
+
+        self.assertEqual(response.status_code, 503)
+        self.assertLess(elapsed, 0.05)
+
+
+class TestViewsDegrade(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        self.stub = FaultyTMDb(delay=1.0)
+        self.stub.mode = 'slow'
+        if tmdb.cache is not None:
+            tmdb.cache.clear()
+        self.patches = [
+            patch.object(tmdb, 'base_url', self.stub.url),
+            patch.object(tmdb, 'timeout', (1, 0.2)),
+            patch.object(tmdb, 'backoff', 0.01),
+            patch.object(tmdb, 'breakers', Breakers(min_calls=2, slow_call=0.1, open_seconds=60)),
+        ]
+        for patcher in self.patches:
+            patcher.start()
+        tmdb.close()
+
+    def tearDown(self):
+        for patcher in reversed(self.patches):
+            patcher.stop()
+        tmdb.close()
+        self.stub.close()
+
+    def test_dashboard_renders_empty_rows_in_milliseconds_while_open(self):
+        # Two slow page loads open every row's circuit
+        self.client.get('/')
+        self.client.get('/')
+        self.assertEqual({breaker['state'] for breaker in tmdb.breakers.stats().values()}, {OPEN})
+        requests = self.stub.requests
+
+        started = time.perf_counter()
+        response = self.client.get('/')
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Horror Movies', response.data)
+        self.assertNotIn(b'Live', response.data)
+        self.assertLess(elapsed, 0.1)
+        self.assertEqual(self.stub.requests, requests)
+
+    def test_cache_stats_need_a_login(self):
+        response = self.client.get('/cache/stats')
+
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('/login', response.location)
+
+    def test_cache_stats_report_the_circuits(self):
+        self.client.get('/')
+        self.client.get('/')
+
+        with patch.dict(app.config, {'LOGIN_DISABLED': True}):
+            breakers = self.client.get('/cache/stats').get_json()['breakers']
+
+        self.assertEqual(breakers['now_playing']['state'], OPEN)
+        self.assertGreaterEqual(breakers['now_playing']['opened'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
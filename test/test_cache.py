@@ -0,0 +1,222 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import json
+import threading
+import time
+import unittest
+from unittest.mock import patch, Mock
+import fakeredis
+import metrics
+from cache import LRUCache, TMDbCache
+from tmdb import TMDbClient, endpoint_for, cache_key
+
+
+def make_response(payload):
+    response = Mock()
+    response.status_code = 200
+    response.headers = {}
+    response.json.return_value = payload
+    return response
+
+
+class TestLRUCache(unittest.TestCase):
+    def test_expired_entries_are_dropped(self):
+        cache = LRUCache()
+        cache.set('a', '"x"', ttl=10, stored_at=100)
+        self.assertEqual(cache.get('a', now=105), (100, '"x"'))
+        self.assertIsNone(cache.get('a', now=111))
+        self.assertEqual(cache.bytes, 0)
+
+    def test_evicts_least_recently_used_by_size(self):
+        cache = LRUCache(max_bytes=10)
+        cache.set('a', 'aaaa', ttl=60)
+        cache.set('b', 'bbbb', ttl=60)
+        cache.get('a')
+        cache.set('c', 'cccc', ttl=60)
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('c'))
+        self.assertEqual(cache.bytes, 8)
+        self.assertEqual(cache.evictions, 1)
+
+    def test_oversized_values_are_not_stored(self):
+        cache = LRUCache(max_bytes=3)
+        cache.set('a', 'aaaa', ttl=60)
+        self.assertEqual(len(cache), 0)
+
+
+class TestTMDbCache(unittest.TestCase):
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis()
+        self.cache = TMDbCache(local=LRUCache(), redis_client=self.redis)
+
+    def test_per_endpoint_ttls(self):
+        self.assertEqual(self.cache.ttl_for('now_playing'), 300)
+        self.assertEqual(self.cache.ttl_for('discover'), 3600)
+        self.cache.set('popular', '/movie/popular', {'results': []})
+        self.cache.set('movie', '/movie/550', {'id': 550})
+        self.assertLessEqual(self.redis.ttl('tmdb:/movie/popular'), 300)
+        self.assertGreater(self.redis.ttl('tmdb:/movie/550'), 3600)
+
+    def test_stale_while_revalidate_entries_live_until_hard_ttl(self):
+        self.cache.set('now_playing', '/movie/now_playing', {'results': []})
+        self.assertGreater(self.redis.ttl('tmdb:/movie/now_playing'), 300)
+
+    def test_redis_hit_is_promoted_to_local(self):
+        self.cache.set('movie', '/movie/550', {'id': 550})
+        self.cache.local.clear()
+
+        self.assertEqual(self.cache.get('movie', '/movie/550'), {'id': 550})
+        self.assertEqual(self.cache.get('movie', '/movie/550'), {'id': 550})
+        self.assertEqual(self.cache.stats()['endpoints']['movie'],
+                         {'local_hits': 1, 'redis_hits': 1, 'stale_hits': 0, 'misses': 0})
+
+    def test_shared_between_workers(self):
+        other_worker = TMDbCache(local=LRUCache(), redis_client=self.redis)
+        self.cache.set('popular', '/movie/popular', {'results': [1]})
+        self.assertEqual(other_worker.get('popular', '/movie/popular'), {'results': [1]})
+
+    def test_redis_errors_are_misses(self):
+        broken = Mock()
+        broken.get.side_effect = ConnectionError
+        cache = TMDbCache(local=LRUCache(), redis_client=broken)
+        self.assertIsNone(cache.get('movie', '/movie/1'))
+        self.assertEqual(cache.stats()['total']['misses'], 1)
+
+
+class TestClientCaching(unittest.TestCase):
+    def setUp(self):
+        self.cache = TMDbCache(local=LRUCache(), redis_client=fakeredis.FakeRedis())
+        self.client = TMDbClient(api_key='key', base_url='https://tmdb.test/3', cache=self.cache)
+
+    def test_endpoint_names(self):
+        self.assertEqual(endpoint_for('/movie/550'), 'movie')
+        self.assertEqual(endpoint_for('/movie/now_playing'), 'now_playing')
+        self.assertEqual(endpoint_for('/discover/movie'), 'discover')
+        self.assertEqual(endpoint_for('/search/person'), 'search_person')
+
+    def test_cache_key_ignores_parameter_order(self):
+        self.assertEqual(cache_key('/discover/movie', {'page': 1, 'with_genres': 28}),
+                         cache_key('discover/movie/', {'with_genres': 28, 'page': 1}))
+
+    @patch('requests.Session.get')
+    def test_second_call_is_served_from_cache(self, mock_get):
+        mock_get.return_value = make_response({'id': 550, 'title': 'Fight Club'})
+
+        first = self.client.get('/movie/550', {'append_to_response': 'credits'})
+        second = self.client.get('/movie/550', {'append_to_response': 'credits'})
+
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertFalse(first.from_cache)
+        self.assertTrue(second.from_cache)
+        self.assertEqual(second.json()['title'], 'Fight Club')
+        self.assertEqual(json.loads(self.cache.redis.get('tmdb:/movie/550?append_to_response=credits'))['v'],
+                         {'id': 550, 'title': 'Fight Club'})
+
+    @patch('requests.Session.get')
+    def test_errors_are_not_cached(self, mock_get):
+        error = make_response({})
+        error.status_code = 404
+        mock_get.return_value = error
+
+        self.client.get('/movie/1')
+        self.client.get('/movie/1')
+
+        self.assertEqual(mock_get.call_count, 2)
+
+
+class TestStaleWhileRevalidate(unittest.TestCase):
+    def setUp(self):
+        self.cache = TMDbCache(local=LRUCache(), redis_client=fakeredis.FakeRedis(),
+                               ttls={'now_playing': 60}, hard_ttls={'now_playing': 600})
+        self.client = TMDbClient(api_key='key', base_url='https://tmdb.test/3', cache=self.cache)
+        self.key = cache_key('/movie/now_playing', {'page': 1})
+
+    @patch('requests.Session.get')
+    def test_fresh_entry_is_not_refreshed(self, mock_get):
+        self.cache.set('now_playing', self.key, {'results': ['old']})
+        self.client.get('/movie/now_playing', {'page': 1})
+        mock_get.assert_not_called()
+
+    @patch('requests.Session.get')
+    def test_stale_entry_is_served_and_refreshed(self, mock_get):
+        mock_get.return_value = make_response({'results': ['new']})
+        self.cache.set('now_playing', self.key, {'results': ['old']}, stored_at=time.time() - 120)
+
+        response = self.client.get('/movie/now_playing', {'page': 1})
+        self.assertEqual(response.json(), {'results': ['old']})
+
+        self._wait_for_refresh()
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertEqual(self.client.get('/movie/now_playing', {'page': 1}).json(),
+                         {'results': ['new']})
+        self.assertEqual(self.cache.stats()['endpoints']['now_playing']['stale_hits'], 1)
+
+    @patch('requests.Session.get')
+    def test_refresh_runs_in_the_background_untimed(self, mock_get):
+        threads = []
+
+        def get(url, params=None, timeout=None):
+            threads.append(threading.current_thread().name)
+            return make_response({'results': ['new']})
+
+        mock_get.side_effect = get
+        self.cache.set('now_playing', self.key, {'results': ['old']}, stored_at=time.time() - 120)
+        timings = metrics.Timings()
+
+        with patch.object(metrics, 'enabled', True), metrics.recording(timings):
+            self.client.get('/movie/now_playing', {'page': 1})
+            self._wait_for_refresh()
+
+        self.assertEqual(len(threads), 1)
+        self.assertTrue(threads[0].startswith('movievault-background'))
+        self.assertEqual(timings.parts['tmdb'], [])
+
+    @patch('requests.Session.get')
+    def test_single_refresh_per_key(self, mock_get):
+        release = threading.Event()
+
+        def slow_get(url, params=None, timeout=None):
+            release.wait(5)
+            return make_response({'results': ['new']})
+
+        mock_get.side_effect = slow_get
+        self.cache.set('now_playing', self.key, {'results': ['old']}, stored_at=time.time() - 120)
+
+        for _ in range(20):
+            self.assertEqual(self.client.get('/movie/now_playing', {'page': 1}).json(),
+                             {'results': ['old']})
+        release.set()
+        self._wait_for_refresh()
+        self.assertEqual(mock_get.call_count, 1)
+
+    @patch('requests.Session.get')
+    def test_refresh_is_skipped_while_another_worker_holds_the_lock(self, mock_get):
+        self.cache.set('now_playing', self.key, {'results': ['old']}, stored_at=time.time() - 120)
+        self.assertTrue(self.cache.acquire_refresh(self.key))
+
+        self.client.get('/movie/now_playing', {'page': 1})
+        self._wait_for_refresh()
+        mock_get.assert_not_called()
+
+    @patch('requests.Session.get')
+    def test_entry_past_hard_ttl_is_fetched_synchronously(self, mock_get):
+        mock_get.return_value = make_response({'results': ['new']})
+        self.cache.set('now_playing', self.key, {'results': ['old']}, stored_at=time.time() - 700)
+
+        response = self.client.get('/movie/now_playing', {'page': 1})
+
+        self.assertEqual(response.json(), {'results': ['new']})
+        self.assertEqual(mock_get.call_count, 1)
+
+    def _wait_for_refresh(self):
+        deadline = time.time() + 5
+        while self.client._refreshing and time.time() < deadline:
+            time.sleep(0.01)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,222 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import importlib.util
+import json
+import tempfile
+import unittest
+from datetime import date
+from unittest.mock import patch, Mock
+import sqlalchemy as sa
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from sqlalchemy.exc import IntegrityError
+import catalog
+from app import app, db, fetch_movie_by_id, fetch_movies_by_genre, fetch_new_movies
+from helpers import reset_tmdb
+from models import CatalogIngest, Movie, MovieGenre, MovieCast
+
+FIGHT_CLUB = {
+    'id': 550,
+    'title': 'Fight Club',
+    'original_title': 'Fight Club',
+    'poster_path': '/fight.jpg',
+    'release_date': '1999-10-15',
+    'overview': 'An insomniac office worker...',
+    'vote_average': 8.4,
+    'vote_count': 30000,
+    'popularity': 60.0,
+    'runtime': 139,
+    'genres': [{'id': 18, 'name': 'Drama'}],
+    'credits': {'cast': [{'id': 287, 'name': 'Brad Pitt', 'character': 'Tyler Durden'},
+                         {'id': 819, 'name': 'Edward Norton', 'character': 'The Narrator'}]},
+}
+
+
+class TestCatalog(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.min_rows = app.config['CATALOG_MIN_ROWS']
+        self.runner = app.test_cli_runner()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        reset_tmdb()
+        with app.app_context():
+            db.create_all()
+
+    def tearDown(self):
+        app.config['CATALOG_MIN_ROWS'] = self.min_rows
+        self.tmpdir.cleanup()
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def write_dump(self, records):
+        path = os.path.join(self.tmpdir.name, 'movie_ids.json')
+        with open(path, 'w') as dump:
+            for record in records:
+                dump.write(json.dumps(record) + '\n')
+        return path
+
+    def test_ingest_command_streams_in_batches(self):
+        records = [{'adult': False, 'id': movie_id, 'original_title': f'Movie {movie_id}',
+                    'popularity': movie_id / 10, 'video': False} for movie_id in range(1, 8)]
+        path = self.write_dump(records)
+
+        with app.app_context(), patch('catalog.write_batch', wraps=__import__('catalog').write_batch) as batches:
+            result = self.runner.invoke(args=['catalog', 'ingest', path, '--batch-size', '3'])
+            self.assertEqual(result.exit_code, 0, result.output)
+            self.assertIn('Ingested 7 movies', result.output)
+            self.assertEqual([len(call.args[0]) for call in batches.call_args_list], [3, 3, 1])
+            self.assertEqual(Movie.query.count(), 7)
+            self.assertEqual(db.session.get(Movie, 3).title, 'Movie 3')
+
+    def test_reingesting_thin_export_keeps_details(self):
+        self.runner.invoke(args=['catalog', 'ingest', self.write_dump([FIGHT_CLUB])])
+        thin = {'adult': False, 'id': 550, 'original_title': 'Fight Club', 'popularity': 70.0}
+        self.runner.invoke(args=['catalog', 'ingest', self.write_dump([thin])])
+
+        with app.app_context():
+            movie = db.session.get(Movie, 550)
+            self.assertTrue(movie.detailed)
+            self.assertEqual(movie.runtime, 139)
+            self.assertEqual(movie.popularity, 70.0)
+            self.assertEqual(MovieCast.query.filter_by(movie_id=550).count(), 2)
+            self.assertEqual(MovieGenre.query.filter_by(movie_id=550).count(), 1)
+
+    def test_batch_repeating_a_movie_keeps_the_last_record(self):
+        thin = {'adult': False, 'id': 550, 'original_title': 'Fight Club', 'popularity': 70.0}
+
+        with app.app_context():
+            with patch.object(db.session, 'execute', wraps=db.session.execute) as execute:
+                catalog.write_batch([thin, FIGHT_CLUB, dict(FIGHT_CLUB, popularity=80.0)])
+                statements = [call.args[1] for call in execute.call_args_list if len(call.args) > 1]
+            db.session.commit()
+
+            self.assertEqual([row['id'] for row in statements[0]], [550])
+            movie = db.session.get(Movie, 550)
+            self.assertTrue(movie.detailed)
+            self.assertEqual(movie.popularity, 80.0)
+            self.assertEqual(MovieCast.query.filter_by(movie_id=550).count(), 2)
+
+    @patch('requests.Session.get')
+    def test_movie_by_id_reads_catalog_first(self, mock_get):
+        self.runner.invoke(args=['catalog', 'ingest', self.write_dump([FIGHT_CLUB])])
+
+        with app.app_context():
+            movie = fetch_movie_by_id(550)
+
+        mock_get.assert_not_called()
+        self.assertEqual(movie['title'], 'Fight Club')
+        self.assertEqual(movie['genres'], [{'id': 18, 'name': 'Drama'}])
+        self.assertEqual(movie['credits']['cast'][0]['name'], 'Brad Pitt')
+
+    @patch('requests.Session.get')
+    def test_movie_by_id_miss_is_written_through(self, mock_get):
+        response = Mock()
+        response.status_code = 200
+        response.json.return_value = FIGHT_CLUB
+        mock_get.return_value = response
+
+        with app.app_context():
+            fetch_movie_by_id(550)
+            reset_tmdb()
+            movie = fetch_movie_by_id(550)
+
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertEqual(movie['runtime'], 139)
+
+    @patch('requests.Session.get')
+    def test_dashboard_rows_read_populated_catalog(self, mock_get):
+        app.config['CATALOG_MIN_ROWS'] = 2
+        recent = date.today().isoformat()
+        records = [
+            {'id': 1, 'title': 'Explosions', 'poster_path': '/1.jpg', 'release_date': recent,
+             'popularity': 90.0, 'genre_ids': [28]},
+            {'id': 2, 'title': 'Quiet Drama', 'poster_path': '/2.jpg', 'release_date': '1990-01-01',
+             'popularity': 10.0, 'genre_ids': [18]},
+        ]
+        self.runner.invoke(args=['catalog', 'ingest', self.write_dump(records)])
+
+        with app.app_context():
+            action = fetch_movies_by_genre('Action')
+            new = fetch_new_movies()
+
+        mock_get.assert_not_called()
+        self.assertEqual([movie['title'] for movie in action], ['Explosions'])
+        self.assertEqual([movie['id'] for movie in new], [1])
+
+    @patch('requests.Session.get')
+    def test_small_catalog_falls_back_to_tmdb(self, mock_get):
+        response = Mock()
+        response.status_code = 200
+        response.json.return_value = {'results': [{'id': 9, 'title': 'From TMDb'}]}
+        mock_get.return_value = response
+        self.runner.invoke(args=['catalog', 'ingest', self.write_dump([FIGHT_CLUB])])
+
+        with app.app_context():
+            action = fetch_movies_by_genre('Action')
+
+        self.assertEqual(action, [{'id': 9, 'title': 'From TMDb'}])
+
+    @patch('requests.Session.get')
+    def test_written_through_movies_do_not_open_the_catalog(self, mock_get):
+        response = Mock()
+        response.status_code = 200
+        response.json.return_value = {'results': [{'id': 9, 'title': 'From TMDb'}]}
+        mock_get.return_value = response
+        app.config['CATALOG_MIN_ROWS'] = 1
+        catalog._size_cache['expires_at'] = 0.0
+
+        with app.app_context():
+            catalog.store_movies([dict(FIGHT_CLUB, genres=[{'id': 28, 'name': 'Action'}])])
+            self.assertEqual(Movie.query.count(), 1)
+            self.assertEqual(catalog.ingested_size(), 0)
+            action = fetch_movies_by_genre('Action')
+
+        self.assertEqual(action, [{'id': 9, 'title': 'From TMDb'}])
+
+    def test_ingest_records_the_catalog_size(self):
+        self.runner.invoke(args=['catalog', 'ingest', self.write_dump([FIGHT_CLUB])])
+        self.runner.invoke(args=['catalog', 'ingest', self.write_dump([dict(FIGHT_CLUB, id=551)])])
+
+        with app.app_context():
+            self.assertEqual([run.movies for run in CatalogIngest.query.order_by(CatalogIngest.id)], [1, 2])
+            self.assertEqual(catalog.ingested_size(), 2)
+
+    def test_conflicting_write_through_is_skipped(self):
+        conflict = IntegrityError('INSERT INTO movie_cast', {}, Exception('duplicate key'))
+
+        with app.app_context(), patch('catalog.write_batch', side_effect=conflict):
+            catalog.store_movies([FIGHT_CLUB])
+            self.assertEqual(Movie.query.count(), 0)
+
+
+class TestCatalogIngestMigration(unittest.TestCase):
+    def setUp(self):
+        path = os.path.join(os.path.dirname(__file__), '../src/migrations/versions',
+                            'c5e8d2a17f40_add_catalog_ingest.py')
+        spec = importlib.util.spec_from_file_location('catalog_ingest_migration', path)
+        self.migration = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(self.migration)
+        self.engine = sa.create_engine('sqlite://')
+
+    def run_migration(self, step):
+        with self.engine.begin() as connection:
+            with Operations.context(MigrationContext.configure(connection)):
+                step()
+
+    def test_upgrade_creates_the_table_once(self):
+        self.run_migration(self.migration.upgrade)
+        self.run_migration(self.migration.upgrade)
+
+        self.assertEqual({column['name'] for column in sa.inspect(self.engine).get_columns('catalog_ingest')},
+                         {'id', 'finished_at', 'movies'})
+
+        self.run_migration(self.migration.downgrade)
+        self.assertNotIn('catalog_ingest', sa.inspect(self.engine).get_table_names())
+
+
+if __name__ == '__main__':
+    unittest.main()
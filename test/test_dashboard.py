@@ -0,0 +1,81 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import time
+import unittest
+import requests
+from unittest.mock import patch, Mock
+from app import app
+from helpers import reset_tmdb
+
+DELAY = 0.2
+
+
+def stub_tmdb(slow=(), failing=()):
+    """
+    Builds a stand-in for requests.Session.get that answers every TMDb call
+    after DELAY seconds with a single movie named after the requested row.
+    """
+    def get(url, params=None, timeout=None):
+        row = str(params.get('with_genres') or url.rsplit('/', 1)[-1])
+        time.sleep(DELAY * 5 if row in slow else DELAY)
+        if row in failing:
+            raise requests.exceptions.ConnectionError(row)
+        response = Mock()
+        response.status_code = 200
+        response.json.return_value = {'results': [{
+            'id': 1, 'title': f'Row {row}', 'poster_path': '/p.jpg',
+            'release_date': '2024-01-01', 'vote_average': 7.0,
+        }]}
+        return response
+    return get
+
+
+class TestDashboardFanOut(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        self.timeout = app.config['DASHBOARD_ROW_TIMEOUT']
+        reset_tmdb()
+
+    def tearDown(self):
+        app.config['DASHBOARD_ROW_TIMEOUT'] = self.timeout
+
+    def test_rows_are_fetched_in_parallel(self):
+        with patch('requests.Session.get', side_effect=stub_tmdb()) as mock_get:
+            start = time.perf_counter()
+            response = self.client.get('/')
+            elapsed = time.perf_counter() - start
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mock_get.call_count, 6)
+        self.assertLess(elapsed, DELAY * 3)
+        for row in (b'now_playing', b'top_rated', b'28', b'35', b'27', b'10749'):
+            self.assertIn(b'Row ' + row, response.data)
+
+    def test_failed_row_renders_empty_section(self):
+        with patch('requests.Session.get', side_effect=stub_tmdb(failing={'27'})):
+            response = self.client.get('/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Horror Movies', response.data)
+        self.assertNotIn(b'Row 27', response.data)
+        self.assertIn(b'Row 28', response.data)
+
+    def test_slow_row_renders_empty_section(self):
+        app.config['DASHBOARD_ROW_TIMEOUT'] = DELAY * 2
+        with patch('requests.Session.get', side_effect=stub_tmdb(slow={'top_rated'})):
+            start = time.perf_counter()
+            response = self.client.get('/')
+            elapsed = time.perf_counter() - start
+
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(elapsed, DELAY * 4)
+        self.assertNotIn(b'Row top_rated', response.data)
+        self.assertIn(b'Row now_playing', response.data)
+
+
+if __name__ == '__main__':
+    unittest.main()
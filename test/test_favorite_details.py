@@ -0,0 +1,143 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import unittest
+from unittest.mock import patch, Mock
+from app import app, db, User, Favorite
+from helpers import reset_tmdb
+from models import FavoriteGenre, FavoriteCast
+import favorites
+import recommendation_store
+from werkzeug.security import generate_password_hash
+
+
+def details(movie_id, title, genres, cast):
+    return {
+        'id': movie_id,
+        'title': title,
+        'poster_path': f'/{movie_id}.jpg',
+        'release_date': '1999-10-15',
+        'vote_average': 8.0,
+        'runtime': 120,
+        'genres': [{'id': genre_id, 'name': name} for genre_id, name in genres],
+        'credits': {'cast': [{'id': position, 'name': name} for position, name in enumerate(cast)]},
+    }
+
+
+FIGHT_CLUB = details(550, 'Fight Club', [(18, 'Drama')],
+                     ['Brad Pitt', 'Edward Norton', 'Helena Bonham Carter', 'Meat Loaf'])
+SEVEN = details(807, 'Se7en', [(80, 'Crime'), (18, 'Drama')],
+                ['Brad Pitt', 'Morgan Freeman', 'Gwyneth Paltrow'])
+HEAT = details(949, 'Heat', [(80, 'Crime')], ['Al Pacino', 'Robert De Niro', 'Val Kilmer'])
+MOVIES = {movie['id']: movie for movie in (FIGHT_CLUB, SEVEN, HEAT)}
+
+
+class TestFavoriteDetails(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        reset_tmdb()
+        with app.app_context():
+            db.create_all()
+            user = User(username='vaulter', password=generate_password_hash('testpassword'),
+                        first_name='Test', last_name='User')
+            db.session.add(user)
+            db.session.commit()
+            self.user_id = user.id
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def login(self):
+        self.client.post('/login', data=dict(username='vaulter', password='testpassword'))
+
+    def add(self, *movie_ids):
+        with patch('app.fetch_movie_by_id', side_effect=lambda movie_id: MOVIES[movie_id]):
+            for movie_id in movie_ids:
+                self.client.post(f'/add_to_favorites/{movie_id}')
+            recommendation_store.wait(5)
+
+    def test_add_to_favorites_records_genres_and_top_cast(self):
+        self.login()
+        self.add(550)
+
+        with app.app_context():
+            favorite = Favorite.query.filter_by(user_id=self.user_id).one()
+            self.assertEqual([genre.name for genre in favorite.genres], ['Drama'])
+            self.assertEqual([member.name for member in favorite.cast],
+                             ['Brad Pitt', 'Edward Norton', 'Helena Bonham Carter'])
+            self.assertEqual({member.user_id for member in favorite.cast}, {self.user_id})
+
+    def test_most_common_genre_and_actor_use_one_query_each(self):
+        self.login()
+        self.add(550, 807, 949)
+
+        with app.app_context():
+            self.assertEqual(favorites.most_common_genre(self.user_id), 'Drama')
+            self.assertEqual(favorites.most_common_actor(self.user_id), 'Brad Pitt')
+            self.assertIsNone(favorites.most_common_genre(self.user_id + 1))
+
+    def test_ties_go_to_the_first_favorite(self):
+        self.login()
+        self.add(949, 550)
+
+        with app.app_context():
+            self.assertEqual(favorites.most_common_genre(self.user_id), 'Crime')
+            self.assertEqual(favorites.most_common_actor(self.user_id), 'Al Pacino')
+
+    @patch('app.fetch_movies_by_actor', return_value=[])
+    @patch('app.fetch_movies_by_genre', return_value=[])
+    def test_recommendations_make_no_detail_calls(self, mock_genre, mock_actor):
+        self.login()
+        self.add(550, 807)
+
+        with patch('app.fetch_movie_by_id') as mock_fetch:
+            response = self.client.get('/recommendations')
+
+        self.assertEqual(response.status_code, 200)
+        mock_fetch.assert_not_called()
+        mock_genre.assert_called_with('Drama')
+        mock_actor.assert_called_with('Brad Pitt')
+
+    def test_removing_a_favorite_removes_its_details(self):
+        self.login()
+        self.add(550)
+
+        with patch('app.fetch_movie_by_id', return_value=FIGHT_CLUB):
+            self.client.post('/remove_from_favorites/550')
+
+        with app.app_context():
+            self.assertEqual(FavoriteGenre.query.count(), 0)
+            self.assertEqual(FavoriteCast.query.count(), 0)
+
+    @patch('requests.Session.get')
+    def test_backfill_command(self, mock_get):
+        def respond(url, params=None, timeout=None):
+            response = Mock()
+            response.status_code = 200 if url.endswith('/movie/807') else 404
+            response.headers = {}
+            response.json.return_value = SEVEN
+            return response
+
+        mock_get.side_effect = respond
+        with app.app_context():
+            for movie_id in (807, 999):
+                db.session.add(Favorite(user_id=self.user_id, movie_id=movie_id, movie_title='Old',
+                                        movie_poster='/old.jpg', movie_release_date='1995-09-22',
+                                        movie_rating=8.0, movie_runtime=127))
+            db.session.commit()
+
+        result = app.test_cli_runner().invoke(args=['favorites', 'backfill'])
+
+        self.assertIn('Backfilled 1 favorites, skipped 1', result.output)
+        with app.app_context():
+            self.assertEqual(favorites.most_common_genre(self.user_id), 'Crime')
+            self.assertEqual(favorites.most_common_actor(self.user_id), 'Brad Pitt')
+
+
+if __name__ == '__main__':
+    unittest.main()
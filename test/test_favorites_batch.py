@@ -0,0 +1,139 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import unittest
+from unittest.mock import patch
+from app import app, db, User, Favorite
+from helpers import reset_tmdb
+from models import FavoriteGenre, FavoriteCast
+import catalog
+import favorites
+import recommendation_store
+from werkzeug.security import generate_password_hash
+
+
+def details(movie_id, title, genres=((18, 'Drama'),), cast=('Brad Pitt', 'Edward Norton')):
+    return {
+        'id': movie_id,
+        'title': title,
+        'poster_path': f'/{movie_id}.jpg',
+        'release_date': '1999-10-15',
+        'vote_average': 8.0,
+        'runtime': 120,
+        'genres': [{'id': genre_id, 'name': name} for genre_id, name in genres],
+        'credits': {'cast': [{'id': position, 'name': name} for position, name in enumerate(cast)]},
+    }
+
+
+MOVIES = {
+    550: details(550, 'Fight Club'),
+    807: details(807, 'Se7en', genres=((80, 'Crime'), (18, 'Drama'))),
+    949: details(949, 'Heat', genres=((80, 'Crime'),), cast=('Al Pacino',)),
+}
+
+
+class TestFavoritesBatch(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        reset_tmdb()
+        with app.app_context():
+            db.create_all()
+            user = User(username='importer', password=generate_password_hash('testpassword'),
+                        first_name='Test', last_name='User')
+            db.session.add(user)
+            db.session.commit()
+            self.user_id = user.id
+        self.client.post('/login', data=dict(username='importer', password='testpassword'))
+
+    def tearDown(self):
+        recommendation_store.wait(5)
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def batch(self, **body):
+        with patch('favorites.fetch_details', side_effect=MOVIES.get) as fetch_details:
+            response = self.client.post('/api/favorites/batch', json=body)
+        self.fetched = sorted(call.args[0] for call in fetch_details.call_args_list)
+        return response
+
+    def statuses(self, response):
+        return {(result['movie_id'], result['action']): result['status']
+                for result in response.get_json()['results']}
+
+    def test_adds_resolve_details_once_and_report_each_movie(self):
+        self.batch(add=[550])
+        response = self.batch(add=[550, 807, 949, 404, 807])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.statuses(response), {
+            (550, 'add'): 'exists', (807, 'add'): 'added', (949, 'add'): 'added', (404, 'add'): 'not_found'})
+        self.assertEqual([result['movie_id'] for result in response.get_json()['results']],
+                         [550, 807, 949, 404])
+        self.assertEqual(self.fetched, [404, 807, 949])
+        with app.app_context():
+            self.assertEqual(Favorite.query.filter_by(user_id=self.user_id).count(), 3)
+            seven = Favorite.query.filter_by(user_id=self.user_id, movie_id=807).one()
+            self.assertEqual(seven.movie_title, 'Se7en')
+            self.assertEqual(sorted(genre.name for genre in seven.genres), ['Crime', 'Drama'])
+            self.assertEqual([member.name for member in seven.cast], ['Brad Pitt', 'Edward Norton'])
+            self.assertEqual(favorites.most_common_genre(self.user_id), 'Drama')
+
+    def test_catalog_movies_are_not_fetched(self):
+        with app.app_context():
+            catalog.store_movies([MOVIES[550], MOVIES[807]])
+
+        response = self.batch(add=[550, 807, 949])
+
+        self.assertEqual(set(self.statuses(response).values()), {'added'})
+        self.assertEqual(self.fetched, [949])
+
+    def test_removes_favorites_with_their_details(self):
+        self.batch(add=[550, 807])
+        response = self.batch(remove=[807, 949])
+
+        self.assertEqual(self.statuses(response), {(807, 'remove'): 'removed',
+                                                   (949, 'remove'): 'not_favorited'})
+        with app.app_context():
+            self.assertEqual([favorite.movie_id for favorite in
+                              Favorite.query.filter_by(user_id=self.user_id)], [550])
+            self.assertEqual(FavoriteGenre.query.filter_by(user_id=self.user_id).count(), 1)
+            self.assertEqual(FavoriteCast.query.filter_by(user_id=self.user_id).count(), 2)
+
+    def test_concurrent_add_is_reported_as_existing(self):
+        def added_elsewhere(movie_ids, timeout):
+            db.session.add(Favorite(**favorites.favorite_row(self.user_id, MOVIES[550])))
+            db.session.flush()
+            return {movie_id: MOVIES[movie_id] for movie_id in movie_ids}
+
+        with patch('favorites.load_details', side_effect=added_elsewhere):
+            response = self.client.post('/api/favorites/batch', json={'add': [550, 807]})
+
+        self.assertEqual(self.statuses(response), {(550, 'add'): 'exists', (807, 'add'): 'added'})
+        with app.app_context():
+            self.assertEqual(Favorite.query.filter_by(user_id=self.user_id).count(), 2)
+
+    def test_rejects_malformed_batches(self):
+        app.config['FAVORITES_BATCH_LIMIT'] = 3
+        try:
+            for body in ([550], {'add': 550}, {'add': ['550']}, {'add': [True]}, {'remove': [0]},
+                         {'add': [550], 'remove': [550]}, {'add': [1, 2], 'remove': [3, 4]}):
+                response = self.batch(**body) if isinstance(body, dict) else \
+                    self.client.post('/api/favorites/batch', json=body)
+                self.assertEqual(response.status_code, 400, body)
+                self.assertIn('error', response.get_json())
+        finally:
+            app.config['FAVORITES_BATCH_LIMIT'] = favorites.BATCH_LIMIT
+        self.assertEqual(self.fetched, [])
+
+    def test_requires_login(self):
+        self.client.post('/logout')
+        response = self.client.post('/api/favorites/batch', json={'add': [550]})
+        self.assertEqual(response.status_code, 401)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,163 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import importlib.util
+import unittest
+from unittest.mock import patch
+import sqlalchemy as sa
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from app import app, db, User, Favorite
+import favorites
+import recommendation_store
+from werkzeug.security import generate_password_hash
+
+MIGRATION = os.path.join(os.path.dirname(__file__), '../src/migrations/versions',
+                         '4d2b7e1c9a3f_dedupe_favorites_and_index_sort_orders.py')
+
+# Ratings and titles repeat so the id tie-breaker decides page boundaries.
+ROWS = [(movie_id, f'Movie {movie_id % 4}', 5.0 + movie_id % 3, f'19{90 + movie_id % 5}-01-01')
+        for movie_id in range(1, 12)]
+
+
+class TestFavoritesPagination(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        with app.app_context():
+            db.create_all()
+            user = User(username='pager', password=generate_password_hash('testpassword'),
+                        first_name='Test', last_name='User')
+            db.session.add(user)
+            db.session.commit()
+            self.user_id = user.id
+            db.session.add_all(Favorite(user_id=self.user_id, movie_id=movie_id, movie_title=title,
+                                        movie_poster=f'/{movie_id}.jpg', movie_release_date=released,
+                                        movie_rating=rating, movie_runtime=100)
+                               for movie_id, title, rating, released in ROWS)
+            db.session.commit()
+        self.client.post('/login', data=dict(username='pager', password='testpassword'))
+
+    def tearDown(self):
+        recommendation_store.wait(5)
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def walk(self, sort, limit):
+        seen, cursor = [], None
+        while True:
+            page, cursor = favorites.page(self.user_id, sort, cursor, limit)
+            self.assertLessEqual(len(page), limit)
+            seen.extend(page)
+            if cursor is None:
+                return seen
+
+    def test_pages_cover_every_favorite_in_sort_order(self):
+        expected = {
+            'added': lambda favorite: -favorite.id,
+            'title': lambda favorite: (favorite.movie_title, favorite.id),
+            'rating': lambda favorite: (-favorite.movie_rating, -favorite.id),
+            'release': lambda favorite: (favorite.movie_release_date, favorite.id),
+        }
+        with app.app_context():
+            everything = Favorite.query.filter_by(user_id=self.user_id).all()
+            for sort, key in expected.items():
+                walked = [favorite.id for favorite in self.walk(sort, limit=3)]
+                ordered = [favorite.id for favorite in sorted(everything, key=key)]
+                if sort == 'release':
+                    ordered.reverse()
+                self.assertEqual(walked, ordered, sort)
+
+    def test_malformed_cursor_starts_from_the_first_page(self):
+        with app.app_context():
+            first, _ = favorites.page(self.user_id, 'title', None, 3)
+            for cursor in ('not-base64!', favorites.encode_cursor([1]), favorites.encode_cursor({}),
+                           favorites.encode_cursor([{'a': 1}, 2]), favorites.encode_cursor([1, 2]),
+                           favorites.encode_cursor(['Movie 1', True])):
+                page, _ = favorites.page(self.user_id, 'title', cursor, 3)
+                self.assertEqual([favorite.id for favorite in page],
+                                 [favorite.id for favorite in first])
+
+    def test_cursor_of_the_wrong_types_is_ignored_by_the_view(self):
+        for sort, values in (('added', [{'a': 1}]), ('rating', ['high', 3]), ('release', [None, 3])):
+            response = self.client.get(f'/favorites?sort={sort}&after={favorites.encode_cursor(values)}')
+            self.assertEqual(response.status_code, 200)
+
+    def test_view_links_to_the_next_page(self):
+        app.config['FAVORITES_PAGE_SIZE'] = 4
+        try:
+            response = self.client.get('/favorites?sort=rating')
+            self.assertIn(b'Next Page', response.data)
+            self.assertNotIn(b'First Page', response.data)
+            with app.app_context():
+                _, cursor = favorites.page(self.user_id, 'rating', None, 4)
+            response = self.client.get(f'/favorites?sort=rating&after={cursor}')
+            self.assertIn(b'First Page', response.data)
+            self.assertEqual(response.data.count(b'class="movie-card"'), 4)
+        finally:
+            app.config['FAVORITES_PAGE_SIZE'] = favorites.PAGE_SIZE
+
+    @patch('app.fetch_movie_by_id')
+    def test_adding_a_favorite_twice_keeps_one_row(self, mock_fetch_movie):
+        response = self.client.post('/add_to_favorites/1')
+
+        self.assertEqual(response.status_code, 302)
+        mock_fetch_movie.assert_not_called()
+        with app.app_context():
+            self.assertEqual(Favorite.query.filter_by(user_id=self.user_id, movie_id=1).count(), 1)
+
+
+class TestFavoritesMigration(unittest.TestCase):
+    def setUp(self):
+        spec = importlib.util.spec_from_file_location('favorites_migration', MIGRATION)
+        self.migration = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(self.migration)
+        self.engine = sa.create_engine('sqlite://')
+        with self.engine.begin() as connection:
+            connection.exec_driver_sql(
+                'CREATE TABLE favorite (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, '
+                'movie_id INTEGER NOT NULL, movie_title VARCHAR(255) NOT NULL, '
+                'movie_poster VARCHAR(255) NOT NULL, movie_release_date VARCHAR(255) NOT NULL, '
+                'movie_rating FLOAT NOT NULL, movie_runtime INTEGER NOT NULL)')
+            connection.exec_driver_sql(
+                'CREATE TABLE favorite_genre (favorite_id INTEGER, genre_id INTEGER, '
+                'user_id INTEGER, name VARCHAR(100))')
+            connection.exec_driver_sql(
+                "INSERT INTO favorite VALUES (1, 1, 550, 'Fight Club', '', '', 8, 1), "
+                "(2, 1, 550, 'Fight Club', '', '', 8, 1), (3, 2, 550, 'Fight Club', '', '', 8, 1), "
+                "(4, 1, 13, 'Forrest Gump', '', '', 8, 1)")
+            connection.exec_driver_sql(
+                "INSERT INTO favorite_genre VALUES (1, 18, 1, 'Drama'), (2, 18, 1, 'Drama')")
+
+    def run_migration(self, step):
+        with self.engine.begin() as connection:
+            with Operations.context(MigrationContext.configure(connection)):
+                step()
+
+    def test_upgrade_dedupes_and_adds_indexes(self):
+        self.run_migration(self.migration.upgrade)
+
+        with self.engine.connect() as connection:
+            self.assertEqual([row[0] for row in connection.exec_driver_sql(
+                'SELECT id FROM favorite ORDER BY id')], [1, 3, 4])
+            self.assertEqual([row[0] for row in connection.exec_driver_sql(
+                'SELECT favorite_id FROM favorite_genre')], [1])
+            with self.assertRaises(sa.exc.IntegrityError):
+                connection.exec_driver_sql(
+                    "INSERT INTO favorite VALUES (5, 1, 550, 'Fight Club', '', '', 8, 1)")
+        indexes = {index['name'] for index in sa.inspect(self.engine).get_indexes('favorite')}
+        self.assertEqual(indexes, {name for name, _, _ in self.migration.INDEXES})
+
+    def test_upgrade_is_a_no_op_on_a_current_schema(self):
+        self.run_migration(self.migration.upgrade)
+        self.run_migration(self.migration.upgrade)
+        self.run_migration(self.migration.downgrade)
+
+        self.assertEqual(sa.inspect(self.engine).get_indexes('favorite'), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
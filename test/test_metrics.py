@@ -0,0 +1,164 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import asyncio
+import time
+import unittest
+from unittest.mock import Mock, patch
+from prometheus_client import REGISTRY
+import sqlalchemy as sa
+import metrics
+from app import app, create_app, db, tmdb
+from helpers import reset_tmdb
+from executor import gather
+from tmdb_async import AsyncTMDbClient
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def slow_response(seconds, payload):
+    def get(*args, **kwargs):
+        time.sleep(seconds)
+        response = Mock(status_code=200)
+        response.json.return_value = payload
+        return response
+    return get
+
+
+MOVIE = {'id': 550, 'title': 'Fight Club', 'poster_path': '/poster.jpg', 'release_date': '1999-10-15',
+         'genres': [{'id': 18, 'name': 'Drama'}], 'vote_average': 8.4, 'runtime': 139, 'overview': '',
+         'credits': {'cast': [{'id': 287, 'name': 'Brad Pitt'}]}}
+
+
+class TestTimings(unittest.TestCase):
+    def test_header_lists_the_parts_with_their_counts(self):
+        timings = metrics.Timings()
+        timings.add('db', 0.002)
+        timings.add('tmdb', 0.1)
+        timings.add('db', 0.0015)
+
+        self.assertEqual(timings.header(0.25),
+                         'tmdb;dur=100.0;desc="1 call", db;dur=3.5;desc="2 queries", total;dur=250.0')
+
+    def test_statement_kinds(self):
+        self.assertEqual(metrics.statement_kind('  select * from user'), 'select')
+        self.assertEqual(metrics.statement_kind('INSERT INTO favorite VALUES (?)'), 'insert')
+        self.assertEqual(metrics.statement_kind('PRAGMA foreign_keys'), 'other')
+
+
+class TestQueryTimings(unittest.TestCase):
+    def test_failed_queries_leave_nothing_on_the_connection(self):
+        timings = metrics.Timings()
+        engine = sa.create_engine('sqlite://')
+
+        with engine.connect() as connection, metrics.recording(timings):
+            with self.assertRaises(sa.exc.OperationalError):
+                connection.exec_driver_sql('SELECT * FROM missing')
+            time.sleep(0.05)
+            connection.exec_driver_sql('SELECT 1')
+            self.assertFalse([value for value in connection.info.values() if value])
+
+        self.assertEqual(len(timings.parts['db']), 1)
+        self.assertLess(timings.parts['db'][0], 0.05)
+
+
+class TestTMDbTimings(unittest.TestCase):
+    def setUp(self):
+        reset_tmdb()
+
+    @patch('requests.Session.get', side_effect=slow_response(0.02, MOVIE))
+    def test_misses_are_timed_per_endpoint(self, mock_get):
+        before = sample('movievault_tmdb_call_seconds_count', endpoint='movie')
+        timings = metrics.Timings()
+
+        with metrics.recording(timings):
+            tmdb.get('/movie/550')
+            tmdb.get('/movie/550')
+
+        count = len(timings.parts['tmdb'])
+        self.assertEqual(count, 1 if tmdb.cache is not None else 2)
+        self.assertGreaterEqual(timings.parts['tmdb'][0], 0.02)
+        self.assertEqual(sample('movievault_tmdb_call_seconds_count', endpoint='movie') - before, count)
+
+    @patch('requests.Session.get', side_effect=slow_response(0.01, MOVIE))
+    def test_calls_on_pool_threads_count_for_the_request(self, mock_get):
+        timings = metrics.Timings()
+
+        with app.app_context(), metrics.recording(timings):
+            gather({page: (lambda page=page: tmdb.get('/movie/550', {'page': page})) for page in range(3)})
+
+        self.assertEqual(len(timings.parts['tmdb']), 3)
+
+    def test_async_calls_are_timed(self):
+        timings = metrics.Timings()
+        async_client = AsyncTMDbClient(tmdb)
+
+        async def fetch():
+            with metrics.recording(timings):
+                return await async_client.get('/movie/550')
+
+        async def slow_fetch(path, params=None):
+            await asyncio.sleep(0.02)
+            return Mock(status_code=200, json=Mock(return_value=MOVIE))
+
+        try:
+            with patch.object(async_client, 'fetch', slow_fetch):
+                asyncio.run(fetch())
+        finally:
+            async_client.close()
+
+        self.assertEqual(len(timings.parts['tmdb']), 1)
+        self.assertGreaterEqual(timings.parts['tmdb'][0], 0.02)
+
+
+class TestRequestTimings(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        with app.app_context():
+            db.create_all()
+        reset_tmdb()
+
+    @patch('app.catalog.get_movie', return_value=None)
+    @patch('requests.Session.get', side_effect=slow_response(0.02, MOVIE))
+    def test_movie_page_reports_its_breakdown(self, mock_get, mock_get_movie):
+        response = self.client.get('/movies/550')
+
+        self.assertEqual(response.status_code, 200)
+        parts = dict(entry.split(';', 1)[0:2] for entry in response.headers['Server-Timing'].split(', '))
+        self.assertEqual(set(parts), {'tmdb', 'db', 'render', 'total'})
+        self.assertIn('desc="1 call"', parts['tmdb'])
+        self.assertIn('desc="1 template"', parts['render'])
+        total = float(parts['total'].split('=')[1])
+        tmdb_ms = float(parts['tmdb'].split(';')[0].split('=')[1])
+        self.assertGreaterEqual(tmdb_ms, 20)
+        self.assertGreaterEqual(total, tmdb_ms)
+
+    def test_metrics_endpoint_serves_the_histograms(self):
+        self.client.get('/login')
+
+        response = self.client.get('/metrics')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith('text/plain'))
+        text = response.get_data(as_text=True)
+        self.assertIn('movievault_request_seconds_bucket{le="0.001",method="GET",view="login"}', text)
+        self.assertIn('movievault_template_render_seconds_count{template="login.html"}', text)
+        self.assertIn('movievault_db_query_seconds_bucket', text)
+
+    def test_metrics_off(self):
+        with patch.object(metrics, 'enabled'):
+            other = create_app({'METRICS': False, 'TESTING': True})
+            self.assertFalse(metrics.enabled)
+        client = other.test_client()
+
+        self.assertEqual(client.get('/metrics').status_code, 404)
+        self.assertNotIn('Server-Timing', client.get('/login').headers)
+
+
+if __name__ == '__main__':
+    unittest.main()
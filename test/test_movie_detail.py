@@ -1,7 +1,14 @@
+import importlib.util
+import os
 import unittest
-from unittest.mock import patch
+from unittest.mock import patch, Mock
+import requests
+import sqlalchemy as sa
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
 from app import app, db
-from models import User
+from helpers import reset_tmdb
+from models import User, TitleLookup
 from flask import session
 from werkzeug.security import generate_password_hash
 
@@ -35,7 +42,7 @@ class TestMovieDetailsIntegration(unittest.TestCase):
             db.session.remove()
             db.drop_all()
 
-    @patch('app.fetch_movie_details')
+    @patch('app.fetch_movie_by_id')
     def test_movie_details(self, mock_fetch_details):
         # Mock the movie details returned from the API
         mock_fetch_details.return_value = {
@@ -51,10 +58,116 @@ class TestMovieDetailsIntegration(unittest.TestCase):
         }
 
         # Simulate GET request to the movie details page
-        response = self.client.get('/movie/Fight Club')
+        response = self.client.get('/movies/550')
         self.assertEqual(response.status_code, 200)
         self.assertIn(b'Fight Club', response.data)
         self.assertIn(b'Brad Pitt', response.data)
+        mock_fetch_details.assert_called_once_with(550)
+
+    @patch('requests.Session.get')
+    def test_title_url_redirects_to_id_url(self, mock_get):
+        reset_tmdb()
+        search_response = Mock()
+        search_response.status_code = 200
+        search_response.json.return_value = {'results': [{'id': 550, 'title': 'Fight Club'}]}
+        mock_get.return_value = search_response
+
+        response = self.client.get('/movie/Fight Club')
+        self.assertEqual(response.status_code, 301)
+        self.assertTrue(response.location.endswith('/movies/550'))
+
+        reset_tmdb()
+        response = self.client.get('/movie/fight  CLUB')
+        self.assertTrue(response.location.endswith('/movies/550'))
+        self.assertEqual(mock_get.call_count, 1)
+
+        with self.app.app_context():
+            self.assertEqual(TitleLookup.query.filter_by(title='fight club').one().movie_id, 550)
+
+    @patch('requests.Session.get')
+    def test_numeric_title_url_resolves_as_a_title(self, mock_get):
+        reset_tmdb()
+        search_response = Mock()
+        search_response.status_code = 200
+        search_response.json.return_value = {'results': [{'id': 530915, 'title': '1917'}]}
+        mock_get.return_value = search_response
+
+        response = self.client.get('/movie/1917')
+
+        self.assertEqual(response.status_code, 301)
+        self.assertTrue(response.location.endswith('/movies/530915'))
+        self.assertEqual(mock_get.call_args[1]['params']['query'], '1917')
+
+    @patch('requests.Session.get')
+    def test_title_url_works_before_the_lookup_table_exists(self, mock_get):
+        reset_tmdb()
+        search_response = Mock()
+        search_response.status_code = 200
+        search_response.json.return_value = {'results': [{'id': 550, 'title': 'Fight Club'}]}
+        mock_get.return_value = search_response
+        with self.app.app_context():
+            TitleLookup.__table__.drop(db.engine)
+        try:
+            response = self.client.get('/movie/Fight Club')
+        finally:
+            with self.app.app_context():
+                TitleLookup.__table__.create(db.engine)
+
+        self.assertEqual(response.status_code, 301)
+        self.assertTrue(response.location.endswith('/movies/550'))
+
+    @patch('requests.Session.get')
+    def test_unknown_title_redirects_to_dashboard(self, mock_get):
+        reset_tmdb()
+        search_response = Mock()
+        search_response.status_code = 200
+        search_response.json.return_value = {'results': []}
+        mock_get.return_value = search_response
+
+        response = self.client.get('/movie/No Such Movie')
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response.location.endswith('/'))
+
+    @patch('requests.Session.get', side_effect=requests.exceptions.ConnectionError('TMDb is down'))
+    def test_title_url_redirects_to_dashboard_when_tmdb_is_down(self, mock_get):
+        reset_tmdb()
+
+        response = self.client.get('/movie/Fight Club')
+
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response.location.endswith('/'))
+        with self.client.session_transaction() as flashed:
+            self.assertIn(('message', 'Movie not found'), flashed['_flashes'])
+        with self.app.app_context():
+            self.assertIsNone(TitleLookup.query.filter_by(title='fight club').first())
+
+class TestTitleLookupMigration(unittest.TestCase):
+    def setUp(self):
+        path = os.path.join(os.path.dirname(__file__), '../src/migrations/versions',
+                            'a91c4e7f3b28_add_title_lookup.py')
+        spec = importlib.util.spec_from_file_location('title_lookup_migration', path)
+        self.migration = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(self.migration)
+        self.engine = sa.create_engine('sqlite://')
+
+    def run_migration(self, step):
+        with self.engine.begin() as connection:
+            with Operations.context(MigrationContext.configure(connection)):
+                step()
+
+    def test_upgrade_creates_the_table_once(self):
+        self.run_migration(self.migration.upgrade)
+        self.run_migration(self.migration.upgrade)
+
+        inspector = sa.inspect(self.engine)
+        self.assertEqual({column['name'] for column in inspector.get_columns('title_lookup')},
+                         {'id', 'title', 'movie_id'})
+        self.assertEqual([index['name'] for index in inspector.get_indexes('title_lookup')],
+                         ['ix_title_lookup_title'])
+
+        self.run_migration(self.migration.downgrade)
+        self.assertNotIn('title_lookup', sa.inspect(self.engine).get_table_names())
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -8,10 +8,14 @@ import requests
 from unittest.mock import patch, MagicMock, Mock
 from app import fetch_movies_by_genre, fetch_top_rated_movies, \
     fetch_movies_by_search, fetch_movie_by_id
+from helpers import reset_tmdb
 
 class TestFetchMoviesByGenre(unittest.TestCase):
 
-    @patch('requests.get')
+    def setUp(self):
+        reset_tmdb()
+
+    @patch('requests.Session.get')
     def test_valid_genre(self, mock_get):
         mock_response = MagicMock()
         mock_response.json.return_value = {'results': ['movie1', 'movie2']}
@@ -20,7 +24,7 @@ class TestFetchMoviesByGenre(unittest.TestCase):
         result = fetch_movies_by_genre(genre_name)
         self.assertEqual(result, ['movie1', 'movie2'])
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_invalid_genre(self, mock_get):
         mock_response = MagicMock()
         mock_response.json.return_value = {'results': []}
@@ -29,14 +33,14 @@ class TestFetchMoviesByGenre(unittest.TestCase):
         result = fetch_movies_by_genre(genre_name)
         self.assertEqual(result, [])
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_api_request_failure(self, mock_get):
         mock_get.side_effect = Exception('API request failed')
         genre_name = 'Action'
         with self.assertRaises(Exception):
             fetch_movies_by_genre(genre_name)
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_api_request_success_no_results(self, mock_get):
         mock_response = MagicMock()
         mock_response.json.return_value = {}
@@ -45,7 +49,7 @@ class TestFetchMoviesByGenre(unittest.TestCase):
         result = fetch_movies_by_genre(genre_name)
         self.assertEqual(result, [])
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_valid_query(self, mock_get):
         mock_response = MagicMock()
         # Add 'poster_path' to the result
@@ -62,7 +66,7 @@ class TestFetchMoviesByGenre(unittest.TestCase):
         self.assertEqual(results, expected_results)
 
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_empty_query(self, mock_get):
         mock_response = MagicMock()
         mock_response.json.return_value = {'results': []}
@@ -71,7 +75,7 @@ class TestFetchMoviesByGenre(unittest.TestCase):
         results = fetch_movies_by_search(query)
         self.assertEqual(results, [])
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_no_results(self, mock_get):
         mock_response = MagicMock()
         mock_response.json.return_value = {'results': []}
@@ -80,7 +84,7 @@ class TestFetchMoviesByGenre(unittest.TestCase):
         results = fetch_movies_by_search(query)
         self.assertEqual(results, [])
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_multiple_results(self, mock_get):
         mock_response = MagicMock()
         # Add 'poster_path' to each result
@@ -102,20 +106,20 @@ class TestFetchMoviesByGenre(unittest.TestCase):
         ]
         self.assertEqual(results, expected_results)
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_request_exception(self, mock_get):
         mock_get.side_effect = requests.exceptions.RequestException
         query = 'exception query'
         with self.assertRaises(requests.exceptions.RequestException):
             fetch_movies_by_search(query)
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_network_error(self, mock_get):
         mock_get.side_effect = requests.exceptions.ConnectionError
         with self.assertRaises(requests.exceptions.ConnectionError):
             fetch_top_rated_movies()
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_invalid_response_format(self, mock_get):
         mock_response = Mock()
         mock_response.json.return_value = {'error': 'Invalid response format'}
@@ -123,7 +127,7 @@ class TestFetchMoviesByGenre(unittest.TestCase):
         result = fetch_top_rated_movies()
         self.assertEqual(result, [])
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_successful_api_call(self, mock_get):
         mock_response = Mock()
         mock_response.status_code = 200
@@ -134,7 +138,7 @@ class TestFetchMoviesByGenre(unittest.TestCase):
 
         self.assertEqual(result, {'id': 123, 'title': 'Test Movie'})
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_invalid_movie_id(self, mock_get):
         mock_response = Mock()
         mock_response.status_code = 404
@@ -142,7 +146,7 @@ class TestFetchMoviesByGenre(unittest.TestCase):
         result = fetch_movie_by_id(123)
         self.assertIsNone(result)
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_api_error(self, mock_get):
         mock_get.side_effect = requests.exceptions.RequestException
         result = fetch_movie_by_id(123)
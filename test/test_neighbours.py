@@ -0,0 +1,113 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import unittest
+from unittest.mock import patch
+import numpy as np
+from scipy import sparse
+from app import app, db, User, Favorite
+from models import MovieNeighbour
+import neighbours
+from werkzeug.security import generate_password_hash
+
+A, B, C, D = 10, 20, 30, 40
+VAULTS = {
+    'ann': [A, B, C],
+    'bob': [A, B],
+    'cat': [A, B, D],
+    'dan': [C, D],
+}
+
+
+class TestNeighbours(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        with app.app_context():
+            db.create_all()
+            for username, movie_ids in VAULTS.items():
+                self.add_user(username, movie_ids)
+            db.session.commit()
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def add_user(self, username, movie_ids):
+        user = User(username=username, password=generate_password_hash('testpassword'),
+                    first_name='Test', last_name='User')
+        db.session.add(user)
+        db.session.flush()
+        for movie_id in movie_ids:
+            db.session.add(Favorite(user_id=user.id, movie_id=movie_id, movie_title=f'Movie {movie_id}',
+                                    movie_poster=f'/{movie_id}.jpg', movie_release_date='2001-01-01',
+                                    movie_rating=7.5, movie_runtime=100))
+        return user
+
+    def test_matrix_is_streamed_in_chunks_and_binary(self):
+        with app.app_context():
+            matrix, movie_ids = neighbours.favorite_matrix(chunk_size=2)
+
+        self.assertEqual(matrix.shape, (4, 4))
+        self.assertEqual(list(movie_ids), [A, B, C, D])
+        self.assertEqual(matrix.sum(), 10)
+        self.assertEqual(matrix.max(), 1)
+
+    def test_neighbours_match_dense_cosine(self):
+        generator = np.random.default_rng(7)
+        dense = (generator.random((60, 25)) < 0.2).astype(np.float32)
+        matrix = sparse.csr_matrix(dense)
+
+        found = dict(neighbours.top_neighbours(matrix, top_n=5, min_users=1, chunk_size=4))
+
+        norms = np.sqrt(dense.sum(axis=0))
+        norms[norms == 0] = 1
+        cosine = (dense.T @ dense) / np.outer(norms, norms)
+        np.fill_diagonal(cosine, 0)
+        for column, pairs in found.items():
+            expected = np.sort(cosine[column])[::-1][:len(pairs)]
+            np.testing.assert_allclose([score for _, score, _ in pairs], expected, rtol=1e-5)
+            for other, score, users in pairs:
+                self.assertEqual(users, int(dense[:, column] @ dense[:, other]))
+
+    def test_build_command_persists_ranked_neighbours(self):
+        result = app.test_cli_runner().invoke(args=['neighbours', 'build'])
+        self.assertIn('Stored neighbours for 2 of 4 movies from 4 users', result.output)
+
+        with app.app_context():
+            rows = MovieNeighbour.query.order_by(MovieNeighbour.movie_id, MovieNeighbour.rank).all()
+            self.assertEqual([(row.movie_id, row.neighbour_id, row.users) for row in rows],
+                             [(A, B, 3), (B, A, 3)])
+            self.assertAlmostEqual(rows[0].score, 1.0)
+            self.assertEqual(rows[0].title, 'Movie 20')
+
+    def test_rebuild_replaces_previous_neighbours(self):
+        runner = app.test_cli_runner()
+        runner.invoke(args=['neighbours', 'build', '--min-users', '1'])
+        runner.invoke(args=['neighbours', 'build'])
+
+        with app.app_context():
+            self.assertEqual(MovieNeighbour.query.count(), 2)
+
+    @patch('app.fetch_recommendations', return_value=([], []))
+    @patch('recommender.recommend', return_value=None)
+    def test_recommendations_show_also_vaulted(self, mock_recommend, mock_fallback):
+        app.test_cli_runner().invoke(args=['neighbours', 'build', '--min-users', '1'])
+        with app.app_context():
+            self.add_user('eve', [D, A])
+            db.session.commit()
+        self.client.post('/login', data=dict(username='eve', password='testpassword'))
+
+        response = self.client.get('/recommendations')
+
+        self.assertIn(b'Users who vaulted Movie 10 also vaulted', response.data)
+        self.assertIn(b'Movie 20 (2001)', response.data)
+        self.assertIn(b'Movie 30 (2001)', response.data)
+        self.assertNotIn(b'Movie 40 (2001)', response.data)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,191 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import importlib.util
+import threading
+import unittest
+from unittest.mock import patch
+import sqlalchemy as sa
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from sqlalchemy.exc import DataError
+from app import app, db, User
+import passwords
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class TestPasswordHasher(unittest.TestCase):
+    def test_canonical_method_spells_out_werkzeug_defaults(self):
+        self.assertEqual(passwords.canonical_method('scrypt'), 'scrypt:32768:8:1')
+        self.assertEqual(passwords.canonical_method('pbkdf2'), 'pbkdf2:sha256:600000')
+        self.assertEqual(passwords.canonical_method('pbkdf2:sha512'), 'pbkdf2:sha512:600000')
+        self.assertEqual(passwords.canonical_method('pbkdf2:sha256:1000'), 'pbkdf2:sha256:1000')
+        with self.assertRaises(ValueError):
+            passwords.canonical_method('md5')
+
+    def test_needs_rehash_when_method_or_cost_changed(self):
+        hasher = passwords.PasswordHasher(method='pbkdf2:sha256:1000', workers=0)
+        current = hasher.hash('secret')
+
+        self.assertFalse(hasher.needs_rehash(current))
+        self.assertTrue(hasher.needs_rehash(generate_password_hash('secret', 'pbkdf2:sha256:2000')))
+        self.assertTrue(hasher.needs_rehash(generate_password_hash('secret', 'scrypt:1024:8:1')))
+
+    def test_hashes_on_the_process_pool(self):
+        hasher = passwords.PasswordHasher(method='pbkdf2:sha256:1000', workers=1)
+        try:
+            stored = hasher.hash('secret')
+            self.assertTrue(stored.startswith('pbkdf2:sha256:1000$'))
+            self.assertTrue(hasher.verify(stored, 'secret'))
+            self.assertFalse(hasher.verify(stored, 'wrong'))
+            self.assertFalse(hasher.verify('not a hash', 'secret'))
+            self.assertIsNotNone(hasher._pool)
+        finally:
+            hasher.reset()
+
+    def test_raises_busy_when_no_slot_frees_up(self):
+        hasher = passwords.PasswordHasher(workers=0, concurrency=1, wait=0.05)
+        started, release = threading.Event(), threading.Event()
+
+        def slow_check(stored_hash, password):
+            started.set()
+            release.wait(5)
+            return True
+
+        with patch('passwords.check_password_hash', side_effect=slow_check):
+            holder = threading.Thread(target=hasher.verify, args=('x$y$z', 'secret'))
+            holder.start()
+            started.wait(5)
+            with self.assertRaises(passwords.PasswordHasherBusy):
+                hasher.verify('x$y$z', 'secret')
+            release.set()
+            holder.join(5)
+            self.assertTrue(hasher.verify('x$y$z', 'secret'))
+
+
+class TestPasswordRoutes(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        passwords.hasher.configure(method='pbkdf2:sha256:1000', workers=0)
+        with app.app_context():
+            db.create_all()
+            user = User(username='hasher', password=generate_password_hash('testpassword', 'pbkdf2:sha256:500'),
+                        first_name='Test', last_name='User')
+            db.session.add(user)
+            db.session.commit()
+            self.user_id = user.id
+
+    def tearDown(self):
+        passwords.hasher.configure(method=app.config['PASSWORD_HASH_METHOD'],
+                                   workers=app.config['PASSWORD_HASH_WORKERS'],
+                                   concurrency=app.config['PASSWORD_HASH_CONCURRENCY'],
+                                   wait=app.config['PASSWORD_HASH_WAIT'])
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def stored_hash(self, username='hasher'):
+        with app.app_context():
+            return User.query.filter_by(username=username).one().password
+
+    def flashes(self):
+        with self.client.session_transaction() as session:
+            return [message for _, message in session.get('_flashes', [])]
+
+    def test_login_rehashes_an_outdated_hash(self):
+        response = self.client.post('/login', data=dict(username='hasher', password='testpassword'))
+
+        self.assertEqual(response.status_code, 302)
+        stored = self.stored_hash()
+        self.assertTrue(stored.startswith('pbkdf2:sha256:1000$'))
+        self.assertTrue(check_password_hash(stored, 'testpassword'))
+
+    def test_failed_login_keeps_the_hash(self):
+        before = self.stored_hash()
+
+        response = self.client.post('/login', data=dict(username='hasher', password='wrong'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Invalid username or password', self.flashes())
+        self.assertEqual(self.stored_hash(), before)
+
+    def test_login_still_succeeds_when_the_rehash_is_busy(self):
+        before = self.stored_hash()
+
+        with patch.object(passwords.hasher, 'hash', side_effect=passwords.PasswordHasherBusy):
+            response = self.client.post('/login', data=dict(username='hasher', password='testpassword'))
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.stored_hash(), before)
+
+    def test_login_still_succeeds_when_the_new_hash_cannot_be_stored(self):
+        before = self.stored_hash()
+        too_long = DataError('UPDATE user SET password', {}, Exception('value too long for type'))
+
+        with patch.object(db.session, 'commit', side_effect=too_long):
+            response = self.client.post('/login', data=dict(username='hasher', password='testpassword'))
+
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response.location.endswith('/'))
+        self.assertEqual(self.stored_hash(), before)
+
+    def test_password_column_fits_the_default_method(self):
+        self.assertGreaterEqual(User.__table__.c.password.type.length,
+                                len(generate_password_hash('secret', passwords.DEFAULT_METHOD)))
+
+    def test_login_returns_503_when_busy(self):
+        with patch.object(passwords.hasher, 'verify', side_effect=passwords.PasswordHasherBusy):
+            response = self.client.post('/login', data=dict(username='hasher', password='testpassword'))
+
+        self.assertEqual(response.status_code, 503)
+        self.assertTrue(any('try again in a moment' in message for message in self.flashes()))
+
+    def test_signup_uses_the_configured_method(self):
+        self.client.post('/signup', data=dict(username='newbie', password='secret',
+                                              first_name='New', last_name='User'))
+
+        stored = self.stored_hash('newbie')
+        self.assertTrue(stored.startswith('pbkdf2:sha256:1000$'))
+        self.assertTrue(check_password_hash(stored, 'secret'))
+
+
+class TestWidenPasswordMigration(unittest.TestCase):
+    def setUp(self):
+        path = os.path.join(os.path.dirname(__file__), '../src/migrations/versions',
+                            'e2f7a9c4b815_widen_user_password.py')
+        spec = importlib.util.spec_from_file_location('widen_password_migration', path)
+        self.migration = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(self.migration)
+        self.engine = sa.create_engine('sqlite://')
+        with self.engine.begin() as connection:
+            connection.exec_driver_sql('CREATE TABLE user (id INTEGER PRIMARY KEY, '
+                                       'username VARCHAR(150) NOT NULL, password VARCHAR(150) NOT NULL)')
+            connection.exec_driver_sql("INSERT INTO user VALUES (1, 'old', 'pbkdf2:sha256:600000$salt$hash')")
+
+    def run_migration(self, step):
+        with self.engine.begin() as connection:
+            with Operations.context(MigrationContext.configure(connection)):
+                step()
+
+    def password_length(self):
+        return next(column['type'].length for column in sa.inspect(self.engine).get_columns('user')
+                    if column['name'] == 'password')
+
+    def test_upgrade_widens_the_column_once(self):
+        self.run_migration(self.migration.upgrade)
+        self.run_migration(self.migration.upgrade)
+
+        self.assertEqual(self.password_length(), 255)
+        with self.engine.connect() as connection:
+            self.assertEqual(connection.exec_driver_sql('SELECT password FROM user').scalar(),
+                             'pbkdf2:sha256:600000$salt$hash')
+
+        self.run_migration(self.migration.downgrade)
+        self.assertEqual(self.password_length(), 150)
+
+
+if __name__ == '__main__':
+    unittest.main()
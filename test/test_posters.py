@@ -0,0 +1,153 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import io
+import shutil
+import tempfile
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+from flask import render_template_string
+from PIL import Image
+from app import app
+import posters
+
+
+def jpeg(width=780, height=1170):
+    output = io.BytesIO()
+    Image.new('RGB', (width, height), (200, 40, 40)).save(output, 'JPEG')
+    return output.getvalue()
+
+
+class TestDiskCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = posters.DiskCache(self.directory, max_bytes=1000)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_set_then_get_returns_a_sharded_path(self):
+        path = self.cache.set('w185/abc.jpg', b'poster')
+
+        self.assertEqual(self.cache.get('w185/abc.jpg'), path)
+        self.assertEqual(os.path.relpath(path, self.directory).count(os.sep), 2)
+        with open(path, 'rb') as file:
+            self.assertEqual(file.read(), b'poster')
+        self.assertIsNone(self.cache.get('w185/missing.jpg'))
+
+    def test_evicts_least_recently_used_files(self):
+        stale = self.cache.set('w185/stale.jpg', b'x' * 400)
+        used = self.cache.set('w185/used.jpg', b'x' * 400)
+        # Mark stale as last used long ago and used as just read
+        os.utime(stale, (time.time() - 3600, time.time() - 3600))
+        os.utime(used, (time.time() - 600, time.time() - 600))
+        self.cache.get('w185/used.jpg')
+
+        self.cache.set('w185/new.jpg', b'x' * 400)
+
+        self.assertIsNone(self.cache.get('w185/stale.jpg'))
+        self.assertIsNotNone(self.cache.get('w185/used.jpg'))
+        self.assertIsNotNone(self.cache.get('w185/new.jpg'))
+        self.assertEqual(self.cache.evictions, 1)
+        self.assertLessEqual(self.cache.size(), 1000)
+
+
+class PosterTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        posters.store.configure(directory=self.directory)
+        self.original = jpeg()
+        patcher = patch.object(posters.store, 'fetch_original', return_value=self.original)
+        self.fetch = patcher.start()
+        self.addCleanup(patcher.stop)
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+
+    def tearDown(self):
+        posters.store.configure(directory=app.config['POSTER_CACHE_DIR'])
+        shutil.rmtree(self.directory)
+
+
+class TestPosterStore(PosterTestCase):
+    def test_variants_are_resized_from_one_fetched_original(self):
+        small = posters.store.variant('w154', 'abc.jpg')
+        large = posters.store.variant('w500', 'abc.jpg')
+
+        with Image.open(small) as image:
+            self.assertEqual(image.size, (154, 231))
+        with Image.open(large) as image:
+            self.assertEqual(image.size, (500, 750))
+        self.fetch.assert_called_once_with('abc.jpg')
+
+    def test_concurrent_misses_fetch_once(self):
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            paths = set(pool.map(lambda _: posters.store.variant('w185', 'abc.jpg'), range(32)))
+
+        self.assertEqual(len(paths), 1)
+        self.fetch.assert_called_once_with('abc.jpg')
+
+
+class TestPosterView(PosterTestCase):
+    def test_serves_a_cacheable_resized_poster(self):
+        response = self.client.get('/poster/w185/abc.jpg')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'image/jpeg')
+        self.assertEqual(response.cache_control.max_age, posters.MAX_AGE)
+        self.assertTrue(response.cache_control.immutable)
+        etag, weak = response.get_etag()
+        self.assertFalse(weak)
+        with Image.open(io.BytesIO(response.data)) as image:
+            self.assertEqual(image.width, 185)
+
+    def test_matching_etag_gets_not_modified(self):
+        etag, _ = self.client.get('/poster/w185/abc.jpg').get_etag()
+
+        response = self.client.get('/poster/w185/abc.jpg', headers={'If-None-Match': f'"{etag}"'})
+
+        self.assertEqual(response.status_code, 304)
+        self.fetch.assert_called_once()
+
+    def test_rejects_unknown_sizes_and_paths(self):
+        self.assertEqual(self.client.get('/poster/w9999/abc.jpg').status_code, 404)
+        self.assertEqual(self.client.get('/poster/w185/abc.exe').status_code, 404)
+        self.assertEqual(self.client.get('/poster/w185/..%2Fusers.db').status_code, 404)
+        self.fetch.assert_not_called()
+
+    def test_origin_failures(self):
+        self.fetch.side_effect = posters.PosterNotFound('abc.jpg')
+        self.assertEqual(self.client.get('/poster/w185/abc.jpg').status_code, 404)
+
+        self.fetch.side_effect = posters.PosterOriginError('abc.jpg: HTTP 500')
+        self.assertEqual(self.client.get('/poster/w185/abc.jpg').status_code, 502)
+
+
+class TestPosterAttrs(unittest.TestCase):
+    def render(self, poster_path):
+        with app.test_request_context():
+            return render_template_string('<img {{ poster_attrs(path, 150) }}>', path=poster_path)
+
+    def test_points_at_the_proxy_with_every_width(self):
+        html = self.render('/abc.jpg')
+
+        self.assertIn('src="/poster/w154/abc.jpg"', html)
+        self.assertIn('sizes="150px"', html)
+        for width in posters.WIDTHS:
+            self.assertIn(f'/poster/w{width}/abc.jpg {width}w', html)
+
+    def test_points_at_tmdb_without_the_proxy(self):
+        with patch.dict(app.config, {'POSTER_PROXY': False}):
+            html = self.render('/abc.jpg')
+
+        self.assertIn('src="https://image.tmdb.org/t/p/w154/abc.jpg"', html)
+
+    def test_missing_poster_renders_no_source(self):
+        self.assertEqual(self.render(None), '<img >')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,235 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import asyncio
+import json
+import threading
+import time
+import unittest
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+import executor
+import ratelimit
+from ratelimit import Scheduler, INTERACTIVE, PREFETCH, BULK
+from tmdb import TMDbClient
+
+
+def timed_acquire(scheduler, name, waits):
+    started = time.monotonic()
+    granted = scheduler.acquire(name)
+    waits.append((name, granted, time.monotonic() - started))
+
+
+class TestScheduler(unittest.TestCase):
+    def test_paces_to_the_rate_after_the_burst(self):
+        scheduler = Scheduler(rate=50, burst=5)
+        started = time.monotonic()
+
+        for _ in range(15):
+            self.assertTrue(scheduler.acquire())
+
+        # 5 tokens up front, then 10 more at 50 a second
+        self.assertGreaterEqual(time.monotonic() - started, 0.18)
+        self.assertEqual(scheduler.stats()['lanes'][INTERACTIVE]['granted'], 15)
+
+    def test_interactive_callers_go_ahead_of_queued_background_work(self):
+        scheduler = Scheduler(rate=20, burst=1, wait=5)
+        scheduler.acquire(BULK)
+        waits = []
+        background = [threading.Thread(target=timed_acquire, args=(scheduler, name, waits))
+                      for name in [BULK] * 10 + [PREFETCH] * 5]
+        for thread in background:
+            thread.start()
+        while scheduler.stats()['lanes'][BULK]['queued'] < 10:
+            time.sleep(0.005)
+
+        timed_acquire(scheduler, INTERACTIVE, waits)
+        for thread in background:
+            thread.join(5)
+
+        order = [name for name, _, _ in waits]
+        self.assertEqual(order[0], INTERACTIVE)
+        # Interactive waited for one token, not for the queue ahead of it
+        self.assertLess(waits[0][2], 0.15)
+        self.assertLess(max(index for index, name in enumerate(order) if name == PREFETCH),
+                        min(index for index, name in enumerate(order) if name == BULK))
+
+    def test_pause_holds_every_lane(self):
+        scheduler = Scheduler(rate=100, burst=10)
+        scheduler.pause(0.3)
+        started = time.monotonic()
+
+        self.assertTrue(scheduler.acquire(INTERACTIVE))
+
+        self.assertGreaterEqual(time.monotonic() - started, 0.3)
+
+    def test_gives_up_after_the_lane_wait(self):
+        scheduler = Scheduler(rate=100, burst=10, wait=0.1)
+        scheduler.pause(5)
+
+        self.assertFalse(scheduler.acquire(INTERACTIVE))
+        self.assertFalse(asyncio.run(scheduler.acquire_async(PREFETCH)))
+
+        lanes = scheduler.stats()['lanes']
+        self.assertEqual(lanes[INTERACTIVE]['timeouts'], 1)
+        self.assertEqual(lanes[PREFETCH]['timeouts'], 1)
+        self.assertEqual(lanes[INTERACTIVE]['queued'], 0)
+        self.assertIsNone(scheduler.timeout_for(BULK))
+
+    def test_async_callers_share_the_queues(self):
+        scheduler = Scheduler(rate=20, burst=1)
+        scheduler.acquire(BULK)
+        waits = []
+        bulk = threading.Thread(target=timed_acquire, args=(scheduler, BULK, waits))
+        bulk.start()
+        while scheduler.stats()['lanes'][BULK]['queued'] < 1:
+            time.sleep(0.005)
+
+        async def interactive():
+            granted = await scheduler.acquire_async(INTERACTIVE)
+            waits.append((INTERACTIVE, granted, None))
+
+        asyncio.run(interactive())
+        bulk.join(5)
+
+        self.assertEqual([name for name, _, _ in waits], [INTERACTIVE, BULK])
+
+    def test_queues_are_dropped_after_a_fork(self):
+        scheduler = Scheduler(rate=100, burst=1)
+        scheduler._queues[BULK].append(object())
+
+        with patch('ratelimit.os.getpid', return_value=-1):
+            self.assertEqual(scheduler.stats()['lanes'][BULK]['queued'], 0)
+            self.assertTrue(scheduler.acquire(INTERACTIVE, timeout=0.1))
+
+
+class TestLanes(unittest.TestCase):
+    def test_calls_are_interactive_by_default(self):
+        self.assertEqual(ratelimit.current_lane(), INTERACTIVE)
+        with ratelimit.lane(BULK):
+            self.assertEqual(ratelimit.current_lane(), BULK)
+        self.assertEqual(ratelimit.current_lane(), INTERACTIVE)
+
+    def test_pool_tasks_run_in_the_callers_lane(self):
+        with ratelimit.lane(PREFETCH):
+            future = executor.submit(ratelimit.current_lane)
+        self.assertEqual(future.result(5), PREFETCH)
+        self.assertEqual(executor.submit(ratelimit.current_lane).result(5), INTERACTIVE)
+
+
+class RateLimitedTMDb:
+    """
+    A local stand-in for TMDb that answers at most quota requests in any
+    one-second window and a 429 with Retry-After beyond that.
+    """
+
+    def __init__(self, quota):
+        self.quota = quota
+        self.served = deque()
+        self.rejected = 0
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                now = time.monotonic()
+                with stub.lock:
+                    while stub.served and stub.served[0] <= now - 1:
+                        stub.served.popleft()
+                    allowed = len(stub.served) < stub.quota
+                    if allowed:
+                        stub.served.append(now)
+                    else:
+                        stub.rejected += 1
+                body = json.dumps({'id': 1} if allowed else {'status_code': 25}).encode()
+                self.send_response(200 if allowed else 429)
+                if not allowed:
+                    self.send_header('Retry-After', '1')
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.server.server_port}/3'
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class TestAgainstRateLimitedTMDb(unittest.TestCase):
+    def setUp(self):
+        self.stub = RateLimitedTMDb(quota=20)
+        self.stop = threading.Event()
+
+    def tearDown(self):
+        self.stop.set()
+        self.stub.close()
+
+    def client(self, rate, burst=5):
+        return TMDbClient(api_key='key', base_url=self.stub.url, max_retries=2, backoff=0.05,
+                          scheduler=Scheduler(rate=rate, burst=burst, wait=5))
+
+    def flood(self, client, threads=8):
+        """
+        Keeps threads busy making bulk calls, as a catalog sync would.
+        """
+        def run():
+            with ratelimit.lane(BULK):
+                while not self.stop.is_set():
+                    client.fetch('/discover/movie', {'page': 1})
+
+        for _ in range(threads):
+            threading.Thread(target=run, daemon=True).start()
+        while client.scheduler.stats()['lanes'][BULK]['queued'] < threads - 1:
+            time.sleep(0.01)
+
+    def interactive_calls(self, client, count=10):
+        waits = []
+        for movie_id in range(count):
+            started = time.monotonic()
+            response = client.fetch(f'/movie/{movie_id}')
+            waits.append((response.status_code, time.monotonic() - started))
+            time.sleep(0.1)
+        return waits
+
+    def test_interactive_calls_are_not_starved_by_bulk_work(self):
+        # The burst plus a second's tokens fit in the quota
+        client = self.client(rate=15, burst=4)
+        self.flood(client)
+
+        waits = self.interactive_calls(client)
+
+        self.assertEqual({status for status, _ in waits}, {200})
+        self.assertLess(max(wait for _, wait in waits), 0.5)
+        self.assertEqual(self.stub.rejected, 0)
+        lanes = client.scheduler.stats()['lanes']
+        self.assertGreater(lanes[BULK]['granted'], 0)
+        self.assertGreater(lanes[BULK]['queued'], 0)
+
+    def test_backs_off_for_retry_after_when_over_quota(self):
+        # A rate above the quota: TMDb answers 429s and the scheduler pauses
+        client = self.client(rate=60)
+        self.flood(client)
+
+        waits = self.interactive_calls(client, count=5)
+
+        self.assertEqual({status for status, _ in waits}, {200})
+        self.assertGreater(self.stub.rejected, 0)
+        # Each pause holds every thread, so rejections stay a small share
+        self.assertLess(self.stub.rejected, len(self.stub.served) + 40)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,179 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import threading
+import unittest
+from datetime import timedelta
+from unittest.mock import patch
+from sqlalchemy import event
+from app import app, db, User, compute_recommendations
+from helpers import reset_tmdb
+from models import RecommendationList
+import executor
+import recommendation_store
+from werkzeug.security import generate_password_hash
+
+
+def details(movie_id, title, genre, actor):
+    return {'id': movie_id, 'title': title, 'poster_path': f'/{movie_id}.jpg',
+            'release_date': '1999-10-15', 'vote_average': 8.0, 'runtime': 120,
+            'genres': [{'id': 18, 'name': genre}],
+            'credits': {'cast': [{'id': 1, 'name': actor}]}}
+
+
+MOVIES = {
+    550: details(550, 'Fight Club', 'Drama', 'Brad Pitt'),
+    807: details(807, 'Se7en', 'Drama', 'Brad Pitt'),
+}
+BY_GENRE = [{'id': 550, 'title': 'Fight Club'}, {'id': 13, 'title': 'Forrest Gump',
+                                                'poster_path': '/13.jpg', 'release_date': '1994-07-06',
+                                                'vote_average': 8.5}]
+BY_ACTOR = [{'id': 807, 'title': 'Se7en'}, {'id': 1422, 'title': 'The Departed',
+                                           'poster_path': None, 'release_date': '2006-10-05',
+                                           'vote_average': 8.2}]
+
+
+@patch('app.fetch_movies_by_actor', side_effect=lambda name: list(BY_ACTOR))
+@patch('app.fetch_movies_by_genre', side_effect=lambda name: list(BY_GENRE))
+@patch('app.fetch_movie_by_id', side_effect=lambda movie_id: MOVIES[movie_id])
+class TestRecommendationStore(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        reset_tmdb()
+        with app.app_context():
+            db.create_all()
+            user = User(username='materialized', password=generate_password_hash('testpassword'),
+                        first_name='Test', last_name='User')
+            db.session.add(user)
+            db.session.commit()
+            self.user_id = user.id
+        self.client.post('/login', data=dict(username='materialized', password='testpassword'))
+
+    def tearDown(self):
+        recommendation_store.wait(5)
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def vault(self, *movie_ids):
+        for movie_id in movie_ids:
+            self.client.post(f'/add_to_favorites/{movie_id}')
+        self.assertTrue(recommendation_store.wait(5))
+
+    def assert_matches_fresh_computation(self):
+        with app.app_context():
+            stored = recommendation_store.load(self.user_id)
+            fresh = compute_recommendations(self.user_id)
+        for section in recommendation_store.SECTIONS:
+            self.assertEqual([movie['id'] for movie in stored[section]],
+                             [movie['id'] for movie in fresh[section]], section)
+        self.assertEqual(stored['anchor_title'], fresh['anchor_title'])
+        return stored
+
+    def test_adding_a_favorite_materializes_the_list(self, *mocks):
+        self.vault(550)
+        stored = self.assert_matches_fresh_computation()
+        self.assertEqual([movie['id'] for movie in stored['genre']], [13])
+        self.assertEqual(stored['actor'][0]['title'], 'Se7en')
+
+    def test_removing_a_favorite_recomputes_the_list(self, *mocks):
+        self.vault(550, 807)
+        self.assertEqual(self.assert_matches_fresh_computation()['actor'][0]['id'], 1422)
+
+        self.client.post('/remove_from_favorites/807')
+        self.assertTrue(recommendation_store.wait(5))
+
+        stored = self.assert_matches_fresh_computation()
+        self.assertEqual([movie['id'] for movie in stored['actor']], [807, 1422])
+        self.assertEqual(stored['anchor_title'], 'Fight Club')
+
+    def test_page_is_one_read_of_the_materialized_list(self, *mocks):
+        self.vault(550)
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', record)
+        try:
+            with patch('app.compute_recommendations') as compute:
+                response = self.client.get('/recommendations')
+        finally:
+            event.remove(engine, 'before_cursor_execute', record)
+
+        compute.assert_not_called()
+        self.assertIn(b'Forrest Gump', response.data)
+        self.assertEqual(len([sql for sql in statements if 'recommend' in sql]), 1)
+
+    def test_first_visit_computes_inline(self, *mocks):
+        with app.app_context():
+            self.assertIsNone(recommendation_store.load(self.user_id))
+        response = self.client.get('/recommendations')
+        self.assertEqual(response.status_code, 200)
+        with app.app_context():
+            self.assertIsNotNone(recommendation_store.load(self.user_id))
+
+    def test_stale_list_is_served_then_refreshed(self, *mocks):
+        self.vault(550)
+        old = recommendation_store.utcnow() - timedelta(days=2)
+        with app.app_context():
+            db.session.get(RecommendationList, self.user_id).computed_at = old
+            db.session.commit()
+
+        response = self.client.get('/recommendations')
+        self.assertIn(b'Forrest Gump', response.data)
+        self.assertTrue(recommendation_store.wait(5))
+
+        with app.app_context():
+            self.assertGreater(recommendation_store.load(self.user_id)['computed_at'], old)
+
+    def test_refresh_command_recomputes_stale_lists(self, *mocks):
+        self.vault(550)
+        runner = app.test_cli_runner()
+
+        result = runner.invoke(args=['refresh-recommendations'])
+        self.assertIn('Refreshed recommendations for 0 users', result.output)
+
+        result = runner.invoke(args=['refresh-recommendations', '--max-age', '0'])
+        self.assertIn('Refreshed recommendations for 1 users, 0 failed', result.output)
+
+    def test_bursts_of_changes_are_coalesced(self, *mocks):
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def slow_refresh(user_id):
+            calls.append(user_id)
+            started.set()
+            release.wait(5)
+
+        recommendation_store.schedule(self.user_id, slow_refresh)
+        started.wait(5)
+        for _ in range(5):
+            recommendation_store.schedule(self.user_id, slow_refresh)
+        release.set()
+
+        self.assertTrue(recommendation_store.wait(5))
+        self.assertEqual(calls, [self.user_id, self.user_id])
+
+    def test_recomputes_leave_the_shared_pool_free(self, *mocks):
+        release = threading.Event()
+        user_ids = range(10_000, 10_000 + executor.MAX_WORKERS + executor.BACKGROUND_WORKERS)
+
+        for user_id in user_ids:
+            recommendation_store.schedule(user_id, lambda user_id: release.wait(5))
+        try:
+            results = executor.gather({'row': lambda: ['fetched']}, timeout=1)
+        finally:
+            release.set()
+
+        self.assertEqual(results, {'row': ['fetched']})
+        self.assertTrue(recommendation_store.wait(10))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import unittest
+from unittest.mock import patch
+import numpy as np
+from app import app, db, User, Favorite
+from helpers import reset_tmdb
+from models import FavoriteGenre, FavoriteCast
+import catalog
+import recommender
+import recommendation_store
+from recommender import Ranker
+from werkzeug.security import generate_password_hash
+
+DRAMA, CRIME, COMEDY = 18, 80, 35
+
+
+def movie(movie_id, genres, cast, year, popularity=10.0):
+    return {'id': movie_id, 'title': f'Movie {movie_id}', 'poster_path': f'/{movie_id}.jpg',
+            'release_date': f'{year}-01-01', 'popularity': popularity, 'runtime': 100,
+            'vote_average': 7.0, 'genres': [{'id': genre, 'name': str(genre)} for genre in genres],
+            'credits': {'cast': [{'id': person, 'name': f'Person {person}'} for person in cast]}}
+
+
+MOVIES = [
+    movie(1, [CRIME], [100, 101], 1995),
+    movie(2, [CRIME], [100], 1996),
+    movie(3, [CRIME], [102], 1990, popularity=90.0),
+    movie(4, [COMEDY], [103], 2020, popularity=99.0),
+    movie(5, [DRAMA, CRIME], [101], 1999),
+    movie(6, [CRIME], [104], 1970),
+]
+
+
+def ranker(movies=MOVIES):
+    return Ranker([m['id'] for m in movies], [m['popularity'] for m in movies],
+                  [m['release_date'] for m in movies],
+                  [(m['id'], g['id']) for m in movies for g in m['genres']],
+                  [(m['id'], c['id']) for m in movies for c in m['credits']['cast']])
+
+
+class TestRanker(unittest.TestCase):
+    def test_scores_follow_the_profile(self):
+        model = ranker()
+        profile = model.profile([CRIME], [100], [1990])
+
+        self.assertEqual(model.rank(profile, limit=3, max_genre_share=1), [2, 1, 3])
+
+    def test_favorites_are_excluded_and_unrelated_movies_are_not_returned(self):
+        model = ranker()
+        profile = model.profile([CRIME], [100], [1990])
+
+        ranked = model.rank(profile, exclude={1, 2}, limit=10, max_genre_share=1)
+
+        self.assertNotIn(1, ranked)
+        self.assertNotIn(2, ranked)
+        self.assertNotIn(4, ranked)
+
+    def test_diversity_caps_a_primary_genre(self):
+        movies = [movie(movie_id, [CRIME], [100], 1995, popularity=movie_id) for movie_id in range(1, 11)]
+        movies.append(movie(11, [DRAMA], [100], 1995))
+        model = ranker(movies)
+        profile = model.profile([CRIME], [100], [1990])
+
+        ranked = model.rank(profile, limit=5, max_genre_share=0.4)
+
+        self.assertEqual(len(ranked), 5)
+        self.assertIn(11, ranked[:3])
+        self.assertEqual(ranked[:2], [10, 9])
+
+    def test_unknown_profile_ranks_nothing(self):
+        model = ranker()
+        self.assertIsNone(model.profile([999], [999], [None]))
+        self.assertEqual(model.rank(None), [])
+
+    def test_feature_blocks_are_unit_length(self):
+        model = ranker()
+        row = model.features[model.row_of[1]].toarray().ravel()
+        genre = row[:len(model.genre_columns)]
+        cast = row[model.offsets[1]:model.offsets[2]]
+        self.assertAlmostEqual(float(np.linalg.norm(genre)), 1.0, places=5)
+        self.assertAlmostEqual(float(np.linalg.norm(cast)), 1.0, places=5)
+
+
+class TestRecommendationsPage(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.min_rows = app.config['CATALOG_MIN_ROWS']
+        app.config['CATALOG_MIN_ROWS'] = 1
+        self.client = app.test_client()
+        reset_tmdb()
+        with app.app_context():
+            db.create_all()
+            catalog.ingest(MOVIES)
+            user = User(username='ranker', password=generate_password_hash('testpassword'),
+                        first_name='Test', last_name='User')
+            db.session.add(user)
+            db.session.commit()
+            self.user_id = user.id
+        self.client.post('/login', data=dict(username='ranker', password='testpassword'))
+
+    def tearDown(self):
+        app.config['CATALOG_MIN_ROWS'] = self.min_rows
+        recommender.model.value = None
+        recommender.model.built_at = None
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def favorite(self, movie_id):
+        with patch('app.fetch_movie_by_id', return_value=MOVIES[movie_id - 1]):
+            self.client.post(f'/add_to_favorites/{movie_id}')
+            recommendation_store.wait(5)
+
+    @patch('requests.Session.get')
+    def test_page_shows_ranked_picks_without_tmdb_calls(self, mock_get):
+        with recommender.model.building:
+            with app.app_context():
+                recommender.model.rebuild()
+            self.favorite(1)
+            response = self.client.get('/recommendations')
+
+        mock_get.assert_not_called()
+        self.assertIn(b'Top Picks for You', response.data)
+        self.assertIn(b'Movie 2', response.data)
+        self.assertNotIn(b'Movie 1 (', response.data)
+        self.assertNotIn(b'Movie 4', response.data)
+
+    def test_recommend_returns_list_results(self):
+        self.favorite(1)
+        with recommender.model.building:
+            with app.app_context():
+                recommender.model.rebuild()
+                picks = recommender.recommend(self.user_id, limit=2)
+
+        self.assertEqual([pick['id'] for pick in picks], [2, 5])
+        self.assertEqual(picks[0]['poster_path'], '/2.jpg')
+
+    @patch('app.fetch_movies_by_actor', return_value=[{'id': 1, 'title': 'Owned'}, {'id': 9, 'title': 'New'}])
+    @patch('app.fetch_movies_by_genre', return_value=[{'id': 1, 'title': 'Owned'}])
+    def test_fallback_excludes_favorites(self, mock_genre, mock_actor):
+        self.favorite(1)
+        with recommender.model.building:
+            from app import fetch_recommendations
+            with app.app_context():
+                by_genre, by_actor = fetch_recommendations(self.user_id)
+
+        self.assertEqual(by_genre, [])
+        self.assertEqual([movie['id'] for movie in by_actor], [9])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import time
+import unittest
+from unittest.mock import patch, Mock
+from app import app, db
+from helpers import reset_tmdb
+import catalog
+import search_index
+
+MOVIES = [
+    {'id': 550, 'title': 'Fight Club', 'original_title': 'Fight Club', 'poster_path': '/fc.jpg',
+     'release_date': '1999-10-15', 'popularity': 60.0, 'runtime': 139,
+     'credits': {'cast': [{'id': 287, 'name': 'Brad Pitt'}, {'id': 819, 'name': 'Edward Norton'}]}},
+    {'id': 807, 'title': 'Se7en', 'original_title': 'Se7en', 'poster_path': '/se7en.jpg',
+     'release_date': '1995-09-22', 'popularity': 50.0, 'runtime': 127,
+     'credits': {'cast': [{'id': 287, 'name': 'Brad Pitt'}, {'id': 192, 'name': 'Morgan Freeman'}]}},
+    {'id': 1, 'title': 'Pitt Stop', 'original_title': 'Pitt Stop', 'poster_path': '/ps.jpg',
+     'release_date': '2001-01-01', 'popularity': 1.0, 'runtime': 90, 'credits': {'cast': []}},
+    {'id': 2, 'title': 'Le Fabuleux', 'original_title': 'Amélie', 'poster_path': '/am.jpg',
+     'popularity': 30.0},
+    {'id': 3, 'title': 'Fight Without Poster', 'poster_path': None, 'popularity': 5.0},
+]
+
+
+class TestSearchIndex(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.min_rows = app.config['CATALOG_MIN_ROWS']
+        app.config['CATALOG_MIN_ROWS'] = 1
+        self.client = app.test_client()
+        reset_tmdb()
+        with app.app_context():
+            db.create_all()
+            catalog.ingest(MOVIES)
+
+    def tearDown(self):
+        app.config['CATALOG_MIN_ROWS'] = self.min_rows
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_title_matches_rank_above_cast_matches(self):
+        with app.app_context():
+            ids = search_index.match_ids('pitt')
+        self.assertEqual(ids[0], 1)
+        self.assertEqual(sorted(ids[1:]), [550, 807])
+
+    def test_prefix_and_diacritics(self):
+        with app.app_context():
+            self.assertEqual(search_index.match_ids('fig clu'), [550])
+            self.assertEqual(search_index.match_ids('amelie'), [2])
+
+    def test_query_syntax_is_neutralised(self):
+        with app.app_context():
+            self.assertEqual(search_index.match_ids('fight: "club" -(*'), [550])
+            self.assertEqual(search_index.match_ids('!!!'), [])
+
+    def test_index_follows_catalog_updates(self):
+        with app.app_context():
+            catalog.store_movie(dict(MOVIES[1], credits={'cast': [{'id': 1, 'name': 'Kevin Spacey'}]}))
+            self.assertEqual(search_index.match_ids('spacey'), [807])
+            self.assertEqual(search_index.match_ids('freeman'), [])
+
+    def test_catalog_search_returns_list_shape(self):
+        with app.app_context():
+            results = catalog.search('fight')
+        self.assertEqual([movie['id'] for movie in results], [550])
+        self.assertEqual(results[0]['poster_path'], '/fc.jpg')
+
+    @patch('requests.Session.get')
+    def test_search_route_uses_index_first(self, mock_get):
+        start = time.perf_counter()
+        response = self.client.get('/search?query=Brad Pitt')
+        elapsed = time.perf_counter() - start
+
+        mock_get.assert_not_called()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Fight Club', response.data)
+        self.assertIn(b'Se7en', response.data)
+        self.assertLess(elapsed, 1)
+
+    @patch('requests.Session.get')
+    def test_search_route_falls_back_to_tmdb(self, mock_get):
+        response = Mock()
+        response.status_code = 200
+        response.json.return_value = {'results': [{'id': 9, 'title': 'Remote Hit', 'poster_path': '/r.jpg',
+                                                   'release_date': '2020-01-01', 'overview': '',
+                                                   'vote_average': 7}]}
+        mock_get.return_value = response
+
+        page = self.client.get('/search?query=remote')
+
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertIn(b'Remote Hit', page.data)
+
+    def test_reindex_command(self):
+        with app.app_context():
+            db.session.execute(search_index.SQLITE_DELETE, {'ids': [550, 807]})
+            db.session.commit()
+        result = app.test_cli_runner().invoke(args=['catalog', 'reindex'])
+        self.assertIn('Indexed 5 movies', result.output)
+        with app.app_context():
+            self.assertEqual(search_index.match_ids('fight club'), [550])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,282 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import asyncio
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch, Mock
+import fakeredis
+import httpx
+from cache import LRUCache, TMDbCache
+from singleflight import SingleFlight
+from tmdb import TMDbClient, cache_key
+from ratelimit import INTERACTIVE
+from tmdb_async import AsyncTMDbClient
+from app import app, db, tmdb, TitleLookup
+from helpers import reset_tmdb
+
+CALLERS = 100
+
+
+def make_response(payload):
+    response = Mock()
+    response.status_code = 200
+    response.headers = {}
+    response.json.return_value = payload
+    return response
+
+
+def wait_until(condition, timeout=10):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            raise AssertionError('Timed out waiting')
+        time.sleep(0.005)
+
+
+class TestSingleFlight(unittest.TestCase):
+    def setUp(self):
+        self.flights = SingleFlight()
+        self.calls = 0
+
+    def run_concurrently(self, key, function):
+        def leader_function():
+            self.calls += 1
+            # Hold the call open until every other caller has joined it
+            wait_until(lambda: self.flights.waiting(key) == CALLERS - 1)
+            return function()
+
+        def call(_):
+            try:
+                return self.flights.do(key, leader_function)
+            except Exception as error:
+                return error
+
+        with ThreadPoolExecutor(max_workers=CALLERS) as pool:
+            return list(pool.map(call, range(CALLERS)))
+
+    def test_concurrent_callers_share_one_call(self):
+        results = self.run_concurrently('movie:550', lambda: {'id': 550})
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(len({id(result) for result in results}), 1)
+        self.assertEqual(self.flights.stats(), {'leaders': 1, 'followers': CALLERS - 1, 'in_flight': 0})
+
+    def test_concurrent_callers_share_the_exception(self):
+        def fail():
+            raise ValueError('TMDb is down')
+
+        results = self.run_concurrently('movie:550', fail)
+
+        self.assertEqual(self.calls, 1)
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+
+    def test_finished_calls_are_not_cached(self):
+        self.assertEqual(self.flights.do('a', lambda: 1), 1)
+        self.assertEqual(self.flights.do('a', lambda: 2), 2)
+        self.assertEqual(self.flights.in_flight(), 0)
+
+    def test_flights_in_progress_are_dropped_after_a_fork(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow():
+            started.set()
+            release.wait(5)
+            return 'parent'
+
+        thread = threading.Thread(target=self.flights.do, args=('a', slow))
+        thread.start()
+        started.wait(5)
+        with patch('singleflight.os.getpid', return_value=-1):
+            self.assertEqual(self.flights.do('a', lambda: 'child'), 'child')
+        release.set()
+        thread.join(5)
+
+
+class TestClientCoalescing(unittest.TestCase):
+    def setUp(self):
+        self.requests = []
+        self.release = threading.Event()
+
+    def fake_get(self, url, params=None, timeout=None):
+        self.requests.append(url)
+        self.release.wait(5)
+        return make_response({'id': 550, 'title': 'Fight Club'})
+
+    def fire(self, client, params):
+        """
+        Sends CALLERS identical requests at once, releasing TMDb's answer
+        once all but the first are waiting on it.
+        """
+        key = (INTERACTIVE, cache_key('/movie/550', params[0]))
+
+        def release_when_joined():
+            wait_until(lambda: client.flights.waiting(key) == CALLERS - 1)
+            self.release.set()
+
+        threading.Thread(target=release_when_joined, daemon=True).start()
+        with ThreadPoolExecutor(max_workers=CALLERS) as pool:
+            return list(pool.map(lambda index: client.get('/movie/550', params[index % len(params)]),
+                                 range(CALLERS)))
+
+    @patch('requests.Session.get')
+    def test_identical_requests_make_one_upstream_call(self, mock_get):
+        mock_get.side_effect = self.fake_get
+        client = TMDbClient(api_key='key', base_url='https://tmdb.test/3')
+
+        responses = self.fire(client, [{'append_to_response': 'credits', 'language': 'en-US'},
+                                       {'language': 'en-US', 'append_to_response': 'credits'}])
+
+        self.assertEqual(len(self.requests), 1)
+        self.assertEqual({response.json()['title'] for response in responses}, {'Fight Club'})
+
+    @patch('requests.Session.get')
+    def test_cache_misses_make_one_upstream_call(self, mock_get):
+        mock_get.side_effect = self.fake_get
+        client = TMDbClient(api_key='key', base_url='https://tmdb.test/3',
+                            cache=TMDbCache(local=LRUCache()))
+
+        responses = self.fire(client, [{'append_to_response': 'credits'}])
+
+        self.assertEqual(len(self.requests), 1)
+        self.assertEqual({response.json()['id'] for response in responses}, {550})
+        self.assertEqual(client.get('/movie/550', {'append_to_response': 'credits'}).json()['id'], 550)
+        self.assertEqual(len(self.requests), 1)
+
+
+class TestCrossWorkerFill(unittest.TestCase):
+    def setUp(self):
+        server = fakeredis.FakeServer()
+        # Two workers: separate local tiers and clients over one Redis
+        self.workers = [
+            TMDbClient(api_key='key', base_url='https://tmdb.test/3',
+                       cache=TMDbCache(local=LRUCache(), redis_client=fakeredis.FakeRedis(server=server),
+                                       fill_timeout=2))
+            for _ in range(2)]
+        self.requests = []
+
+    @patch('requests.Session.get')
+    def test_other_worker_waits_for_the_fill(self, mock_get):
+        def slow_get(url, params=None, timeout=None):
+            self.requests.append(url)
+            time.sleep(0.3)
+            return make_response({'id': 550})
+
+        mock_get.side_effect = slow_get
+        first = threading.Thread(target=self.workers[0].get, args=('/movie/550',))
+        first.start()
+        wait_until(lambda: self.requests)
+
+        response = self.workers[1].get('/movie/550')
+        first.join(5)
+
+        self.assertEqual(response.json(), {'id': 550})
+        self.assertEqual(len(self.requests), 1)
+
+    @patch('requests.Session.get')
+    def test_fetches_itself_when_the_fill_never_lands(self, mock_get):
+        mock_get.return_value = make_response({'id': 550})
+        self.workers[0].cache.fill_timeout = 0.2
+        self.workers[0].cache.acquire_fill(cache_key('/movie/550'))
+
+        response = self.workers[0].get('/movie/550')
+
+        self.assertEqual(response.json(), {'id': 550})
+        self.assertEqual(mock_get.call_count, 1)
+
+
+class TestAsyncClientCoalescing(unittest.TestCase):
+    def test_identical_requests_make_one_upstream_call(self):
+        requests = []
+
+        async def handler(request):
+            requests.append(request.url.path)
+            await asyncio.sleep(0.2)
+            return httpx.Response(200, json={'id': 550})
+
+        client = AsyncTMDbClient(TMDbClient(api_key='key', base_url='https://tmdb.test/3'),
+                                 transport=httpx.MockTransport(handler))
+
+        async def burst():
+            return await asyncio.gather(*[client.get('/movie/550') for _ in range(CALLERS)])
+
+        try:
+            responses = asyncio.run(burst())
+        finally:
+            client.close()
+
+        self.assertEqual(len(requests), 1)
+        self.assertEqual({response.json()['id'] for response in responses}, {550})
+
+    def test_redis_is_read_off_the_loop(self):
+        redis = fakeredis.FakeRedis()
+        cache = TMDbCache(local=LRUCache(), redis_client=redis)
+        client = AsyncTMDbClient(TMDbClient(api_key='key', base_url='https://tmdb.test/3', cache=cache),
+                                 transport=httpx.MockTransport(lambda request: httpx.Response(500)))
+        cache.set('movie', cache_key('/movie/550'), {'id': 550})
+        cache.local.clear()
+        readers = []
+        redis_get = redis.get
+
+        def get(name):
+            readers.append(threading.get_ident())
+            return redis_get(name)
+
+        async def fetch():
+            return threading.get_ident(), await client.get('/movie/550')
+
+        try:
+            with patch.object(redis, 'get', get):
+                loop_thread, response = asyncio.run(fetch())
+        finally:
+            client.close()
+
+        self.assertEqual(response.json(), {'id': 550})
+        self.assertTrue(readers)
+        self.assertNotIn(loop_thread, readers)
+
+
+class TestViewCoalescing(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        with app.app_context():
+            db.create_all()
+        reset_tmdb()
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    @patch('requests.Session.get')
+    def test_concurrent_title_lookups_search_once(self, mock_get):
+        searches = []
+
+        def slow_search(url, params=None, timeout=None):
+            searches.append(params['query'])
+            time.sleep(0.5)
+            return make_response({'results': [{'id': 550}]})
+
+        mock_get.side_effect = slow_search
+        followers = tmdb.flights.followers
+
+        def request(_):
+            return app.test_client().get('/movie/Fight Club').status_code
+
+        with ThreadPoolExecutor(max_workers=CALLERS) as pool:
+            statuses = list(pool.map(request, range(CALLERS)))
+
+        self.assertEqual(set(statuses), {301})
+        self.assertEqual(searches, ['Fight Club'])
+        self.assertGreater(tmdb.flights.followers, followers)
+        with app.app_context():
+            self.assertEqual(TitleLookup.query.count(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import time
+import unittest
+from unittest.mock import patch, Mock
+from sqlalchemy.exc import ProgrammingError
+from app import app, db
+import catalog
+import suggest
+from snapshot import Snapshot
+from suggest import TitleIndex, normalize
+
+TITLES = [
+    (155, 'The Dark Knight', '2008-07-16', 90.0),
+    (49026, 'The Dark Knight Rises', '2012-07-16', 70.0),
+    (2, 'Dark City', '1998-02-27', 20.0),
+    (3, 'Darkman', '1990-08-24', 10.0),
+    (4, 'Amélie', '2001-04-25', 40.0),
+    (5, 'Léon: The Professional', '1994-09-14', 50.0),
+]
+
+
+class TestTitleIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = TitleIndex(TITLES)
+
+    def titles(self, query, limit=10):
+        return [movie['title'] for movie in self.index.suggest(query, limit)]
+
+    def test_completions_are_ranked_by_popularity(self):
+        self.assertEqual(self.titles('dark'),
+                         ['The Dark Knight', 'The Dark Knight Rises', 'Dark City', 'Darkman'])
+        self.assertEqual(self.titles('dark', limit=2), ['The Dark Knight', 'The Dark Knight Rises'])
+
+    def test_leading_articles_are_optional(self):
+        self.assertEqual(self.titles('the dark knight r'), ['The Dark Knight Rises'])
+        self.assertEqual(self.titles('dark kn'), ['The Dark Knight', 'The Dark Knight Rises'])
+
+    def test_case_accents_and_punctuation_are_folded(self):
+        self.assertEqual(normalize('  Léon:  The—Professional '), 'leon the professional')
+        self.assertEqual(self.titles('AMELIE'), ['Amélie'])
+        self.assertEqual(self.titles('leon the'), ['Léon: The Professional'])
+
+    def test_result_shape(self):
+        self.assertEqual(self.index.suggest('amé'), [{'id': 4, 'title': 'Amélie', 'year': 2001}])
+        self.assertEqual(self.index.suggest('   '), [])
+        self.assertEqual(self.index.suggest('zzz'), [])
+
+    def test_hot_prefixes_match_a_full_scan(self):
+        entries = [(movie_id, f'Star {movie_id:03d}', None, (movie_id * 37) % 211)
+                   for movie_id in range(1, 200)]
+        with patch('suggest.HOT_RANGE', 16):
+            index = TitleIndex(entries)
+
+        self.assertIn(b'sta', index.hot)
+        self.assertIn(b'star 1', index.hot)
+        expected = sorted(entries, key=lambda entry: entry[3], reverse=True)[:10]
+        self.assertEqual([movie['id'] for movie in index.suggest('sta')],
+                         [entry[0] for entry in expected])
+        for prefix in ('s', 'star 1', 'star 10'):
+            self.assertEqual([movie['id'] for movie in index.suggest(prefix)],
+                             [index.ids[row] for row in index._top(*index.range(prefix.encode()), 10)])
+
+
+class TestSuggestEndpoint(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        with app.app_context():
+            db.create_all()
+            catalog.ingest([{'id': movie_id, 'title': title, 'release_date': release_date,
+                             'popularity': popularity}
+                            for movie_id, title, release_date, popularity in TITLES])
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_endpoint_serves_catalog_titles(self):
+        with suggest.index.building:
+            with app.app_context():
+                suggest.index.rebuild()
+
+            start = time.perf_counter()
+            response = self.client.get('/search/suggest?q=Dark%20K&limit=1')
+            elapsed = time.perf_counter() - start
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json(),
+                         {'query': 'Dark K', 'results': [{'id': 155, 'title': 'The Dark Knight',
+                                                          'year': 2008}]})
+        self.assertLess(elapsed, 0.5)
+
+    def test_rebuild_swaps_index_atomically(self):
+        with suggest.index.building:
+            with app.app_context():
+                before = suggest.index.value
+                catalog.store_movie({'id': 6, 'title': 'Darkest Hour', 'popularity': 99.0,
+                                     'runtime': 125})
+                self.assertEqual(suggest.index.value, before)
+                suggest.index.rebuild()
+
+            self.assertIsNot(suggest.index.value, before)
+            self.assertEqual(suggest.suggest('dark', 1)[0]['title'], 'Darkest Hour')
+
+    def test_stale_index_is_rebuilt_in_the_background(self):
+        with app.app_context(), patch('snapshot.executor.submit_background') as submit, \
+                patch.object(suggest.index, 'built_at', time.time() - 7200), \
+                patch.object(suggest.index, 'failed_at', None):
+            suggest.index.ensure_fresh()
+            suggest.index.ensure_fresh()
+        self.assertEqual(submit.call_count, 1)
+        suggest.index.building.release()
+
+
+class TestSnapshot(unittest.TestCase):
+    def test_failed_build_is_not_retried_at_once(self):
+        missing = ProgrammingError('SELECT * FROM movie', {}, Exception('relation "movie" does not exist'))
+        snapshot = Snapshot('test index', Mock(side_effect=missing), 'TEST_INTERVAL', initial='old')
+
+        with app.app_context():
+            self.assertIsNone(snapshot.rebuild())
+            with patch('snapshot.executor.submit_background') as submit:
+                snapshot.ensure_fresh()
+
+        self.assertEqual(snapshot.value, 'old')
+        self.assertIsNotNone(snapshot.failed_at)
+        submit.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
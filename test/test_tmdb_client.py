@@ -0,0 +1,130 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import time
+import unittest
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from unittest.mock import patch, Mock
+from cache import LRUCache, TMDbCache
+from ratelimit import Scheduler
+from tmdb import TMDbClient, cache_key, parse_retry_after
+
+
+def make_response(status_code, payload=None, headers=None):
+    response = Mock()
+    response.status_code = status_code
+    response.headers = headers or {}
+    response.json.return_value = payload or {}
+    return response
+
+
+class TestTMDbClient(unittest.TestCase):
+    def setUp(self):
+        self.client = TMDbClient(api_key='key', base_url='https://tmdb.test/3/',
+                                 pool_size=4, connect_timeout=1, read_timeout=2,
+                                 max_retries=2, backoff=0.1)
+
+    def tearDown(self):
+        self.client.close()
+
+    def test_url_and_params(self):
+        self.assertEqual(self.client.url('/movie/popular'), 'https://tmdb.test/3/movie/popular')
+        self.assertEqual(self.client.params({'query': 'Alien', 'page': None}),
+                         {'api_key': 'key', 'query': 'Alien'})
+
+    def test_session_is_pooled_and_reused(self):
+        session = self.client.session
+        self.assertIs(session, self.client.session)
+        adapter = session.get_adapter('https://tmdb.test/3/movie/1')
+        self.assertEqual(adapter._pool_maxsize, 4)
+
+    def test_session_recreated_after_fork(self):
+        session = self.client.session
+        with patch('tmdb.os.getpid', return_value=-1):
+            self.assertIsNot(session, self.client.session)
+
+    @patch('requests.Session.get')
+    def test_get_passes_timeouts(self, mock_get):
+        mock_get.return_value = make_response(200, {'results': []})
+        self.client.get('/movie/now_playing', {'page': 1})
+        mock_get.assert_called_once_with('https://tmdb.test/3/movie/now_playing',
+                                         params={'api_key': 'key', 'page': 1},
+                                         timeout=(1, 2))
+
+    @patch('tmdb.time.sleep')
+    @patch('requests.Session.get')
+    def test_retries_server_errors(self, mock_get, mock_sleep):
+        mock_get.side_effect = [make_response(503), make_response(200, {'id': 1})]
+        response = self.client.get('/movie/1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mock_get.call_count, 2)
+        delay = mock_sleep.call_args[0][0]
+        self.assertTrue(0 <= delay <= 0.1)
+
+    @patch('tmdb.time.sleep')
+    @patch('requests.Session.get')
+    def test_honours_retry_after(self, mock_get, mock_sleep):
+        mock_get.side_effect = [make_response(429, headers={'Retry-After': '3'}),
+                                make_response(200)]
+        self.client.get('/movie/1')
+        mock_sleep.assert_called_once_with(3.0)
+
+    @patch('tmdb.time.sleep')
+    @patch('requests.Session.get')
+    def test_honours_retry_after_as_a_date(self, mock_get, mock_sleep):
+        when = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=4), usegmt=True)
+        mock_get.side_effect = [make_response(429, headers={'Retry-After': when}),
+                                make_response(200)]
+        self.client.get('/movie/1')
+        self.assertTrue(2 <= mock_sleep.call_args[0][0] <= 4)
+
+    @patch('tmdb.time.sleep')
+    @patch('requests.Session.get')
+    def test_long_retry_after_is_returned_without_sleeping(self, mock_get, mock_sleep):
+        mock_get.return_value = make_response(429, headers={'Retry-After': '3600'})
+        self.client.scheduler = Scheduler(rate=10, burst=10, wait=2)
+
+        response = self.client.get('/movie/1')
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(mock_get.call_count, 1)
+        mock_sleep.assert_not_called()
+        self.assertLessEqual(self.client.scheduler._paused_until - time.monotonic(), 2)
+
+    @patch('requests.Session.get')
+    def test_long_retry_after_serves_the_last_known_good_payload(self, mock_get):
+        self.client.cache = TMDbCache(local=LRUCache())
+        self.client.cache.set('movie', cache_key('/movie/1'), {'id': 1}, stored_at=time.time() - 1.5 * 86400)
+        mock_get.return_value = make_response(429, headers={'Retry-After': '3600'})
+
+        response = self.client.get('/movie/1')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'id': 1})
+
+    def test_parse_retry_after(self):
+        self.assertEqual(parse_retry_after('7'), 7.0)
+        self.assertEqual(parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT'), 0.0)
+        self.assertIsNone(parse_retry_after('soon'))
+        self.assertIsNone(parse_retry_after(None))
+
+    @patch('tmdb.time.sleep')
+    @patch('requests.Session.get')
+    def test_gives_up_after_max_retries(self, mock_get, mock_sleep):
+        mock_get.return_value = make_response(500)
+        response = self.client.get('/movie/1')
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(mock_get.call_count, 3)
+
+    @patch('requests.Session.get')
+    def test_client_errors_are_not_retried(self, mock_get):
+        mock_get.return_value = make_response(404)
+        self.client.get('/movie/1')
+        self.assertEqual(mock_get.call_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import time
+import unittest
+from unittest.mock import patch
+from sqlalchemy import event
+from app import app, db, User
+import suggest
+import user_cache
+from werkzeug.security import generate_password_hash
+
+
+class TestUserCache(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        user_cache.cache.clear()
+        with app.app_context():
+            db.create_all()
+            user = User(username='cached', password=generate_password_hash('testpassword'),
+                        first_name='Test', last_name='User')
+            db.session.add(user)
+            db.session.commit()
+            self.user_id = user.id
+            self.engine = db.engine
+        self.login(self.client)
+
+    def tearDown(self):
+        user_cache.cache.clear()
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def login(self, client, password='testpassword'):
+        return client.post('/login', data=dict(username='cached', password=password))
+
+    def statements(self, client, path):
+        executed = []
+
+        def record(conn, cursor, statement, *args):
+            executed.append(statement)
+
+        event.listen(self.engine, 'before_cursor_execute', record)
+        try:
+            with patch.object(suggest.index, 'built_at', time.time()):
+                response = client.get(path)
+        finally:
+            event.remove(self.engine, 'before_cursor_execute', record)
+        return response, executed
+
+    def test_cached_requests_run_no_sql(self):
+        response, executed = self.statements(self.client, '/edit_profile')
+        self.assertEqual(response.status_code, 200)
+
+        response, executed = self.statements(self.client, '/edit_profile')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Test', response.data)
+        self.assertEqual(executed, [])
+
+    def test_miss_falls_back_to_the_database(self):
+        self.statements(self.client, '/edit_profile')
+        user_cache.cache.clear()
+
+        response, executed = self.statements(self.client, '/edit_profile')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(executed), 1)
+        self.assertIn('FROM user', executed[0])
+
+    def test_profile_change_is_seen_at_once_and_signs_out_other_sessions(self):
+        other = app.test_client()
+        self.login(other)
+        self.statements(self.client, '/edit_profile')
+        with self.client.session_transaction() as session:
+            token = session['_user_id']
+
+        self.client.post('/edit_profile', data=dict(first_name='Renamed', last_name='User',
+                                                    password='newpassword'))
+
+        with self.client.session_transaction() as session:
+            self.assertNotEqual(session['_user_id'], token)
+        response, _ = self.statements(self.client, '/edit_profile')
+        self.assertIn(b'Renamed', response.data)
+        response, _ = self.statements(other, '/edit_profile')
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('/login', response.location)
+        self.assertEqual(self.login(app.test_client(), 'newpassword').status_code, 302)
+
+    def test_other_workers_revoke_old_sessions_within_the_ttl(self):
+        with self.client.session_transaction() as session:
+            token = session['_user_id']
+        with app.app_context():
+            self.assertIsNotNone(user_cache.load(token))
+            # Another worker bumps the version; this one is not told
+            db.session.get(User, self.user_id).session_version += 1
+            db.session.commit()
+            now = time.time()
+
+            with patch('user_cache.time.time', return_value=now + user_cache.cache.ttl - 1):
+                self.assertIsNotNone(user_cache.load(token))
+            with patch('user_cache.time.time', return_value=now + user_cache.cache.ttl + 1):
+                self.assertIsNone(user_cache.load(token))
+
+    def test_tokens_without_a_version_still_load(self):
+        with self.client.session_transaction() as session:
+            session['_user_id'] = str(self.user_id)
+
+        response, _ = self.statements(self.client, '/edit_profile')
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_deleted_user_is_signed_out(self):
+        self.statements(self.client, '/edit_profile')
+        with app.app_context():
+            db.session.delete(db.session.get(User, self.user_id))
+            db.session.commit()
+        user_cache.cache.invalidate(self.user_id)
+
+        response, _ = self.statements(self.client, '/edit_profile')
+
+        self.assertEqual(response.status_code, 302)
+
+    def test_parse_token(self):
+        self.assertEqual(user_cache.parse_token('7:3'), (7, 3))
+        self.assertEqual(user_cache.parse_token('7'), (7, 0))
+        self.assertIsNone(user_cache.parse_token('seven'))
+
+
+if __name__ == '__main__':
+    unittest.main()
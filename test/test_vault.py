@@ -0,0 +1,138 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import unittest
+from unittest.mock import patch
+from sqlalchemy import event
+from app import app, db, User, Favorite
+import favorites
+import recommendation_store
+import vault
+from werkzeug.security import generate_password_hash
+
+
+def row(first_id):
+    return [{'id': movie_id, 'title': f'Movie {movie_id}', 'poster_path': f'/{movie_id}.jpg',
+             'release_date': '2001-01-01', 'vote_average': 7.0}
+            for movie_id in range(first_id, first_id + 20)]
+
+
+class TestFavoriteIds(unittest.TestCase):
+    def test_membership_and_changes(self):
+        ids = vault.FavoriteIds([30, 10, 20, 10])
+
+        self.assertEqual(list(ids), [10, 20, 30])
+        self.assertIn(20, ids)
+        self.assertNotIn(25, ids)
+        self.assertNotIn(40, ids)
+        changed = ids.changed(added=[25, 10], removed=[30])
+        self.assertEqual(list(changed), [10, 20, 25])
+        self.assertEqual(list(ids), [10, 20, 30])
+
+    def test_cache_misses_on_new_version_expiry_and_eviction(self):
+        cache = vault.FavoriteIdCache(max_users=2, ttl=60)
+        cache.set(1, 'a', vault.FavoriteIds([1]), now=0)
+
+        self.assertEqual(list(cache.get(1, 'a', now=30)), [1])
+        cache.update(1, 'b', added=[2])
+        self.assertIsNone(cache.get(1, 'a', now=30))
+
+        cache.set(1, 'b', vault.FavoriteIds([1]), now=0)
+        self.assertIsNone(cache.get(1, 'b', now=60))
+
+        for user_id in (1, 2, 3):
+            cache.set(user_id, None, vault.FavoriteIds(), now=0)
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get(1, None, now=0))
+
+
+class TestVaultBadges(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        vault.cache.clear()
+        with app.app_context():
+            db.create_all()
+            user = User(username='badges', password=generate_password_hash('testpassword'),
+                        first_name='Test', last_name='User')
+            db.session.add(user)
+            db.session.commit()
+            self.user_id = user.id
+            for movie_id in (101, 205, 305):
+                db.session.add(Favorite(**favorites.favorite_row(self.user_id, row(movie_id)[0])))
+            db.session.commit()
+            self.engine = db.engine
+        self.client.post('/login', data=dict(username='badges', password='testpassword'))
+
+    def tearDown(self):
+        recommendation_store.wait(5)
+        vault.cache.clear()
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def favorite_queries(self, path):
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(self.engine, 'before_cursor_execute', record)
+        try:
+            with patch('app.fetch_new_movies', return_value=row(100)), \
+                    patch('app.fetch_top_rated_movies', return_value=row(200)), \
+                    patch('app.fetch_movies_by_genre', side_effect=lambda genre: row(300)):
+                response = self.client.get(path)
+        finally:
+            event.remove(self.engine, 'before_cursor_execute', record)
+        return response, [statement for statement in statements if 'FROM favorite' in statement]
+
+    def test_dashboard_badges_cost_one_query_then_none(self):
+        response, queries = self.favorite_queries('/')
+
+        self.assertEqual(response.data.count(b'In Your Vault'), 1 + 1 + 4)
+        self.assertEqual(len(queries), 1)
+
+        response, queries = self.favorite_queries('/')
+        self.assertEqual(response.data.count(b'In Your Vault'), 6)
+        self.assertEqual(queries, [])
+
+    def test_anonymous_pages_have_no_badges_or_queries(self):
+        self.client.post('/logout')
+        response, queries = self.favorite_queries('/')
+
+        self.assertNotIn(b'In Your Vault', response.data)
+        self.assertEqual(queries, [])
+
+    @patch('app.fetch_movie_by_id')
+    def test_changes_are_seen_by_this_and_other_workers(self, mock_fetch_movie):
+        mock_fetch_movie.return_value = dict(row(110)[0], runtime=90)
+        self.favorite_queries('/')
+
+        self.client.post('/add_to_favorites/110')
+        recommendation_store.wait(5)
+        response, queries = self.favorite_queries('/')
+        self.assertEqual(response.data.count(b'In Your Vault'), 7)
+        self.assertEqual(queries, [])
+
+        # Another worker still holding the set from before the change.
+        with self.client.session_transaction() as session:
+            version = session[vault.SESSION_KEY]
+        vault.cache.set(self.user_id, 'older', vault.FavoriteIds([101, 205, 305]))
+        response, queries = self.favorite_queries('/')
+        self.assertEqual(response.data.count(b'In Your Vault'), 7)
+        self.assertEqual(len(queries), 1)
+
+        self.client.post('/remove_from_favorites/110')
+        recommendation_store.wait(5)
+        with self.client.session_transaction() as session:
+            self.assertNotEqual(session[vault.SESSION_KEY], version)
+        response, queries = self.favorite_queries('/movies/110')
+        self.assertIn(b'Add to Favorites', response.data)
+        self.assertEqual(queries, [])
+
+
+if __name__ == '__main__':
+    unittest.main()